@@ -1,10 +1,35 @@
+# Lot initializer - writes /{ROOT_BRANCH}/_meta and one FREE node per spot
+# under /{ROOT_BRANCH}/SPOTS for a layout of rows x cols spots on one or more
+# levels, with entrance gates and blocked cells (pillars, ramps) left out.
+#
+# The spot payload is generated lazily and sent as chunked multi-path updates,
+# several in flight at once (rtdb_batch.write_chunks), so a 100k-spot garage
+# is never one giant request or one giant dict. Finished chunks are recorded
+# in a progress file: rerunning after a failure or Ctrl+C sends only the rest.
+# The result is verified with a shallow (key-only) read of SPOTS.
+#
+#   python Init_Park.py                                   # the default 10 x 5 lot
+#   python Init_Park.py --rows 100 --cols 250 --levels 4 --gate north=0,10 --block 5,5
+#   python Init_Park.py --layout garage.json --workers 8
+#
+# Levels are stacked along the row axis (level L, row r is grid row
+# L * rows + r), so every other module keeps its 'row,col' keys and grid.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
 import time
-from firebase_admin import db
-from firebase_init import db as _db_init  # ensures app is initialized
+import typing
+import storage
+import rtdb_batch
+from lot_grid import manhattan_grid
 from constants import ROOT_BRANCH, STAT_FREE
 
 
-# Parking-lot size (adjust as needed)
+# Parking-lot size (adjust as needed, or pass --rows/--cols/--layout)
 ROWS = 10
 COLS = 5
 
@@ -12,6 +37,19 @@ COLS = 5
 ENTRY_ROW = 3
 ENTRY_COL = 0
 
+# lot entrances written to _meta/gates: gate_id -> (row, col)
+# (ParkingLot.load_gates / dashboard /api/status?gate=<id> read them back)
+GATES = {
+    "main": (ENTRY_ROW, ENTRY_COL),
+}
+
+# distanceFromEntry added per level between a spot and the entry's level (the ramp)
+LEVEL_DISTANCE = 20
+
+# finished chunks of an interrupted run (INIT_PARK_PROGRESS moves it)
+PROGRESS_PATH = os.environ.get(
+    "INIT_PARK_PROGRESS", os.path.join(os.path.expanduser("~"), ".cache", "iot_parking", "init_park_progress.json"))
+
 
 def _spot_id(r, c):
     # use canonical key format 'row,col' to match other modules
@@ -23,44 +61,260 @@ def distance_from_entry(r, c):
     return abs(r - ENTRY_ROW) + abs(c - ENTRY_COL)
 
 
-def main():
-    base = db.reference(ROOT_BRANCH)
-    spots_ref = base.child("SPOTS")
+def _cell(value, name) -> typing.Tuple[int, ...]:
+    """[r, c] / 'r,c' / {'row': r, 'col': c[, 'level': l]} -> tuple of ints."""
+    if isinstance(value, dict):
+        value = [value["level"], value["row"], value["col"]] if "level" in value else [value["row"], value["col"]]
+    if isinstance(value, str):
+        level, _, rc = value.rpartition(":")
+        value = ([level] if level else []) + rc.split(",")
+    cell = tuple(int(v) for v in value)
+    if len(cell) not in (2, 3):
+        raise ValueError(f"{name}: expected [row, col] or [level, row, col], got {value!r}")
+    return cell
+
+
+class Layout:
+    """The lot to initialize.
+
+    rows x cols spots per level; gates {gate_id: (row, col) or (level, row,
+    col)} on level 0 unless given; distanceFromEntry is the Manhattan
+    distance to `entry` (default: the first gate) within a level plus
+    level_distance per level away from the entry's level. blocked holds
+    (row, col) cells left out on every level and (level, row, col) cells
+    left out on one.
+    """
+
+    def __init__(self, rows: int = ROWS, cols: int = COLS, levels: int = 1,
+                 gates: typing.Optional[dict] = None, blocked: typing.Iterable = (),
+                 entry=None, level_distance: int = LEVEL_DISTANCE):
+        if rows < 1 or cols < 1 or levels < 1:
+            raise ValueError("rows, cols and levels must be at least 1")
+        self.rows, self.cols, self.levels = int(rows), int(cols), int(levels)
+        self.level_distance = int(level_distance)
+        gates = dict(GATES) if gates is None else gates
+        self.gates = {str(gid): self._on_level(_cell(pos, f"gate {gid}")) for gid, pos in gates.items()}
+        if entry is None and not self.gates:
+            raise ValueError("need a gate or an entry to measure distanceFromEntry from")
+        self.entry = self._on_level(_cell(entry, "entry")) if entry is not None else next(iter(self.gates.values()))
+        self.blocked = set()
+        for cell in blocked:
+            cell = _cell(cell, "blocked cell")
+            for level in ([cell[0]] if len(cell) == 3 else range(self.levels)):
+                self.blocked.add(self._on_level((level,) + cell[-2:]))
+
+    def _on_level(self, cell):
+        level, row, col = cell if len(cell) == 3 else (0,) + cell
+        if not (0 <= level < self.levels and 0 <= row < self.rows and 0 <= col < self.cols):
+            raise ValueError(f"{cell} is outside the {self.levels} x {self.rows} x {self.cols} lot")
+        return level, row, col
 
-    # create metadata
-    meta = {
-        "_meta": {
-            "rows": ROWS,
-            "cols": COLS,
+    @classmethod
+    def from_dict(cls, d: dict) -> 'Layout':
+        """From a layout file: {"rows", "cols", "levels", "gates", "blocked", "entry", "levelDistance"}."""
+        unknown = set(d) - {"rows", "cols", "levels", "gates", "blocked", "entry", "levelDistance"}
+        if unknown:
+            raise ValueError(f"unknown layout keys: {', '.join(sorted(unknown))}")
+        return cls(d.get("rows", ROWS), d.get("cols", COLS), d.get("levels", 1), d.get("gates"),
+                   d.get("blocked", ()), d.get("entry"), d.get("levelDistance", LEVEL_DISTANCE))
+
+    def to_dict(self) -> dict:
+        return {"rows": self.rows, "cols": self.cols, "levels": self.levels,
+                "gates": {gid: list(cell) for gid, cell in sorted(self.gates.items())},
+                "blocked": sorted(list(cell) for cell in self.blocked),
+                "entry": list(self.entry), "levelDistance": self.level_distance}
+
+    def fingerprint(self) -> str:
+        return hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()
+
+    def grid_row(self, level: int, row: int) -> int:
+        return level * self.rows + row
+
+    @property
+    def spot_count(self) -> int:
+        return self.levels * self.rows * self.cols - len(self.blocked)
+
+    def spots(self, now_ms: int) -> typing.Iterator[typing.Tuple[str, dict]]:
+        """(spot_id, node) for every spot, level by level and row by row."""
+        entry_level, entry_row, entry_col = self.entry
+        # every spot's in-level distance in one vectorized pass (same values as distance_from_entry)
+        distances = manhattan_grid(self.rows, self.cols, entry_row, entry_col).tolist()
+        for level in range(self.levels):
+            ramp = abs(level - entry_level) * self.level_distance
+            for r in range(self.rows):
+                row = self.grid_row(level, r)
+                for c in range(self.cols):
+                    if (level, r, c) in self.blocked:
+                        continue
+                    node = {
+                        "row": row,
+                        "col": c,
+                        "status": STAT_FREE,
+                        "distanceFromEntry": distances[r][c] + ramp,
+                        "lastUpdateMs": now_ms,
+                        "seenCarId": "-",      # initialized as null
+                        "waitingCarId": "-",   # initialized as null
+                    }
+                    if self.levels > 1:
+                        node["level"] = level
+                    yield _spot_id(row, c), node
+
+    def meta(self) -> dict:
+        return {
+            "rows": self.levels * self.rows,
+            "cols": self.cols,
+            "levels": self.levels,
+            "rowsPerLevel": self.rows,
+            "spots": self.spot_count,
+            "blocked": len(self.blocked),
             "lastInit": int(time.time()),
-        },
-       
-    }
-    base.update(meta)
-
-    payload = {}
-    now_ms = int(time.time() * 1000)
-    for r in range(ROWS):
-        for c in range(COLS):
-            sid = _spot_id(r, c)
-            payload[sid] = {
-                "row": r,
-                "col": c,
-                "status": STAT_FREE,
-                "distanceFromEntry": distance_from_entry(r, c),
-                "lastUpdateMs": now_ms,
-                "seenCarId": "-",      # initialized as null
-                "waitingCarId": "-",   # initialized as null
-            }
-
-    spots_ref.set(payload)
-    print(f"[WRITE] Initialized {ROWS*COLS} spots under /{ROOT_BRANCH}/SPOTS (keys as 'row,col')")
-
-    # sanity read
-    data = spots_ref.get() or {}
-    print(f"[READ] Spots in DB: {len(data)}")
+            "gates": {gid: {"row": self.grid_row(level, r), "col": c} for gid, (level, r, c) in self.gates.items()},
+        }
+
+
+def chunked(items: typing.Iterable, size: int) -> typing.Iterator[dict]:
+    chunk = {}
+    for key, value in items:
+        chunk[key] = value
+        if len(chunk) >= size:
+            yield chunk
+            chunk = {}
+    if chunk:
+        yield chunk
+
+
+class Progress:
+    """Chunks of one layout already written, kept in a JSON file across runs."""
+
+    def __init__(self, path: typing.Optional[str], key: dict):
+        self.path = path
+        self.key = key
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def load(self) -> 'Progress':
+        if not self.path:
+            return self
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if isinstance(saved, dict) and saved.get("key") == self.key:
+            self.done = set(saved.get("done", ()))
+        return self
+
+    def mark(self, index: int):
+        with self._lock:
+            self.done.add(index)
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": self.key, "done": sorted(self.done), "updated": int(time.time())}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def initialize(layout: Layout, chunk_size: typing.Optional[int] = None, workers: typing.Optional[int] = None,
+               progress_path: typing.Optional[str] = PROGRESS_PATH, restart: bool = False) -> bool:
+    """Write layout's _meta and spots; True once a shallow read finds every spot.
+
+    Resumes from progress_path when it holds an unfinished run of the same
+    layout (restart=True starts over). A fresh run first removes the old
+    SPOTS node, so spots of a previous, larger layout don't linger.
+    """
+    chunk_size = chunk_size or rtdb_batch.BULK_CHUNK_SIZE
+    base = storage.reference(ROOT_BRANCH)
+    spots_ref = base.child("SPOTS")
+    total = -(-layout.spot_count // chunk_size)
+    progress = Progress(progress_path, {"root": ROOT_BRANCH, "layout": layout.fingerprint(),
+                                        "chunkSize": chunk_size, "db": os.environ.get("RTDB_URL")})
+    if not restart:
+        progress.load()
+    if progress.done:
+        print(f"[INIT] Resuming: {len(progress.done)}/{total} chunks already written")
+    else:
+        spots_ref.delete()
+    base.update({"_meta": layout.meta()})
+
+    # chunks still to send, and which chunk index each position in that stream is
+    sent = []
+
+    def pending_chunks():
+        for index, chunk in enumerate(chunked(layout.spots(int(time.time() * 1000)), chunk_size)):
+            if index not in progress.done:
+                sent.append(index)
+                yield chunk
+
+    def done(position, chunk):
+        progress.mark(sent[position])
+        finished = len(progress.done)
+        if finished % max(1, total // 10) == 0 or finished == total:
+            print(f"[WRITE] {finished}/{total} chunks")
+
+    started = time.perf_counter()
+    failed = rtdb_batch.write_chunks(pending_chunks(), spots_ref.path, workers, done=done)
+    if failed:
+        print(f"[WRITE] {len(failed)} chunk(s) failed; rerun to resume from {progress.path}")
+        return False
+    print(f"[WRITE] Initialized {layout.spot_count} spots under /{ROOT_BRANCH}/SPOTS (keys as 'row,col') "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    # sanity read: keys only, not the whole tree
+    count = len(spots_ref.get(shallow=True) or {})
+    print(f"[READ] Spots in DB: {count}")
+    if count != layout.spot_count:
+        print(f"[READ] Expected {layout.spot_count} spots; rerun with --restart to rewrite them")
+        return False
+    progress.clear()
+    return True
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Initialize the parking lot spots and _meta in the RTDB")
+    ap.add_argument("--layout", help="JSON layout file (rows, cols, levels, gates, blocked, entry, levelDistance)")
+    ap.add_argument("--rows", type=int, help=f"rows per level (default {ROWS})")
+    ap.add_argument("--cols", type=int, help=f"columns (default {COLS})")
+    ap.add_argument("--levels", type=int, help="levels (default 1)")
+    ap.add_argument("--gate", action="append", metavar="ID=ROW,COL", help="entrance gate (repeatable; replaces the layout's)")
+    ap.add_argument("--block", action="append", metavar="[LEVEL:]ROW,COL", help="cell without a spot (repeatable)")
+    ap.add_argument("--entry", metavar="[LEVEL:]ROW,COL", help="distanceFromEntry origin (default: the first gate)")
+    ap.add_argument("--chunk-size", type=int, help=f"spots per update request (default {rtdb_batch.BULK_CHUNK_SIZE})")
+    ap.add_argument("--workers", type=int, help=f"update requests in flight (default {rtdb_batch.BULK_WORKERS})")
+    ap.add_argument("--progress", default=PROGRESS_PATH, help="progress file for resuming ('' disables)")
+    ap.add_argument("--restart", action="store_true", help="ignore saved progress and rewrite every spot")
+    return ap.parse_args(argv)
+
+
+def layout_from_args(args: argparse.Namespace) -> Layout:
+    spec = {}
+    if args.layout:
+        with open(args.layout) as f:
+            spec = json.load(f)
+    for key in ("rows", "cols", "levels", "entry"):
+        if getattr(args, key) is not None:
+            spec[key] = getattr(args, key)
+    if args.gate:
+        spec["gates"] = dict(g.split("=", 1) for g in args.gate)
+    if args.block:
+        spec["blocked"] = list(spec.get("blocked", ())) + args.block
+    return Layout.from_dict(spec)
+
 
+def main(argv=None):
+    args = parse_args(argv)
+    layout = layout_from_args(args)
+    ok = initialize(layout, args.chunk_size, args.workers, args.progress or None, args.restart)
+    sys.exit(0 if ok else 1)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,20 +1,21 @@
 import threading
 import time
-from firebase_admin import db
-from firebase_init import db as _db_init  # ensures firebase is initialized
+import storage
 from constants import ROOT_BRANCH, STAT_WAIT, STAT_OCC
+from eventlog import EventLog, Preview
 
-BASE = db.reference(ROOT_BRANCH)
+_log = EventLog('RTDB_listener', 'LISTENER')
+
+BASE = storage.reference(ROOT_BRANCH)
 SPOTS = BASE.child("SPOTS")
 CARS = BASE.child("CARS")
 
 
 def _on_spots(event):
     # event: {event_type, path, data}
-    try:
-        print(f"[SPOTS EVENT] {event.event_type} {event.path} -> {str(event.data)[:120]}")
-    except Exception:
-        print("[SPOTS EVENT] (print failed)")
+    # the payload is previewed lazily (at most 120 chars) on the log writer thread
+    _log.info('spots_event', '%s %s -> %s', event.event_type, event.path, Preview(event.data),
+              event_type=event.event_type, path=event.path)
 
     # Example: auto-confirm WAITING -> OCCUPIED when 'arrivalConfirmed' flag appears
     # (You can delete this if your flow is different.)
@@ -28,16 +29,14 @@ def _on_spots(event):
                     "arrivalConfirmed": None,
                     "lastUpdate": int(time.time()),
                 })
-                print(f"[AUTO] {spot_id}: WAITING→OCCUPIED by listener")
+                _log.info('auto_confirm', '%s: WAITING→OCCUPIED by listener', spot_id, spot=spot_id)
     except Exception as e:
-        print("[SPOTS HANDLER ERROR]", e)
+        _log.error('spots_handler_error', 'SPOTS handler error: %s', e)
 
 
 def _on_cars(event):
-    try:
-        print(f"[CARS EVENT] {event.event_type} {event.path} -> {str(event.data)[:120]}")
-    except Exception:
-        print("[CARS EVENT] (print failed)")
+    _log.info('cars_event', '%s %s -> %s', event.event_type, event.path, Preview(event.data),
+              event_type=event.event_type, path=event.path)
 
 
 def start_listener(block_forever: bool = True):
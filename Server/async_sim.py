@@ -0,0 +1,265 @@
+# Asyncio simulator - every car is its own coroutine (approaching, waiting for
+# its spot, parked, departing), so thousands of cars are in flight at once the
+# way they are at rush hour, instead of one car at a time. The transitions
+# are the event_generator functions the other simulators use; they run on a
+# worker thread so their RTDB reads and writes never block the event loop,
+# and a bound on outstanding transitions pushes back on the cars when the
+# database can't keep up.
+
+import asyncio
+import functools
+import itertools
+import os
+import random
+import time
+import typing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from data_structures import ParkingLot
+from event_generator import simulate_car_arrival, simulate_car_parked, simulate_car_departure
+from traffic import TrafficModel, exponential_dwell
+
+PHASES = ('approaching', 'waiting', 'parked', 'departing')
+# mean stay when neither dwell nor traffic gives one (as in Tools/bench_sim_engine.py)
+DEFAULT_MEAN_DWELL = 2 * 3600.0
+
+
+class AsyncParkingSimulation:
+    """The lot's traffic with one asyncio task per car.
+
+    - a car arrives every arrival_interval s, or at the times of `arrivals`
+      (seconds from the start; traffic supplies them with the dwell model)
+    - it drives `approach` s to the gate; while the lot is full it queues
+      there up to `patience` s for a departure (0: turned away as 'rejected')
+    - simulate_car_arrival reserves its spot (WAITING), simulate_car_parked
+      wait_between s later (OCCUPIED), and simulate_car_departure after a stay
+      of dwell(rng) s
+    - a wrong park every wrong_park_interval s (0 disables), as in sim_engine
+
+    Times are virtual seconds on the wall clock scaled by `speed` (virtual
+    seconds per real second). Transitions run in submission order on
+    io_workers threads (1 keeps every spot's writes in the order of its
+    in-memory changes; more exercise the allocator from several threads at
+    once). At most max_pending transitions are queued or running; the cars
+    behind them wait, and that wait is summed in `io_wait` (real seconds).
+    `phases` counts the cars in each phase right now, `peak` the most seen
+    at once per phase, for all cars together ('cars') and for transitions
+    outstanding ('pending').
+    """
+
+    def __init__(self, parking_lot: ParkingLot, arrival_interval: typing.Optional[float] = None,
+                 wait_between: typing.Optional[float] = None, approach: float = 0.0, patience: float = 0.0,
+                 wrong_park_interval: typing.Optional[float] = None,
+                 dwell: typing.Optional[typing.Callable[[random.Random], float]] = None,
+                 rng: typing.Optional[random.Random] = None,
+                 arrivals: typing.Optional[typing.Iterable[float]] = None,
+                 traffic: typing.Optional[TrafficModel] = None, speed: float = 1.0,
+                 io_workers: int = 1, max_pending: int = 64):
+        def env(value, name, default):
+            return float(os.environ.get(name, default)) if value is None else float(value)
+
+        if traffic is not None:
+            arrivals = traffic.arrival_times() if arrivals is None else arrivals
+            dwell = traffic.dwell if dwell is None else dwell
+            rng = rng or traffic.rng('dwell')
+        if speed <= 0:
+            raise ValueError('speed must be positive (virtual seconds per real second)')
+
+        self.parking_lot = parking_lot
+        self.arrival_interval = env(arrival_interval, 'ARRIVAL_INTERVAL_SECONDS', '5')
+        self.wait_between = env(wait_between, 'WAIT_SECONDS', '1')
+        self.wrong_park_interval = env(wrong_park_interval, 'WRONG_PARK_SECONDS', '45')
+        self.approach = approach
+        self.patience = patience
+        self.dwell = dwell or exponential_dwell(DEFAULT_MEAN_DWELL)
+        self.rng = rng or random.Random()
+        self.speed = speed
+        self.io_workers = io_workers
+        self.max_pending = max_pending
+        self._arrivals = arrivals
+        self.stats = Counter()
+        self.phases = Counter()
+        self.peak = Counter()
+        self.io_wait = 0.0
+        self.created_plates = []
+        self._cars = set()
+        self._claims = 0
+        self._pending = 0
+
+    # Bookkeeping (event loop thread only)
+    def _move(self, old: typing.Optional[str], new: typing.Optional[str]) -> typing.Optional[str]:
+        if old:
+            self.phases[old] -= 1
+        if new:
+            self.phases[new] += 1
+            self.peak[new] = max(self.peak[new], self.phases[new])
+        return new
+
+    def _has_room(self) -> bool:
+        # cars between the check and their reservation have a spot spoken for
+        return len(getattr(self.parking_lot, 'free_spots', ()) or ()) - self._claims > 0
+
+    def _reserved(self, plate: str) -> bool:
+        get_pair = getattr(self.parking_lot, 'get_waiting_pair', None)
+        return get_pair is None or get_pair(plate) is not None
+
+    async def _sleep(self, seconds: float):
+        if seconds > 0:
+            await asyncio.sleep(seconds / self.speed)
+
+    async def _io(self, kind: str, fn, *args, **kwargs):
+        """fn(*args, **kwargs) on the worker pool once a slot is free; None if it raised."""
+        started = time.perf_counter()
+        async with self._slots:
+            self.io_wait += time.perf_counter() - started
+            self._pending += 1
+            self.peak['pending'] = max(self.peak['pending'], self._pending)
+            try:
+                return await self._loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+            except Exception as e:
+                self.stats[f"{kind}_failed"] += 1
+                print(f"[SIM] {kind} failed: {e}")
+                return None
+            finally:
+                self._pending -= 1
+
+    # Cars
+    async def _car(self):
+        phase = self._move(None, 'approaching')
+        try:
+            await self._sleep(self.approach)
+            if not self._has_room() and not await self._queue_at_gate():
+                self.stats['rejected'] += 1
+                return
+            self._claims += 1
+            try:
+                plate = await self._io('arrival', simulate_car_arrival, self.parking_lot)
+            finally:
+                self._claims -= 1
+            if not plate:
+                return
+            self.stats['arrivals'] += 1
+            self.created_plates.append(plate)
+            if not self._reserved(plate):
+                # no spot after all (e.g. a sensor took it): its record stays queued
+                self.stats['queued'] += 1
+                return
+            phase = self._move(phase, 'waiting')
+            await self._sleep(self.wait_between)
+            spot_id = await self._io('park', simulate_car_parked, self.parking_lot, plate)
+            if not spot_id:
+                return
+            self.stats['parked'] += 1
+            phase = self._move(phase, 'parked')
+            await self._sleep(self.dwell(self.rng))
+            phase = self._move(phase, 'departing')
+            await self._depart(spot_id, plate)
+        finally:
+            self._move(phase, None)
+
+    async def _queue_at_gate(self) -> bool:
+        """Wait up to patience for a departure to make room; True once there is."""
+        if self.patience <= 0:
+            return False
+        async with self._spot_freed:
+            try:
+                await asyncio.wait_for(self._spot_freed.wait_for(self._has_room), self.patience / self.speed)
+            except asyncio.TimeoutError:
+                return False
+        return self._has_room()
+
+    async def _depart(self, spot_id: str, plate: str):
+        # the spot may have been freed/reassigned by a refresh since this car parked
+        if self.parking_lot.occupied_spots_with_cars.get(spot_id) != plate:
+            self.stats['stale_departures'] += 1
+            return
+        if await self._io('departure', simulate_car_departure, self.parking_lot, spot_id=spot_id):
+            self.stats['departures'] += 1
+            async with self._spot_freed:
+                self._spot_freed.notify()
+
+    async def _wrong_parked_car(self, state: dict):
+        import simulation_sondos
+        phase = self._move(None, 'waiting')
+        try:
+            await self._sleep(1.0)
+            await self._io('wrong_park', simulation_sondos.wrong_park_restore_closest, self.parking_lot, state)
+            await self._sleep(1.0)
+            plate = await self._io('wrong_park', simulation_sondos.wrong_park_finish, self.parking_lot, state)
+            if not plate:
+                return
+            self.stats['wrong_parks'] += 1
+            self.created_plates.append(plate)
+            phase = self._move(phase, 'parked')
+            await self._sleep(self.dwell(self.rng))
+            phase = self._move(phase, 'departing')
+            await self._depart(state['chosen_id'], plate)
+        finally:
+            self._move(phase, None)
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._cars.add(task)
+        task.add_done_callback(self._cars.discard)
+        self.peak['cars'] = max(self.peak['cars'], len(self._cars))
+
+    # Drivers
+    async def _arrival_loop(self, until: typing.Optional[float]):
+        times = self._arrivals
+        if times is None:
+            times = (i * self.arrival_interval for i in itertools.count())
+        for at in times:
+            if until is not None and at > until:
+                break
+            await self._until(at)
+            self._spawn(self._car())
+        if until is not None:
+            await self._until(until)
+
+    async def _wrong_park_loop(self):
+        import simulation_sondos
+        while True:
+            await self._sleep(self.wrong_park_interval)
+            state = await self._io('wrong_park', simulation_sondos.wrong_park_begin, self.parking_lot)
+            if state is not None:
+                self._spawn(self._wrong_parked_car(state))
+
+    async def _until(self, at: float):
+        delay = self._origin + at / self.speed - self._loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @property
+    def now(self) -> float:
+        """Virtual seconds since run() started."""
+        return (self._loop.time() - self._origin) * self.speed
+
+    async def run(self, duration: typing.Optional[float] = None, drain: bool = False) -> Counter:
+        """Run arrivals for duration virtual seconds (None: until they run out or the task is cancelled).
+
+        With drain, cars already in the lot then finish their stay and leave;
+        otherwise they are cancelled where they are. Transitions already
+        handed to the worker threads always complete. Returns stats.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._origin = self._loop.time()
+        self._executor = ThreadPoolExecutor(self.io_workers, thread_name_prefix='sim-io')
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._spot_freed = asyncio.Condition()
+        drivers = [asyncio.ensure_future(self._arrival_loop(duration))]
+        if self.wrong_park_interval > 0:
+            drivers.append(asyncio.ensure_future(self._wrong_park_loop()))
+        try:
+            await drivers[0]
+            if drain:
+                for task in drivers[1:]:
+                    task.cancel()
+                while self._cars:
+                    await asyncio.gather(*list(self._cars), return_exceptions=True)
+        finally:
+            pending = drivers + list(self._cars)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await self._loop.run_in_executor(None, self._executor.shutdown)
+        return self.stats
@@ -0,0 +1,277 @@
+# Monte-Carlo capacity planner - runs many independent simulations of a
+# ParkingLot and its BFS allocator over a parameter grid (lot size, gates,
+# arrival rate, dwell time) in a process pool and aggregates the results.
+#
+# Each run owns an in-memory lot driven by sim_engine on a virtual clock with
+# traffic-model arrivals and stays; nothing touches storage or Firebase, so
+# runs are CPU-bound and independent and the sweep scales with the workers.
+#
+#   python capacity_planner.py --rows 10 20 --cols 5 10 --rate 300 600 \
+#       --dwell exp:3600 --replicates 20 --hours 24 --out sweep.jsonl
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from data_structures import ParkingLot, Spot
+from sim_engine import SimEngine
+from traffic import TrafficModel
+
+# results carry these parameter keys; everything else is a metric
+PARAM_KEYS = ('rows', 'cols', 'gates', 'arrivals', 'profile', 'dwell', 'hours', 'warmup_hours', 'wait')
+METRIC_KEYS = ('offered', 'rejected', 'rejection_rate', 'mean_occupancy', 'peak_occupancy',
+               'mean_walk', 'mean_time_saved')
+
+
+def build_lot(rows: int, cols: int, gates) -> ParkingLot:
+    """rows x cols lot; distanceFromEntry is the Manhattan distance to the first gate (as Init_Park)."""
+    entry_row, entry_col = gates[0]
+    pl = ParkingLot()
+    for r in range(rows):
+        for c in range(cols):
+            pl.add_spot(Spot(r, c, abs(r - entry_row) + abs(c - entry_col)))
+    for i, (r, c) in enumerate(gates):
+        pl.register_gate(f"g{i}", r, c)
+    return pl
+
+
+def run_scenario(params: dict) -> dict:
+    """One simulation; returns params plus its metrics.
+
+    Cars arrive through a gate picked uniformly at random, get the BFS-closest
+    free spot from that gate (or are rejected when the lot is full), park
+    `wait` seconds later and leave after their dwell time. Metrics cover the
+    time after warmup_hours:
+
+    - rejection_rate    rejected / offered arrivals
+    - mean_occupancy    time-weighted share of spots not FREE (0..1)
+    - peak_occupancy    highest share of spots not FREE
+    - mean_walk         Manhattan distance from the car's gate to its spot
+    - mean_time_saved   ParkingLot.get_time_saved() seen by each arrival
+    """
+    started = time.perf_counter()
+    rows, cols, wait = params['rows'], params['cols'], params.get('wait', 1.0)
+    gates = [tuple(g) for g in params['gates']]
+    traffic = TrafficModel.from_spec(params['arrivals'], params['dwell'], params.get('profile'),
+                                     seed=params.get('seed'))
+    gate_rng = traffic.rng('gates')
+    dwell_rng = traffic.rng('dwell')
+    warmup = params.get('warmup_hours', 0.0) * 3600.0
+    horizon = warmup + params['hours'] * 3600.0
+    spots = rows * cols
+
+    pl = build_lot(rows, cols, gates)
+    engine = SimEngine()
+    m = {'offered': 0, 'rejected': 0, 'walk': 0, 'parked': 0, 'time_saved': 0, 'busy': 0,
+         'busy_area': 0.0, 'peak': 0, 'last': warmup}
+    plates = itertools.count()
+
+    def set_busy(delta):
+        # integrate the number of non-FREE spots over time (after warmup)
+        now = engine.now
+        if now > warmup:
+            m['busy_area'] += m['busy'] * (now - max(m['last'], warmup))
+            m['last'] = now
+        m['busy'] += delta
+        if now >= warmup:
+            m['peak'] = max(m['peak'], m['busy'])
+
+    def arrival():
+        counted = engine.now >= warmup
+        gate = gate_rng.randrange(len(gates))
+        if counted:
+            m['offered'] += 1
+            m['time_saved'] += pl.get_time_saved()
+        plate = f"C{next(plates)}"
+        spot_id = pl.reserve_closest(plate, gate=f"g{gate}")
+        if spot_id is None:
+            if counted:
+                m['rejected'] += 1
+            return
+        set_busy(1)
+        if counted:
+            spot = pl.get_spot(spot_id)
+            m['walk'] += abs(spot.row - gates[gate][0]) + abs(spot.col - gates[gate][1])
+            m['parked'] += 1
+        engine.schedule(wait, 'park', park, plate, spot_id)
+
+    def park(plate, spot_id):
+        pl.confirm_parked(plate, spot_id)
+        engine.schedule(traffic.dwell(dwell_rng), 'departure', depart, spot_id)
+
+    def depart(spot_id):
+        pl.release_spot(spot_id)
+        set_busy(-1)
+
+    arrivals = traffic.arrival_times()
+
+    def next_arrival():
+        at = next(arrivals, None)
+        if at is not None and at <= horizon:
+            engine.schedule_at(at, 'arrival', lambda: (arrival(), next_arrival()))
+
+    next_arrival()
+    engine.run(until=horizon)
+    set_busy(0)  # close the occupancy integral at the horizon
+
+    measured = horizon - warmup
+    result = {k: params[k] for k in params}
+    result.update({
+        'offered': m['offered'],
+        'rejected': m['rejected'],
+        'rejection_rate': m['rejected'] / m['offered'] if m['offered'] else 0.0,
+        'mean_occupancy': m['busy_area'] / (measured * spots) if measured > 0 else 0.0,
+        'peak_occupancy': m['peak'] / spots,
+        'mean_walk': m['walk'] / m['parked'] if m['parked'] else 0.0,
+        'mean_time_saved': m['time_saved'] / m['offered'] if m['offered'] else 0.0,
+        'events': sum(engine.processed.values()),
+        'runtime_s': round(time.perf_counter() - started, 4),
+    })
+    return result
+
+
+def run_batch(batch: typing.List[dict]) -> typing.List[dict]:
+    """Worker entry point: several scenarios per task to keep IPC overhead low."""
+    return [run_scenario(params) for params in batch]
+
+
+def expand_grid(rows=(10,), cols=(5,), gates=(((3, 0),),), rates=(600.0,), dwell=('exp:3600',),
+                profile=None, hours: float = 24.0, warmup_hours: float = 0.0, wait: float = 1.0,
+                replicates: int = 1, seed: int = 0) -> typing.List[dict]:
+    """Every combination of the axes, `replicates` times with distinct seeds.
+
+    rates are Poisson arrival rates in cars/hour (shaped by profile if given);
+    gates is a list of gate layouts, each a sequence of (row, col) entrances.
+    """
+    scenarios = []
+    combos = itertools.product(rows, cols, gates, rates, dwell)
+    for i, (r, c, layout, rate, dw) in enumerate(combos):
+        for rep in range(replicates):
+            scenarios.append({
+                'rows': r, 'cols': c, 'gates': [list(g) for g in layout],
+                'arrivals': f"poisson:{rate:g}", 'profile': profile, 'dwell': dw,
+                'hours': hours, 'warmup_hours': warmup_hours, 'wait': wait,
+                'seed': seed + i * replicates + rep,
+            })
+    return scenarios
+
+
+def run_sweep(scenarios: typing.Sequence[dict], workers: typing.Optional[int] = None,
+              batch_size: typing.Optional[int] = None) -> typing.Iterator[dict]:
+    """Run scenarios in a process pool and yield each result as soon as its batch finishes.
+
+    workers defaults to os.cpu_count(); workers=1 runs in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for params in scenarios:
+            yield run_scenario(params)
+        return
+    # a few batches per worker so stragglers don't idle the pool at the end
+    batch_size = batch_size or max(1, min(50, len(scenarios) // (workers * 8)))
+    batches = [list(scenarios[i:i + batch_size]) for i in range(0, len(scenarios), batch_size)]
+    pool = ProcessPoolExecutor(workers)
+    try:
+        futures = [pool.submit(run_batch, b) for b in batches]
+        for future in as_completed(futures):
+            yield from future.result()
+    except BaseException:
+        # Ctrl+C, a failed batch or the caller closing the generator: drop the queued batches
+        # instead of waiting for all of them the way the executor's __exit__ would
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+
+def _group_key(result: dict) -> tuple:
+    return tuple(json.dumps(result.get(k), sort_keys=True) for k in PARAM_KEYS)
+
+
+def summarize(results: typing.Iterable[dict]) -> typing.List[dict]:
+    """One row per parameter combination: replicate count, mean and 95% CI half-width per metric."""
+    groups = {}
+    for res in results:
+        groups.setdefault(_group_key(res), []).append(res)
+    report = []
+    for runs in groups.values():
+        row = {k: runs[0].get(k) for k in PARAM_KEYS}
+        row['runs'] = len(runs)
+        for metric in METRIC_KEYS:
+            values = [r[metric] for r in runs]
+            mean = sum(values) / len(values)
+            var = sum((v - mean) ** 2 for v in values) / (len(values) - 1) if len(values) > 1 else 0.0
+            row[metric] = mean
+            row[f"{metric}_ci95"] = 1.96 * math.sqrt(var / len(values))
+        report.append(row)
+    report.sort(key=lambda r: (r['rows'] * r['cols'], r['rows'], r['arrivals'], r['dwell'], str(r['gates'])))
+    return report
+
+
+def format_report(report: typing.List[dict]) -> str:
+    lines = [f"{'lot':>7} {'gates':>14} {'arrivals':>14} {'dwell':>16} {'runs':>5} "
+             f"{'reject':>14} {'occupancy':>15} {'peak':>6} {'walk':>6} {'saved':>6}"]
+    for r in report:
+        gates = ';'.join(f"{g[0]},{g[1]}" for g in r['gates'])
+        lines.append(f"{r['rows']}x{r['cols']:<4} {gates:>14} {r['arrivals']:>14} {r['dwell']:>16} {r['runs']:>5} "
+                     f"{r['rejection_rate']:>7.1%} ±{r['rejection_rate_ci95']:>5.1%} "
+                     f"{r['mean_occupancy']:>7.1%} ±{r['mean_occupancy_ci95']:>5.1%} "
+                     f"{r['peak_occupancy']:>6.0%} {r['mean_walk']:>6.2f} {r['mean_time_saved']:>6.2f}")
+    return '\n'.join(lines)
+
+
+def _parse_gates(spec: str):
+    """'3,0' or '0,2;9,4' -> [(3, 0)] / [(0, 2), (9, 4)]"""
+    return tuple(tuple(int(v) for v in g.split(',')) for g in spec.split(';') if g.strip())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Monte-Carlo capacity planner for ParkingLot + BFS allocation')
+    ap.add_argument('--rows', type=int, nargs='+', default=[10])
+    ap.add_argument('--cols', type=int, nargs='+', default=[5])
+    ap.add_argument('--gates', nargs='+', default=['3,0'], help="gate layouts, e.g. '3,0' '0,2;9,4'")
+    ap.add_argument('--rate', type=float, nargs='+', default=[60.0], help='arrivals per hour (Poisson)')
+    ap.add_argument('--dwell', nargs='+', default=['exp:2400'], help='traffic dwell specs')
+    ap.add_argument('--profile', default=None, help='hourly rate profile (weekday, weekend, flat)')
+    ap.add_argument('--hours', type=float, default=24.0, help='measured virtual hours per run')
+    ap.add_argument('--warmup', type=float, default=2.0, help='virtual hours before measuring')
+    ap.add_argument('--wait', type=float, default=1.0, help='seconds from allocation to parked')
+    ap.add_argument('--replicates', type=int, default=10)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    ap.add_argument('--out', default=None, help='append every run as a JSON line to this file')
+    args = ap.parse_args(argv)
+
+    scenarios = expand_grid(args.rows, args.cols, [_parse_gates(g) for g in args.gates], args.rate, args.dwell,
+                            args.profile, args.hours, args.warmup, args.wait, args.replicates, args.seed)
+    workers = args.workers or os.cpu_count() or 1
+    print(f"[PLAN] {len(scenarios)} runs on {workers} worker(s)")
+    out = open(args.out, 'a') if args.out else None
+    results = []
+    started = time.time()
+    step = max(1, len(scenarios) // 20)
+    try:
+        for res in run_sweep(scenarios, workers):
+            results.append(res)
+            if out:
+                out.write(json.dumps(res) + '\n')
+                out.flush()
+            if len(results) % step == 0 or len(results) == len(scenarios):
+                elapsed = time.time() - started
+                print(f"[PLAN] {len(results)}/{len(scenarios)} runs, {len(results) / elapsed:.1f} runs/s",
+                      file=sys.stderr)
+    except KeyboardInterrupt:
+        print(f"[PLAN] Interrupted — reporting the {len(results)} finished runs")
+    finally:
+        if out:
+            out.close()
+    print(format_report(summarize(results)))
+    return results
+
+
+if __name__ == '__main__':
+    main()
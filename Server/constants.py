@@ -1,4 +1,5 @@
 ROOT_BRANCH = "SondosPark"
 STAT_FREE = "FREE"
 STAT_WAIT = "WAITING"
-STAT_OCC = "OCCUPIED"
\ No newline at end of file
+STAT_OCC = "OCCUPIED"
+STAT_WRONG = "WRONG_PARK"
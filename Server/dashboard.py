@@ -1,36 +1,51 @@
-from flask import Flask, jsonify, render_template
-import firebase_init  # ensures firebase_admin is initialized
-from firebase_admin import db
-from data_structures import ParkingLot, Spot
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
+import metrics
+import storage
+from data_structures import ParkingLot, parse_spot_key
+from lot_mirror import get_shared_mirror
+import json
+import os
+import threading
 import time
+import zlib
 
 # Note: the repository contains a `template/` directory (singular). Keep the
 # value in sync so Jinja can find `index.html`.
 app = Flask(__name__, static_folder='static', template_folder='template')
 ROOT = '/SondosPark/SPOTS'
+META = '/SondosPark/_meta'
+
+# gate registry read from _meta/gates; entrances rarely move, so re-read it at most every GATES_TTL seconds
+GATES_TTL = 30.0
+_gates_cache = {'gates': {}, 'loaded_at': None}
+
+
+def load_gates():
+    """Return {gate_id: (row, col)} from the _meta node written by Init_Park (cached)."""
+    now = time.time()
+    if _gates_cache['loaded_at'] is None or now - _gates_cache['loaded_at'] >= GATES_TTL:
+        pl = ParkingLot()
+        try:
+            pl.load_gates(storage.reference(META).get() or {})
+        except Exception as e:
+            print(f"[DASH] Failed to read gates from {META}: {e}")
+        _gates_cache['gates'] = dict(pl.gates)
+        _gates_cache['loaded_at'] = now
+    return _gates_cache['gates']
+
+
+_malformed_reported = set()
 
 
 def build_parkinglot_from_db(snapshot):
     pl = ParkingLot()
-    for sid, s in (snapshot or {}).items():
-        if not isinstance(s, dict):
-            continue
-        try:
-            row_str, col_str = sid.replace('(', '').replace(')', '').split(',')
-            row, col = int(row_str), int(col_str)
-        except Exception:
-            # if malformed key, skip
-            continue
-        dist = s.get('distanceFromEntry', 0) or 0
-        spot = Spot(row, col, dist)
-        spot.status = s.get('status', 'FREE')
-        spot.waiting_car_id = s.get('waitingCarId', '-')
-        spot.seen_car_id = s.get('seenCarId', '-')
-        # use plain id format 'row,col'
-        spot.spot_id = f"{row},{col}"
-        pl.spot_lookup[spot.spot_id] = spot
-        if spot.status == 'FREE':
-            pl.free_spots.add(spot)
+    malformed = pl.load_snapshot(snapshot)
+    # report each malformed entry once, not on every poll
+    fresh = {sid: why for sid, why in malformed.items() if sid not in _malformed_reported}
+    if fresh:
+        _malformed_reported.update(fresh)
+        print(f"[DASH] Skipped {len(fresh)} malformed spot entries: "
+              + ', '.join(f"{sid!r} ({why})" for sid, why in list(fresh.items())[:10]))
     return pl
 
 
@@ -41,19 +56,59 @@ def index():
     return render_template('index.html', ts=int(time.time()))
 
 
-@app.route('/api/status')
-def api_status():
-    ref = db.reference(ROOT)
-    data = ref.get() or {}
-
-    # compute closest free using ParkingLot BFS
-    pl = build_parkinglot_from_db(data)
-    # gate configuration - default gate coordinates (row=0, col=2)
-    import os
-    gate_row = int(os.environ.get('GATE_ROW', '0'))
-    gate_col = int(os.environ.get('GATE_COL', '2'))
+def live_mirror():
+    """The shared live mirror, or None when disabled (LIVE_MIRROR=0) or unavailable."""
+    return get_shared_mirror() if os.environ.get('LIVE_MIRROR', '1') != '0' else None
+
+
+def current_state():
+    """Return (ParkingLot, raw SPOTS dict) for the current lot state.
+
+    Served from the process-wide live mirror (zero RTDB round trips) unless
+    LIVE_MIRROR=0 or the stream can't be attached, in which case the whole
+    SPOTS node is read and a fresh ParkingLot is built.
+    """
+    mirror = live_mirror()
+    if mirror is not None:
+        return mirror.parking_lot, mirror.snapshot()
+    data = storage.reference(ROOT).get() or {}
+    return build_parkinglot_from_db(data), data
+
+
+def resolve_gate(pl, gate_id):
+    """(row, col) for ?gate=<id>, or the default gate when gate_id is None.
+
+    Returns None for an unknown gate id. The default gate is (row=0, col=2)
+    unless GATE_ROW/GATE_COL are set.
+    """
+    if gate_id is not None:
+        return pl.get_gate(gate_id)
+    return int(os.environ.get('GATE_ROW', '0')), int(os.environ.get('GATE_COL', '2'))
+
+
+def normalize_spots(data):
+    """Strip parentheses/whitespace so keys are 'row,col' for the client."""
+    normalized = {}
+    for sid, s in (data or {}).items():
+        if not isinstance(s, dict):
+            continue
+        key = sid.replace('(', '').replace(')', '').strip()
+        normalized[key] = s
+    return normalized
+
+
+def status_summary(pl, data, gate_row, gate_col, free_count=None, waiting=None):
+    """Everything in the status payload except the spots themselves.
+
+    free_count and waiting ({spot_id: node} of the WAITING spots) may be
+    passed in when already known (the live mirror keeps both). Otherwise they
+    come from the lot's occupancy grid when it has one (vectorized), or from
+    a scan of data.
+    """
     closest = pl.find_closest(gate_row, gate_col)
     closest_str = f"{closest[0]},{closest[1]}" if closest else None
+    # nearest free spot for every registered entrance (one index peek per gate)
+    closest_by_gate = {gid: (f"{c[0]},{c[1]}" if c else None) for gid, c in pl.find_closest_for_gates().items()}
 
     # Determine waiting car at the gate (if any)
     # gate position may be present in pl.spot_lookup as 'row,col'
@@ -67,51 +122,339 @@ def api_status():
     # and prefer the one nearest the gate (Manhattan distance). This ensures
     # the arriving box shows the car assigned even if it's not placed exactly
     # on the gate cell.
-    if not waiting_car or waiting_car == '-':
+    grid = getattr(pl, 'occupancy', None)
+    if (not waiting_car or waiting_car == '-') and grid is not None:
+        cell = grid.nearest('WAITING', gate_row, gate_col)
+        spot = pl.get_spot(f"{cell[0]},{cell[1]}") if cell else None
+        if spot is not None and getattr(spot, 'waiting_car_id', '-') not in (None, '-'):
+            waiting_car = spot.waiting_car_id
+    elif not waiting_car or waiting_car == '-':
         best = None
         best_dist = None
-        for sid, s in (data or {}).items():
+        for sid, s in (waiting if waiting is not None else data or {}).items():
             if not isinstance(s, dict):
                 continue
             if s.get('status') == 'WAITING':
-                try:
-                    rstr, cstr = sid.replace('(', '').replace(')', '').split(',')
-                    r, c = int(rstr), int(cstr)
-                except Exception:
+                parsed = parse_spot_key(sid)
+                if parsed is None:
                     continue
-                dist = abs(r - gate_row) + abs(c - gate_col)
+                dist = abs(parsed[1] - gate_row) + abs(parsed[2] - gate_col)
                 if best is None or dist < best_dist:
                     best = s.get('waitingCarId')
                     best_dist = dist
         if best:
             waiting_car = best
 
-    # normalize keys for the client: strip parentheses so keys are 'row,col'
-    normalized = {}
-    for sid, s in (data or {}).items():
-        if not isinstance(s, dict):
-            continue
-        # strip parentheses and whitespace
-        key = sid.replace('(', '').replace(')', '').strip()
-        normalized[key] = s
-
     # compute free count for UI
-    free_count = sum(1 for s in normalized.values() if isinstance(s, dict) and (s.get('status') or '').upper() == 'FREE')
-    is_full = free_count == 0
-
-    # include timestamp
-    now = int(time.time() * 1000)
-    return jsonify({
-        'spots': normalized,
+    if free_count is None and grid is not None:
+        free_count = grid.free_count()
+    elif free_count is None:
+        free_count = sum(1 for s in (data or {}).values()
+                         if isinstance(s, dict) and (s.get('status') or '').upper() == 'FREE')
+    return {
         'closest_free': closest_str,
-        'ts': now,
-        'gate': {'row': gate_row, 'col': gate_col},
+        'closest_free_by_gate': closest_by_gate,
         'gate_waiting_car': waiting_car or '-',
         'free_count': free_count,
-        'is_full': is_full,
-    })
+        'is_full': free_count == 0,
+    }
+
+
+def register_gates(pl):
+    """Make pl's gate registry the one in _meta (a gate removed there is dropped)."""
+    gates = load_gates()
+    if pl.gates != gates:
+        pl.set_gates(gates)
+
+
+# --- cached responses -------------------------------------------------------
+# With the live mirror a response depends only on (mirror epoch, version,
+# gate, registered gates), so summaries and serialized bodies are built once
+# per version and shared by every /api/status request and every stream client.
+STREAM_KEEPALIVE_SECONDS = 15.0
+CACHE_ENTRIES = 64
+_summary_cache = {}
+_body_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _cached(cache, key, build):
+    with _cache_lock:
+        hit = cache.get(key)
+    if hit is not None:
+        return hit
+    value = build()
+    with _cache_lock:
+        # only the newest versions are ever asked for again
+        if len(cache) >= CACHE_ENTRIES:
+            cache.clear()
+        cache[key] = value
+    return value
+
+
+def to_json_bytes(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def _gates_key(pl):
+    # closest_free_by_gate covers every registered gate, so their positions are part of the key
+    return tuple(sorted(pl.gates.items()))
+
+
+def _gates_tag(pl):
+    """Short ETag part that changes when a gate is added, moved or removed."""
+    return format(zlib.crc32(repr(_gates_key(pl)).encode()), 'x')
+
+
+def cached_summary(mirror, gate_row, gate_col):
+    """status_summary for the mirror's current version, from its O(1) counters."""
+    key = (mirror.epoch, mirror.version, gate_row, gate_col, _gates_key(mirror.parking_lot))
+    return _cached(_summary_cache, key,
+                   lambda: status_summary(mirror.parking_lot, None, gate_row, gate_col,
+                                          free_count=mirror.free_count(), waiting=mirror.waiting_spots()))
+
+
+def cached_status_body(mirror, gate_id, gate_row, gate_col):
+    """(version, etag, summary, JSON bytes) of the full status payload for the current version."""
+    def build():
+        version, data = mirror.versioned_snapshot()
+        summary = cached_summary(mirror, gate_row, gate_col)
+        payload = {
+            'spots': normalize_spots(data),
+            'ts': int(time.time() * 1000),
+            'gate': {'id': gate_id, 'row': gate_row, 'col': gate_col},
+            'version': version,
+            'epoch': mirror.epoch,
+            'delta': False,
+            **summary,
+        }
+        etag = f"{mirror.epoch}-{version}-{gate_id or ''}-{gate_row}.{gate_col}-{_gates_tag(mirror.parking_lot)}"
+        return version, etag, summary, to_json_bytes(payload)
+    key = (mirror.epoch, mirror.version, gate_id, gate_row, gate_col, _gates_key(mirror.parking_lot))
+    return _cached(_body_cache, key, build)
+
+
+def json_response(body, etag=None):
+    resp = Response(body, mimetype='application/json')
+    if etag is not None:
+        resp.set_etag(etag)
+        # let browsers cache but always revalidate (cheap 304s)
+        resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+def not_modified(etag):
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+@app.route('/api/status')
+def api_status():
+    """Lot status for one gate.
+
+    With the live mirror the body is served from a per-version cache with an
+    ETag (If-None-Match -> 304). ?since=<version>[&epoch=<epoch>] returns only
+    the spots changed after that version ('delta': true, deleted spots are
+    null), 304 when nothing changed, or the full payload when the version is
+    too old or from another mirror epoch.
+    """
+    mirror = live_mirror()
+    if mirror is not None:
+        pl = mirror.parking_lot
+    else:
+        pl, data = current_state()
+    register_gates(pl)
+
+    # gate configuration - ?gate=<id> selects a registered entrance, otherwise
+    # the default gate coordinates (row=0, col=2) or GATE_ROW/GATE_COL
+    gate_id = request.args.get('gate')
+    gate = resolve_gate(pl, gate_id)
+    if gate is None:
+        return jsonify({'error': f"unknown gate '{gate_id}'", 'gates': sorted(pl.gates)}), 404
+    gate_row, gate_col = gate
+
+    if mirror is None:
+        # include timestamp
+        now = int(time.time() * 1000)
+        return jsonify({
+            'spots': normalize_spots(data),
+            'ts': now,
+            'gate': {'id': gate_id, 'row': gate_row, 'col': gate_col},
+            **status_summary(pl, data, gate_row, gate_col),
+        })
+
+    since = request.args.get('since', type=int)
+    if since is not None and request.args.get('epoch', mirror.epoch) == mirror.epoch:
+        version, changes = mirror.changes_since(since)
+        if changes is not None:
+            etag = f"{mirror.epoch}-{version}-{gate_id or ''}-{gate_row}.{gate_col}-{_gates_tag(pl)}-since{since}"
+            if not changes:
+                return not_modified(etag)
+            body = to_json_bytes({
+                'spots': changes,
+                'ts': int(time.time() * 1000),
+                'gate': {'id': gate_id, 'row': gate_row, 'col': gate_col},
+                'version': version,
+                'epoch': mirror.epoch,
+                'delta': True,
+                'since': since,
+                **cached_summary(mirror, gate_row, gate_col),
+            })
+            return json_response(body, etag)
+
+    _, etag, _, body = cached_status_body(mirror, gate_id, gate_row, gate_col)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    return json_response(body, etag)
+
+
+# --- whole-lot analytics (lot_grid.OccupancyGrid) ---------------------------
+HEATMAP_MAX_TILES = 32  # default heatmap resolution: at most 32 x 32 tiles
+_analytics_cache = {}
+
+
+def lot_grid_for(pl):
+    """The lot's occupancy grid (the mirror keeps one; plain reads build it)."""
+    return pl.occupancy if pl.occupancy is not None else pl.attach_occupancy_grid()
+
+
+def heatmap_payload(grid, block=None):
+    """Occupancy per block x block tile in per-mille (0-1000); -1 for tiles without spots.
+
+    Integers rather than floats/null: the payload encodes ~3x faster.
+    """
+    rows, cols = grid.shape
+    block = block or max(1, -(-max(rows, cols) // HEATMAP_MAX_TILES))
+    import numpy as np  # only needed here; keeps numpy off the dashboard import path
+    shares = grid.heatmap(block)
+    tiles = np.where(np.isnan(shares), -1, np.rint(shares * 1000)).astype(np.int16)
+    return {'rows': rows, 'cols': cols, 'block': block, 'scale': 1000, 'tiles': tiles.tolist()}
+
+
+def analytics_lot_and_gate():
+    """((mirror, pl, gate_id, (row, col)), None), or (None, error response) for an unknown gate."""
+    mirror = live_mirror()
+    pl = mirror.parking_lot if mirror is not None else current_state()[0]
+    register_gates(pl)
+    gate_id = request.args.get('gate')
+    gate = resolve_gate(pl, gate_id)
+    if gate is None:
+        return None, (jsonify({'error': f"unknown gate '{gate_id}'", 'gates': sorted(pl.gates)}), 404)
+    return (mirror, pl, gate_id, gate), None
+
+
+def cached_json(mirror, key, build):
+    """(etag, bytes) of build() for the mirror's current version."""
+    def make():
+        etag = f"{mirror.epoch}-{mirror.version}-" + '-'.join(str(k) for k in key)
+        return etag, to_json_bytes(build())
+    return _cached(_analytics_cache, (mirror.epoch, mirror.version) + key, make)
+
+
+@app.route('/api/analytics')
+def api_analytics():
+    """Counts by status, occupancy share overall / per row / per column and the
+    Manhattan-nearest FREE and WAITING spots for a gate, from the occupancy grid."""
+    found, error = analytics_lot_and_gate()
+    if error is not None:
+        return error
+    mirror, pl, gate_id, (gate_row, gate_col) = found
+
+    def build():
+        return {'gate': {'id': gate_id, 'row': gate_row, 'col': gate_col},
+                **lot_grid_for(pl).summary(gate_row, gate_col)}
+    if mirror is None:
+        return jsonify(build())
+    etag, body = cached_json(mirror, ('analytics', gate_row, gate_col), build)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    return json_response(body, etag)
+
+
+@app.route('/api/heatmap')
+def api_heatmap():
+    """Occupancy heatmap; ?block=<n> sets the tile size (default: at most 32 x 32 tiles)."""
+    block = request.args.get('block', type=int)
+    if block is not None and block < 1:
+        return jsonify({'error': 'block must be >= 1'}), 400
+    mirror = live_mirror()
+    pl = mirror.parking_lot if mirror is not None else current_state()[0]
+    if mirror is None:
+        return jsonify(heatmap_payload(lot_grid_for(pl), block))
+    etag, body = cached_json(mirror, ('heatmap', block), lambda: heatmap_payload(lot_grid_for(pl), block))
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    return json_response(body, etag)
+
+
+def sse_event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+# --- push channel -----------------------------------------------------------
+# One upstream subscription (the shared live mirror) fans out to every client.
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events: one 'snapshot', then 'delta' events with changed spots only.
+
+    Delta payloads carry {'version', 'ts', 'spots': {spot_id: node or None}}
+    plus whichever of closest_free / free_count / is_full / gate_waiting_car /
+    closest_free_by_gate changed since the previous event.
+    """
+    mirror = live_mirror()
+    if mirror is None:
+        # EventSource gives up on non-200 responses; app.js then falls back to polling
+        return jsonify({'error': 'live stream unavailable'}), 503
+    pl = mirror.parking_lot
+    register_gates(pl)
+    gate_id = request.args.get('gate')
+    gate = resolve_gate(pl, gate_id)
+    if gate is None:
+        return jsonify({'error': f"unknown gate '{gate_id}'", 'gates': sorted(pl.gates)}), 404
+    gate_row, gate_col = gate
+
+    def snapshot_event():
+        # same cached bytes as /api/status
+        version, _, summary, body = cached_status_body(mirror, gate_id, gate_row, gate_col)
+        return version, summary, f"event: snapshot\ndata: {body.decode()}\n\n"
+
+    def generate():
+        version, sent_summary, event = snapshot_event()
+        yield event
+        while True:
+            if mirror.wait_for_change(version, STREAM_KEEPALIVE_SECONDS) == version:
+                yield ": keepalive\n\n"
+                continue
+            new_version, changes = mirror.changes_since(version)
+            if changes is None:
+                # fell behind the changelog -> resend everything
+                version, sent_summary, event = snapshot_event()
+                yield event
+                continue
+            summary = cached_summary(mirror, gate_row, gate_col)
+            payload = {'version': new_version, 'ts': int(time.time() * 1000), 'spots': changes}
+            payload.update({k: v for k, v in summary.items() if sent_summary.get(k) != v})
+            version, sent_summary = new_version, summary
+            yield sse_event('delta', payload)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text: hot-path timers (METRICS=1) and RTDB requests per module."""
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
+    # attach the live mirror up front so the first request doesn't wait for it
+    if os.environ.get('LIVE_MIRROR', '1') != '0':
+        get_shared_mirror()
+    else:
+        storage.get_backend()  # starts connecting to the RTDB while the server boots
     # Listen on all interfaces so tablet can connect; use port 8000
-    app.run(host='0.0.0.0', port=8000, debug=False)
+    # (threaded: every /api/stream client holds a worker thread)
+    app.run(host='0.0.0.0', port=8000, debug=False, threaded=True)
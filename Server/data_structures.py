@@ -1,107 +1,282 @@
 from typing import Dict, Optional, Tuple, Callable
 import random
+import threading
 from bisect import bisect_left, insort
 from collections import deque
+from functools import lru_cache
+from itertools import compress
+from operator import ne
+import sys
+from constants import STAT_FREE, STAT_WAIT, STAT_OCC, STAT_WRONG
 
 class SortedList:
-    """A small sorted list with optional key function. Compatible with previous API.
-
-    If key is provided, items are ordered by key(item). Internally stores
-    tuples (k, item) when key is set to allow use of insort.
+    """Sorted container with optional key function. Compatible with previous API.
+
+    Items are kept in a blocked sorted list: a list of sub-lists of at most
+    ``_LOAD * 2`` entries plus the maximum entry of each sub-list, so a bisect
+    over the maxes followed by a bisect inside one sub-list locates any
+    position in O(log n). A side dict maps every stored item to its internal
+    entry, which makes membership O(1) and add/remove O(log n) (plus a small
+    memmove inside one sub-list).
+
+    Entries are ``(key, tiebreak, item)`` tuples. The tiebreak keeps the
+    previous ordering of equal keys (newest first when a key function is set,
+    insertion order otherwise) and means items themselves are never compared.
+    Items must be hashable (Spot objects hash by identity).
     """
+    _LOAD = 512
+
     def __init__(self, iterable=None, key: Optional[Callable] = None):
         self._key = key
-        self._list = []
+        self._lists = []   # sub-lists of (key, tiebreak, item) entries
+        self._maxes = []   # last entry of each sub-list
+        self._index = {}   # item -> list of entries currently stored for it
+        self._len = 0
+        self._seq = 0
         if iterable:
-            for item in iterable:
-                self.add(item)
-
-    def _wrap(self, value):
-        return (self._key(value), value) if self._key is not None else value
+            self._bulk_load(iterable)
+
+    def _bulk_load(self, iterable):
+        """Fill an empty list with one sort instead of n inserts."""
+        entries = sorted(self._make_entry(item) for item in iterable)
+        for i in range(0, len(entries), self._LOAD):
+            sub = entries[i:i + self._LOAD]
+            self._lists.append(sub)
+            self._maxes.append(sub[-1])
+        for entry in entries:
+            self._index.setdefault(entry[2], []).append(entry)
+        self._len = len(entries)
+
+    def _make_entry(self, value):
+        self._seq += 1
+        if self._key is None:
+            return (value, self._seq, value)
+        # negative sequence -> equal keys are ordered newest first, like bisect_left did
+        return (self._key(value), -self._seq, value)
+
+    def _locate(self, entry):
+        """Return (sub-list index, position) of an entry known to be stored."""
+        pos = bisect_left(self._maxes, entry)
+        sub = self._lists[pos]
+        return pos, bisect_left(sub, entry)
+
+    def _delete(self, pos, idx):
+        sub = self._lists[pos]
+        del sub[idx]
+        self._len -= 1
+        if not sub:
+            del self._lists[pos]
+            del self._maxes[pos]
+            return
+        self._maxes[pos] = sub[-1]
+        # merge small neighbours back together so the number of sub-lists stays ~n/LOAD
+        if len(sub) < self._LOAD // 2 and len(self._lists) > 1:
+            other = pos - 1 if pos > 0 else pos + 1
+            lo, hi = min(pos, other), max(pos, other)
+            merged = self._lists[lo] + self._lists[hi]
+            self._lists[lo:hi + 1] = [merged]
+            self._maxes[lo:hi + 1] = [merged[-1]]
+            if len(merged) > self._LOAD * 2:
+                self._split(lo)
+
+    def _split(self, pos):
+        sub = self._lists[pos]
+        half = len(sub) // 2
+        left, right = sub[:half], sub[half:]
+        self._lists[pos:pos + 1] = [left, right]
+        self._maxes[pos:pos + 1] = [left[-1], right[-1]]
+
+    def _position(self, idx):
+        """Translate a flat index into (sub-list index, position)."""
+        if idx < 0:
+            idx += self._len
+        if idx < 0 or idx >= self._len:
+            raise IndexError("SortedList index out of range")
+        if idx < len(self._lists[0]):
+            return 0, idx
+        last = len(self._lists) - 1
+        tail_start = self._len - len(self._lists[last])
+        if idx >= tail_start:
+            return last, idx - tail_start
+        for pos, sub in enumerate(self._lists):
+            if idx < len(sub):
+                return pos, idx
+            idx -= len(sub)
+        raise IndexError("SortedList index out of range")
 
     def add(self, value):
-        if self._key is None:
-            insort(self._list, value)
+        entry = self._make_entry(value)
+        if not self._maxes:
+            self._lists.append([entry])
+            self._maxes.append(entry)
         else:
-            # Ensure internal storage uses (key, item) tuples
-            if self._list and not isinstance(self._list[0], tuple):
-                self._list = [(self._key(v), v) for v in self._list]
-            k = self._key(value)
-            # build keys list for bisect search to avoid comparing items directly
-            keys = [kv[0] for kv in self._list]
-            idx = bisect_left(keys, k)
-            self._list.insert(idx, (k, value))
+            pos = bisect_left(self._maxes, entry)
+            if pos == len(self._maxes):
+                pos -= 1
+                self._lists[pos].append(entry)
+                self._maxes[pos] = entry
+            else:
+                insort(self._lists[pos], entry)
+            if len(self._lists[pos]) > self._LOAD * 2:
+                self._split(pos)
+        self._index.setdefault(value, []).append(entry)
+        self._len += 1
+
+    def update(self, iterable):
+        """Add every item; one sort instead of n inserts when the list is empty."""
+        if self._len:
+            for value in iterable:
+                self.add(value)
+        else:
+            self._bulk_load(iterable)
 
     def remove(self, value):
-        if self._key is None:
-            idx = bisect_left(self._list, value)
-            if idx != len(self._list) and self._list[idx] == value:
-                self._list.pop(idx)
-                return
-            raise ValueError(f"{value} not in SortedList")
-        else:
-            # find by identity of stored item
-            for i, (k, item) in enumerate(self._list):
-                if item == value:
-                    self._list.pop(i)
-                    return
+        entries = self._index.get(value)
+        if not entries:
             raise ValueError(f"{value} not in SortedList")
+        entry = entries.pop()
+        if not entries:
+            del self._index[value]
+        self._delete(*self._locate(entry))
+
+    def discard(self, value):
+        """Remove value if present (no error when it is not)."""
+        if self._index.get(value):
+            self.remove(value)
 
     def pop(self, index=-1):
-        val = self._list.pop(index)
-        return val[1] if self._key is not None else val
+        if not self._len:
+            raise IndexError("pop from empty SortedList")
+        pos, idx = self._position(index)
+        entry = self._lists[pos][idx]
+        value = entry[2]
+        entries = self._index[value]
+        entries.remove(entry)
+        if not entries:
+            del self._index[value]
+        self._delete(pos, idx)
+        return value
 
     def __len__(self):
-        return len(self._list)
+        return self._len
 
     def __getitem__(self, idx):
-        val = self._list[idx]
-        return val[1] if self._key is not None else val
+        if isinstance(idx, slice):
+            return [entry[2] for entry in self._entries()][idx]
+        pos, i = self._position(idx)
+        return self._lists[pos][i][2]
+
+    def _entries(self):
+        for sub in self._lists:
+            yield from sub
 
     def __iter__(self):
-        if self._key is None:
-            return iter(self._list)
-        else:
-            return (item for (_, item) in self._list)
+        return (entry[2] for entry in self._entries())
 
     def __contains__(self, value):
-        if self._key is None:
-            idx = bisect_left(self._list, value)
-            return idx != len(self._list) and self._list[idx] == value
-        else:
-            return any(item == value for (_, item) in self._list)
+        try:
+            return value in self._index
+        except TypeError:
+            return False
 
     def index(self, value):
-        if self._key is None:
-            idx = bisect_left(self._list, value)
-            if idx != len(self._list) and self._list[idx] == value:
-                return idx
-            raise ValueError(f"{value} not in SortedList")
-        else:
-            for i, (_, item) in enumerate(self._list):
-                if item == value:
-                    return i
+        entries = self._index.get(value)
+        if not entries:
             raise ValueError(f"{value} not in SortedList")
+        # report the first stored occurrence, like the old linear scan did
+        entry = min(entries)
+        pos, idx = self._locate(entry)
+        return sum(len(sub) for sub in self._lists[:pos]) + idx
+
+@lru_cache(maxsize=1 << 20)
+def parse_spot_key(spot_id: str) -> Optional[Tuple[str, int, int]]:
+    """'row,col' / '(row,col)' -> ('row,col', row, col), or None if malformed.
+
+    Cached: the same keys come back on every snapshot load and stream event.
+    """
+    s = spot_id.strip()
+    if s.startswith('(') and s.endswith(')'):
+        s = s[1:-1]
+    parts = s.split(',')
+    try:
+        row, col = int(parts[0]), int(parts[1])
+    except (ValueError, IndexError):
+        return None
+    return f"{row},{col}", row, col
+
+
+# Canonical status strings: every Spot holds one of these objects rather than
+# its own copy of the text read from the RTDB (see intern_status)
+STATUSES = {name: name for name in (STAT_FREE, STAT_WAIT, STAT_OCC, STAT_WRONG)}
+
+
+def intern_status(value):
+    """Return the shared string object for a status (unknown strings are sys.intern'ed)."""
+    status = STATUSES.get(value)
+    if status is not None:
+        return status
+    return sys.intern(value) if type(value) is str else value
+
 
 class Spot:
-    """Represents a parking spot with coordinates, distance, and status"""
-    
+    """Represents a parking spot with coordinates, distance, and status
+
+    Slotted (no per-instance __dict__) with integer coordinates and an
+    interned status; spot_id is derived from row/col on demand.
+    """
+    __slots__ = ('_lot', '_status', 'waiting_car_id', 'seen_car_id', 'distance_from_entry', 'row', 'col')
+
     def __init__(self, row: int, col: int, distance: int):
+        # ParkingLot that indexes this spot; notified whenever status changes
+        self._lot = None
         # RTDB fields
-        self.status = "FREE"
+        self._status = STAT_FREE
         self.waiting_car_id = "-"
         self.seen_car_id = "-"
-        self.distance_from_entry = distance
-        
-        # Local-only field for efficiency (matches RTDB key format)
-        # use plain 'row,col' key format to match event_generator and RTDB child naming
-        self.spot_id = f"{row},{col}"
+        self.distance_from_entry = int(distance)
+        # integer grid coordinates so the BFS index never has to parse spot_id
+        self.row = int(row)
+        self.col = int(col)
+
+    @classmethod
+    def from_node(cls, row: int, col: int, node: dict) -> 'Spot':
+        """Build a spot from its RTDB node ({'status', 'distanceFromEntry', 'waitingCarId', 'seenCarId'})."""
+        spot = cls(row, col, node.get('distanceFromEntry', 0) or 0)
+        spot._status = intern_status(node.get('status', STAT_FREE))
+        spot.waiting_car_id = node.get('waitingCarId', '-')
+        spot.seen_car_id = node.get('seenCarId', '-')
+        return spot
+
+    @property
+    def spot_id(self) -> str:
+        # plain 'row,col' key format to match event_generator and RTDB child naming
+        return f"{self.row},{self.col}"
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        value = intern_status(value)
+        lot = self._lot
+        if lot is None:
+            self._status = value
+            return
+        # keep the owning lot's per-gate free indexes in step with FREE/WAITING/OCCUPIED
+        # flips; under the lot lock so a flip and its index update are one atomic step
+        with lot._lock:
+            old = self._status
+            self._status = value
+            if value != old:
+                lot._on_spot_status(self, old, value)
     
     # RTDB sync methods removed
 
 class Car:
     """Represents a car with plate ID, status, and parking information"""
-    
+    __slots__ = ('plate_id', 'status', 'allocated_spot', 'timestamp', 'actual_spot')
+
     def __init__(self, plate_id: str):
         # RTDB fields
         self.plate_id = plate_id
@@ -115,9 +290,18 @@ class Car:
     # RTDB sync methods removed
 
 class ParkingLot:
-    """Main class that manages all parking lot data structures and operations"""
+    """Main class that manages all parking lot data structures and operations
+
+    Thread-safe: every mutation (and every index read that may rebuild lazily)
+    runs under one re-entrant lot lock. The critical sections are an index
+    peek plus a few O(log n) updates, so a single lock is cheaper than
+    coordinating per-gate locks. Use reserve_closest for allocations from
+    several threads.
+    """
     
     def __init__(self):
+        self._lock = threading.RLock()
+
         # AVL tree (SortedList) of free spots, ordered by distance from entry
         # support key to order by Spot.distance_from_entry
         self.free_spots = SortedList(key=lambda spot: spot.distance_from_entry)
@@ -125,8 +309,9 @@ class ParkingLot:
         # Hash tables for O(1) lookups
         self.spot_lookup = {}  # spot_id -> Spot object
         self.car_lookup = {}   # car_plate -> Car object
-        # Current waiting pair (car allocated to spot but not yet parked)
-        self.waiting_pair = None  # {"car_id": str, "spot_id": str} or None
+        # Waiting pairs (cars allocated to a spot but not yet parked): car_id -> spot_id,
+        # in allocation order so the most recent pair is the last entry
+        self.waiting_pairs = {}
 
         # Hash table of occupied spots: spot_id -> car_id (O(1) operations)
         self.occupied_spots_with_cars = {}
@@ -134,39 +319,253 @@ class ParkingLot:
         # Variable to hold the time we saved (e.g., last state save timestamp)
         self.saved_time = None
         self.isFull = False
+        # True when a stream keeps this lot in sync with the RTDB (lot_mirror);
+        # periodic DB refreshes are then unnecessary
+        self.live = False
+
+        # Coordinate index used by find_closest: (row, col) -> Spot, plus the
+        # in-grid neighbors of every cell, pre-sorted by the BFS tie-break (col, row).
+        # Callers may also register spots by writing spot_lookup directly, so the
+        # index catches up lazily whenever spot_lookup has grown (_sync_grid).
+        self._grid = {}
+        self._neighbors = {}
+        self._grid_synced = 0
+
+        # Per-gate nearest-free indexes (built on first query for a gate):
+        # BFS visit rank of every reachable cell, and the FREE cells ordered by
+        # that rank. Spot status changes update them in O(log n) via
+        # _on_spot_status; adding a new cell changes the topology and drops them.
+        self._gate_ranks = {}  # (gate_row, gate_col) -> {(row, col): rank}
+        self._gate_free = {}   # (gate_row, gate_col) -> SortedList of free cells by rank
+
+        # Gate registry (lot entrances): gate_id -> (row, col), loaded from _meta/gates
+        self.gates = {}
+
+        # RTDB node last loaded for every spot ('row,col' -> node); refresh_from_snapshot
+        # diffs new snapshots against it so only changed spots are re-applied. These
+        # are copies (spot nodes are flat), so a caller editing its snapshot in place
+        # still shows up as a change on the next refresh
+        self._db_nodes = {}
+
+        # Optional array-backed copy of the spot states for analytics
+        # (lot_grid.OccupancyGrid, see attach_occupancy_grid)
+        self.occupancy = None
     
     # Basic data operations
     def add_spot(self, spot):
         """Add spot to both free_spots list and spot_lookup hash"""
-        self.free_spots.add(spot)
-        self.spot_lookup[spot.spot_id] = spot
+        with self._lock:
+            self.free_spots.add(spot)
+            was_synced = self._grid_synced == len(self.spot_lookup)
+            self.spot_lookup[spot.spot_id] = spot
+            self._index_spot(spot)
+            if was_synced:
+                self._grid_synced = len(self.spot_lookup)
     
+    def remove_spot(self, spot_id: str):
+        """Remove a spot from the lot entirely (the cell disappears from the grid)."""
+        with self._lock:
+            was_synced = self._grid_synced == len(self.spot_lookup)
+            spot = self.spot_lookup.pop(spot_id, None)
+            if spot is None:
+                return None
+            self.remove_spot_from_free(spot)
+            self.occupied_spots_with_cars.pop(spot_id, None)
+            self._db_nodes.pop(spot_id, None)
+            cell = self._spot_coords(spot, spot_id)
+            if self._grid.get(cell) is spot:
+                del self._grid[cell]
+                self._neighbors.pop(cell, None)
+                self._link_cells((cell,))
+                if self.occupancy is not None and min(cell) >= 0:
+                    self.occupancy.remove_spot(*cell)
+            if hasattr(spot, '_lot'):
+                spot._lot = None
+            # -1 forces a rescan if spot_lookup had unindexed entries
+            self._grid_synced = len(self.spot_lookup) if was_synced else -1
+            return spot
+
+    def apply_spot_node(self, spot_id: str, node: dict):
+        """Create or update a spot from its RTDB node ({'status': ..., 'carId': ...}).
+
+        spot_id may be 'row,col' or '(row,col)'; the spot is stored under 'row,col'.
+        Keeps free_spots and occupied_spots_with_cars in step with the status.
+        Returns the Spot.
+        """
+        row, col = self._parse_spot_coords(spot_id)
+        key = f"{row},{col}"
+        with self._lock:
+            spot = self.spot_lookup.get(key)
+            if spot is None:
+                spot = Spot.from_node(row, col, node)
+                self.add_spot(spot)
+            else:
+                spot.status = node.get('status', 'FREE')
+                spot.waiting_car_id = node.get('waitingCarId', '-')
+                spot.seen_car_id = node.get('seenCarId', '-')
+            status = spot.status
+            if status == 'FREE':
+                self.add_spot_to_free(spot)
+            else:
+                self.remove_spot_from_free(spot)
+            car_id = node.get('carId')
+            if status == 'OCCUPIED' and car_id:
+                self.occupied_spots_with_cars[key] = car_id
+            else:
+                self.occupied_spots_with_cars.pop(key, None)
+            return spot
+
+    def load_snapshot(self, snapshot) -> Dict[str, str]:
+        """Load a raw SPOTS snapshot ({'row,col': node}) in one pass.
+
+        New spots are built with Spot.from_node and the free ones bulk-loaded
+        into free_spots; spots already in the lot are updated in place (like
+        apply_spot_node). Spots missing from the snapshot are left alone. New
+        cells join the coordinate index on the next find_closest (_sync_grid),
+        or right away when an occupancy grid is attached. Returns {key: reason}
+        for the entries that were skipped as malformed.
+        """
+        malformed = {}
+        new_spots = {}
+        new_free = []
+        lookup = self.spot_lookup
+        occupied = self.occupied_spots_with_cars
+        db_nodes = self._db_nodes
+        from_node = Spot.from_node
+        with self._lock:
+            for sid, node in (snapshot or {}).items():
+                if type(node) is not dict:
+                    malformed[sid] = 'not a spot node'
+                    continue
+                parsed = parse_spot_key(sid) if isinstance(sid, str) else None
+                if parsed is None:
+                    malformed[sid] = "key is not 'row,col'"
+                    continue
+                key, row, col = parsed
+                spot = lookup.get(key)
+                if spot is None:
+                    try:
+                        spot = from_node(row, col, node)
+                    except (TypeError, ValueError):
+                        malformed[sid] = 'bad distanceFromEntry'
+                        continue
+                    lookup[key] = new_spots[key] = spot
+                    if spot._status == 'FREE':
+                        new_free.append(spot)
+                else:
+                    spot.status = node.get('status', 'FREE')
+                    spot.waiting_car_id = node.get('waitingCarId', '-')
+                    spot.seen_car_id = node.get('seenCarId', '-')
+                    if key in new_spots:
+                        # same cell listed twice ('r,c' and '(r,c)'): the last node wins
+                        if spot in new_free:
+                            new_free.remove(spot)
+                        if spot.status == 'FREE':
+                            new_free.append(spot)
+                    elif spot.status == 'FREE':
+                        self.add_spot_to_free(spot)
+                    else:
+                        self.remove_spot_from_free(spot)
+                car_id = node.get('carId')
+                if car_id and spot._status == 'OCCUPIED':
+                    occupied[key] = car_id
+                elif key in occupied:
+                    del occupied[key]
+                db_nodes[key] = dict(node)
+            self.free_spots.update(new_free)
+            if self.occupancy is not None:
+                self._sync_grid()
+        return malformed
+
+    def refresh_from_snapshot(self, snapshot) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Apply only the spots whose node differs from the one last loaded.
+
+        Nodes are compared by content (not every writer sets lastUpdateMs) in
+        one C-level pass over the snapshot, so an unchanged spot costs a dict
+        lookup and comparison; key parsing, the free_spots /
+        occupied_spots_with_cars / index updates are proportional to the
+        number of changes. Keys are compared as 'row,col', so '(r,c)' and 'r,c'
+        name the same spot; spots missing from the snapshot are removed.
+        Returns {spot_id: (old_status, new_status)} for every spot whose node
+        changed; old_status is None for a new spot, new_status None for a removed one.
+        """
+        snapshot = snapshot or {}
+        db_nodes = self._db_nodes
+        lookup = self.spot_lookup
+        with self._lock:
+            # keys whose node differs from the loaded one, or that weren't loaded under that key
+            candidates = list(compress(snapshot, map(ne, map(db_nodes.get, snapshot), snapshot.values())))
+            changed = {}
+            before = {}
+            unloaded = 0   # snapshot keys not in db_nodes as written
+            aliases = set()  # loaded keys only named as '(r,c)' / ' r,c '
+            for sid in candidates:
+                node = snapshot[sid]
+                key = sid
+                if sid not in db_nodes:
+                    unloaded += 1
+                    parsed = parse_spot_key(sid) if isinstance(sid, str) else None
+                    if parsed is None:
+                        changed[sid] = node  # load_snapshot reports it as malformed
+                        continue
+                    key = parsed[0]
+                    if key in db_nodes:
+                        if key not in snapshot:
+                            aliases.add(key)
+                        if db_nodes[key] == node:
+                            continue
+                changed[sid] = node
+                spot = lookup.get(key)
+                before[key] = spot.status if spot is not None else None
+            if len(snapshot) - unloaded + len(aliases) == len(db_nodes):
+                removed = ()
+            else:
+                present = set()
+                for sid in snapshot:
+                    parsed = parse_spot_key(sid) if isinstance(sid, str) else None
+                    if parsed is not None:
+                        present.add(parsed[0])
+                removed = db_nodes.keys() - present
+
+            self.load_snapshot(changed)
+            changes = {key: (old_status, lookup[key].status) for key, old_status in before.items() if key in lookup}
+            for key in removed:
+                del db_nodes[key]
+                spot = self.remove_spot(key)
+                if spot is not None:
+                    changes[key] = (spot.status, None)
+            return changes
+
     def add_car(self, car):
         """Add car to car_lookup hash"""
-        self.car_lookup[car.plate_id] = car
+        with self._lock:
+            self.car_lookup[car.plate_id] = car
     
     def get_closest_free_spot(self):
         """Return closest free spot (first element) or None if empty"""
-        return self.free_spots[0] if self.free_spots else None
+        with self._lock:
+            return self.free_spots[0] if self.free_spots else None
     
     def get_time_saved(self):
         """Get the time saved based on the distance difference between the farthest and closest free spots."""
-        if len(self.free_spots) < 2:
-            return 0
-        else:
-            return self.free_spots[-1].distance_from_entry - self.free_spots[0].distance_from_entry
+        with self._lock:
+            if len(self.free_spots) < 2:
+                return 0
+            else:
+                return self.free_spots[-1].distance_from_entry - self.free_spots[0].distance_from_entry
         
     
     def remove_spot_from_free(self, spot):
         """Remove spot from free_spots list"""
-        # allow passing either Spot object or spot_id string
-        if isinstance(spot, str):
-            s = self.spot_lookup.get(spot)
-            if s and s in self.free_spots:
-                self.free_spots.remove(s)
-            return
-        if spot in self.free_spots:
-            self.free_spots.remove(spot)
+        with self._lock:
+            # allow passing either Spot object or spot_id string
+            if isinstance(spot, str):
+                s = self.spot_lookup.get(spot)
+                if s and s in self.free_spots:
+                    self.free_spots.remove(s)
+                return
+            if spot in self.free_spots:
+                self.free_spots.remove(spot)
 
     def remove_spot_by_id(self, spot_id: str):
         """Remove a spot from free_spots by its spot_id string."""
@@ -179,9 +578,79 @@ class ParkingLot:
     
     def add_spot_to_free(self, spot):
         """Add spot back to free_spots list"""
-        if spot not in self.free_spots:
-            self.free_spots.add(spot)
+        with self._lock:
+            if spot not in self.free_spots:
+                self.free_spots.add(spot)
     
+    def attach_occupancy_grid(self, grid=None):
+        """Keep an array-backed copy of the spot states in step with the lot.
+
+        grid defaults to a new lot_grid.OccupancyGrid (needs numpy). It is
+        filled from the current spots, then updated by add_spot/remove_spot
+        and every status flip; cells with a negative row or column stay out
+        of it. Returns the grid.
+        """
+        if grid is None:
+            from lot_grid import OccupancyGrid
+            grid = OccupancyGrid()
+        with self._lock:
+            self._sync_grid()
+            grid.load((r, c, getattr(spot, 'status', 'FREE'), getattr(spot, 'distance_from_entry', 0) or 0)
+                      for (r, c), spot in self._grid.items() if r >= 0 and c >= 0)
+            self.occupancy = grid
+        return grid
+
+    # Gate registry
+    def register_gate(self, gate_id: str, row: int, col: int):
+        """Register (or move) an entrance gate."""
+        self.gates[str(gate_id)] = (int(row), int(col))
+
+    def set_gates(self, gates: Dict[str, Tuple[int, int]]):
+        """Replace the whole registry with {gate_id: (row, col)}; gates not listed are dropped."""
+        gates = {str(gid): (int(row), int(col)) for gid, (row, col) in gates.items()}
+        with self._lock:
+            self.gates = gates
+
+    def load_gates(self, meta) -> int:
+        """Register gates from the RTDB _meta node written by Init_Park.
+
+        Expects meta['gates'] = {gate_id: {'row': r, 'col': c}}; malformed
+        entries are skipped. Returns the number of gates registered.
+        """
+        gates = (meta or {}).get('gates') if isinstance(meta, dict) else None
+        count = 0
+        for gate_id, g in (gates or {}).items():
+            try:
+                self.register_gate(gate_id, g['row'], g['col'])
+                count += 1
+            except (KeyError, TypeError, ValueError):
+                continue
+        return count
+
+    def get_gate(self, gate_id: str) -> Optional[Tuple[int, int]]:
+        """Return (row, col) of a registered gate or None."""
+        return self.gates.get(str(gate_id))
+
+    def find_closest_for_gates(self, gate_ids=None) -> Dict[str, Optional[Tuple[int, int]]]:
+        """Closest FREE spot for every registered gate (or the given gate ids).
+
+        Each gate has its own precomputed index, so this is one peek per gate
+        rather than one grid search per gate.
+        """
+        with self._lock:
+            ids = list(self.gates) if gate_ids is None else gate_ids
+            return {gid: self.find_closest(*self.gates[gid]) for gid in ids if gid in self.gates}
+
+    def allocate_for_gates(self, arrivals) -> Dict[str, Optional[str]]:
+        """Allocate spots for cars arriving at several gates at the same moment.
+
+        arrivals is an iterable of (car_id, gate_id). Cars are served in order
+        and every allocation immediately updates the other gates' indexes, so no
+        spot is handed out twice. Returns {car_id: spot_id or None}.
+        """
+        with self._lock:
+            return {car_id: self.allocate_closest_spot(car_id, gate=gate_id) for car_id, gate_id in arrivals}
+
     # Simple lookups
     def get_spot(self, spot_id):
         """Get spot by spot_id from hash table"""
@@ -193,114 +662,294 @@ class ParkingLot:
     
     # Pairing operations
     def set_waiting_pair(self, car_id, spot_id):
-        """Set current waiting pair"""
-        self.waiting_pair = {"car_id": car_id, "spot_id": spot_id}
+        """Record that car_id is heading to spot_id (it becomes the most recent pair)"""
+        with self._lock:
+            self.waiting_pairs.pop(car_id, None)
+            self.waiting_pairs[car_id] = spot_id
     
-    def get_waiting_pair(self):
-        """Get current waiting pair"""
-        return self.waiting_pair
+    def get_waiting_pair(self, car_id=None):
+        """Get the waiting pair of car_id, or the most recent pair when car_id is None"""
+        with self._lock:
+            if car_id is None:
+                if not self.waiting_pairs:
+                    return None
+                car_id = next(reversed(self.waiting_pairs))
+            spot_id = self.waiting_pairs.get(car_id)
+            return {"car_id": car_id, "spot_id": spot_id} if spot_id is not None else None
     
-    def clear_waiting_pair(self):
-        """Clear current waiting pair"""
-        self.waiting_pair = None
+    def clear_waiting_pair(self, car_id=None):
+        """Clear the waiting pair of car_id (the most recent pair when car_id is None)"""
+        with self._lock:
+            if car_id is None and self.waiting_pairs:
+                car_id = next(reversed(self.waiting_pairs))
+            return self.waiting_pairs.pop(car_id, None)
+
+    @property
+    def waiting_pair(self):
+        """Most recent waiting pair (kept for code written against the single-pair API)"""
+        return self.get_waiting_pair()
     
     # Occupied spots tracking methods
     def add_occupied_spot(self, spot_id, car_id):
         """Add a spot to occupied hash table - O(1)"""
-        self.occupied_spots_with_cars[spot_id] = car_id
+        with self._lock:
+            self.occupied_spots_with_cars[spot_id] = car_id
     
     def remove_occupied_spot(self, spot_id):
         """Remove a spot from occupied hash table - O(1)"""
-        self.occupied_spots_with_cars.pop(spot_id, None)
+        with self._lock:
+            self.occupied_spots_with_cars.pop(spot_id, None)
     
     def get_occupied_spots(self):
         """Get list of occupied spot tuples [(spot_id, car_id), ...]"""
-        return list(self.occupied_spots_with_cars.items())
+        with self._lock:
+            return list(self.occupied_spots_with_cars.items())
     
     def get_random_occupied_spot(self):
         """Get a random occupied spot tuple (spot_id, car_id) or None if empty"""
-        return random.choice(list(self.occupied_spots_with_cars.items())) if self.occupied_spots_with_cars else None
+        with self._lock:
+            return random.choice(list(self.occupied_spots_with_cars.items())) if self.occupied_spots_with_cars else None
+
+    # Atomic lifecycle transitions (safe to call from many threads)
+    def reserve_closest(self, car_id: str, gate: Optional[str] = None,
+                        gate_row: int = 0, gate_col: int = 2) -> Optional[str]:
+        """Atomically pick the closest free spot for car_id and mark it WAITING.
+
+        Lookup, status flip, free_spots removal and the waiting pair happen under
+        the lot lock, so concurrent callers never receive the same spot. Calling
+        it again for a car that already waits returns the same spot.
+        Returns the 'row,col' spot id or None when the lot is full.
+        """
+        with self._lock:
+            current = self.waiting_pairs.get(car_id)
+            if current is not None:
+                return current
+            if gate is not None:
+                if gate not in self.gates:
+                    raise KeyError(f"unknown gate '{gate}'")
+                gate_row, gate_col = self.gates[gate]
+            return self._reserve_locked(car_id, gate_row, gate_col)
+
+    def confirm_parked(self, car_id: str, spot_id: Optional[str] = None) -> Optional[str]:
+        """Atomically turn car_id's waiting pair (or spot_id) into an OCCUPIED spot.
+
+        Returns the spot id or None when the car has no reservation and no
+        spot_id was given.
+        """
+        with self._lock:
+            reserved = self.waiting_pairs.pop(car_id, None)
+            spot_id = spot_id or reserved
+            if spot_id is None:
+                return None
+            spot = self.spot_lookup.get(spot_id)
+            if spot is not None:
+                spot.status = 'OCCUPIED'
+                self.remove_spot_from_free(spot)
+            self.occupied_spots_with_cars[spot_id] = car_id
+            return spot_id
+
+    def release_spot(self, spot_id: str) -> Optional[str]:
+        """Atomically free spot_id (departure); returns the car that held it, if any."""
+        with self._lock:
+            car_id = self.occupied_spots_with_cars.pop(spot_id, None)
+            for waiting_car, waiting_spot in list(self.waiting_pairs.items()):
+                if waiting_spot == spot_id:
+                    del self.waiting_pairs[waiting_car]
+                    car_id = car_id or waiting_car
+            spot = self.spot_lookup.get(spot_id)
+            if spot is not None:
+                spot.status = 'FREE'
+                self.add_spot_to_free(spot)
+            return car_id
 
     # Grid/BFS utilities
     def _parse_spot_coords(self, spot_id: str) -> Tuple[int, int]:
         """Parse spot_id formatted as '(row,col)' or 'row,col' into (row, col) ints."""
-        s = spot_id.strip()
-        if s.startswith('(') and s.endswith(')'):
-            s = s[1:-1]
-        parts = s.split(',')
-        return int(parts[0]), int(parts[1])
+        parsed = parse_spot_key(spot_id)
+        if parsed is None:
+            raise ValueError(f"malformed spot id {spot_id!r}")
+        return parsed[1], parsed[2]
 
     def _format_coord_tuple(self, row: int, col: int, with_paren: bool = False) -> str:
         if with_paren:
             return f"({row},{col})"
         return f"{row},{col}"
 
-    def find_closest(self, gate_row: int = 0, gate_col: int = 2) -> Optional[Tuple[int, int]]:
-        """Find closest FREE spot to the gate using BFS on the grid of spots.
+    def _spot_coords(self, spot, spot_id: Optional[str] = None) -> Tuple[int, int]:
+        """Return (row, col) of a spot, parsing its id only for spots without coordinates."""
+        row, col = getattr(spot, 'row', None), getattr(spot, 'col', None)
+        if row is None or col is None:
+            return self._parse_spot_coords(spot_id or spot.spot_id)
+        return row, col
 
-        Returns (row, col) or None if no free spots. The return shape matches the
-        rest of the code and the UI which uses 'row,col' string keys.
-        """
-        # Build set of free positions from spot_lookup
-        free_positions = set()
-        for sid, spot in self.spot_lookup.items():
-            if getattr(spot, 'status', None) == 'FREE':
-                row, col = self._parse_spot_coords(sid)
-                free_positions.add((row, col))
+    def _cell_neighbors(self, cell: Tuple[int, int]) -> Tuple[Tuple[int, int], ...]:
+        """In-grid up/down/left/right neighbors of cell, sorted by (col, row).
 
-        if not free_positions:
+        left (col-1), up (row-1), down (row+1), right (col+1) is already (col, row) order.
+        """
+        r, c = cell
+        grid = self._grid
+        return tuple(n for n in ((r, c - 1), (r - 1, c), (r + 1, c), (r, c + 1)) if n in grid)
+
+    def _link_cells(self, cells):
+        """Recompute neighbor lists for cells and the cells around them."""
+        grid = self._grid
+        affected = set()
+        for r, c in cells:
+            affected.update(((r, c), (r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)))
+        for cell in affected:
+            if cell in grid:
+                self._neighbors[cell] = self._cell_neighbors(cell)
+        # new cells -> BFS ranks from every gate are stale
+        self._gate_ranks.clear()
+        self._gate_free.clear()
+
+    def _index_spot(self, spot, spot_id: Optional[str] = None, link: bool = True) -> Optional[Tuple[int, int]]:
+        """Register spot in the coordinate index; returns its cell if the cell is new.
+
+        With link=False the caller is responsible for calling _link_cells on the
+        returned cells (bulk indexing links everything in one pass).
+        """
+        cell = self._spot_coords(spot, spot_id)
+        is_new = cell not in self._grid
+        self._grid[cell] = spot
+        if hasattr(spot, '_lot'):
+            spot._lot = self
+        if self.occupancy is not None and min(cell) >= 0:
+            self.occupancy.set_spot(cell[0], cell[1], getattr(spot, 'status', 'FREE'),
+                                    getattr(spot, 'distance_from_entry', 0) or 0)
+        if not is_new:
+            # same cell, new Spot object: only its free/not-free state may differ
+            self._update_gate_free(cell, getattr(spot, 'status', None) == 'FREE')
             return None
+        if link:
+            self._link_cells((cell,))
+        return cell
 
-        # BFS from gate
-        q = deque()
-        start = (gate_row, gate_col)
-        q.append(start)
-        seen = {start}
-
-        # neighbor deltas: up/down/left/right
-        deltas = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-
+    def _sync_grid(self):
+        """Index spots that were put into spot_lookup without going through add_spot."""
+        if self._grid_synced == len(self.spot_lookup):
+            return
+        new_cells = []
+        for sid, spot in self.spot_lookup.items():
+            try:
+                cell = self._spot_coords(spot, sid)
+            except (ValueError, IndexError):
+                continue
+            if self._grid.get(cell) is not spot:
+                cell = self._index_spot(spot, sid, link=False)
+                if cell is not None:
+                    new_cells.append(cell)
+        if new_cells:
+            self._link_cells(new_cells)
+        self._grid_synced = len(self.spot_lookup)
+
+    def _gate_order(self, gate: Tuple[int, int]) -> Dict[Tuple[int, int], int]:
+        """BFS visit rank of every cell reachable from the gate.
+
+        Walks the whole grid regardless of spot status, expanding neighbors in
+        (col, row) order, so the first FREE cell in rank order is exactly what a
+        BFS that stops at the first FREE cell would return.
+        """
+        neighbors = self._neighbors
+        q = deque([gate])
+        seen = {gate}
+        ranks = {}
         while q:
-            r, c = q.popleft()
-            if (r, c) in free_positions:
-                # return (row, col) to match the 'row,col' key format used by the DB
-                return (r, c)
-            # Collect potential neighbors, then sort deterministically by (col, row)
-            neighbors = []
-            for dr, dc in deltas:
-                nr, nc = r + dr, c + dc
-                if (nr, nc) in seen:
-                    continue
-                # only explore coordinates that exist in the grid (either free or occupied)
-                if (nr, nc) in free_positions or any((nr, nc) == self._parse_spot_coords(sid) for sid in self.spot_lookup):
-                    neighbors.append((nr, nc))
+            cell = q.popleft()
+            if cell in self._grid:
+                ranks[cell] = len(ranks)
+            # the gate itself may sit outside the grid, so compute its neighbors on demand
+            cell_neighbors = neighbors.get(cell)
+            if cell_neighbors is None:
+                cell_neighbors = self._cell_neighbors(cell)
+            for nxt in cell_neighbors:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    q.append(nxt)
+        return ranks
+
+    def _gate_free_index(self, gate: Tuple[int, int]) -> SortedList:
+        """Return the rank-ordered free cells for gate, building them on first use."""
+        free = self._gate_free.get(gate)
+        if free is None:
+            ranks = self._gate_order(gate)
+            grid = self._grid
+            free = SortedList((cell for cell in ranks if getattr(grid[cell], 'status', None) == 'FREE'),
+                              key=ranks.__getitem__)
+            self._gate_ranks[gate] = ranks
+            self._gate_free[gate] = free
+        return free
+
+    def _update_gate_free(self, cell: Tuple[int, int], is_free: bool):
+        for gate, free in self._gate_free.items():
+            if cell not in self._gate_ranks[gate]:
+                continue
+            if is_free and cell not in free:
+                free.add(cell)
+            elif not is_free and cell in free:
+                free.remove(cell)
+
+    def _on_spot_status(self, spot, old: str, new: str):
+        """Status hook called by Spot.status (with the lot lock held); keeps the gate indexes current."""
+        free_flip = (old == 'FREE') != (new == 'FREE')
+        if not free_flip and self.occupancy is None:
+            return
+        cell = self._spot_coords(spot)
+        if self._grid.get(cell) is not spot:
+            return
+        if self.occupancy is not None and min(cell) >= 0:
+            self.occupancy.set_status(cell[0], cell[1], new)
+        if free_flip:
+            self._update_gate_free(cell, new == 'FREE')
 
-            # sort neighbors so tie-breaker prefers lower column, then lower row
-            neighbors.sort(key=lambda rc: (rc[1], rc[0]))
-            for nr, nc in neighbors:
-                seen.add((nr, nc))
-                q.append((nr, nc))
+    def find_closest(self, gate_row: int = 0, gate_col: int = 2) -> Optional[Tuple[int, int]]:
+        """Find closest FREE spot to the gate using BFS on the grid of spots.
 
-        return None
+        Returns (row, col) or None if no free spots. The return shape matches the
+        rest of the code and the UI which uses 'row,col' string keys.
 
-    def allocate_closest_spot(self, car_id: str, gate_row: int = 0, gate_col: int = 2) -> Optional[str]:
+        The BFS itself runs once per gate (see _gate_order); afterwards this is a
+        peek at the gate's rank-ordered free cells.
+        """
+        with self._lock:
+            self._sync_grid()
+            free = self._gate_free_index((gate_row, gate_col))
+            while free:
+                cell = free[0]
+                # spots that are not Spot instances have no status hook; drop them lazily
+                if getattr(self._grid[cell], 'status', None) == 'FREE':
+                    # return (row, col) to match the 'row,col' key format used by the DB
+                    return cell
+                free.remove(cell)
+            return None
+
+    def allocate_closest_spot(self, car_id: str, gate_row: int = 0, gate_col: int = 2,
+                              gate: Optional[str] = None) -> Optional[str]:
         """Allocate the closest free spot (BFS) for car_id.
 
         Returns the allocated spot id as 'row,col' string (no parentheses) or None.
         Also sets waiting_pair and removes spot from free_spots.
+        If gate names a registered gate, its coordinates override gate_row/gate_col.
         """
+        with self._lock:
+            if gate is not None:
+                if gate not in self.gates:
+                    raise KeyError(f"unknown gate '{gate}'")
+                gate_row, gate_col = self.gates[gate]
+            key_plain = self._reserve_locked(car_id, gate_row, gate_col)
+        return key_plain
+
+    def _reserve_locked(self, car_id: str, gate_row: int, gate_col: int) -> Optional[str]:
+        """Closest free spot -> WAITING for car_id; caller holds the lot lock."""
         coord = self.find_closest(gate_row, gate_col)
         if coord is None:
             return None
-        # find_closest now returns (row, col)
+        # find_closest now returns (row, col); the coordinate index resolves both
+        # 'row,col' and '(row,col)' spot_lookup keys
         row, col = coord
-        # our spot_lookup keys use '(row,col)'
-        key_paren = self._format_coord_tuple(row, col, with_paren=True)
         key_plain = self._format_coord_tuple(row, col, with_paren=False)
-        spot = self.spot_lookup.get(key_paren) or self.spot_lookup.get(f"({row},{col})")
-        if spot is None:
-            # try the plain key
-            spot = self.spot_lookup.get(key_plain)
+        spot = self._grid.get(coord)
         if spot is None:
             return None
 
@@ -314,5 +963,4 @@ class ParkingLot:
 
         # set waiting pair and return plain key 'row,col'
         self.set_waiting_pair(car_id, key_plain)
-        print(f"[ParkingLot] Allocated spot {key_plain} to car {car_id}; free_spots_count={len(self.free_spots)}")
         return key_plain
\ No newline at end of file
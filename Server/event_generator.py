@@ -1,14 +1,21 @@
 # Event Generator - Simulates car arrivals and departures
 # This file generates events that write to Firebase RTDB, triggering the listener
 
-import firebase_admin
-from firebase_admin import credentials, db
 import random
 import time
 import datetime
 from data_structures import ParkingLot
 import typing
+import storage
 from constants import ROOT_BRANCH
+import rtdb_batch
+from rtdb_batch import WriteBatch
+from eventlog import EventLog
+
+_log = EventLog('event_generator', 'EVENT')
+
+# spot driven by the physical sensor: simulated departures never free it
+SENSOR_SPOTS = ('0,0', '(0,0)')
 
 
 def refresh_spot_from_db(parking_lot: typing.Optional[ParkingLot], spot_id: str):
@@ -19,53 +26,34 @@ def refresh_spot_from_db(parking_lot: typing.Optional[ParkingLot], spot_id: str)
     """
     if not parking_lot or not spot_id:
         return
+    # a stream-fed lot (lot_mirror) already has the latest sensor state
+    if getattr(parking_lot, 'live', False):
+        return
     try:
-        spots_ref = db.reference(f"/{ROOT_BRANCH}/SPOTS")
+        spots_ref = storage.reference(f"/{ROOT_BRANCH}/SPOTS")
         node = spots_ref.child(str(spot_id)).get() or {}
-        status = node.get('status')
-        # ensure Spot object exists in parking_lot.spot_lookup
-        sp = parking_lot.get_spot(spot_id)
-        if not sp:
-            # attempt to parse row,col and use distance if available
-            try:
-                row, col = spot_id.split(',')
-                dist = node.get('distanceFromEntry') or node.get('distanceFromEntry', 0) or 0
-                sp = type('SpotProxy', (), {})()
-                sp.spot_id = spot_id
-                sp.status = status or 'FREE'
-                sp.distance_from_entry = int(dist) if dist is not None else 0
-                # register in parking_lot
-                parking_lot.spot_lookup[spot_id] = sp
-                try:
-                    parking_lot.add_spot(sp)
-                except Exception:
-                    try:
-                        parking_lot.add_spot_to_free(sp)
-                    except Exception:
-                        pass
-            except Exception:
-                return
-        else:
-            # update existing Spot object status and free/occupied containers
-            prev = getattr(sp, 'status', None)
-            sp.status = status or prev or 'FREE'
-            # reflect change in free_spots container
-            try:
-                if sp.status == 'FREE':
-                    parking_lot.add_spot_to_free(sp)
-                else:
-                    parking_lot.remove_spot_from_free(sp)
-            except Exception:
-                pass
+        if not isinstance(node, dict):
+            node = {}
+        if not node.get('status') and parking_lot.get_spot(spot_id) is not None:
+            return  # nothing to apply: keep the spot's current state
+        # same path as a full snapshot load: a real Spot (not an ad-hoc proxy) so
+        # status flips reach the lot's gate indexes, free_spots / occupied kept in step
+        malformed = parking_lot.load_snapshot({str(spot_id): node})
+        if malformed:
+            _log.warning('refresh_skipped', 'refresh_spot_from_db(%s) skipped: %s', spot_id, malformed[str(spot_id)], spot=spot_id)
     except Exception as e:
-        print(f"[WARN] refresh_spot_from_db({spot_id}) failed: {e}")
+        _log.warning('refresh_failed', 'refresh_spot_from_db(%s) failed: %s', spot_id, e, spot=spot_id)
 
 def generate_plate_id():
     """Generate a random 8-digit car plate ID"""
     return f"{random.randint(10000000, 99999999)}"
 
-def simulate_car_arrival(parking_lot: typing.Optional[ParkingLot] = None):
-    """Simulate a new car arriving - writes to Firebase RTDB and tries to allocate a spot using parking_lot"""
+def simulate_car_arrival(parking_lot: typing.Optional[ParkingLot] = None, gate: typing.Optional[str] = None):
+    """Simulate a new car arriving - writes to Firebase RTDB and tries to allocate a spot using parking_lot
+
+    gate optionally names a registered entrance (ParkingLot.gates); otherwise the
+    GATE_ROW/GATE_COL env vars (default 0,2) are used.
+    """
     plate_id = generate_plate_id()
     timestamp = datetime.datetime.now().isoformat()
     
@@ -78,9 +66,6 @@ def simulate_car_arrival(parking_lot: typing.Optional[ParkingLot] = None):
         'timestamp': timestamp
     }
     
-    cars_ref = db.reference(f"/{ROOT_BRANCH}/CARS")
-    cars_ref.child(plate_id).set(car_data)
-
     # if this is a sensor-controlled spot (like 0,0) make sure we refresh it from DB
     try:
         refresh_spot_from_db(parking_lot, '0,0')
@@ -97,51 +82,14 @@ def simulate_car_arrival(parking_lot: typing.Optional[ParkingLot] = None):
             import os
             gate_row = int(os.environ.get('GATE_ROW', '0'))
             gate_col = int(os.environ.get('GATE_COL', '2'))
-            if hasattr(parking_lot, 'allocate_closest_spot'):
-                # compute BFS closest before allocator mutates free_spots
-                try:
-                    bfs_coord = parking_lot.find_closest(gate_row=gate_row, gate_col=gate_col)
-                    bfs_key = f"{bfs_coord[0]},{bfs_coord[1]}" if bfs_coord else None
-                except Exception:
-                    bfs_key = None
-
+            if gate is not None and hasattr(parking_lot, 'get_gate') and parking_lot.get_gate(gate):
+                gate_row, gate_col = parking_lot.get_gate(gate)
+            if hasattr(parking_lot, 'reserve_closest'):
+                # atomic lookup + WAITING flip + waiting pair under the lot lock, so
+                # concurrent arrivals can never be handed the same spot
+                allocated_spot = parking_lot.reserve_closest(plate_id, gate_row=gate_row, gate_col=gate_col)
+            elif hasattr(parking_lot, 'allocate_closest_spot'):
                 allocated_spot = parking_lot.allocate_closest_spot(plate_id, gate_row=gate_row, gate_col=gate_col)
-
-                # defensive: if allocator result differs from precomputed BFS, prefer the BFS key
-                if bfs_key and allocated_spot != bfs_key:
-                    print(f"[WARN] allocator returned {allocated_spot} but BFS closest was {bfs_key} -> preferring BFS result")
-                    # try to return allocated_spot to free_spots (if it was removed)
-                    try:
-                        if hasattr(parking_lot, 'get_spot') and allocated_spot:
-                            spobj = parking_lot.get_spot(allocated_spot)
-                            if spobj:
-                                spobj.status = 'FREE'
-                                if hasattr(parking_lot, 'add_spot_to_free'):
-                                    parking_lot.add_spot_to_free(spobj)
-                                else:
-                                    try:
-                                        parking_lot.free_spots.add(spobj)
-                                    except Exception:
-                                        pass
-                    except Exception:
-                        pass
-
-                    # remove bfs_key from free list and set as waiting for this plate
-                    allocated_spot = bfs_key
-                    try:
-                        if hasattr(parking_lot, 'get_spot'):
-                            bsp = parking_lot.get_spot(bfs_key)
-                            if bsp:
-                                try:
-                                    parking_lot.remove_spot_from_free(bsp)
-                                except Exception:
-                                    try:
-                                        parking_lot.free_spots.remove(bsp)
-                                    except Exception:
-                                        pass
-                                parking_lot.set_waiting_pair(plate_id, bfs_key)
-                    except Exception:
-                        pass
             else:
                 # if no BFS allocator, fall back to a simple free_spots pop
                 if hasattr(parking_lot, 'free_spots'):
@@ -151,34 +99,53 @@ def simulate_car_arrival(parking_lot: typing.Optional[ParkingLot] = None):
                         allocated_spot = sp.spot_id if hasattr(sp, 'spot_id') else sp
                     except Exception:
                         allocated_spot = None
+            if allocated_spot:
+                _log.debug('spot_allocated', 'Allocated spot %s to car %s; free_spots_count=%d', allocated_spot, plate_id,
+                           len(parking_lot.free_spots), spot=allocated_spot, plate=plate_id)
         except Exception as e:
             # allocation failed; leave as waiting
-            print(f"⚠️ ParkingLot allocation error: {e}")
+            _log.warning('allocation_error', 'ParkingLot allocation error: %s', e, plate=plate_id)
 
+    # one multi-path update: the car record (with its allocation) and the spot
+    batch = WriteBatch()
     if allocated_spot:
         # update RTDB to reflect allocation: assign closest spot and mark as waiting
-        cars_ref.child(plate_id).update({'allocatedSpot': allocated_spot, 'ClosestSpot': allocated_spot, 'SpotIn': {'Arrievied': False}, 'status': 'waiting'})
-
+        car_data.update({'allocatedSpot': allocated_spot, 'ClosestSpot': allocated_spot})
+        batch.set(f"{ROOT_BRANCH}/CARS/{plate_id}", car_data)
         # write to UI branch so console reflects the waiting state
-        spots_ref = db.reference(f"{ROOT_BRANCH}/SPOTS")
-        spots_ref.child(str(allocated_spot)).update({'status': 'WAITING', 'waitingCarId': plate_id, 'seenCarId': '-'})
-        print(f"🔔 Car {plate_id} assigned to spot {allocated_spot} (waiting)")
+        batch.update(f"{ROOT_BRANCH}/SPOTS/{allocated_spot}", {'status': 'WAITING', 'waitingCarId': plate_id, 'seenCarId': '-'})
+        rtdb_batch.commit(batch)
+        _log.debug('car_waiting', 'Car %s assigned to spot %s (waiting)', plate_id, allocated_spot,
+                   plate=plate_id, spot=allocated_spot)
     else:
-        print(f"⏳ Car {plate_id} added to queue (no spot allocated)")
+        batch.set(f"{ROOT_BRANCH}/CARS/{plate_id}", car_data)
+        rtdb_batch.commit(batch)
+        _log.debug('car_queued', 'Car %s added to queue (no spot allocated)', plate_id, plate=plate_id)
 
     return plate_id
 
-def simulate_car_departure(parking_lot: typing.Optional[ParkingLot]):
-    """Simulate a car leaving using the parking lot structure and update RTDB"""
+def simulate_car_departure(parking_lot: typing.Optional[ParkingLot], spot_id: typing.Optional[str] = None):
+    """Simulate a car leaving using the parking lot structure and update RTDB
+
+    spot_id picks the car parked there (e.g. a car whose dwell time is up);
+    by default a random occupied spot is freed.
+    """
     if not parking_lot:
-        print("❌ No ParkingLot provided!")
+        _log.warning('no_parking_lot', 'No ParkingLot provided')
         return None
 
     spot_car_pair = None
     try:
         # Build a list of occupied (spot_id, car_id) tuples from available APIs
         occ_list = None
-        if hasattr(parking_lot, 'get_occupied_spots'):
+        if spot_id is not None:
+            # targeted departure: just that spot's occupant (no full scan)
+            occupants = getattr(parking_lot, 'occupied_spots_with_cars', None)
+            if occupants is None:
+                occupants = dict(parking_lot.get_occupied_spots())
+            car_id = occupants.get(str(spot_id))
+            occ_list = [(str(spot_id), car_id)] if car_id else []
+        elif hasattr(parking_lot, 'get_occupied_spots'):
             occ_list = parking_lot.get_occupied_spots()
         elif hasattr(parking_lot, 'occupied_spots_with_cars'):
             occ_list = list(getattr(parking_lot, 'occupied_spots_with_cars').items())
@@ -188,27 +155,30 @@ def simulate_car_departure(parking_lot: typing.Optional[ParkingLot]):
 
         if occ_list:
             # Exclude the sensor-controlled spot '0,0' (and variant '(0,0)') per user request
-            filtered = [(s, c) for (s, c) in occ_list if str(s) not in ('0,0', '(0,0)')]
+            filtered = [(s, c) for (s, c) in occ_list if str(s) not in SENSOR_SPOTS]
             if not filtered:
                 # No occupied spots available except the sensor-controlled one -> don't depart
-                print("❌ No occupied spots found (excluding 0,0). Skipping departure.")
+                _log.debug('no_departure', 'No occupied spots found (excluding 0,0). Skipping departure.')
                 return None
             spot_car_pair = random.choice(filtered)
         else:
             spot_car_pair = None
     except Exception as e:
-        print(f"⚠️ Error querying ParkingLot: {e}")
+        _log.warning('departure_error', 'Error querying ParkingLot: %s', e)
 
     if not spot_car_pair:
-        print("❌ No occupied spots found!")
+        _log.debug('no_departure', 'No occupied spots found')
         return None
 
     spot_id, departing_car_id = spot_car_pair
-    print(f"🚗 Car {departing_car_id} leaving spot {spot_id}")
+    _log.debug('car_leaving', 'Car %s leaving spot %s', departing_car_id, spot_id, plate=departing_car_id, spot=spot_id)
 
     # Update parking lot internal structures if possible so freed spot is visible to allocators
     try:
-        if parking_lot:
+        if parking_lot and hasattr(parking_lot, 'release_spot'):
+            # atomic: drop occupant/waiting pair, mark FREE, return to free_spots
+            parking_lot.release_spot(spot_id)
+        elif parking_lot:
             # Prefer modern API to remove occupied spot
             if hasattr(parking_lot, 'remove_occupied_spot'):
                 try:
@@ -258,44 +228,20 @@ def simulate_car_departure(parking_lot: typing.Optional[ParkingLot]):
                             except Exception:
                                 pass
             except Exception as e:
-                print(f"⚠️ Error updating ParkingLot on departure: {e}")
+                _log.warning('departure_error', 'Error updating ParkingLot on departure: %s', e, spot=spot_id)
     except Exception as e:
-        print(f"⚠️ Error updating ParkingLot on departure: {e}")
-
-    # Update RTDB - mark spot free and mark car as departed
-    # update UI branch for spots (reset seen/waiting)
-    spots_ref = db.reference(f"/{ROOT_BRANCH}/SPOTS")
-    spots_ref.child(str(spot_id)).update({'status': 'FREE', 'carId': None, 'seenCarId': '-', 'waitingCarId': '-'})
-    # Remove the car record from the RTDB so departed cars don't linger.
-    # Attempt both the namespaced branch and the legacy top-level /CARS to be safe.
-    try:
-        namespaced_ref = db.reference(f"/{ROOT_BRANCH}/CARS").child(str(departing_car_id))
-        try:
-            # Best-effort update to mark departed before deletion (useful for listeners)
-            namespaced_ref.update({'status': 'departed', 'allocatedSpot': '-'})
-        except Exception:
-            pass
-        try:
-            namespaced_ref.delete()
-            print(f"[DB] Deleted car {departing_car_id} from /{ROOT_BRANCH}/CARS")
-        except Exception:
-            print(f"[DB] Failed to delete car {departing_car_id} from /{ROOT_BRANCH}/CARS")
-    except Exception:
-        print(f"[DB] Error handling namespaced car delete for {departing_car_id}")
-
-    # Also attempt to remove legacy top-level /CARS entries if present
-    try:
-        legacy_ref = db.reference(f"/CARS").child(str(departing_car_id))
-        try:
-            legacy_ref.delete()
-            print(f"[DB] Deleted car {departing_car_id} from /CARS (legacy)")
-        except Exception:
-            # not fatal; just log
-            print(f"[DB] Failed to delete car {departing_car_id} from /CARS (legacy)")
-    except Exception:
-        pass
-
-    print(f"✅ Triggered departure for spot {spot_id}")
+        _log.warning('departure_error', 'Error updating ParkingLot on departure: %s', e, spot=spot_id)
+
+    # Update RTDB in one multi-path update - mark the spot free (reset seen/waiting)
+    # and remove the car record so departed cars don't linger, from both the
+    # namespaced branch and the legacy top-level /CARS
+    batch = WriteBatch()
+    batch.update(f"{ROOT_BRANCH}/SPOTS/{spot_id}", {'status': 'FREE', 'carId': None, 'seenCarId': '-', 'waitingCarId': '-'})
+    batch.delete(f"{ROOT_BRANCH}/CARS/{departing_car_id}")
+    batch.delete(f"CARS/{departing_car_id}")
+    rtdb_batch.commit(batch)
+    _log.debug('car_departed', 'Car %s left spot %s (record deleted from /%s/CARS and /CARS)', departing_car_id, spot_id,
+               ROOT_BRANCH, plate=departing_car_id, spot=spot_id)
     return departing_car_id
 
 
@@ -308,14 +254,19 @@ def simulate_car_parked(parking_lot: typing.Optional[ParkingLot], plate_id: str)
     Returns the allocated spot id or None on failure.
     """
     if not plate_id:
-        print("❌ No plate id provided to simulate_car_parked")
+        _log.warning('no_plate', 'No plate id provided to simulate_car_parked')
         return None
 
-    cars_ref = db.reference(f"/{ROOT_BRANCH}/CARS")
+    cars_ref = storage.reference(f"/{ROOT_BRANCH}/CARS")
     # Find allocated spot: prefer parking_lot mapping, fallback to DB stored allocatedSpot
     allocated_spot = None
     try:
-        if parking_lot and hasattr(parking_lot, 'occupied_spots'):
+        if parking_lot and hasattr(parking_lot, 'get_waiting_pair'):
+            # the car's reservation from reserve_closest (no DB read needed)
+            pair = parking_lot.get_waiting_pair(plate_id)
+            if pair:
+                allocated_spot = pair['spot_id']
+        if not allocated_spot and parking_lot and hasattr(parking_lot, 'occupied_spots'):
             # find spot by matching plate id
             for s, c in getattr(parking_lot, 'occupied_spots').items():
                 if c == plate_id:
@@ -325,29 +276,29 @@ def simulate_car_parked(parking_lot: typing.Optional[ParkingLot], plate_id: str)
             car_record = cars_ref.child(plate_id).get() or {}
             allocated_spot = car_record.get('allocatedSpot')
     except Exception as e:
-        print(f"⚠️ Error determining allocated spot for {plate_id}: {e}")
+        _log.warning('park_error', 'Error determining allocated spot for %s: %s', plate_id, e, plate=plate_id)
 
     if not allocated_spot:
-        print(f"❌ No allocated spot found for car {plate_id}")
+        _log.warning('no_allocation', 'No allocated spot found for car %s', plate_id, plate=plate_id)
         return None
 
-    # Update car record: arrived
-    try:
-        cars_ref.child(plate_id).update({'SpotIn': {'Arrievied': True}, 'status': 'parked', 'allocatedSpot': allocated_spot})
-    except Exception as e:
-        print(f"⚠️ Failed to update car record for {plate_id}: {e}")
-
-    # Update spot record to OCCUPIED and set seen/waiting fields
-    spots_ref = db.reference(f"{ROOT_BRANCH}/SPOTS")
+    # One multi-path update: car record arrived, spot record OCCUPIED with seen/waiting fields
     ts = int(time.time() * 1000)
+    batch = WriteBatch()
+    batch.update(f"{ROOT_BRANCH}/CARS/{plate_id}", {'SpotIn': {'Arrievied': True}, 'status': 'parked', 'allocatedSpot': allocated_spot})
+    batch.update(f"{ROOT_BRANCH}/SPOTS/{allocated_spot}", {'status': 'OCCUPIED', 'carId': plate_id, 'seenCarId': plate_id, 'waitingCarId': '-', 'lastUpdateMs': ts})
     try:
-        spots_ref.child(str(allocated_spot)).update({'status': 'OCCUPIED', 'carId': plate_id, 'seenCarId': plate_id, 'waitingCarId': '-', 'lastUpdateMs': ts})
+        rtdb_batch.commit(batch)
     except Exception as e:
-        print(f"⚠️ Failed to update spot {allocated_spot} for parked car {plate_id}: {e}")
+        _log.warning('park_write_failed', 'Failed to update car %s / spot %s for parked car: %s', plate_id, allocated_spot, e,
+                     plate=plate_id, spot=allocated_spot)
 
     # Update parking_lot internal structures if APIs available
     try:
-        if parking_lot:
+        if parking_lot and hasattr(parking_lot, 'confirm_parked'):
+            # atomic: clear the waiting pair, mark OCCUPIED, record the occupant
+            parking_lot.confirm_parked(plate_id, allocated_spot)
+        elif parking_lot:
             if hasattr(parking_lot, 'add_occupied_spot'):
                 parking_lot.add_occupied_spot(allocated_spot, plate_id)
             elif hasattr(parking_lot, 'occupied_spots'):
@@ -367,7 +318,7 @@ def simulate_car_parked(parking_lot: typing.Optional[ParkingLot], plate_id: str)
                 except Exception:
                     pass
     except Exception as e:
-        print(f"⚠️ Error updating parking_lot internals for parked car {plate_id}: {e}")
+        _log.warning('park_error', 'Error updating parking_lot internals for parked car %s: %s', plate_id, e, plate=plate_id)
 
-    print(f"✅ Car {plate_id} parked at spot {allocated_spot}")
+    _log.debug('car_parked', 'Car %s parked at spot %s', plate_id, allocated_spot, plate=plate_id, spot=allocated_spot)
     return allocated_spot
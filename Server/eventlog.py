@@ -0,0 +1,241 @@
+# Event log - structured logging for the per-car hot loops (allocation,
+# arrival/park/departure, listener events) in place of print().
+#
+# Callers only pay for what is kept: a disabled level returns before any
+# formatting, sampled-out events return after one counter bump, and kept
+# records are handed unformatted to a bounded queue. A background thread
+# formats them (text, or JSON lines with LOG_FORMAT=json) and writes them
+# to stdout or LOG_FILE. When the queue is full, INFO/DEBUG records are
+# dropped and counted rather than blocking the simulator; warnings and
+# errors wait up to WARNING_WAIT seconds for room and are otherwise written
+# on the caller's thread, so they are never lost.
+#
+#   LOG_LEVEL   DEBUG / INFO / WARNING / ...                  (INFO)
+#   LOG_FORMAT  text or json                                  (text)
+#   LOG_FILE    append here instead of stdout
+#   LOG_SAMPLE  keep 1 in N of an event: "car_parked=10,spots_event=100"
+#               ("*=N" for every INFO/DEBUG event; warnings are never sampled)
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import typing
+from collections import Counter
+
+ROOT = 'iot_parking'
+TEXT_FORMAT = '[%(tag)s] %(message)s'
+QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+WARNING_WAIT = 0.5
+
+# emitted / sampled_out / dropped (queue full) / unqueued (warning written by the caller), per event name
+stats = Counter()
+
+
+def parse_sample(spec: str) -> typing.Dict[str, int]:
+    """'car_parked=10,*=2' -> {'car_parked': 10, '*': 2} (keep 1 in N)."""
+    rates = {}
+    for part in filter(None, (p.strip() for p in (spec or '').split(','))):
+        name, _, every = part.partition('=')
+        every = int(every)
+        if every < 1:
+            raise ValueError(f"LOG_SAMPLE: keep 1 in N needs N >= 1, got {part!r}")
+        rates[name.strip()] = every
+    return rates
+
+
+class Preview:
+    """str(value) cut to `limit` characters, rendered lazily and without
+    stringifying the parts of a large dict/list that would be cut anyway."""
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value, limit: int = 120):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        out, size = [], 0
+        for piece in _pieces(self.value, top=True):
+            out.append(piece)
+            size += len(piece)
+            if size > self.limit:
+                return ''.join(out)[:self.limit] + '...'
+        return ''.join(out)
+
+
+def _pieces(value, top=False):
+    if isinstance(value, dict):
+        yield '{'
+        for i, (k, v) in enumerate(value.items()):
+            yield (', ' if i else '') + repr(k) + ': '
+            yield from _pieces(v)
+        yield '}'
+    elif isinstance(value, (list, tuple)):
+        yield '[' if isinstance(value, list) else '('
+        for i, v in enumerate(value):
+            if i:
+                yield ', '
+            yield from _pieces(v)
+        yield ']' if isinstance(value, list) else ')'
+    else:
+        yield str(value) if top else repr(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, event, msg and the event's fields."""
+
+    def format(self, record):
+        entry = {'ts': round(record.created, 6), 'level': record.levelname,
+                 'logger': record.name, 'event': getattr(record, 'event', None),
+                 'msg': record.getMessage()}
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # The stock handler formats on the caller's thread (prepare) and raises
+    # when the queue is full; here records go over as they are and the
+    # listener thread formats them.
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        event = getattr(record, 'event', None)
+        if record.levelno < logging.WARNING:
+            stats[f"dropped:{event}"] += 1
+            return
+        try:
+            self.queue.put(record, timeout=WARNING_WAIT)
+        except queue.Full:
+            listener = _listener
+            for handler in (listener.handlers if listener is not None else ()):
+                handler.handle(record)
+            stats[f"unqueued:{event}"] += 1
+
+
+class _Stdout:
+    # resolve sys.stdout at write time, so redirect_stdout/capsys see the output
+    def write(self, text):
+        return sys.stdout.write(text)
+
+    def flush(self):
+        sys.stdout.flush()
+
+
+_listener = None
+_queue = None
+_closed = False  # set by shutdown(); records are then written on the caller's thread
+_lock = threading.Lock()
+_sample = parse_sample(os.environ.get('LOG_SAMPLE', ''))
+
+
+def configure(level: typing.Optional[str] = None, fmt: typing.Optional[str] = None,
+              path: typing.Optional[str] = None, sample: typing.Optional[str] = None,
+              stream=None):
+    """(Re)start the background writer; arguments default to the LOG_* variables."""
+    global _listener, _queue, _sample, _closed
+    with _lock:
+        _stop_locked()
+        _closed = False
+        root = logging.getLogger(ROOT)
+        root.setLevel((level or os.environ.get('LOG_LEVEL', 'INFO')).upper())
+        root.propagate = False
+        path = path if path is not None else os.environ.get('LOG_FILE')
+        if stream is not None:
+            handler = logging.StreamHandler(stream)
+        elif path:
+            handler = logging.FileHandler(path)
+        else:
+            handler = logging.StreamHandler(_Stdout())
+        fmt = (fmt or os.environ.get('LOG_FORMAT', 'text')).lower()
+        handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+        _sample = parse_sample(sample if sample is not None else os.environ.get('LOG_SAMPLE', ''))
+        _queue = queue.Queue(QUEUE_SIZE)
+        root.handlers[:] = [_QueueHandler(_queue)]
+        _listener = logging.handlers.QueueListener(_queue, handler)
+        _listener.start()
+
+
+def _stop_locked():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def flush():
+    """Block until every queued record has been written."""
+    if _queue is not None:
+        _queue.join()
+
+
+@atexit.register
+def shutdown():
+    """Write what is queued and stop the background writer.
+
+    Records logged afterwards (by other atexit hooks, say) go straight to
+    the writer's handlers instead of starting a new thread.
+    """
+    global _closed
+    with _lock:
+        if _listener is not None:
+            handlers = list(_listener.handlers)
+            _stop_locked()
+            logging.getLogger(ROOT).handlers[:] = handlers
+        _closed = True
+
+
+class EventLog:
+    """Named events for one module: log.info('car_parked', 'Car %s parked at %s', plate, spot, plate=plate).
+
+    `tag` prefixes text output ([SIM], [EVENT], ...); keyword arguments
+    become fields of the JSON line. Message arguments are formatted on the
+    writer thread, so pass values that will not change afterwards (wrap
+    large payloads in Preview).
+    """
+
+    def __init__(self, name: str, tag: typing.Optional[str] = None):
+        self.logger = logging.getLogger(f"{ROOT}.{name}")
+        self.tag = tag or name
+        self._seen = Counter()
+
+    def log(self, level: int, event: str, msg: str, *args, **fields):
+        if _listener is None and not _closed:
+            configure()
+        if not self.logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING:
+            every = _sample.get(event) or _sample.get('*', 1)
+            if every > 1:
+                self._seen[event] += 1
+                if self._seen[event] % every != 1:
+                    stats[f"sampled_out:{event}"] += 1
+                    return
+        stats[f"emitted:{event}"] += 1
+        self.logger.log(level, msg, *args, extra={'tag': self.tag, 'event': event, 'fields': fields})
+
+    def debug(self, event: str, msg: str, *args, **fields):
+        self.log(logging.DEBUG, event, msg, *args, **fields)
+
+    def info(self, event: str, msg: str, *args, **fields):
+        self.log(logging.INFO, event, msg, *args, **fields)
+
+    def warning(self, event: str, msg: str, *args, **fields):
+        self.log(logging.WARNING, event, msg, *args, **fields)
+
+    def error(self, event: str, msg: str, *args, **fields):
+        self.log(logging.ERROR, event, msg, *args, **fields)
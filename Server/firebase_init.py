@@ -1,35 +1,107 @@
 import os
 import json
 import time
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import db
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# Try env override first (recommended)
-ENV_DB_URL = os.environ.get("RTDB_URL") or os.environ.get("FIREBASE_DATABASE_URL")
+# Importing this module is cheap: nothing is read, probed or initialized until
+# init() is called (storage.FirebaseStorage does that on first DB use).
 
-def _probe_url(url):
+PROBE_TIMEOUT = float(os.environ.get("RTDB_PROBE_TIMEOUT", "3"))
+# probed database URLs are remembered here per project (RTDB_URL_CACHE='' disables)
+URL_CACHE_PATH = os.environ.get(
+    "RTDB_URL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "iot_parking", "rtdb_url.json"))
+URL_CACHE_MAX_AGE = 30 * 86400
+
+# credential path (use GOOGLE_APPLICATION_CREDENTIALS if set, else 'secret.json' next to this file)
+# If the process CWD is the repo root (common when running scripts), a plain
+# "secret.json" won't be found. Point the default to the Server/secret.json
+# location (next to this module) so both `cd Server && python ...` and
+# `python Server/simulation_sondos.py` work.
+default_secret = os.path.join(os.path.dirname(__file__), "secret.json")
+cred_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", default_secret)
+
+# set by init()
+database_url = None
+_app = None
+_init_lock = threading.Lock()
+
+
+def _env_db_url():
+    # Try env override first (recommended)
+    return os.environ.get("RTDB_URL") or os.environ.get("FIREBASE_DATABASE_URL")
+
+
+def _probe_url(url, timeout=None):
     try:
         import requests
-        resp = requests.get(url.rstrip("/") + "/.json", timeout=3)
+        resp = requests.get(url.rstrip("/") + "/.json", timeout=timeout or PROBE_TIMEOUT)
         # treat 404 as non-existing endpoint; 200/401/403/etc means endpoint exists
         return resp.status_code != 404
     except Exception:
         return False
 
+
+def _probe_candidates(candidates):
+    """First candidate (in list order) whose endpoint exists, probing all of them at once."""
+    if not candidates:
+        return None
+    with ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+        found = list(pool.map(_probe_url, candidates))
+    return next((u for u, ok in zip(candidates, found) if ok), None)
+
+
+def _read_url_cache():
+    if not URL_CACHE_PATH:
+        return {}
+    try:
+        with open(URL_CACHE_PATH) as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _cached_url(project_id):
+    entry = _read_url_cache().get(project_id) or {}
+    if entry.get("url") and time.time() - entry.get("probedAt", 0) < URL_CACHE_MAX_AGE:
+        return entry["url"]
+    return None
+
+
+def _store_cached_url(project_id, url):
+    if not URL_CACHE_PATH:
+        return
+    cache = _read_url_cache()
+    cache[project_id] = {"url": url, "probedAt": int(time.time())}
+    try:
+        os.makedirs(os.path.dirname(URL_CACHE_PATH) or ".", exist_ok=True)
+        tmp = f"{URL_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp, URL_CACHE_PATH)
+    except OSError as e:
+        print(f"[Firebase] Could not cache the database URL in {URL_CACHE_PATH}: {e}")
+
+
 def _derive_database_url(cred_path):
-    if ENV_DB_URL:
-        return ENV_DB_URL
+    env_url = _env_db_url()
+    if env_url:
+        return env_url
 
     try:
-        info = json.load(open(cred_path))
-        pid = info.get("project_id")
+        with open(cred_path) as f:
+            pid = json.load(f).get("project_id")
     except Exception:
         return None
 
     if not pid:
         return None
 
+    cached = _cached_url(pid)
+    if cached:
+        return cached
+
     candidates = [
         f"https://{pid}-default-rtdb.firebaseio.com",
         f"https://{pid}-default-rtdb.europe-west1.firebasedatabase.app",
@@ -37,31 +109,28 @@ def _derive_database_url(cred_path):
         f"https://{pid}-default-rtdb.europe-west3.firebasedatabase.app",
     ]
 
-    for u in candidates:
-        if _probe_url(u):
-            return u
+    found = _probe_candidates(candidates)
+    if found:
+        _store_cached_url(pid, found)
+        return found
 
     # fallback to first candidate
     return candidates[0]
 
-# credential path (use GOOGLE_APPLICATION_CREDENTIALS if set, else 'secret.json' next to this file)
-# If the process CWD is the repo root (common when running scripts), a plain
-# "secret.json" won't be found. Point the default to the Server/secret.json
-# location (next to this module) so both `cd Server && python ...` and
-# `python Server/simulation_sondos.py` work.
-default_secret = os.path.join(os.path.dirname(__file__), "secret.json")
-cred_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", default_secret)
 
-# Prefer certificate file when available. If missing, fall back to Application Default
-# Credentials so importing this module doesn't crash immediately. This makes local
-# development easier but we emit a clear message explaining how to provide creds.
-if os.path.exists(cred_path):
-    try:
-        cred = credentials.Certificate(cred_path)
-    except Exception as e:
-        # Unexpected parsing error from certificate file
-        raise RuntimeError(f"Failed to load Firebase certificate from {cred_path}: {e}") from e
-else:
+def _load_credentials(cred_path):
+    """Certificate credentials from cred_path, or None for Application Default Credentials."""
+    from firebase_admin import credentials
+
+    # Prefer certificate file when available. If missing, fall back to Application Default
+    # Credentials so local development works without one, with a clear message explaining
+    # how to provide creds.
+    if os.path.exists(cred_path):
+        try:
+            return credentials.Certificate(cred_path)
+        except Exception as e:
+            # Unexpected parsing error from certificate file
+            raise RuntimeError(f"Failed to load Firebase certificate from {cred_path}: {e}") from e
     if "GOOGLE_APPLICATION_CREDENTIALS" in os.environ:
         # User explicitly set the env var but file does not exist -> fail fast with clear message
         raise FileNotFoundError(
@@ -70,45 +139,67 @@ else:
         )
     # No certificate file found; fall back to Application Default Credentials (ADC).
     # ADC will work if the environment has been configured (e.g. gcloud auth application-default login)
-    # or when running on a Google Cloud environment. We keep `cred` as None so
-    # `firebase_admin.initialize_app` uses the default credential flow.
+    # or when running on a Google Cloud environment. Returning None makes
+    # `firebase_admin.initialize_app` use the default credential flow.
     print("[Firebase] Warning: credential file not found; falling back to Application Default Credentials.\n"
           "If you expect to use a service account file locally, set GOOGLE_APPLICATION_CREDENTIALS or add 'secret.json'.")
-    cred = None
-
-database_url = _derive_database_url(cred_path)
-if not database_url:
-    database_url = os.environ.get("RTDB_URL")  # final fallback
-
-# If we still don't have a database URL, that's unrecoverable for parts of the
-# application that expect a Realtime Database (e.g. simulation scripts). Fail
-# fast with a helpful message so the user knows how to fix their environment.
-if not database_url:
-    raise RuntimeError(
-        """Firebase Realtime Database URL could not be determined.
+    return None
+
+
+def init():
+    """Initialize the Firebase app once (thread-safe) and return it."""
+    global _app, database_url
+    if _app is not None:
+        return _app
+    with _init_lock:
+        if _app is not None:
+            return _app
+        import firebase_admin
+        try:
+            app = firebase_admin.get_app()
+            database_url = app.options.get("databaseURL")
+        except ValueError:
+            cred = _load_credentials(cred_path)
+            url = _derive_database_url(cred_path)
+
+            # If we still don't have a database URL, that's unrecoverable for parts of the
+            # application that expect a Realtime Database (e.g. simulation scripts). Fail
+            # fast with a helpful message so the user knows how to fix their environment.
+            if not url:
+                raise RuntimeError(
+                    """Firebase Realtime Database URL could not be determined.
 Provide one of the following to continue:
  1) Set the RTDB_URL or FIREBASE_DATABASE_URL environment variable to your RTDB URL.
     Example: export RTDB_URL='https://<project>-default-rtdb.europe-west1.firebasedatabase.app'
  2) Place a service account JSON named 'secret.json' in the Server folder or set
     GOOGLE_APPLICATION_CREDENTIALS to its absolute path so the code can derive the project_id.
 
-Note: If you intend to run without a Realtime Database (read-only or offline), adjust imports that
-call db.reference or mock the database in tests.
+Note: If you intend to run without a Realtime Database, set STORAGE_BACKEND=memory.
 """
-    )
-
-# Initialize Firebase app idempotently. If `cred` is None, firebase_admin will use
-# Application Default Credentials or other configured defaults.
-try:
-    firebase_admin.get_app()
-except ValueError:
-    init_opts = {"databaseURL": database_url} if database_url else None
-    if init_opts:
-        firebase_admin.initialize_app(cred, init_opts)
-    else:
-        # initialize without options if we don't have a databaseURL
-        firebase_admin.initialize_app(cred)
-
-print(f"[Firebase] Using DB: {database_url}")
-# export db (other modules import `from firebase_init import db as _db_init`)
-# Note: `db` is already imported from firebase_admin above
\ No newline at end of file
+                )
+            app = firebase_admin.initialize_app(cred, {"databaseURL": url})
+            database_url = url
+            print(f"[Firebase] Using DB: {database_url}")
+        _app = app
+        return _app
+
+
+def start():
+    """Begin init() on a background thread (e.g. while a worker boots); returns the thread."""
+    def run():
+        try:
+            init()
+        except Exception as e:
+            print(f"[Firebase] Background initialization failed: {e}")
+    thread = threading.Thread(target=run, name="firebase-init", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # `from firebase_init import db` still works: it initializes the app first
+    if name == "db":
+        init()
+        from firebase_admin import db
+        return db
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
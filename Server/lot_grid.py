@@ -0,0 +1,240 @@
+# Array-backed lot state for whole-lot analytics - spot statuses as a uint8
+# grid and distances as an int32 grid, so counts, nearest-spot queries and
+# per-row/column occupancy are single vectorized passes instead of Python
+# loops over every spot dict.
+
+import threading
+import typing
+import numpy as np
+
+# status codes in the grid; NO_SPOT marks cells without a spot
+NO_SPOT, FREE, WAITING, OCCUPIED, WRONG_PARK, OTHER = range(6)
+STATUS_CODES = {'FREE': FREE, 'WAITING': WAITING, 'OCCUPIED': OCCUPIED, 'WRONG_PARK': WRONG_PARK}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+STATUS_NAMES[OTHER] = 'OTHER'
+
+
+def status_code(status) -> int:
+    return STATUS_CODES.get(str(status or 'FREE').upper(), OTHER)
+
+
+def manhattan_grid(rows: int, cols: int, row: int, col: int) -> np.ndarray:
+    """rows x cols int32 array of |r - row| + |c - col| (e.g. distanceFromEntry for a lot)."""
+    r = np.abs(np.arange(rows, dtype=np.int32) - row)
+    c = np.abs(np.arange(cols, dtype=np.int32) - col)
+    return r[:, None] + c[None, :]
+
+
+class OccupancyGrid:
+    """uint8 status grid + int32 distance grid mirroring a ParkingLot.
+
+    Attach it with ParkingLot.attach_occupancy_grid(); the lot then updates
+    it on every add/remove/status flip. Each update is O(1) and also keeps
+    the per-status counts and the per-row/column spot and busy (non-FREE)
+    counts, so counts(), free_count(), row_occupancy() and col_occupancy()
+    never scan the lot; nearest() and heatmap() are single vectorized passes.
+    The arrays grow as spots appear beyond the current bounds.
+    """
+
+    def __init__(self, rows: int = 0, cols: int = 0):
+        # arrays are over-allocated as the lot grows; rows/cols are the used extents
+        self._status = np.zeros((rows, cols), dtype=np.uint8)
+        self._distance = np.full((rows, cols), -1, dtype=np.int32)
+        self._row_spots = np.zeros(rows, dtype=np.int32)
+        self._row_busy = np.zeros(rows, dtype=np.int32)
+        self._col_spots = np.zeros(cols, dtype=np.int32)
+        self._col_busy = np.zeros(cols, dtype=np.int32)
+        self._counts = [0] * (OTHER + 1)
+        self.rows, self.cols = rows, cols
+        self._lock = threading.RLock()
+
+    @property
+    def shape(self) -> typing.Tuple[int, int]:
+        return self.rows, self.cols
+
+    @property
+    def status(self) -> np.ndarray:
+        """rows x cols uint8 status codes (a view; NO_SPOT where there is no spot)."""
+        return self._status[:self.rows, :self.cols]
+
+    @property
+    def distance(self) -> np.ndarray:
+        """rows x cols int32 distanceFromEntry (a view; -1 where there is no spot)."""
+        return self._distance[:self.rows, :self.cols]
+
+    @staticmethod
+    def _check(row: int, col: int):
+        # numpy would wrap a negative index around to the far edge of the array
+        if row < 0 or col < 0:
+            raise ValueError(f"cell ({row}, {col}) has a negative coordinate")
+
+    def _ensure(self, row: int, col: int):
+        self._check(row, col)
+        self.rows, self.cols = max(self.rows, row + 1), max(self.cols, col + 1)
+        rows, cols = self._status.shape
+        if row < rows and col < cols:
+            return
+        # grow geometrically so a lot loaded spot by spot costs O(n) copies
+        new_rows = max(rows, row + 1, rows * 2 if row >= rows else 0)
+        new_cols = max(cols, col + 1, cols * 2 if col >= cols else 0)
+        status = np.zeros((new_rows, new_cols), dtype=np.uint8)
+        distance = np.full((new_rows, new_cols), -1, dtype=np.int32)
+        status[:rows, :cols] = self._status
+        distance[:rows, :cols] = self._distance
+        self._status, self._distance = status, distance
+        for name, size in (('_row_spots', new_rows), ('_row_busy', new_rows),
+                           ('_col_spots', new_cols), ('_col_busy', new_cols)):
+            old = getattr(self, name)
+            grown = np.zeros(size, dtype=np.int32)
+            grown[:old.size] = old
+            setattr(self, name, grown)
+
+    def _set_code(self, row: int, col: int, code: int):
+        old = int(self._status[row, col])
+        if old == code:
+            return
+        self._status[row, col] = code
+        self._counts[old] -= 1
+        self._counts[code] += 1
+        if (old == NO_SPOT) != (code == NO_SPOT):
+            step = 1 if old == NO_SPOT else -1
+            self._row_spots[row] += step
+            self._col_spots[col] += step
+        if (old > FREE) != (code > FREE):
+            step = 1 if code > FREE else -1
+            self._row_busy[row] += step
+            self._col_busy[col] += step
+
+    def _recount(self):
+        status = self.status
+        bins = np.bincount(status.ravel(), minlength=OTHER + 1)
+        self._counts = [int(n) for n in bins[:OTHER + 1]]
+        rows, cols = self.rows, self.cols
+        self._row_spots[:rows] = np.count_nonzero(status, axis=1)
+        self._col_spots[:cols] = np.count_nonzero(status, axis=0)
+        busy = status > FREE
+        self._row_busy[:rows] = np.count_nonzero(busy, axis=1)
+        self._col_busy[:cols] = np.count_nonzero(busy, axis=0)
+
+    # Updates (called by ParkingLot)
+    def set_spot(self, row: int, col: int, status, distance: int = 0):
+        with self._lock:
+            self._ensure(row, col)
+            self._set_code(row, col, status_code(status))
+            self._distance[row, col] = distance
+
+    def set_status(self, row: int, col: int, status):
+        self._check(row, col)
+        with self._lock:
+            if row < self.rows and col < self.cols and self._status[row, col] != NO_SPOT:
+                self._set_code(row, col, status_code(status))
+
+    def remove_spot(self, row: int, col: int):
+        self._check(row, col)
+        with self._lock:
+            if row < self.rows and col < self.cols:
+                self._set_code(row, col, NO_SPOT)
+                self._distance[row, col] = -1
+
+    def load(self, cells):
+        """Bulk fill from (row, col, status, distance) tuples."""
+        cells = list(cells)
+        with self._lock:
+            if not cells:
+                return
+            rows = np.fromiter((c[0] for c in cells), dtype=np.int64, count=len(cells))
+            cols = np.fromiter((c[1] for c in cells), dtype=np.int64, count=len(cells))
+            self._check(int(rows.min()), int(cols.min()))
+            self._ensure(int(rows.max()), int(cols.max()))
+            self._status[rows, cols] = [status_code(c[2]) for c in cells]
+            self._distance[rows, cols] = [int(c[3] or 0) for c in cells]
+            self._recount()
+
+    # Whole-lot queries
+    def counts(self) -> typing.Dict[str, int]:
+        """{'FREE': n, 'WAITING': n, ...} (kept up to date, O(1))."""
+        counts = self._counts
+        return {STATUS_NAMES[code]: counts[code] for code in range(FREE, OTHER + 1)}
+
+    def spot_count(self) -> int:
+        return sum(self._counts[FREE:])
+
+    def free_count(self) -> int:
+        return self._counts[FREE]
+
+    def nearest(self, status, row: int, col: int) -> typing.Optional[typing.Tuple[int, int]]:
+        """(row, col) of the spot with this status closest to (row, col) by Manhattan distance.
+
+        Ties go to the first cell in row-major order. None if there is none.
+        Searches growing boxes around (row, col): a match at distance <= k
+        inside the box of radius k is the global nearest, so a busy lot with
+        free spots near the gate never scans the whole grid.
+        """
+        code = status_code(status)
+        with self._lock:
+            if not self._counts[code]:
+                return None
+            rows, cols = self.rows, self.cols
+            k = 8
+            while True:
+                r0, r1 = max(0, row - k), max(0, min(rows, row + k + 1))
+                c0, c1 = max(0, col - k), max(0, min(cols, col + k + 1))
+                whole = r0 == 0 and c0 == 0 and r1 == rows and c1 == cols
+                cells = np.flatnonzero(self._status[r0:r1, c0:c1] == code)
+                if cells.size:
+                    r, c = np.divmod(cells, c1 - c0)
+                    dist = np.abs(r + (r0 - row)) + np.abs(c + (c0 - col))
+                    best = int(np.argmin(dist))
+                    if whole or dist[best] <= k:
+                        return int(r[best]) + r0, int(c[best]) + c0
+                elif whole:
+                    return None
+                k *= 4
+
+    @staticmethod
+    def _shares(busy: np.ndarray, spots: np.ndarray) -> np.ndarray:
+        return np.divide(busy, spots, out=np.zeros(busy.shape, dtype=np.float64), where=spots > 0)
+
+    def row_occupancy(self) -> np.ndarray:
+        """Share of non-FREE spots in every row (0 for rows without spots)."""
+        return self._shares(self._row_busy[:self.rows], self._row_spots[:self.rows])
+
+    def col_occupancy(self) -> np.ndarray:
+        """Share of non-FREE spots in every column (0 for columns without spots)."""
+        return self._shares(self._col_busy[:self.cols], self._col_spots[:self.cols])
+
+    def heatmap(self, block: int = 1) -> np.ndarray:
+        """Share of non-FREE spots per block x block tile (NaN for tiles without spots)."""
+        grid = self.status
+        rows, cols = grid.shape
+        block = max(1, int(block))
+        th, tw = -(-rows // block), -(-cols // block)
+        padded = np.zeros((th * block, tw * block), dtype=np.uint8)
+        padded[:rows, :cols] = grid
+        # per-tile sums in two passes: block rows, then block columns
+        def tile_sums(mask):
+            strips = mask.reshape(th, block, tw * block).sum(axis=1, dtype=np.int32)
+            return strips.reshape(th, tw, block).sum(axis=2)
+        spots = tile_sums(padded != NO_SPOT)
+        busy = tile_sums(padded > FREE)
+        return np.divide(busy, spots, out=np.full(busy.shape, np.nan), where=spots > 0)
+
+    def summary(self, gate_row: int, gate_col: int) -> dict:
+        """JSON-ready analytics for a gate: counts, occupancy profiles, nearest FREE/WAITING."""
+        with self._lock:
+            counts = self.counts()
+            spots = sum(counts.values())
+            nearest_free = self.nearest('FREE', gate_row, gate_col)
+            nearest_waiting = self.nearest('WAITING', gate_row, gate_col)
+            return {
+                'rows': self.shape[0],
+                'cols': self.shape[1],
+                'spots': spots,
+                'counts': counts,
+                'free_count': counts['FREE'],
+                'occupancy': (spots - counts['FREE']) / spots if spots else 0.0,
+                'row_occupancy': np.round(self.row_occupancy(), 4).tolist(),
+                'col_occupancy': np.round(self.col_occupancy(), 4).tolist(),
+                'nearest_free': f"{nearest_free[0]},{nearest_free[1]}" if nearest_free else None,
+                'nearest_waiting': f"{nearest_waiting[0]},{nearest_waiting[1]}" if nearest_waiting else None,
+            }
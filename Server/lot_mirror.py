@@ -0,0 +1,331 @@
+# Live ParkingLot mirror - keeps an in-memory ParkingLot in sync with
+# /{ROOT_BRANCH}/SPOTS by applying RTDB stream events instead of re-reading
+# the whole SPOTS tree.
+
+import threading
+import time
+import typing
+import uuid
+from collections import Counter, deque
+import storage
+from constants import ROOT_BRANCH
+from data_structures import ParkingLot
+
+
+def _normalize_key(spot_id: str) -> str:
+    """'(r,c)' / ' r,c ' -> 'r,c' (the key format used by the UI and ParkingLot)."""
+    return str(spot_id).replace('(', '').replace(')', '').strip()
+
+
+def _node_status(node) -> str:
+    return str(node.get('status') or '').upper()
+
+
+def _listener_thread(stream) -> typing.Optional[threading.Thread]:
+    """The thread delivering a listener's events (rtdb_client stream or firebase_admin), if any."""
+    return getattr(stream, 'thread', None) or getattr(stream, '_thread', None)
+
+
+class ParkingLotMirror:
+    """Long-lived ParkingLot replica fed by SPOTS.listen() events.
+
+    The first stream event is a 'put' at '/' with the whole SPOTS node; after
+    that Firebase sends only what changed:
+
+    - put   '/'                 whole node replaced
+    - patch '/'                 {spot_id: node, ...} merged
+    - put   '/3,1'              one spot replaced (None deletes it)
+    - patch '/3,1'              fields of one spot merged
+    - put   '/3,1/status'       a single field (or deeper path) replaced
+
+    Every applied event bumps `version`, so readers can tell cheaply whether
+    anything changed. Steady-state reads (`parking_lot`, `snapshot()`) cost no
+    network round trips. The last CHANGELOG_SIZE versions remember which spots
+    they touched, so `changes_since()` can hand out deltas. Per-status counts
+    and the set of WAITING spots are kept up to date on every event, so
+    `free_count()` and `waiting_spots()` never scan the lot.
+
+    `epoch` is unique per mirror instance; (epoch, version) identifies a lot
+    state across mirror restarts (versions start over at 0). `grid` is the
+    lot's array-backed OccupancyGrid for vectorized whole-lot analytics.
+
+    A dropped stream comes back on its own: rtdb_client reconnects, and a
+    listener whose thread ends is replaced (`relistens`). Either way the new
+    initial 'put' at '/' rebuilds the lot.
+    """
+    CHANGELOG_SIZE = 4096
+    # seconds between checks that the listener is still running
+    WATCH_SECONDS = 1.0
+
+    def __init__(self, spots_path: str = f"/{ROOT_BRANCH}/SPOTS"):
+        self.spots_path = spots_path
+        self.parking_lot = ParkingLot()
+        self.parking_lot.live = True
+        self.grid = self.parking_lot.attach_occupancy_grid()
+        self._raw = {}  # 'row,col' -> node dict as stored in the RTDB
+        self._version = 0
+        self._changed = threading.Condition()
+        self._ready = threading.Event()
+        self._stream = None
+        self._stopped = threading.Event()
+        self.relistens = 0
+        # (version, keys touched by that version) for delta readers
+        self._changelog = deque(maxlen=self.CHANGELOG_SIZE)
+        self._touched = set()
+        # upper-cased status -> number of spots; keys of the WAITING spots
+        self._status_counts = Counter()
+        self._waiting = set()
+        self.epoch = uuid.uuid4().hex[:12]
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def ready(self) -> bool:
+        """True once the initial snapshot has been applied."""
+        return self._ready.is_set()
+
+    # Stream lifecycle
+    def start(self, timeout: float = 10.0):
+        """Attach the stream and wait (up to timeout seconds) for the initial snapshot."""
+        if self._stream is None:
+            self._stopped.clear()
+            self._stream = storage.reference(self.spots_path).listen(self._on_event)
+            if _listener_thread(self._stream) is not None:
+                threading.Thread(target=self._watch, name=f"mirror-watch{self.spots_path}", daemon=True).start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"no initial snapshot from {self.spots_path} after {timeout}s")
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def _watch(self):
+        """Listen again when the listener's thread ends (firebase_admin gives up on errors).
+
+        The new listener's initial 'put' at '/' rebuilds the lot.
+        """
+        delay = self.WATCH_SECONDS
+        while not self._stopped.wait(delay):
+            thread = _listener_thread(self._stream)
+            if thread is None or thread.is_alive():
+                delay = self.WATCH_SECONDS
+                continue
+            print(f"[MIRROR] Stream on {self.spots_path} ended; listening again")
+            try:
+                stream = storage.reference(self.spots_path).listen(self._on_event)
+            except Exception as e:
+                print(f"[MIRROR] Listening on {self.spots_path} failed: {e}")
+                delay = min(delay * 2, RETRY_AFTER_SECONDS)
+                continue
+            if self._stopped.is_set():
+                stream.close()
+                return
+            self._stream = stream
+            self.relistens += 1
+
+    def _on_event(self, event):
+        try:
+            self.apply_event(event.event_type, event.path, event.data)
+        except Exception as e:
+            print(f"[MIRROR] Failed to apply {event.event_type} {event.path}: {e}")
+
+    # Event application
+    def apply_event(self, event_type: str, path: str, data) -> int:
+        """Apply one stream event and return the new version."""
+        parts = [p for p in (path or '/').split('/') if p]
+        with self._changed:
+            if not parts:
+                if event_type == 'put':
+                    self._replace_all(data if isinstance(data, dict) else {})
+                else:
+                    for sid, node in (data or {}).items():
+                        self._put_spot(sid, node)
+            elif len(parts) == 1:
+                if event_type == 'put':
+                    self._put_spot(parts[0], data)
+                else:
+                    self._patch_spot(parts[0], data or {})
+            else:
+                self._put_field(parts[0], parts[1:], data, merge=(event_type == 'patch'))
+            self._version += 1
+            self._changelog.append((self._version, frozenset(self._touched)))
+            self._touched.clear()
+            self._ready.set()
+            self._changed.notify_all()
+            return self._version
+
+    def _replace_all(self, data: dict):
+        new_keys = {_normalize_key(sid) for sid in data}
+        for key in [k for k in self._raw if k not in new_keys]:
+            self._remove_spot(key)
+        # one bulk load rather than spot-by-spot applies (this is the whole lot)
+        malformed = self.parking_lot.load_snapshot(data)
+        for sid, node in data.items():
+            if sid not in malformed:
+                self._record(_normalize_key(sid), node)
+            elif node is None:
+                self._remove_spot(_normalize_key(sid))
+        skipped = [f"{sid!r} ({why})" for sid, why in malformed.items() if data[sid] is not None]
+        if skipped:
+            print(f"[MIRROR] Skipped {len(skipped)} malformed spot entries: {', '.join(skipped[:10])}")
+
+    def _put_spot(self, spot_id: str, node):
+        key = _normalize_key(spot_id)
+        if node is None:
+            self._remove_spot(key)
+            return
+        if not isinstance(node, dict):
+            return
+        try:
+            self.parking_lot.apply_spot_node(key, node)
+        except ValueError:
+            # malformed key (not 'row,col'); keep it out of the lot
+            return
+        self._record(key, node)
+
+    def _record(self, key: str, node: dict):
+        self._uncount(self._raw.get(key))
+        self._raw[key] = node
+        self._count(key, node)
+        self._touched.add(key)
+
+    def _patch_spot(self, spot_id: str, fields: dict):
+        key = _normalize_key(spot_id)
+        node = dict(self._raw.get(key) or {})
+        for name, value in fields.items():
+            if value is None:
+                node.pop(name, None)
+            else:
+                node[name] = value
+        self._put_spot(key, node)
+
+    def _put_field(self, spot_id: str, field_path, value, merge: bool = False):
+        key = _normalize_key(spot_id)
+        node = dict(self._raw.get(key) or {})
+        # copy-on-write down the nested path ('SpotIn/Arrievied' style fields)
+        parent = node
+        for name in field_path[:-1]:
+            child = parent.get(name)
+            child = dict(child) if isinstance(child, dict) else {}
+            parent[name] = child
+            parent = child
+        leaf = field_path[-1]
+        if merge and isinstance(value, dict):
+            current = parent.get(leaf)
+            merged = dict(current) if isinstance(current, dict) else {}
+            for name, v in value.items():
+                if v is None:
+                    merged.pop(name, None)
+                else:
+                    merged[name] = v
+            value = merged
+        if value is None:
+            parent.pop(leaf, None)
+        else:
+            parent[leaf] = value
+        self._put_spot(key, node)
+
+    def _remove_spot(self, key: str):
+        node = self._raw.pop(key, None)
+        if node is not None:
+            self._uncount(node)
+            self._waiting.discard(key)
+            self._touched.add(key)
+        self.parking_lot.remove_spot(key)
+
+    def _count(self, key: str, node: dict):
+        status = _node_status(node)
+        self._status_counts[status] += 1
+        if status == 'WAITING':
+            self._waiting.add(key)
+        else:
+            self._waiting.discard(key)
+
+    def _uncount(self, node):
+        if node is not None:
+            self._status_counts[_node_status(node)] -= 1
+
+    # Readers
+    def snapshot(self) -> dict:
+        """Shallow copy of the mirrored SPOTS node ('row,col' -> node dict)."""
+        with self._changed:
+            return dict(self._raw)
+
+    def versioned_snapshot(self) -> typing.Tuple[int, dict]:
+        """(version, snapshot()) read atomically."""
+        with self._changed:
+            return self._version, dict(self._raw)
+
+    def free_count(self) -> int:
+        """Number of spots whose status is FREE (O(1))."""
+        return self._status_counts['FREE']
+
+    def waiting_spots(self) -> dict:
+        """{spot_id: node} of the WAITING spots only."""
+        with self._changed:
+            return {k: self._raw[k] for k in self._waiting}
+
+    def changes_since(self, since_version: int) -> typing.Tuple[int, typing.Optional[dict]]:
+        """Return (version, {spot_id: node or None for deleted}) changed after since_version.
+
+        The dict is None when since_version is older than the changelog (or
+        from the future); the caller should then start over from snapshot().
+        """
+        with self._changed:
+            version = self._version
+            if since_version == version:
+                return version, {}
+            if since_version > version or not self._changelog or self._changelog[0][0] > since_version + 1:
+                return version, None
+            keys = set()
+            for v, touched in reversed(self._changelog):
+                if v <= since_version:
+                    break
+                keys |= touched
+            return version, {k: self._raw.get(k) for k in keys}
+
+    def wait_for_change(self, since_version: int, timeout: typing.Optional[float] = None) -> int:
+        """Block until version > since_version (or timeout); returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._version > since_version, timeout)
+            return self._version
+
+
+# Process-wide mirror shared by the dashboard and the simulator
+_shared = None
+_shared_lock = threading.Lock()
+_last_failure = None
+RETRY_AFTER_SECONDS = 30.0
+
+
+def get_shared_mirror(timeout: float = 10.0) -> typing.Optional[ParkingLotMirror]:
+    """Return the started process-wide mirror, or None if the stream can't be attached.
+
+    A failed attach is not retried for RETRY_AFTER_SECONDS so callers can
+    fall back to plain reads without paying the attach cost on every request.
+    """
+    global _shared, _last_failure
+    with _shared_lock:
+        if _shared is not None:
+            return _shared
+        if _last_failure is not None and time.time() - _last_failure < RETRY_AFTER_SECONDS:
+            return None
+        mirror = ParkingLotMirror()
+        try:
+            mirror.start(timeout)
+        except Exception as e:
+            mirror.stop()
+            _last_failure = time.time()
+            print(f"[MIRROR] Live mirror unavailable ({e}); falling back to full reads")
+            return None
+        _shared = mirror
+        print(f"[MIRROR] Live mirror attached to {mirror.spots_path} ({len(mirror.snapshot())} spots)")
+        return _shared
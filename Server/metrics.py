@@ -0,0 +1,306 @@
+# Hot-path metrics - counters and histograms for allocation, the gate BFS,
+# SortedList operations and snapshot loads/refreshes, plus the RTDB request
+# metrics rtdb_client keeps, rendered as Prometheus text (dashboard /metrics)
+# or JSON (simulator, METRICS_DUMP=<file>).
+#
+# Recording is off by default. enable() (or METRICS=1) wraps the hot-path
+# methods in timing wrappers and disable() puts the originals back, so a
+# disabled process runs exactly the uninstrumented code.
+
+import functools
+import json
+import os
+import threading
+import time
+import typing
+from collections import deque
+
+import rtdb_client
+
+# seconds; spans a SortedList op (~1 us) to a full snapshot load (~1 s)
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                   1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SAMPLES = 2048
+
+
+def _label_text(names, values, extra=''):
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: typing.Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def prometheus(self) -> typing.List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labels, key)} {value:g}" for key, value in values]
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [{'labels': dict(zip(self.labels, key)), 'value': value}
+                    for key, value in sorted(self._values.items())]
+
+
+class _Series:
+    __slots__ = ('buckets', 'count', 'total', 'samples')
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+
+
+class Histogram:
+    """Observations per label set: Prometheus buckets, sum and count, plus the
+    last SAMPLES values for exact p50/p99 in the JSON dump."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: typing.Sequence[str] = (),
+                 buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.bounds = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = _Series(len(self.bounds))
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    series.buckets[i] += 1
+                    break
+            series.count += 1
+            series.total += value
+            series.samples.append(value)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def quantile(self, q: float, *label_values) -> typing.Optional[float]:
+        with self._lock:
+            series = self._series.get(label_values)
+            ordered = sorted(series.samples) if series else []
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+    def prometheus(self) -> typing.List[str]:
+        lines = []
+        with self._lock:
+            series = sorted((key, list(s.buckets), s.count, s.total) for key, s in self._series.items())
+        for key, buckets, count, total in series:
+            running = 0
+            for bound, n in zip(self.bounds, buckets):
+                running += n
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {running}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labels, key, inf)} {count}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total:.9g}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+    def snapshot(self) -> list:
+        with self._lock:
+            series = sorted((key, s.count, s.total, sorted(s.samples)) for key, s in self._series.items())
+        out = []
+        for key, count, total, ordered in series:
+            def pick(q):
+                return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+            out.append({'labels': dict(zip(self.labels, key)), 'count': count, 'sum': total,
+                        'p50': pick(0.50), 'p99': pick(0.99), 'max': ordered[-1] if ordered else None})
+        return out
+
+
+REGISTRY = {}
+_registry_lock = threading.Lock()
+
+
+def _register(cls, name, help, labels, **kwargs):
+    with _registry_lock:
+        metric = REGISTRY.get(name)
+        if metric is None:
+            metric = REGISTRY[name] = cls(name, help, labels, **kwargs)
+        return metric
+
+
+def counter(name: str, help: str, labels: typing.Sequence[str] = ()) -> Counter:
+    return _register(Counter, name, help, labels)
+
+
+def histogram(name: str, help: str, labels: typing.Sequence[str] = (), **kwargs) -> Histogram:
+    return _register(Histogram, name, help, labels, **kwargs)
+
+
+ALLOCATION = histogram('parking_allocation_seconds', 'Time to pick and reserve the closest free spot', ['method'])
+FIND_CLOSEST = histogram('parking_find_closest_seconds', 'Time of ParkingLot.find_closest')
+BFS_RUNS = counter('parking_bfs_runs_total', 'Gate BFS walks (one per gate until the lot changes shape)')
+BFS_NODES = counter('parking_bfs_nodes_visited_total', 'Grid cells visited by the gate BFS')
+SORTED_LIST = histogram('sortedlist_op_seconds', 'Time of SortedList operations', ['op'])
+SNAPSHOT = histogram('parking_snapshot_seconds', 'Time to apply an RTDB SPOTS snapshot to a ParkingLot', ['op'])
+REFRESH_CHANGES = counter('parking_refresh_changed_spots_total', 'Spots a snapshot refresh found changed')
+
+
+# Hot paths: (class, method, wrapper factory)
+def _timed(hist, *labels, after=None):
+    def wrap(original):
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            result = original(*args, **kwargs)
+            hist.observe(time.perf_counter() - started, *labels)
+            if after is not None:
+                after(result)
+            return result
+        return timed
+    return wrap
+
+
+def _bfs_visit(ranks):
+    BFS_RUNS.inc()
+    BFS_NODES.inc(len(ranks))
+
+
+def _hot_paths():
+    from data_structures import ParkingLot, SortedList
+    paths = [
+        (ParkingLot, 'find_closest', _timed(FIND_CLOSEST)),
+        (ParkingLot, 'reserve_closest', _timed(ALLOCATION, 'reserve_closest')),
+        (ParkingLot, 'allocate_closest_spot', _timed(ALLOCATION, 'allocate_closest_spot')),
+        (ParkingLot, '_gate_order', _timed(histogram('parking_bfs_seconds', 'Time of one gate BFS walk'),
+                                           after=_bfs_visit)),
+        (ParkingLot, 'load_snapshot', _timed(SNAPSHOT, 'load')),
+        (ParkingLot, 'refresh_from_snapshot', _timed(SNAPSHOT, 'refresh',
+                                                     after=lambda changes: REFRESH_CHANGES.inc(len(changes)))),
+    ]
+    for op in ('add', 'update', 'remove', 'discard', 'pop', 'index', '__contains__'):
+        paths.append((SortedList, op, _timed(SORTED_LIST, op.strip('_'))))
+    return paths
+
+
+_originals = []
+_state_lock = threading.Lock()
+enabled = False
+
+
+def enable():
+    """Start recording: wrap the hot paths (idempotent)."""
+    global enabled
+    with _state_lock:
+        if enabled:
+            return
+        for owner, name, wrap in _hot_paths():
+            original = owner.__dict__[name]
+            _originals.append((owner, name, original))
+            setattr(owner, name, wrap(original))
+        enabled = True
+
+
+def disable():
+    """Stop recording and restore the original methods (recorded values are kept)."""
+    global enabled
+    with _state_lock:
+        while _originals:
+            owner, name, original = _originals.pop()
+            setattr(owner, name, original)
+        enabled = False
+
+
+def reset():
+    for metric in list(REGISTRY.values()):
+        metric.reset()
+    rtdb_client.stats.reset()
+
+
+def _rtdb_prometheus() -> typing.List[str]:
+    summary = rtdb_client.stats.summary()
+    out = {
+        'rtdb_requests_total': ('counter', 'RTDB round trips by calling module and operation', []),
+        'rtdb_request_errors_total': ('counter', 'RTDB requests that failed', []),
+        'rtdb_payload_bytes_sent_total': ('counter', 'RTDB request body bytes', []),
+        'rtdb_payload_bytes_received_total': ('counter', 'RTDB response body bytes', []),
+        'rtdb_new_connections_total': ('counter', 'Connections opened for RTDB requests', []),
+        'rtdb_request_seconds': ('summary', 'RTDB request latency (recent requests)', []),
+    }
+    for module, s in summary.items():
+        for op, n in sorted(s['ops'].items()):
+            labels = f'{{module="{module}",op="{op}"}}'
+            out['rtdb_requests_total'][2].append(f"rtdb_requests_total{labels} {n}")
+            out['rtdb_payload_bytes_sent_total'][2].append(
+                f"rtdb_payload_bytes_sent_total{labels} {s['bytes_sent'].get(op, 0)}")
+            out['rtdb_payload_bytes_received_total'][2].append(
+                f"rtdb_payload_bytes_received_total{labels} {s['bytes_received'].get(op, 0)}")
+        labels = f'module="{module}"'
+        out['rtdb_request_errors_total'][2].append(f"rtdb_request_errors_total{{{labels}}} {s['errors']}")
+        out['rtdb_new_connections_total'][2].append(f"rtdb_new_connections_total{{{labels}}} {s['new_connections']}")
+        for q, key in (('0.5', 'p50_ms'), ('0.9', 'p90_ms'), ('0.99', 'p99_ms')):
+            out['rtdb_request_seconds'][2].append(
+                f"rtdb_request_seconds{{{labels},quantile=\"{q}\"}} {s[key] / 1000:.6g}")
+        out['rtdb_request_seconds'][2].append(f"rtdb_request_seconds_sum{{{labels}}} {s['seconds']:.6g}")
+        out['rtdb_request_seconds'][2].append(f"rtdb_request_seconds_count{{{labels}}} {s['requests']}")
+    lines = []
+    for name, (kind, help, samples) in out.items():
+        if samples:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"] + samples
+    return lines
+
+
+def prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        samples = metric.prometheus()
+        if samples:
+            lines += [f"# HELP {name} {metric.help}", f"# TYPE {name} {metric.kind}"] + samples
+    lines += _rtdb_prometheus()
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot() -> dict:
+    """All metrics as plain data: hot-path series with count/sum/p50/p99/max, and rtdb_client's per-module stats."""
+    return {
+        'enabled': enabled,
+        'time': time.time(),
+        'metrics': {name: {'type': m.kind, 'help': m.help, 'series': m.snapshot()}
+                    for name, m in sorted(REGISTRY.items())},
+        'rtdb': rtdb_client.stats.summary(),
+    }
+
+
+def dump(path: str):
+    """Write snapshot() to path as JSON."""
+    with open(path, 'w') as f:
+        json.dump(snapshot(), f, indent=2)
+    print(f"[METRICS] Wrote {path}")
+
+
+if os.environ.get('METRICS', '0') == '1':
+    enable()
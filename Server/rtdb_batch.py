@@ -0,0 +1,265 @@
+# Write coalescing for the RTDB - turns the writes of a lifecycle transition
+# (and optionally of many transitions) into one root-level multi-path update().
+
+import atexit
+import os
+import threading
+import time
+import typing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import storage
+
+
+def _clean(path: str) -> str:
+    return '/'.join(p for p in str(path).split('/') if p)
+
+
+def _ancestors(path: str):
+    parts = path.split('/')
+    return ['/'.join(parts[:i]) for i in range(1, len(parts))]
+
+
+class WriteBatch:
+    """path -> value writes that go out as a single multi-path update().
+
+    A multi-path update may not contain both a path and one of its
+    descendants, so overlapping writes are folded in order:
+
+    - writing a path drops queued writes below it (they'd be overwritten)
+    - writing below a queued path merges into that path's value
+
+    Paths are relative to the database root ('SondosPark/SPOTS/3,1/status');
+    a value of None deletes the node.
+    """
+
+    def __init__(self):
+        self.updates = {}
+        # proper ancestors of the queued paths -> how many queued paths sit below them
+        self._prefixes = Counter()
+
+    def __len__(self):
+        return len(self.updates)
+
+    def __bool__(self):
+        return bool(self.updates)
+
+    def set(self, path: str, value):
+        """Replace the node at path (like ref.set / ref.delete for None)."""
+        self._put(_clean(path), value)
+        return self
+
+    def update(self, path: str, fields: dict):
+        """Replace the given children of path (like ref.update)."""
+        base = _clean(path)
+        for name, value in fields.items():
+            self._put(f"{base}/{_clean(name)}", value)
+        return self
+
+    def delete(self, path: str):
+        return self.set(path, None)
+
+    def merge(self, other: 'WriteBatch'):
+        """Append other's writes (later writes win)."""
+        for path, value in other.updates.items():
+            self._put(path, value)
+        return self
+
+    def _put(self, path: str, value):
+        if self._prefixes.get(path):
+            for key in [k for k in self.updates if k.startswith(path + '/')]:
+                self._drop(key)
+        ancestors = _ancestors(path)
+        for anc in ancestors:
+            if anc in self.updates:
+                self.updates[anc] = self._fold(self.updates[anc], path[len(anc) + 1:].split('/'), value)
+                return
+        if path not in self.updates:
+            for anc in ancestors:
+                self._prefixes[anc] += 1
+        self.updates[path] = value
+
+    def _drop(self, path: str):
+        del self.updates[path]
+        for anc in _ancestors(path):
+            self._prefixes[anc] -= 1
+            if not self._prefixes[anc]:
+                del self._prefixes[anc]
+
+    @staticmethod
+    def _fold(node, parts, value):
+        # copy-on-write down the path so values handed to set() are never mutated
+        root = dict(node) if isinstance(node, dict) else {}
+        parent = root
+        for name in parts[:-1]:
+            child = parent.get(name)
+            child = dict(child) if isinstance(child, dict) else {}
+            parent[name] = child
+            parent = child
+        if value is None:
+            parent.pop(parts[-1], None)
+        else:
+            parent[parts[-1]] = value
+        return root
+
+
+class BatchWriter:
+    """Sends WriteBatches to the RTDB as root-level update() calls.
+
+    With window=0 every commit() is one request. With a window (seconds) the
+    batches committed within it are merged and sent together by a timer, so
+    many cars' transitions cost one round trip; call flush() when the writes
+    must have landed (e.g. before reading them back).
+    """
+
+    def __init__(self, window: float = 0.0, root: str = '/'):
+        self.window = window
+        self.root = root
+        self.round_trips = 0
+        self.writes = 0
+        self._pending = WriteBatch()
+        self._timer = None
+        self._lock = threading.Lock()
+        # serializes sends so merged batches land in commit order
+        self._send_lock = threading.Lock()
+
+    def commit(self, batch: WriteBatch):
+        if not batch:
+            return
+        if self.window <= 0:
+            with self._send_lock:
+                self._send(batch)
+            return
+        with self._lock:
+            self._pending.merge(batch)
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush_quietly)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Send whatever is pending now (raises if the update fails)."""
+        with self._send_lock:
+            with self._lock:
+                batch, self._pending = self._pending, WriteBatch()
+                timer, self._timer = self._timer, None
+            if timer is not None:
+                timer.cancel()
+            if batch:
+                self._send(batch)
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[BATCH] Failed to flush batched writes: {e}")
+
+    def _send(self, batch: WriteBatch):
+        storage.reference(self.root).update(batch.updates)
+        self.round_trips += 1
+        self.writes += len(batch)
+
+
+# Bulk writes (reset/restore of whole subtrees): paths per update() and
+# how many update() requests may be in flight at once
+BULK_CHUNK_SIZE = 500
+BULK_WORKERS = 4
+
+
+def write_chunked(updates: dict, root: str = '/', chunk_size: typing.Optional[int] = None,
+                  workers: typing.Optional[int] = None, retries: int = 3) -> int:
+    """Send a large multi-path update as chunk_size-path update() calls, up to workers at a time.
+
+    updates must be free of overlapping paths (e.g. WriteBatch.updates), so
+    the chunks are independent and may land in any order. Each chunk is
+    retried up to `retries` times. Returns the number of chunks that failed.
+    chunk_size/workers default to BULK_CHUNK_SIZE/BULK_WORKERS.
+    """
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    items = list(updates.items())
+    chunks = (dict(items[i:i + chunk_size]) for i in range(0, len(items), chunk_size))
+    return len(write_chunks(chunks, root, workers, retries))
+
+
+def _send_chunk(root: str, chunk: dict, retries: int) -> bool:
+    for attempt in range(retries):
+        try:
+            storage.reference(root).update(chunk)
+            return True
+        except Exception as e:
+            print(f"[BATCH] Update of {len(chunk)} paths failed (attempt {attempt+1}): {e}")
+            time.sleep(0.2 * (attempt + 1))
+    return False
+
+
+def write_chunks(chunks: typing.Iterable[dict], root: str = '/', workers: typing.Optional[int] = None,
+                 retries: int = 3, done: typing.Optional[typing.Callable[[int, dict], None]] = None) -> typing.List[int]:
+    """Send each chunk (a multi-path update) as one update() call, up to workers at a time.
+
+    chunks may be a generator: at most 2 * workers chunks are held at once,
+    so the full payload is never built in memory. done(index, chunk) is
+    called (from the sending thread) after each chunk lands. Returns the
+    indexes of the chunks that failed after `retries` attempts.
+    """
+    workers = workers or BULK_WORKERS
+    failed = []
+    if workers <= 1:
+        for i, chunk in enumerate(chunks):
+            if not _send_chunk(root, chunk, retries):
+                failed.append(i)
+            elif done is not None:
+                done(i, chunk)
+        return failed
+
+    def send(i, chunk):
+        ok = _send_chunk(root, chunk, retries)
+        if ok and done is not None:
+            done(i, chunk)
+        return ok
+
+    with ThreadPoolExecutor(workers) as pool:
+        pending = {}
+        for i, chunk in enumerate(chunks):
+            if len(pending) >= 2 * workers:
+                oldest = min(pending)
+                if not pending.pop(oldest).result():
+                    failed.append(oldest)
+            pending[i] = pool.submit(send, i, chunk)
+        for i in sorted(pending):
+            if not pending[i].result():
+                failed.append(i)
+    return sorted(failed)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> BatchWriter:
+    """Process-wide writer; RTDB_BATCH_WINDOW_MS (default 0) sets its micro-batch window."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BatchWriter(float(os.environ.get('RTDB_BATCH_WINDOW_MS', '0')) / 1000.0)
+        return _writer
+
+
+def set_batch_window(seconds: float) -> BatchWriter:
+    """Change the shared writer's micro-batch window (pending writes are flushed first)."""
+    writer = get_writer()
+    writer.flush()
+    writer.window = seconds
+    return writer
+
+
+def commit(batch: WriteBatch):
+    get_writer().commit(batch)
+
+
+def flush():
+    if _writer is not None:
+        _writer.flush()
+
+
+# don't lose a pending micro-batch when the simulator exits
+atexit.register(lambda: _writer is not None and _writer._flush_quietly())
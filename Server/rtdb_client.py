@@ -0,0 +1,452 @@
+# Shared RTDB REST client - one pooled keep-alive HTTP session for database
+# traffic, a process-wide concurrency limit, and request metrics per calling
+# module (count, latency percentiles, connection reuse).
+#
+# storage.RestStorage (STORAGE_BACKEND=rest) sends everything through
+# RtdbClient; storage.FirebaseStorage keeps firebase_admin but shares the
+# limit and the metrics, and gets the same counting pool on its session.
+#
+#   RTDB_POOL_SIZE        keep-alive connections kept per host (16)
+#   RTDB_MAX_CONCURRENCY  requests in flight at once, all threads (8)
+#   RTDB_TIMEOUT          seconds per request (30)
+#   RTDB_STATS=1          print the metrics table at exit
+#
+# requests is only imported when the first session is built, so importing
+# this module (and storage) stays cheap.
+
+import atexit
+import calendar
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import typing
+from collections import Counter, deque
+from urllib.parse import quote
+
+POOL_SIZE = int(os.environ.get('RTDB_POOL_SIZE', '16'))
+MAX_CONCURRENCY = int(os.environ.get('RTDB_MAX_CONCURRENCY', '8'))
+TIMEOUT = float(os.environ.get('RTDB_TIMEOUT', '30'))
+# seconds before a dropped stream reconnects; doubles per failed attempt
+STREAM_BACKOFF_MIN = 0.5
+STREAM_BACKOFF_MAX = 30.0
+LATENCY_SAMPLES = 4096
+
+# frames in these modules are plumbing; the first frame outside is the caller
+_PLUMBING = {__name__, 'storage'}
+
+# connections opened / payload bytes moved by the current thread's request
+# (see _pool_classes and _adapter_class)
+_opened = threading.local()
+
+
+class RtdbError(Exception):
+    """A request the RTDB answered with an error status."""
+
+    def __init__(self, method: str, path: str, status: int, detail: str = ''):
+        super().__init__(f"RTDB {method} {path} failed: {status} {detail}".rstrip())
+        self.status = status
+
+
+@functools.lru_cache(maxsize=None)
+def _pool_classes():
+    """urllib3 pool classes that count the connections they open."""
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def counting(base):
+        class Pool(base):
+            def _new_conn(self):
+                _opened.count = getattr(_opened, 'count', 0) + 1
+                return super()._new_conn()
+        Pool.__name__ = f"Counting{base.__name__}"
+        return Pool
+    return {'http': counting(HTTPConnectionPool), 'https': counting(HTTPSConnectionPool)}
+
+
+@functools.lru_cache(maxsize=None)
+def _adapter_class():
+    """HTTPAdapter on the counting pools that also counts request / response payload bytes."""
+    from requests.adapters import HTTPAdapter
+
+    class MeteredAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = _pool_classes()
+
+        def send(self, request, **kwargs):
+            body = request.body
+            _opened.sent = getattr(_opened, 'sent', 0) + (len(body) if body else 0)
+            resp = super().send(request, **kwargs)
+            if not kwargs.get('stream'):
+                # requests reads the body right after send() anyway
+                _opened.received = getattr(_opened, 'received', 0) + len(resp.content)
+            return resp
+    return MeteredAdapter
+
+
+def pooled_adapter(pool_size: typing.Optional[int] = None, max_retries=0):
+    """HTTPAdapter keeping pool_size keep-alive connections per host, metered for ClientStats."""
+    size = pool_size or POOL_SIZE
+    return _adapter_class()(pool_connections=4, pool_maxsize=size, max_retries=max_retries)
+
+
+def mount_pooled(session, pool_size: typing.Optional[int] = None) -> bool:
+    """Give an existing requests session (e.g. firebase_admin's) the counting pool, once."""
+    import requests
+    if not isinstance(session, requests.Session) or getattr(session, '_rtdb_pooled', False):
+        return False
+    for prefix in ('https://', 'http://'):
+        retries = getattr(session.adapters.get(prefix), 'max_retries', 0)
+        session.mount(prefix, pooled_adapter(pool_size, max_retries=retries))
+    session._rtdb_pooled = True
+    return True
+
+
+def caller_module() -> str:
+    """__name__ of the innermost frame outside storage / rtdb_client."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_globals.get('__name__', '?')
+        if name not in _PLUMBING:
+            return name
+        frame = frame.f_back
+    return '?'
+
+
+class _ModuleStats:
+    __slots__ = ('requests', 'errors', 'new_connections', 'seconds', 'ops', 'sent', 'received', 'latencies')
+
+    def __init__(self, samples):
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.seconds = 0.0
+        self.ops = Counter()
+        self.sent = Counter()
+        self.received = Counter()
+        self.latencies = deque(maxlen=samples)
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class ClientStats:
+    """Request count, latency percentiles and connection reuse per calling module.
+
+    Latency percentiles cover the last `samples` requests of each module;
+    reuse_ratio is the share of requests that did not open a new connection.
+    Payload bytes (request and response bodies) are kept per operation.
+    """
+
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._modules = {}
+
+    def record(self, module: str, op: str, seconds: float, new_connections: int = 0, ok: bool = True,
+               sent: int = 0, received: int = 0):
+        with self._lock:
+            stats = self._modules.get(module)
+            if stats is None:
+                stats = self._modules[module] = _ModuleStats(self.samples)
+            stats.requests += 1
+            stats.errors += not ok
+            stats.new_connections += new_connections
+            stats.seconds += seconds
+            stats.ops[op] += 1
+            stats.sent[op] += sent
+            stats.received[op] += received
+            stats.latencies.append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._modules.clear()
+
+    def summary(self) -> dict:
+        """{module: {requests, errors, seconds, ops, bytes_sent, bytes_received,
+        p50_ms, p90_ms, p99_ms, max_ms, new_connections, reuse_ratio}}; ops and bytes are per operation."""
+        with self._lock:
+            modules = {name: (s.requests, s.errors, s.new_connections, s.seconds, dict(s.ops),
+                              dict(s.sent), dict(s.received), sorted(s.latencies))
+                       for name, s in self._modules.items()}
+        out = {}
+        for name, (requests, errors, opened, seconds, ops, sent, received, ordered) in sorted(modules.items()):
+            out[name] = {
+                'requests': requests,
+                'errors': errors,
+                'seconds': seconds,
+                'ops': ops,
+                'bytes_sent': sent,
+                'bytes_received': received,
+                'p50_ms': _percentile(ordered, 0.50) * 1000,
+                'p90_ms': _percentile(ordered, 0.90) * 1000,
+                'p99_ms': _percentile(ordered, 0.99) * 1000,
+                'max_ms': (ordered[-1] if ordered else 0.0) * 1000,
+                'new_connections': opened,
+                'reuse_ratio': max(0.0, 1 - opened / requests) if requests else 0.0,
+            }
+        return out
+
+    def report(self) -> str:
+        lines = [f"{'module':<22}{'requests':>9}{'errors':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'reuse':>8}"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:<22}{s['requests']:>9}{s['errors']:>7}{s['p50_ms']:>7.1f}ms"
+                         f"{s['p90_ms']:>7.1f}ms{s['p99_ms']:>7.1f}ms{s['reuse_ratio']:>8.0%}")
+        return '\n'.join(lines)
+
+
+stats = ClientStats()
+_limit = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+
+def set_concurrency(limit: int):
+    """Allow `limit` requests in flight at once (requests already waiting keep the old limit)."""
+    global _limit, MAX_CONCURRENCY
+    if limit < 1:
+        raise ValueError('concurrency limit must be at least 1')
+    MAX_CONCURRENCY = limit
+    _limit = threading.BoundedSemaphore(limit)
+
+
+class Request:
+    """with Request('get'): ... - one metered request under the concurrency limit.
+
+    The latency excludes the time spent waiting for a slot.
+    """
+
+    __slots__ = ('op', 'module', '_limit', '_started')
+
+    def __init__(self, op: str, module: typing.Optional[str] = None):
+        self.op = op
+        self.module = module
+
+    def __enter__(self):
+        if self.module is None:
+            self.module = caller_module()
+        self._limit = _limit
+        self._limit.acquire()
+        _opened.count = _opened.sent = _opened.received = 0
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        self._limit.release()
+        stats.record(self.module, self.op, elapsed, _opened.count, ok=exc_type is None,
+                     sent=_opened.sent, received=_opened.received)
+        return False
+
+
+def report_at_exit():
+    """Print the metrics table when the process exits if RTDB_STATS=1 (registered once)."""
+    if os.environ.get('RTDB_STATS') == '1' and not getattr(report_at_exit, 'registered', False):
+        report_at_exit.registered = True
+        atexit.register(lambda: print("[RTDB] Request metrics\n" + stats.report()))
+
+
+class AccessToken:
+    """OAuth2 token source for REST calls from a firebase_admin credential, refreshed before expiry."""
+
+    def __init__(self, credential):
+        self._credential = credential
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires = 0.0
+
+    def __call__(self) -> str:
+        with self._lock:
+            if self._token is None or time.time() > self._expires - 60:
+                info = self._credential.get_access_token()
+                self._token = info.access_token
+                expiry = getattr(info, 'expiry', None)
+                self._expires = calendar.timegm(expiry.utctimetuple()) if expiry else time.time() + 300
+            return self._token
+
+    def expire(self):
+        """Fetch a new token on the next call (the server revoked the current one)."""
+        with self._lock:
+            self._token = None
+
+
+def _lines(raw):
+    """Lines of a streaming urllib3 response as soon as they arrive (iter_lines waits for full chunks)."""
+    read = getattr(raw, 'read1', None) or (lambda amt: raw.read(1))
+    pending = b''
+    while True:
+        chunk = read(65536)
+        if not chunk:
+            return
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.rstrip(b'\r').decode()
+
+
+class _Stream:
+    """A streaming GET delivering server-sent events to callback on its own thread.
+
+    A dropped connection, a server 'cancel' or 'auth_revoked', or an error
+    reconnects after a backoff (STREAM_BACKOFF_MIN doubling up to
+    STREAM_BACKOFF_MAX) with a fresh access token; the server then sends a new
+    initial 'put' at '/', so callbacks rebuild their state from it.
+    """
+
+    def __init__(self, client, path, callback):
+        self._client = client
+        self._path = path
+        self._callback = callback
+        self._closed = threading.Event()
+        self.connected = threading.Event()
+        self.reconnects = 0
+        self._response = None
+        self.thread = threading.Thread(target=self._run, name=f"rtdb-stream{path}", daemon=True)
+
+    def _run(self):
+        import requests
+        delay = STREAM_BACKOFF_MIN
+        # a long-lived stream would pin a pooled connection; it gets its own session
+        with requests.Session() as session:
+            while not self._closed.is_set():
+                started = time.monotonic()
+                try:
+                    reason = self._listen(session)
+                except Exception as e:
+                    reason = f"failed: {e}"
+                finally:
+                    self.connected.set()
+                if self._closed.is_set():
+                    return
+                if reason == 'auth_revoked':
+                    expire = getattr(self._client.auth, 'expire', None)
+                    if expire is not None:
+                        expire()
+                if time.monotonic() - started > STREAM_BACKOFF_MAX:
+                    # it was up for a while: a one-off drop, not a server refusing us
+                    delay = STREAM_BACKOFF_MIN
+                print(f"[RTDB] Stream on {self._path} {reason}; reconnecting in {delay:.1f}s")
+                self._response = None
+                if self._closed.wait(delay):
+                    return
+                delay = min(delay * 2, STREAM_BACKOFF_MAX)
+                self.reconnects += 1
+
+    def _listen(self, session) -> str:
+        """Deliver events from one connection; returns why it ended."""
+        resp = session.get(self._client.url(self._path), params=self._client.params(),
+                           headers={'Accept': 'text/event-stream'}, stream=True,
+                           timeout=(self._client.timeout, None))
+        self._response = resp
+        self.connected.set()
+        if resp.status_code != 200:
+            raise RtdbError('GET', self._path, resp.status_code, resp.text[:200])
+        event = None
+        for line in _lines(resp.raw):
+            if self._closed.is_set():
+                break
+            if line.startswith('event:'):
+                event = line[6:].strip()
+            elif line.startswith('data:') and event in ('put', 'patch'):
+                message = json.loads(line[5:])
+                self._callback(event, message['path'], message['data'])
+            elif event in ('cancel', 'auth_revoked'):
+                return event
+        return 'closed by the server'
+
+    def close(self):
+        self._closed.set()
+        if self._response is not None:
+            self._response.close()
+
+
+class RtdbClient:
+    """The RTDB REST API over one pooled keep-alive session.
+
+    base_url is the database URL; auth is None (emulator, rtdb_standin) or a
+    callable returning an OAuth2 access token (AccessToken).
+    """
+
+    def __init__(self, base_url: str, auth: typing.Optional[typing.Callable[[], str]] = None,
+                 pool_size: typing.Optional[int] = None, timeout: typing.Optional[float] = None):
+        self.base_url = base_url.rstrip('/')
+        self.auth = auth
+        self.pool_size = pool_size or POOL_SIZE
+        self.timeout = timeout or TIMEOUT
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    session = requests.Session()
+                    session.headers['Content-Type'] = 'application/json'
+                    mount_pooled(session, self.pool_size)
+                    self._session = session
+        return self._session
+
+    def url(self, path: str) -> str:
+        parts = [quote(p, safe=',()-_') for p in str(path).split('/') if p]
+        return f"{self.base_url}/{'/'.join(parts)}.json"
+
+    def params(self, **extra) -> dict:
+        if self.auth is not None:
+            extra['access_token'] = self.auth()
+        return extra
+
+    def _call(self, method, op, path, body=None, **params):
+        with Request(op):
+            data = None if body is None else json.dumps(body, separators=(',', ':'))
+            resp = self.session.request(method, self.url(path), params=self.params(**params),
+                                        data=data, timeout=self.timeout)
+            if resp.status_code >= 400:
+                raise RtdbError(method, path, resp.status_code, resp.text[:200])
+            return resp.json() if resp.content else None
+
+    def get(self, path: str, shallow: bool = False):
+        if shallow:
+            return self._call('GET', 'get', path, shallow='true')
+        return self._call('GET', 'get', path)
+
+    def set(self, path: str, value):
+        self._call('PUT', 'set', path, value, print='silent')
+
+    def update(self, path: str, value: dict):
+        self._call('PATCH', 'update', path, value, print='silent')
+
+    def delete(self, path: str):
+        self._call('DELETE', 'delete', path, print='silent')
+
+    def stream(self, path: str, callback) -> _Stream:
+        """callback(event_type, path, data) for every 'put'/'patch' below path; close() stops.
+
+        Returns once the stream is open, so writes made afterwards are seen.
+        """
+        stream = _Stream(self, path, callback)
+        stream.thread.start()
+        stream.connected.wait(self.timeout)
+        return stream
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+def from_env() -> RtdbClient:
+    """Client for the configured database: URL and credentials via firebase_init.
+
+    RTDB_AUTH=none skips credentials and takes the URL from RTDB_URL, for the
+    emulator or rtdb_standin.
+    """
+    if os.environ.get('RTDB_AUTH', '').lower() == 'none':
+        url = os.environ.get('RTDB_URL') or os.environ.get('FIREBASE_DATABASE_URL')
+        if not url:
+            raise RuntimeError('RTDB_AUTH=none needs RTDB_URL (e.g. http://127.0.0.1:9000 for rtdb_standin)')
+        return RtdbClient(url)
+    import firebase_init
+    app = firebase_init.init()
+    return RtdbClient(firebase_init.database_url, auth=AccessToken(app.credential))
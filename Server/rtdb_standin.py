@@ -0,0 +1,203 @@
+# Local stand-in for the RTDB REST API, backed by a storage.MemoryStorage:
+# GET/PUT/PATCH/DELETE on /<path>.json, ?shallow=true, ?print=silent, and
+# text/event-stream listeners. HTTP/1.1 with keep-alive, like the real API,
+# so RestStorage's connection pooling can be tested and benchmarked locally.
+#
+#   python rtdb_standin.py --port 9000
+#   STORAGE_BACKEND=rest RTDB_AUTH=none RTDB_URL=http://127.0.0.1:9000 python simulation_sondos.py
+
+import argparse
+import json
+import queue
+import threading
+import time
+import typing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import storage
+
+KEEPALIVE_SECONDS = 30
+
+
+class _Drop(typing.NamedTuple):
+    """Queued to an open stream to end it, after sending event_type if given."""
+    event_type: typing.Optional[str] = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out as separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.counter_lock:
+            self.server.connections += 1
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _target(self):
+        url = urlsplit(self.path)
+        if not url.path.endswith('.json'):
+            return None, {}
+        path = unquote(url.path[:-len('.json')]) or '/'
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        with self.server.counter_lock:
+            self.server.requests += 1
+        return path, params
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def _reply(self, status, value=None, silent=False):
+        body = b'' if silent else json.dumps(value, separators=(',', ':')).encode()
+        self.send_response(204 if silent and status == 200 else status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        path, params = self._target()
+        if path is None:
+            return self._reply(404, {'error': 'paths end in .json'})
+        db = self.server.storage
+        silent = params.get('print') == 'silent'
+        try:
+            if method == 'GET':
+                if 'text/event-stream' in self.headers.get('Accept', ''):
+                    return self._stream(path)
+                return self._reply(200, db.get(path, shallow=params.get('shallow') == 'true'))
+            if method == 'DELETE':
+                db.delete(path)
+                return self._reply(200, None, silent)
+            value = self._body()
+            if method == 'PUT':
+                db.set(path, value)
+            else:
+                db.update(path, value)
+            return self._reply(200, value, silent)
+        except ValueError as e:
+            return self._reply(400, {'error': str(e)})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _stream(self, path):
+        events = queue.Queue()
+        listener = self.server.storage.listen(path, events.put)
+        with self.server.counter_lock:
+            self.server.streams.add(events)
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        idle_since = time.monotonic()
+        try:
+            while not self.server.stopping.is_set():
+                try:
+                    event = events.get(timeout=0.25)
+                except queue.Empty:
+                    if time.monotonic() - idle_since < self.server.keepalive:
+                        continue
+                    chunk = 'event: keep-alive\ndata: null\n\n'
+                else:
+                    if isinstance(event, _Drop):
+                        if event.event_type:
+                            self.wfile.write(f"event: {event.event_type}\ndata: null\n\n".encode())
+                            self.wfile.flush()
+                        break
+                    data = json.dumps({'path': event.path, 'data': event.data}, separators=(',', ':'))
+                    chunk = f"event: {event.event_type}\ndata: {data}\n\n"
+                self.wfile.write(chunk.encode())
+                self.wfile.flush()
+                idle_since = time.monotonic()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.server.counter_lock:
+                self.server.streams.discard(events)
+            listener.close()
+
+
+class StandinServer(ThreadingHTTPServer):
+    """HTTP server for a MemoryStorage; `connections` / `requests` count what it has served."""
+
+    daemon_threads = True
+
+    def __init__(self, address, backend: typing.Optional[storage.MemoryStorage] = None,
+                 keepalive: float = KEEPALIVE_SECONDS):
+        super().__init__(address, _Handler)
+        self.storage = backend if backend is not None else storage.MemoryStorage()
+        self.keepalive = keepalive
+        self.stopping = threading.Event()
+        self.counter_lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.streams = set()  # event queues of the open streams
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def drop_streams(self, event_type: typing.Optional[str] = None) -> int:
+        """End every open stream, e.g. with 'auth_revoked' or 'cancel' first; returns how many."""
+        with self.counter_lock:
+            streams = list(self.streams)
+        for events in streams:
+            events.put(_Drop(event_type))
+        return len(streams)
+
+    def stop(self):
+        self.stopping.set()
+        self.shutdown()
+        self.server_close()
+
+
+def serve(backend: typing.Optional[storage.MemoryStorage] = None, host: str = '127.0.0.1', port: int = 0,
+          keepalive: float = KEEPALIVE_SECONDS) -> StandinServer:
+    """Start a stand-in on a background thread (port 0: any free port); stop() shuts it down."""
+    server = StandinServer((host, port), backend, keepalive=keepalive)
+    threading.Thread(target=server.serve_forever, name='rtdb-standin', daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Local stand-in for the RTDB REST API')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=9000)
+    ap.add_argument('--load', help='JSON file to start the database from')
+    ap.add_argument('--latency-ms', type=float, default=0.0, help='delay added to every request')
+    args = ap.parse_args()
+    data = None
+    if args.load:
+        with open(args.load) as f:
+            data = json.load(f)
+    backend = storage.MemoryStorage(data, latency=args.latency_ms / 1000)
+    server = StandinServer((args.host, args.port), backend)
+    print(f"[STANDIN] RTDB REST stand-in on {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stopping.set()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+# Discrete-event simulation engine - runs the simulator's arrivals, parks,
+# departures and wrong-parks as timestamped events on a virtual clock instead
+# of time.sleep() loops, so days of lot traffic cost only the CPU time of the
+# transitions themselves.
+
+import heapq
+import itertools
+import os
+import random
+import time
+import typing
+from collections import Counter
+from data_structures import ParkingLot
+from event_generator import SENSOR_SPOTS, simulate_car_arrival, simulate_car_parked, simulate_car_departure
+from traffic import TrafficModel
+
+
+class SimEngine:
+    """Priority queue of timestamped events run in time order on a virtual clock.
+
+    Events are (time, seq, kind, handler, args); seq keeps events scheduled
+    for the same moment in scheduling order. run() jumps `now` straight to the
+    next event, so idle time is free. With realtime=True every event waits for
+    its wall-clock moment instead, at `speed` virtual seconds per real second
+    (demo mode). `processed` counts the handled events by kind.
+    """
+
+    def __init__(self, start: float = 0.0, realtime: bool = False, speed: float = 1.0):
+        self.now = start
+        self.realtime = realtime
+        self.speed = speed
+        self.processed = Counter()
+        self._queue = []
+        self._seq = itertools.count()
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._queue)
+
+    def schedule(self, delay: float, kind: str, handler: typing.Callable, *args):
+        """Run handler(*args) delay virtual seconds from now."""
+        self.schedule_at(self.now + max(0.0, delay), kind, handler, *args)
+
+    def schedule_at(self, at: float, kind: str, handler: typing.Callable, *args):
+        heapq.heappush(self._queue, (at, next(self._seq), kind, handler, args))
+
+    def stop(self):
+        """Make run() return after the current event."""
+        self._stopped = True
+
+    def run(self, until: typing.Optional[float] = None, max_events: typing.Optional[int] = None) -> int:
+        """Process events up to virtual time until (None: until the queue drains).
+
+        A failing handler is reported and counted as '<kind>_failed'; the run
+        goes on. Returns the number of events processed.
+        """
+        self._stopped = False
+        queue = self._queue
+        wall_start, virtual_start = time.monotonic(), self.now
+        done = 0
+        while queue and not self._stopped:
+            if until is not None and queue[0][0] > until:
+                break
+            if max_events is not None and done >= max_events:
+                break
+            at, _, kind, handler, args = heapq.heappop(queue)
+            if self.realtime:
+                delay = wall_start + (at - virtual_start) / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.now = at
+            try:
+                handler(*args)
+                self.processed[kind] += 1
+            except Exception as e:
+                self.processed[f"{kind}_failed"] += 1
+                print(f"[SIM] {kind} event at t={at:.1f}s failed: {e}")
+            done += 1
+        if until is not None and not self._stopped and (not queue or queue[0][0] > until):
+            # nothing left before until: the clock still advances to it
+            self.now = max(self.now, until)
+        return done
+
+
+class ParkingSimulation:
+    """simulate_continuous_arrivals' traffic as events on a SimEngine.
+
+    - arrival every arrival_interval s, or at the times of the `arrivals`
+      stream (seconds from the start, consumed lazily): simulate_car_arrival,
+      or counted as 'rejected' while the lot has no free spot
+    - park wait_between s after the arrival: simulate_car_parked
+    - departure: with dwell, each car leaves dwell(rng) s after parking
+      (a car on the sensor spot 0,0 stays and is counted as
+      'sensor_spot_skipped'); otherwise a random car leaves every
+      depart_interval s (every depart_when_full s while the lot is full),
+      as in the wall-clock loop
+    - wrong park every wrong_park_interval s (0 disables): the three
+      simulation_sondos.wrong_park_* steps, 1 s apart
+
+    Intervals left as None come from the simulator's env vars
+    (ARRIVAL_INTERVAL_SECONDS, WAIT_SECONDS, DEPART_INTERVAL_SECONDS,
+    DEPART_WHEN_FULL_SECONDS, WRONG_PARK_SECONDS). A traffic.TrafficModel
+    supplies the arrival stream, the dwell distribution and its seeded RNG in
+    one go. Every transition writes to storage exactly as the wall-clock
+    simulator does.
+    """
+
+    def __init__(self, parking_lot: ParkingLot, engine: typing.Optional[SimEngine] = None,
+                 arrival_interval: typing.Optional[float] = None, wait_between: typing.Optional[float] = None,
+                 depart_interval: typing.Optional[float] = None, depart_when_full: typing.Optional[float] = None,
+                 wrong_park_interval: typing.Optional[float] = None,
+                 dwell: typing.Optional[typing.Callable[[random.Random], float]] = None,
+                 rng: typing.Optional[random.Random] = None,
+                 arrivals: typing.Optional[typing.Iterable[float]] = None,
+                 traffic: typing.Optional[TrafficModel] = None):
+        def env(value, name, default):
+            return float(os.environ.get(name, default)) if value is None else float(value)
+
+        if traffic is not None:
+            arrivals = traffic.arrival_times() if arrivals is None else arrivals
+            dwell = traffic.dwell if dwell is None else dwell
+            rng = rng or traffic.rng('dwell')
+
+        self.parking_lot = parking_lot
+        self.engine = engine if engine is not None else SimEngine()
+        self.arrival_interval = env(arrival_interval, 'ARRIVAL_INTERVAL_SECONDS', '5')
+        self.wait_between = env(wait_between, 'WAIT_SECONDS', '1')
+        self.depart_interval = env(depart_interval, 'DEPART_INTERVAL_SECONDS', '30')
+        self.depart_when_full = env(depart_when_full, 'DEPART_WHEN_FULL_SECONDS', '10')
+        self.wrong_park_interval = env(wrong_park_interval, 'WRONG_PARK_SECONDS', '45')
+        self.dwell = dwell
+        self.rng = rng or random.Random()
+        self._arrivals = iter(arrivals) if arrivals is not None else None
+        self._origin = 0.0
+        self.stats = Counter()
+        self.created_plates = []
+        self._started = False
+
+    def start(self):
+        """Schedule the recurring arrival / departure / wrong-park events (once)."""
+        if self._started:
+            return
+        self._started = True
+        engine = self.engine
+        self._origin = engine.now
+        if self._arrivals is not None:
+            self._schedule_next_arrival()
+        else:
+            engine.schedule(0.0, 'arrival', self._arrival)
+        if self.dwell is None:
+            engine.schedule(self.depart_interval, 'departure', self._periodic_departure)
+        if self.wrong_park_interval > 0:
+            engine.schedule(self.wrong_park_interval, 'wrong_park', self._wrong_park)
+
+    def run(self, duration: typing.Optional[float] = None) -> Counter:
+        """Run duration virtual seconds from now (None: until engine.stop()); returns stats."""
+        self.start()
+        self.engine.run(until=None if duration is None else self.engine.now + duration)
+        return self.stats
+
+    def _lot_full(self) -> bool:
+        return len(getattr(self.parking_lot, 'free_spots', ()) or ()) == 0
+
+    def _schedule_next_arrival(self):
+        at = next(self._arrivals, None)
+        if at is not None:
+            self.engine.schedule_at(self._origin + at, 'arrival', self._arrival)
+
+    # Event handlers
+    def _arrival(self):
+        if self._arrivals is not None:
+            self._schedule_next_arrival()
+        else:
+            self.engine.schedule(self.arrival_interval, 'arrival', self._arrival)
+        if self._lot_full():
+            self.stats['rejected'] += 1
+            return
+        plate = simulate_car_arrival(self.parking_lot)
+        if not plate:
+            return
+        self.stats['arrivals'] += 1
+        self.created_plates.append(plate)
+        self.engine.schedule(self.wait_between, 'park', self._park, plate)
+
+    def _park(self, plate: str):
+        spot_id = simulate_car_parked(self.parking_lot, plate)
+        if not spot_id:
+            return
+        self.stats['parked'] += 1
+        if self.dwell is not None:
+            self._schedule_dwell(spot_id, plate)
+
+    def _schedule_dwell(self, spot_id: str, plate: str):
+        stay = self.dwell(self.rng)  # drawn either way, so the other cars' stays don't shift
+        if spot_id in SENSOR_SPOTS:
+            # simulate_car_departure never frees the sensor spot
+            self.stats['sensor_spot_skipped'] += 1
+            return
+        self.engine.schedule(stay, 'departure', self._departure, spot_id, plate)
+
+    def _departure(self, spot_id: str, plate: str):
+        # the spot may have been freed/reassigned by a refresh since this car parked
+        if self.parking_lot.occupied_spots_with_cars.get(spot_id) != plate:
+            self.stats['stale_departures'] += 1
+            return
+        if simulate_car_departure(self.parking_lot, spot_id=spot_id):
+            self.stats['departures'] += 1
+
+    def _periodic_departure(self):
+        full = self._lot_full()
+        if simulate_car_departure(self.parking_lot):
+            self.stats['departures'] += 1
+        self.engine.schedule(self.depart_when_full if full else self.depart_interval,
+                             'departure', self._periodic_departure)
+
+    def _wrong_park(self):
+        import simulation_sondos
+        self.engine.schedule(self.wrong_park_interval, 'wrong_park', self._wrong_park)
+        state = simulation_sondos.wrong_park_begin(self.parking_lot)
+        if state is not None:
+            self.engine.schedule(1.0, 'wrong_park', simulation_sondos.wrong_park_restore_closest, self.parking_lot, state)
+            self.engine.schedule(2.0, 'wrong_park', self._wrong_park_finish, state)
+
+    def _wrong_park_finish(self, state: dict):
+        import simulation_sondos
+        plate = simulation_sondos.wrong_park_finish(self.parking_lot, state)
+        self.stats['wrong_parks'] += 1
+        self.created_plates.append(plate)
+        if self.dwell is not None:
+            self._schedule_dwell(state['chosen_id'], plate)
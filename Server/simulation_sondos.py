@@ -1,25 +1,31 @@
+import itertools
 import random
 import time
-from firebase_admin import db
-from firebase_init import db as _db_init  # ensures app is initialized
+import storage
 from constants import ROOT_BRANCH
-from data_structures import ParkingLot, Spot
+from data_structures import ParkingLot
 from event_generator import simulate_car_arrival, simulate_car_parked, simulate_car_departure, generate_plate_id
+from lot_mirror import get_shared_mirror
+import rtdb_batch
+from rtdb_batch import WriteBatch, write_chunked
+from eventlog import EventLog
 import os
 
+_log = EventLog('simulation_sondos', 'SIM')
+
 
 # obtain the SPOTS reference lazily to avoid using a reference created before firebase app init
 def get_spots_ref():
-    return db.reference(f"/{ROOT_BRANCH}/SPOTS")
+    return storage.reference(f"/{ROOT_BRANCH}/SPOTS")
 
 
 def get_cars_ref():
     """Return the CARS reference under the configured ROOT_BRANCH.
 
-    Other modules use db.reference(ROOT_BRANCH).child('CARS'), so ensure
+    Other modules use storage.reference(ROOT_BRANCH).child('CARS'), so ensure
     we operate on the same path instead of the top-level '/CARS'.
     """
-    return db.reference(f"/{ROOT_BRANCH}/CARS")
+    return storage.reference(f"/{ROOT_BRANCH}/CARS")
 
 
 def migrate_top_level_cars(copy_only: bool = True):
@@ -36,7 +42,7 @@ def migrate_top_level_cars(copy_only: bool = True):
         print("[SIM] No occupied spots found; nothing to migrate.")
         return {'found': 0, 'copied': 0, 'deleted': 0}
 
-    top_ref = db.reference('/CARS')
+    top_ref = storage.reference('/CARS')
     ns_ref = get_cars_ref()
 
     top_data = top_ref.get() or {}
@@ -72,71 +78,101 @@ def migrate_top_level_cars(copy_only: bool = True):
     return {'found': len(found_ids), 'copied': copied, 'deleted': deleted}
 
 
+def free_spot_node(node, ts: int) -> dict:
+    """node reset to the minimal FREE state (status, seenCarId, waitingCarId, lastUpdateMs, no carId)."""
+    reset = dict(node) if isinstance(node, dict) else {}
+    reset.pop('carId', None)
+    reset.update({'status': 'FREE', 'seenCarId': '-', 'waitingCarId': '-', 'lastUpdateMs': ts})
+    return reset
+
+
+def reset_spots_batch(spots: dict, ts: int) -> WriteBatch:
+    """Writes that set every spot in spots to FREE (whole nodes, so they end up in the expected shape)."""
+    batch = WriteBatch()
+    for sid, node in spots.items():
+        batch.set(f"{ROOT_BRANCH}/SPOTS/{sid}", free_spot_node(node, ts))
+    return batch
+
+
+def read_lot_tree() -> dict:
+    """One read of /{ROOT_BRANCH} (SPOTS and CARS together)."""
+    return storage.reference(f"/{ROOT_BRANCH}").get() or {}
+
+
 def clear_cars_and_reset_spots():
     """Remove all car records from the DB and set every spot to FREE.
 
     This is a stronger reset than `set_all_spots_free()` because it also
     deletes the `CARS` node entirely so there are no leftover car records.
+    Everything goes out as chunked multi-path updates (see rtdb_batch.write_chunked),
+    followed by a single verification read.
     """
     print(f"[SIM] Clearing all car records from /{ROOT_BRANCH}/CARS and resetting /{ROOT_BRANCH}/SPOTS to FREE...")
-    cars_ref = get_cars_ref()
+    spots = get_spots_ref().get() or {}
+    batch = reset_spots_batch(spots, int(time.time() * 1000))
+    batch.delete(f"{ROOT_BRANCH}/CARS")
+    failed = write_chunked(batch.updates)
+    if failed:
+        print(f"[SIM] Warning: {failed} reset request(s) failed after retries.")
 
-    # attempt to delete the whole node, retry a few times if necessary
-    for attempt in range(3):
-        try:
-            cars_ref.delete()
-            print(f"[SIM] /{ROOT_BRANCH}/CARS deleted.")
-            break
-        except Exception as e:
-            print(f"[SIM] Attempt {attempt+1} to delete /{ROOT_BRANCH}/CARS failed:", e)
-            # fallback to per-child delete on failure
-            try:
-                data = cars_ref.get() or {}
-                for k in list(data.keys()):
-                    try:
-                        cars_ref.child(k).delete()
-                    except Exception:
-                        pass
-                # re-check
-                remaining = cars_ref.get() or {}
-                if not remaining:
-                    print(f"[SIM] /{ROOT_BRANCH}/CARS children deleted via fallback.")
-                    break
-            except Exception as e2:
-                print(f"[SIM] Failed to enumerate /{ROOT_BRANCH}/CARS for deletion:", e2)
-        time.sleep(0.5)
-    else:
-        print(f"[SIM] Warning: /{ROOT_BRANCH}/CARS could not be fully deleted after retries.")
+    # verify spots and cars state with one read; rewrite only what didn't land
+    try:
+        tree = read_lot_tree()
+        cars_now = tree.get('CARS')
+        spots_now = tree.get('SPOTS') or {}
+        not_free = {k: v for k, v in spots_now.items()
+                    if isinstance(v, dict) and (v.get('status') or '').upper() != 'FREE'}
+        if not cars_now and not not_free:
+            print(f"[SIM] Verification succeeded: /{ROOT_BRANCH}/CARS empty and all spots FREE.")
+            return
+        print(f"[SIM] Verification: CARS present? {bool(cars_now)}; spots not FREE: {len(not_free)}. Rewriting them...")
+        retry = reset_spots_batch(not_free, int(time.time() * 1000))
+        if cars_now:
+            retry.delete(f"{ROOT_BRANCH}/CARS")
+        if write_chunked(retry.updates):
+            print("[SIM] Warning: verification failed — DB may not be fully reset.")
+    except Exception as e:
+        print("[SIM] Verification error:", e)
 
-    # now set all spots to FREE (reuse helper) and verify
-    set_all_spots_free()
 
-    # verify spots and cars state; retry a couple times if DB hasn't reflected changes
-    for attempt in range(5):
-        try:
-            cars_now = get_cars_ref().get()
-            spots_now = get_spots_ref().get() or {}
-            all_free = True
-            for v in spots_now.values():
-                if isinstance(v, dict) and (v.get('status') or '').upper() != 'FREE':
-                    all_free = False
-                    break
-            if (not cars_now or cars_now == {}) and all_free:
-                print(f"[SIM] Verification succeeded: /{ROOT_BRANCH}/CARS empty and all spots FREE.")
-                break
-            else:
-                print(f"[SIM] Verification attempt {attempt+1}: CARS present? {bool(cars_now)}; all_free? {all_free}. Retrying...")
-                # try resetting spots again if needed
-                if not all_free:
-                    set_all_spots_free()
-        except Exception as e:
-            print("[SIM] Verification error:", e)
-        time.sleep(0.5)
-    else:
-        print("[SIM] Warning: verification failed — DB may not be fully reset.")
+def restore_spots_and_cars(backup: dict, plates=()):
+    """Write the backed-up SPOTS nodes back and delete the given car records, in bulk."""
+    batch = WriteBatch()
+    for sid, node in (backup or {}).items():
+        batch.set(f"{ROOT_BRANCH}/SPOTS/{sid}", node)
+    for plate in plates:
+        if plate:
+            batch.delete(f"{ROOT_BRANCH}/CARS/{plate}")
+    failed = write_chunked(batch.updates)
+    if failed:
+        print(f"⚠️ Failed to restore {failed} chunk(s) of spots/cars")
+    return failed == 0
+
+
+def use_live_mirror() -> bool:
+    """SIM_LIVE_MIRROR=1 -> drive the simulation from the stream-fed lot (lot_mirror)."""
+    return os.environ.get('SIM_LIVE_MIRROR', '0') == '1'
+
+
+def get_spots_snapshot() -> dict:
+    """Current SPOTS node: from the live mirror when enabled, else one full read."""
+    mirror = get_shared_mirror() if use_live_mirror() else None
+    if mirror is not None:
+        return mirror.snapshot()
+    return get_spots_ref().get() or {}
 
 
 def load_parking_lot_from_db():
+    # with the live mirror the lot is already in memory and kept current by the stream
+    mirror = get_shared_mirror() if use_live_mirror() else None
+    if mirror is not None:
+        backup = mirror.snapshot()
+        if not backup:
+            print("[SIM] No spots found — did you run the initializer?")
+            return None, {}
+        print(f"[SIM] Using live parking lot mirror: free_spots_count={len(mirror.parking_lot.free_spots)}")
+        return mirror.parking_lot, backup
+
     data = get_spots_ref().get() or {}
     if not data:
         print("[SIM] No spots found — did you run the initializer?")
@@ -144,38 +180,16 @@ def load_parking_lot_from_db():
 
     pl = ParkingLot()
     # Keep a backup to restore later
-    backup = {}
-
-    for sid, s in data.items():
-        if not isinstance(s, dict):
-            continue
-        # sid expected in form 'row,col' or '(row,col)'
-        backup[sid] = s
-        try:
-            row_str, col_str = sid.strip('()').split(',')
-            row, col = int(row_str), int(col_str)
-        except Exception:
-            # try splitting on other delimiters
-            parts = sid.replace('(', '').replace(')', '').split(',')
-            if len(parts) >= 2:
-                row, col = int(parts[0]), int(parts[1])
-            else:
-                continue
-
-        dist = s.get('distanceFromEntry', 0) or 0
-        spot = Spot(row, col, dist)
-        # mirror status from DB
-        spot.status = s.get('status', 'FREE')
-        spot.waiting_car_id = s.get('waitingCarId', '-')
-        spot.seen_car_id = s.get('seenCarId', '-')
-        pl.spot_lookup[spot.spot_id] = spot
-        if spot.status == 'FREE':
-            pl.free_spots.add(spot)
+    backup = {sid: s for sid, s in data.items() if isinstance(s, dict)}
+    malformed = pl.load_snapshot(data)
+    if malformed:
+        print(f"[SIM] Skipped {len(malformed)} malformed spot entries: "
+              + ', '.join(f"{sid!r} ({why})" for sid, why in list(malformed.items())[:10]))
 
     # debug: print free spots and distances
     print(f"[SIM] Loaded parking lot: free_spots_count={len(pl.free_spots)}")
-    sample = [(sp.spot_id, sp.distance_from_entry) for sp in pl.free_spots]
-    print("[SIM] Free spots (id,dist) sample:", sample[:10])
+    sample = [(sp.spot_id, sp.distance_from_entry) for sp in itertools.islice(pl.free_spots, 10)]
+    print("[SIM] Free spots (id,dist) sample:", sample)
 
     return pl, backup
 
@@ -183,205 +197,208 @@ def load_parking_lot_from_db():
 def set_all_spots_free():
     """Set every spot under ROOT_BRANCH/SPOTS to FREE in the RTDB.
 
-    This writes a minimal FREE state (status, carId, seenCarId, waitingCarId, lastUpdateMs)
-    for every spot key found under the SPOTS node.
+    This writes a minimal FREE state (status, seenCarId, waitingCarId, lastUpdateMs,
+    carId removed) for every spot key found under the SPOTS node, as chunked
+    multi-path updates.
     """
     data = get_spots_ref().get() or {}
     if not data:
         print("[SIM] No spots found to reset.")
         return
 
-    ts = int(time.time() * 1000)
     print(f"[SIM] Setting all {len(data)} spots to FREE...")
-    for sid in data.keys():
-        payload = {
-            'status': 'FREE',
-            'carId': None,
-            'seenCarId': '-',
-            'waitingCarId': '-',
-            'lastUpdateMs': ts,
-        }
-        # attempt a few times per spot in case of transient errors
-        for attempt in range(3):
-            try:
-                # use set() to ensure the entire spot entry is written to the expected shape
-                get_spots_ref().child(sid).set({**(data.get(sid) if isinstance(data.get(sid), dict) else {}), **payload})
-                break
-            except Exception as e:
-                print(f"⚠️ Failed to reset spot {sid} (attempt {attempt+1}):", e)
-                time.sleep(0.2)
-        else:
-            print(f"⚠️ Giving up resetting spot {sid} after retries.")
+    failed = write_chunked(reset_spots_batch(data, int(time.time() * 1000)).updates)
+    if failed:
+        print(f"⚠️ Giving up on {failed} chunk(s) of spots after retries.")
     print("[SIM] All spots set to FREE (requests issued).")
 
 
-def inject_wrong_park(parking_lot: ParkingLot):
-    """Cause a car to park in a random free spot that is NOT the BFS-closest.
+def wrong_park_begin(parking_lot: ParkingLot):
+    """Wrong-park step 1: a car heads for a random free spot that is NOT the BFS-closest.
 
-    Behavior:
-    - Choose the current BFS closest via parking_lot.find_closest
-    - From the free_spots choose a different random free spot
-    - Write a temporary 'WRONG_PARK' state to that spot (used to show purple) for 2s
-    - After 2s, set spot to 'OCCUPIED' and create a CARS entry for the parked car
-    - Update parking_lot internal structures accordingly
-    Returns the spot_id chosen or None on failure.
+    Writes a temporary 'WRONG_PARK' state to the chosen spot (shown purple) and
+    marks the BFS-closest spot WAITING (orange). Returns the state the next
+    steps need ({'chosen', 'chosen_id', 'bfs_key'}) or None if there is no
+    alternative free spot.
     """
+    if not parking_lot:
+        return None
+    # determine BFS closest
     try:
-        if not parking_lot:
-            return None
-        # determine BFS closest
+        bfs = parking_lot.find_closest()
+        bfs_key = f"{bfs[0]},{bfs[1]}" if bfs else None
+    except Exception:
+        bfs_key = None
+
+    # list free spots available
+    free_list = []
+    if hasattr(parking_lot, 'free_spots'):
         try:
-            bfs = parking_lot.find_closest()
-            bfs_key = f"{bfs[0]},{bfs[1]}" if bfs else None
+            free_list = [sp for sp in parking_lot.free_spots if getattr(sp, 'spot_id', None) != bfs_key]
         except Exception:
-            bfs_key = None
+            # fallback: build from spot_lookup
+            free_list = [s for s in parking_lot.spot_lookup.values() if getattr(s, 'status', None) == 'FREE' and s.spot_id != bfs_key]
 
-        # list free spots available
-        free_list = []
-        if hasattr(parking_lot, 'free_spots'):
-            try:
-                free_list = [sp for sp in parking_lot.free_spots if getattr(sp, 'spot_id', None) != bfs_key]
-            except Exception:
-                # fallback: build from spot_lookup
-                free_list = [s for s in parking_lot.spot_lookup.values() if getattr(s, 'status', None) == 'FREE' and s.spot_id != bfs_key]
+    if not free_list:
+        print("[SIM] No alternative free spot available for wrong-park")
+        return None
 
-        if not free_list:
-            print("[SIM] No alternative free spot available for wrong-park")
-            return None
+    chosen = random.choice(free_list)
+    chosen_id = chosen.spot_id if hasattr(chosen, 'spot_id') else str(chosen)
 
-        chosen = random.choice(free_list)
-        chosen_id = chosen.spot_id if hasattr(chosen, 'spot_id') else str(chosen)
+    spots_ref = get_spots_ref()
 
-        spots_ref = get_spots_ref()
-        cars_ref = get_cars_ref()
-
-        # set temporary wrong-park visual state (use status 'WRONG_PARK' so UI can color purple)
-        ts = int(time.time() * 1000)
+    # set temporary wrong-park visual state (use status 'WRONG_PARK' so UI can color purple)
+    ts = int(time.time() * 1000)
+    try:
+        spots_ref.child(str(chosen_id)).update({'status': 'WRONG_PARK', 'carId': None, 'seenCarId': '-', 'waitingCarId': '-', 'lastUpdateMs': ts})
+    except Exception as e:
+        print("⚠️ Failed to write WRONG_PARK state for", chosen_id, e)
+    # take it out of the free pool too, so no arrival is allocated the spot meanwhile
+    try:
+        chosen.status = 'WRONG_PARK'
+        parking_lot.remove_spot_from_free(chosen)
+    except Exception:
+        pass
+
+    # mark the BFS-closest spot as WAITING (orange) to reflect that the system had intended
+    # the car to go there. Remove it from free_spots so UI shows orange.
+    if bfs_key:
         try:
-            spots_ref.child(str(chosen_id)).update({'status': 'WRONG_PARK', 'carId': None, 'seenCarId': '-', 'waitingCarId': '-', 'lastUpdateMs': ts})
-        except Exception as e:
-            print("⚠️ Failed to write WRONG_PARK state for", chosen_id, e)
-
-        # mark the BFS-closest spot as WAITING (orange) to reflect that the system had intended
-        # the car to go there. Remove it from free_spots so UI shows orange.
-        if bfs_key:
-            try:
-                spots_ref.child(str(bfs_key)).update({'status': 'WAITING', 'waitingCarId': '-', 'lastUpdateMs': ts})
-                spobj = parking_lot.get_spot(bfs_key) if hasattr(parking_lot, 'get_spot') else None
-                if spobj:
-                    spobj.status = 'WAITING'
+            spots_ref.child(str(bfs_key)).update({'status': 'WAITING', 'waitingCarId': '-', 'lastUpdateMs': ts})
+            spobj = parking_lot.get_spot(bfs_key) if hasattr(parking_lot, 'get_spot') else None
+            if spobj:
+                spobj.status = 'WAITING'
+                try:
+                    parking_lot.remove_spot_from_free(spobj)
+                except Exception:
                     try:
-                        parking_lot.remove_spot_from_free(spobj)
+                        parking_lot.remove_spot_from_free(bfs_key)
                     except Exception:
-                        try:
-                            parking_lot.remove_spot_from_free(bfs_key)
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+                        pass
+        except Exception:
+            pass
 
-        print(f"[SIM] Injected wrong-park at {chosen_id} (purple) and set closest {bfs_key} to WAITING (orange).")
-        # keep the closest WAITING state briefly (1s), but keep the wrong-park purple for 2s total
-        time.sleep(1)
+    _log.debug('wrong_park_injected', 'Injected wrong-park at %s (purple) and set closest %s to WAITING (orange).',
+               chosen_id, bfs_key, spot=chosen_id, closest=bfs_key)
+    return {'chosen': chosen, 'chosen_id': chosen_id, 'bfs_key': bfs_key}
 
-        # restore the BFS-closest spot to FREE (after 1s)
-        if bfs_key:
+
+def wrong_park_restore_closest(parking_lot: ParkingLot, state: dict):
+    """Wrong-park step 2 (1s later): the BFS-closest spot goes back to FREE."""
+    bfs_key = state.get('bfs_key')
+    if not bfs_key:
+        return
+    try:
+        get_spots_ref().child(str(bfs_key)).update({'status': 'FREE', 'waitingCarId': '-', 'carId': None, 'seenCarId': '-', 'lastUpdateMs': int(time.time() * 1000)})
+        spobj = parking_lot.get_spot(bfs_key) if hasattr(parking_lot, 'get_spot') else None
+        if spobj:
+            spobj.status = 'FREE'
             try:
-                spots_ref.child(str(bfs_key)).update({'status': 'FREE', 'waitingCarId': '-', 'carId': None, 'seenCarId': '-', 'lastUpdateMs': int(time.time() * 1000)})
-                spobj = parking_lot.get_spot(bfs_key) if hasattr(parking_lot, 'get_spot') else None
-                if spobj:
-                    spobj.status = 'FREE'
-                    try:
-                        parking_lot.add_spot_to_free(spobj)
-                    except Exception:
-                        try:
-                            parking_lot.free_spots.add(spobj)
-                        except Exception:
-                            pass
+                parking_lot.add_spot_to_free(spobj)
             except Exception:
-                pass
+                try:
+                    parking_lot.free_spots.add(spobj)
+                except Exception:
+                    pass
+    except Exception:
+        pass
 
-        # keep the wrong-park purple for one more second (total 2s)
-        time.sleep(1)
 
-        # mark wrong spot as occupied and create car record
-        plate = generate_plate_id()
-        car_payload = {'Id': plate, 'allocatedSpot': chosen_id, 'status': 'parked', 'SpotIn': {'Arrievied': True}, 'timestamp': time.time()}
-        try:
-            cars_ref.child(plate).set(car_payload)
-            spots_ref.child(str(chosen_id)).update({'status': 'OCCUPIED', 'carId': plate, 'seenCarId': plate, 'waitingCarId': '-', 'lastUpdateMs': int(time.time() * 1000)})
-        except Exception as e:
-            print("⚠️ Failed to finalize wrong-park for", chosen_id, e)
+def wrong_park_finish(parking_lot: ParkingLot, state: dict):
+    """Wrong-park step 3 (2s after step 1): the car is parked in the wrong spot.
+
+    Sets the spot OCCUPIED, creates the CARS entry and updates parking_lot.
+    Returns the new car's plate.
+    """
+    chosen, chosen_id, bfs_key = state['chosen'], state['chosen_id'], state.get('bfs_key')
+    # mark wrong spot as occupied and create car record
+    plate = generate_plate_id()
+    car_payload = {'Id': plate, 'allocatedSpot': chosen_id, 'status': 'parked', 'SpotIn': {'Arrievied': True}, 'timestamp': time.time()}
+    batch = WriteBatch()
+    batch.set(f"{ROOT_BRANCH}/CARS/{plate}", car_payload)
+    batch.update(f"{ROOT_BRANCH}/SPOTS/{chosen_id}", {'status': 'OCCUPIED', 'carId': plate, 'seenCarId': plate, 'waitingCarId': '-', 'lastUpdateMs': int(time.time() * 1000)})
+    try:
+        rtdb_batch.commit(batch)
+    except Exception as e:
+        print("⚠️ Failed to finalize wrong-park for", chosen_id, e)
 
-        # update parking_lot internals: remove chosen from free and mark occupied
+    # update parking_lot internals: remove chosen from free and mark occupied
+    try:
+        spobj = parking_lot.get_spot(chosen_id) if hasattr(parking_lot, 'get_spot') else None
+        if spobj is not None:
+            spobj.status = 'OCCUPIED'
         try:
+            parking_lot.remove_spot_from_free(chosen)
+        except Exception:
             try:
-                parking_lot.remove_spot_from_free(chosen)
+                parking_lot.remove_spot_from_free(chosen_id)
             except Exception:
-                try:
-                    parking_lot.remove_spot_from_free(chosen_id)
-                except Exception:
-                    pass
-            if hasattr(parking_lot, 'add_occupied_spot'):
-                parking_lot.add_occupied_spot(chosen_id, plate)
-            else:
-                parking_lot.occupied_spots_with_cars[chosen_id] = plate
-        except Exception:
-            pass
+                pass
+        if hasattr(parking_lot, 'add_occupied_spot'):
+            parking_lot.add_occupied_spot(chosen_id, plate)
+        else:
+            parking_lot.occupied_spots_with_cars[chosen_id] = plate
+    except Exception:
+        pass
+
+    _log.debug('wrong_park_finalized', 'Wrong-park finalized: car %s at %s; closest %s was restored to FREE earlier',
+               plate, chosen_id, bfs_key, plate=plate, spot=chosen_id, closest=bfs_key)
+    return plate
+
+
+def inject_wrong_park(parking_lot: ParkingLot):
+    """Cause a car to park in a random free spot that is NOT the BFS-closest.
 
-        print(f"[SIM] Wrong-park finalized: car {plate} at {chosen_id}; closest {bfs_key} was restored to FREE earlier")
-        return chosen_id
+    Behavior:
+    - Choose the current BFS closest via parking_lot.find_closest
+    - From the free_spots choose a different random free spot
+    - Write a temporary 'WRONG_PARK' state to that spot (used to show purple) for 2s
+    - After 2s, set spot to 'OCCUPIED' and create a CARS entry for the parked car
+    - Update parking_lot internal structures accordingly
+    Returns the spot_id chosen or None on failure.
+
+    The steps are wrong_park_begin / wrong_park_restore_closest / wrong_park_finish,
+    which the discrete-event engine (sim_engine) schedules on its virtual clock.
+    """
+    try:
+        state = wrong_park_begin(parking_lot)
+        if state is None:
+            return None
+        # keep the closest WAITING state briefly (1s), but keep the wrong-park purple for 2s total
+        time.sleep(1)
+        # restore the BFS-closest spot to FREE (after 1s)
+        wrong_park_restore_closest(parking_lot, state)
+        # keep the wrong-park purple for one more second (total 2s)
+        time.sleep(1)
+        wrong_park_finish(parking_lot, state)
+        return state['chosen_id']
     except Exception as e:
         print("[SIM] inject_wrong_park failed:", e)
         return None
 
 
-
-def refresh_parking_lot(parking_lot: ParkingLot):
+def refresh_parking_lot(parking_lot: ParkingLot) -> dict:
     """Refresh the in-memory parking lot state from the database without losing structure.
-    
-    This updates the status and occupancy of spots to reflect external changes.
+
+    Only spots whose DB node changed since the last load/refresh are applied
+    (ParkingLot.refresh_from_snapshot). Returns the change set,
+    {spot_id: (old_status, new_status)}, so callers can react to external
+    changes. A lot fed by the live mirror is already current: nothing to do.
     """
+    if getattr(parking_lot, 'live', False):
+        return {}
     try:
         data = get_spots_ref().get() or {}
         if not data:
-            return parking_lot
-        
-        # Update existing spots
-        for sid, s in data.items():
-            if not isinstance(s, dict):
-                continue
-            
-            spot = parking_lot.spot_lookup.get(sid)
-            if not spot:
-                continue
-            
-            old_status = spot.status
-            new_status = s.get('status', 'FREE')
-            
-            # Update spot attributes
-            spot.status = new_status
-            spot.waiting_car_id = s.get('waitingCarId', '-')
-            spot.seen_car_id = s.get('seenCarId', '-')
-            
-            # Synchronize free_spots set
-            if new_status == 'FREE' and spot not in parking_lot.free_spots:
-                parking_lot.free_spots.add(spot)
-            elif new_status != 'FREE' and spot in parking_lot.free_spots:
-                parking_lot.free_spots.discard(spot)
-            
-            # Update occupied tracking
-            car_id = s.get('carId')
-            if new_status == 'OCCUPIED' and car_id:
-                parking_lot.occupied_spots_with_cars[sid] = car_id
-            elif sid in parking_lot.occupied_spots_with_cars and new_status != 'OCCUPIED':
-                parking_lot.occupied_spots_with_cars.pop(sid, None)
-        
-        print(f"[SIM] Refreshed parking lot: free_spots={len(parking_lot.free_spots)}, occupied={len(parking_lot.occupied_spots_with_cars)}")
-        return parking_lot
+            return {}
+        changes = parking_lot.refresh_from_snapshot(data)
+        _log.info('lot_refreshed', 'Refreshed parking lot: %d changed, free_spots=%d, occupied=%d', len(changes),
+                  len(parking_lot.free_spots), len(parking_lot.occupied_spots_with_cars), changed=len(changes))
+        return changes
     except Exception as e:
-        print(f"[SIM] Error refreshing parking lot: {e}")
-        return parking_lot
+        _log.warning('refresh_failed', 'Error refreshing parking lot: %s', e)
+        return {}
 
 
 def simulate_n_arrivals(n: int = 5, keep_changes: bool = False, wait_between: float = 1.0, arrival_interval: float = 7.0):
@@ -411,7 +428,7 @@ def simulate_n_arrivals(n: int = 5, keep_changes: bool = False, wait_between: fl
         for i in range(n):
             # Periodically refresh parking lot state from DB
             if time.time() - last_refresh_time >= refresh_interval:
-                pl = refresh_parking_lot(pl)
+                refresh_parking_lot(pl)
                 last_refresh_time = time.time()
             
             # if in-memory shows no free spots, we still trigger departures every depart_when_full seconds
@@ -432,10 +449,12 @@ def simulate_n_arrivals(n: int = 5, keep_changes: bool = False, wait_between: fl
             # allow a short delay for the WAITING state to be written/read
             time.sleep(wait_between)
             # print debug snapshot after allocation
-            print(f"[SIM] After arrival: free_spots_count={len(pl.free_spots)}; waiting_pair={pl.get_waiting_pair()}")
+            _log.debug('after_arrival', 'After arrival: free_spots_count=%d; waiting_pair=%s', len(pl.free_spots),
+                       pl.get_waiting_pair(), plate=plate)
             # simulate the car physically parking
             simulate_car_parked(pl, plate)
-            print(f"[SIM] After parked: free_spots_count={len(pl.free_spots)}; occupied_count={len(pl.occupied_spots_with_cars)}")
+            _log.debug('after_parked', 'After parked: free_spots_count=%d; occupied_count=%d', len(pl.free_spots),
+                       len(pl.occupied_spots_with_cars), plate=plate)
             # extra small sleep to let parked writes propagate
             time.sleep(wait_between)
 
@@ -443,7 +462,7 @@ def simulate_n_arrivals(n: int = 5, keep_changes: bool = False, wait_between: fl
             elapsed = time.time() - start_ts
             remaining = arrival_interval - elapsed
             if remaining > 0:
-                print(f"[SIM] Sleeping {remaining:.2f}s until next arrival (to respect arrival_interval)")
+                _log.debug('pacing', 'Sleeping %.2fs until next arrival (to respect arrival_interval)', remaining)
                 time.sleep(remaining)
 
             # periodically inject a wrong-park event (a car parks in a random free spot that is NOT the closest)
@@ -469,7 +488,7 @@ def simulate_n_arrivals(n: int = 5, keep_changes: bool = False, wait_between: fl
             try:
                 spots_ref.child(str(spot)).update({'status': 'FREE', 'carId': None, 'seenCarId': '-', 'waitingCarId': '-', 'lastUpdateMs': ts})
             except Exception as e:
-                print("⚠️ Failed to set spot FREE in DB:", spot, e)
+                _log.warning('free_failed', 'Failed to set spot %s FREE in DB: %s', spot, e, spot=spot)
 
             # update parking lot internals
             try:
@@ -486,7 +505,7 @@ def simulate_n_arrivals(n: int = 5, keep_changes: bool = False, wait_between: fl
             except Exception:
                 pass
 
-            print(f"🚗 Car {plate} departed from spot {spot} and spot set to FREE")
+            _log.debug('car_departed', 'Car %s departed from spot %s and spot set to FREE', plate, spot, plate=plate, spot=spot)
             time.sleep(wait_between)
             # trigger a periodic departure if enough time passed
             try:
@@ -500,18 +519,8 @@ def simulate_n_arrivals(n: int = 5, keep_changes: bool = False, wait_between: fl
 
         if not keep_changes:
             print("[SIM] Restoring original SPOTS from backup...")
-            for sid, s in backup.items():
-                try:
-                    get_spots_ref().child(sid).set(s)
-                except Exception as e:
-                    print("⚠️ Failed to restore spot", sid, e)
-            # remove created cars
-            cars_ref = get_cars_ref()
-            for p in created_plates:
-                try:
-                    cars_ref.child(p).delete()
-                except Exception:
-                    pass
+            # restore spots and remove created cars
+            restore_spots_and_cars(backup, created_plates)
             print("[SIM] Restore complete.")
     except KeyboardInterrupt:
         print("[SIM] Interrupted by user — leaving current DB state as-is.")
@@ -544,7 +553,7 @@ def simulate_continuous_arrivals(keep_changes: bool = False, wait_between: float
         while True:
             # Periodically refresh parking lot state from DB to catch external changes
             if time.time() - last_refresh_time >= refresh_interval:
-                pl = refresh_parking_lot(pl)
+                refresh_parking_lot(pl)
                 last_refresh_time = time.time()
             
             start_ts = time.time()
@@ -552,7 +561,7 @@ def simulate_continuous_arrivals(keep_changes: bool = False, wait_between: float
             if not getattr(pl, 'free_spots', None) or len(pl.free_spots) == 0:
                 # double-check the real DB in case the in-memory model drifted
                 try:
-                    data = get_spots_ref().get() or {}
+                    data = get_spots_snapshot()
                     db_free = sum(1 for v in data.values() if isinstance(v, dict) and (v.get('status') or '').upper() == 'FREE')
                 except Exception:
                     db_free = 0
@@ -568,7 +577,7 @@ def simulate_continuous_arrivals(keep_changes: bool = False, wait_between: float
                             continue
                     except Exception:
                         pass
-                    print("[SIM] PARKING FULL — no free spots available. Waiting until next check...")
+                    _log.info('lot_full', 'PARKING FULL — no free spots available. Waiting until next check...')
                     time.sleep(arrival_interval)
                     continue
                 else:
@@ -587,17 +596,19 @@ def simulate_continuous_arrivals(keep_changes: bool = False, wait_between: float
 
             plate = simulate_car_arrival(pl)
             if not plate:
-                print("[SIM] simulate_car_arrival returned no plate — skipping")
+                _log.warning('no_plate', 'simulate_car_arrival returned no plate — skipping')
                 time.sleep(arrival_interval)
                 continue
 
             created_plates.append(plate)
             # short delay so WAITING state persists briefly
             time.sleep(wait_between)
-            print(f"[SIM] Arrival: free_spots_count={len(pl.free_spots)}; waiting_pair={pl.get_waiting_pair()}")
+            _log.debug('after_arrival', 'Arrival: free_spots_count=%d; waiting_pair=%s', len(pl.free_spots),
+                       pl.get_waiting_pair(), plate=plate)
             simulate_car_parked(pl, plate)
             # (optionally) record or log parked cars; departures are timed periodically
-            print(f"[SIM] Parked: free_spots_count={len(pl.free_spots)}; occupied_count={len(pl.occupied_spots_with_cars)}")
+            _log.debug('after_parked', 'Parked: free_spots_count=%d; occupied_count=%d', len(pl.free_spots),
+                       len(pl.occupied_spots_with_cars), plate=plate)
             time.sleep(wait_between)
 
             # pace to arrival_interval
@@ -626,23 +637,121 @@ def simulate_continuous_arrivals(keep_changes: bool = False, wait_between: float
         print("[SIM] Continuous simulation interrupted by user — cleaning up...")
         if not keep_changes:
             print("[SIM] Restoring original SPOTS from backup...")
-            for sid, s in backup.items():
-                try:
-                    get_spots_ref().child(sid).set(s)
-                except Exception as e:
-                    print("⚠️ Failed to restore spot", sid, e)
-            cars_ref = get_cars_ref()
-            for p in created_plates:
-                try:
-                    cars_ref.child(p).delete()
-                except Exception:
-                    pass
+            restore_spots_and_cars(backup, created_plates)
+            print("[SIM] Restore complete.")
+        else:
+            print("[SIM] Leaving changes in RTDB (KEEP_CHANGES=1).")
+
+
+def simulate_virtual(hours: float = 0.0, keep_changes: bool = False, wait_between: float = 1.0,
+                     arrival_interval: float = 5.0, speed: float = 0.0, traffic=None):
+    """Run the continuous-arrivals traffic on the discrete-event engine (sim_engine).
+
+    Arrivals, parks, departures and wrong-parks are scheduled on a virtual
+    clock instead of slept for. speed=0 runs `hours` of virtual time as fast
+    as the writes allow; speed>0 paces events in real time at that many
+    virtual seconds per second (1 = live demo), for `hours` or, with hours=0,
+    until Ctrl+C. Unless keep_changes, the lot is restored afterwards.
+
+    traffic is a traffic.TrafficModel (default: from the SIM_ARRIVALS /
+    SIM_DWELL / SIM_PROFILE / SIM_SEED env vars, else a car every
+    arrival_interval). A seeded model also seeds plate ids and the random
+    departures/wrong parks, so the run can be replayed exactly.
+    """
+    from sim_engine import SimEngine, ParkingSimulation
+    from traffic import TrafficModel
+
+    traffic = traffic or TrafficModel.from_env()
+    if traffic is not None and traffic.seed is not None:
+        random.seed(f"{traffic.seed}/simulator")
+
+    clear_cars_and_reset_spots()
+    pl, backup = load_parking_lot_from_db()
+    if pl is None:
+        return None
+
+    engine = SimEngine(realtime=speed > 0, speed=speed or 1.0)
+    sim = ParkingSimulation(pl, engine, arrival_interval=arrival_interval, wait_between=wait_between, traffic=traffic)
+    duration = hours * 3600.0 if hours > 0 else None
+    started = time.time()
+    try:
+        workload = traffic.name if traffic is not None else f"arrivals every {arrival_interval}s"
+        print(f"[SIM] Event engine: {hours or 'unbounded'} virtual hours, {workload}"
+              + (f", paced at {speed}x real time" if speed > 0 else ""))
+        sim.run(duration)
+    except KeyboardInterrupt:
+        print("[SIM] Event simulation interrupted by user — cleaning up...")
+    finally:
+        rtdb_batch.flush()
+        print(f"[SIM] Simulated {engine.now / 3600.0:.2f} virtual hours in {time.time() - started:.1f}s: "
+              f"{dict(sim.stats)}")
+        if not keep_changes:
+            print("[SIM] Restoring original SPOTS from backup...")
+            restore_spots_and_cars(backup, sim.created_plates)
             print("[SIM] Restore complete.")
         else:
             print("[SIM] Leaving changes in RTDB (KEEP_CHANGES=1).")
+    return sim.stats
+
+
+def simulate_async(hours: float = 0.0, keep_changes: bool = False, wait_between: float = 1.0,
+                   arrival_interval: float = 5.0, speed: float = 1.0, traffic=None, patience: float = 0.0):
+    """Run the traffic with one asyncio task per car (async_sim), many cars in flight at once.
+
+    speed virtual seconds pass per real second; the run covers `hours` of
+    virtual time or, with hours=0, goes on until Ctrl+C. Cars that find the
+    lot full queue at the gate for up to `patience` seconds. Without
+    RTDB_BATCH_WINDOW_MS the writes are micro-batched over 100 ms for the run,
+    so the database sees a few requests per second however many cars move.
+    Unless keep_changes, the lot is restored afterwards.
+    """
+    import asyncio
+    from async_sim import AsyncParkingSimulation
+    from traffic import TrafficModel
+
+    traffic = traffic or TrafficModel.from_env()
+    if traffic is not None and traffic.seed is not None:
+        random.seed(f"{traffic.seed}/simulator")
+
+    clear_cars_and_reset_spots()
+    pl, backup = load_parking_lot_from_db()
+    if pl is None:
+        return None
+
+    window = rtdb_batch.get_writer().window
+    if 'RTDB_BATCH_WINDOW_MS' not in os.environ:
+        rtdb_batch.set_batch_window(0.1)
+    sim = AsyncParkingSimulation(pl, arrival_interval=arrival_interval, wait_between=wait_between,
+                                 traffic=traffic, speed=speed, patience=patience)
+    started = time.time()
+    try:
+        workload = traffic.name if traffic is not None else f"arrivals every {arrival_interval}s"
+        print(f"[SIM] Async simulator: {hours or 'unbounded'} virtual hours, {workload}, {speed}x real time")
+        asyncio.run(sim.run(hours * 3600.0 if hours > 0 else None))
+    except KeyboardInterrupt:
+        print("[SIM] Async simulation interrupted by user — cleaning up...")
+    finally:
+        rtdb_batch.set_batch_window(window)
+        print(f"[SIM] {dict(sim.stats)} in {time.time() - started:.1f}s; peak in flight: {dict(sim.peak)}, "
+              f"waited {sim.io_wait:.1f}s for DB slots")
+        if not keep_changes:
+            print("[SIM] Restoring original SPOTS from backup...")
+            restore_spots_and_cars(backup, sim.created_plates)
+            print("[SIM] Restore complete.")
+        else:
+            print("[SIM] Leaving changes in RTDB (KEEP_CHANGES=1).")
+    return sim.stats
 
 
 def main():
+    # METRICS_DUMP=<file>: record the hot-path metrics and write them as JSON at exit
+    dump = os.environ.get('METRICS_DUMP')
+    if dump:
+        import atexit
+        import metrics
+        metrics.enable()
+        atexit.register(metrics.dump, dump)
+
     # Ensure DB is cleared and all spots set to FREE at program start
     clear_cars_and_reset_spots()
 
@@ -650,8 +759,17 @@ def main():
     wait = float(os.environ.get('WAIT_SECONDS', '1'))
     n = int(os.environ.get('N_ARRIVALS', '0'))
     arrival_interval = float(os.environ.get('ARRIVAL_INTERVAL_SECONDS', '5'))
+    # SIM_VIRTUAL_HOURS / SIM_SPEED -> run on the discrete-event engine instead of sleeping
+    virtual_hours = float(os.environ.get('SIM_VIRTUAL_HOURS', '0'))
+    speed = float(os.environ.get('SIM_SPEED', '0'))
+    if os.environ.get('SIM_ASYNC', '0') == '1':
+        # one coroutine per car; SIM_SPEED defaults to real time here
+        simulate_async(virtual_hours, keep_changes=keep, wait_between=wait, arrival_interval=arrival_interval,
+                       speed=speed or 1.0, patience=float(os.environ.get('SIM_PATIENCE_SECONDS', '0')))
+    elif virtual_hours > 0 or speed > 0:
+        simulate_virtual(virtual_hours, keep_changes=keep, wait_between=wait, arrival_interval=arrival_interval, speed=speed)
     # If N_ARRIVALS is 0 -> run continuous arrivals until interrupted
-    if n == 0:
+    elif n == 0:
         simulate_continuous_arrivals(keep_changes=keep, wait_between=wait, arrival_interval=arrival_interval)
     else:
         simulate_n_arrivals(n, keep_changes=keep, wait_between=wait, arrival_interval=arrival_interval)
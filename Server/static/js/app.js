@@ -3,22 +3,31 @@ const closestEl = document.getElementById('closest')
 const tsEl = document.getElementById('ts')
 const arrivingIdEl = document.getElementById('arriving-id')
 
-function render(spots, closest, freeCount){
-  // Fixed 5 columns, rows 0..9
-  const cols = [[],[],[],[],[]]
-  for(let col=0; col<5; col++){
-    for(let row=0; row<10; row++){
-      const key = `${row},${col}`
-      cols[col].push({row,col,key,info:spots[key]})
-    }
+// latest known state; the stream patches it, polling replaces it
+const state = {spots: {}, closest: null, freeCount: null, isFull: false, waitingCar: '-', ts: null}
+// 'row,col' -> {sp, label} so updates touch only the cells that changed
+let cells = null
+
+function spotStatus(info){
+  // normalize status (be case-insensitive and robust to missing fields)
+  let st = 'FREE'
+  if(info){
+    if(info.status) st = info.status
+    else if(info.Status) st = info.Status
+    else if(info.state) st = info.state
   }
+  return ('' + st).toUpperCase()
+}
 
+function buildGrid(){
+  // Fixed 5 columns, rows 0..9
+  cells = {}
   gridEl.innerHTML=''
-  cols.forEach(c=>{
+  for(let col=0; col<5; col++){
     const colEl = document.createElement('div')
     colEl.className='col'
     // gate marker
-    if(window._gate && window._gate.col === c[0].col){
+    if(window._gate && window._gate.col === col){
       const g = document.createElement('div')
       g.className='gate'
       g.textContent = 'gate'
@@ -30,38 +39,16 @@ function render(spots, closest, freeCount){
       colEl.appendChild(ph)
     }
 
-    c.forEach(s=>{
+    for(let row=0; row<10; row++){
       const sp = document.createElement('div')
       const label = document.createElement('div')
       label.className = 'spot-label'
       sp.className='spot'
-      // normalize status (be case-insensitive and robust to missing fields)
-      let st = 'FREE'
-      if(s.info){
-        if(s.info.status) st = s.info.status
-        else if(s.info.Status) st = s.info.Status
-        else if(s.info.state) st = s.info.state
-      }
-  st = ('' + st).toUpperCase()
-  if(st === 'FREE') sp.classList.add('free')
-  else if(st === 'WAITING' || st === 'PENDING') sp.classList.add('waiting')
-  else if(st === 'WRONG_PARK') sp.classList.add('wrong')
-  else sp.classList.add('occupied')
-      sp.textContent = `(${s.row},${s.col})`
-      // small textual status under the tile
-      // If the whole lot is full (freeCount===0) we hide the 'OCCUPIED' label to reduce clutter
-      if(typeof freeCount !== 'undefined' && freeCount === 0 && st === 'OCCUPIED'){
-        label.textContent = ''
-      }else{
-        label.textContent = st
-      }
+      sp.textContent = `(${row},${col})`
       label.style.marginTop = '6px'
       label.style.fontSize = '12px'
       label.style.fontWeight = '700'
       label.style.color = '#444'
-      if(closest && closest===s.key){
-        sp.style.outline='4px solid rgba(0,0,0,0.25)'
-      }
       const wrapper = document.createElement('div')
       wrapper.style.display = 'flex'
       wrapper.style.flexDirection = 'column'
@@ -69,80 +56,158 @@ function render(spots, closest, freeCount){
       wrapper.appendChild(sp)
       wrapper.appendChild(label)
       colEl.appendChild(wrapper)
-    })
+      cells[`${row},${col}`] = {sp, label}
+    }
     gridEl.appendChild(colEl)
-  })
+  }
 }
 
-async function poll(){
-  try{
-    const r = await fetch('/api/status')
-    const j = await r.json()
-  const spots = j.spots || {}
-  const closest = j.closest_free
-  const freeCount = typeof j.free_count !== 'undefined' ? j.free_count : null
-  if(j.gate) window._gate = j.gate
-  render(spots, closest, freeCount)
+function patchSpot(key){
+  const cell = cells && cells[key]
+  if(!cell) return
+  const st = spotStatus(state.spots[key])
+  const sp = cell.sp
+  sp.className = 'spot'
+  if(st === 'FREE') sp.classList.add('free')
+  else if(st === 'WAITING' || st === 'PENDING') sp.classList.add('waiting')
+  else if(st === 'WRONG_PARK') sp.classList.add('wrong')
+  else sp.classList.add('occupied')
+  // small textual status under the tile
+  // If the whole lot is full (freeCount===0) we hide the 'OCCUPIED' label to reduce clutter
+  cell.label.textContent = (state.freeCount === 0 && st === 'OCCUPIED') ? '' : st
+  sp.style.outline = state.closest === key ? '4px solid rgba(0,0,0,0.25)' : ''
+}
+
+function render(){
+  if(!cells) buildGrid()
+  Object.keys(cells).forEach(patchSpot)
+}
+
+function setGate(gate){
+  if(!gate) return
+  const prev = window._gate
+  window._gate = gate
+  // the gate marker lives in the column markup, so rebuild only when it moves
+  if(!prev || prev.col !== gate.col) cells = null
+}
+
+function setBanner(full){
+  const banner = document.getElementById('side-banner')
+  if(!banner) return
+  banner.textContent = full ? 'THERE ARE NO FREE SPOTS' : 'THERE ARE FREE SPOTS'
+  banner.style.background = full ? '#ff3b2f' : '#7be36a' // bright red / bright green
+  banner.style.color = '#000' // black text for contrast
+  banner.style.display = 'flex'
+  document.querySelector('.arriving-wrap').classList.add('square')
+  banner.classList.add('square')
+}
+
+function updatePanel(){
   // show parking full banner when DB reports no free spots
   const banner = document.getElementById('side-banner')
   if(banner){
-    // Show a user-friendly message for both states
-    if(typeof freeCount === 'number'){
-      if(freeCount === 0){
-        banner.textContent = 'THERE ARE NO FREE SPOTS'
-        banner.style.background = '#ff3b2f' // bright red
-        banner.style.color = '#000' // black text for contrast
-        banner.style.display = 'flex'
-        document.querySelector('.arriving-wrap').classList.add('square')
-        banner.classList.add('square')
-      }else{
-        banner.textContent = 'THERE ARE FREE SPOTS'
-        banner.style.background = '#7be36a' // bright green
-        banner.style.color = '#000'
-        banner.style.display = 'flex'
-        document.querySelector('.arriving-wrap').classList.add('square')
-        banner.classList.add('square')
-      }
-    }else{
+    if(typeof state.freeCount === 'number'){
+      setBanner(state.freeCount === 0)
+    }else if(state.isFull){
       // fallback: use is_full if free_count not provided
-      if(j.is_full){
-        banner.textContent = 'THERE ARE NO FREE SPOTS'
-        banner.style.background = '#ff3b2f'
-        banner.style.color = '#000'
-        banner.style.display = 'flex'
-        document.querySelector('.arriving-wrap').classList.add('square')
-        banner.classList.add('square')
-      }else{
-        banner.style.display = 'none'
-        document.querySelector('.arriving-wrap').classList.remove('square')
-        banner.classList.remove('square')
-      }
+      setBanner(true)
+    }else{
+      banner.style.display = 'none'
+      document.querySelector('.arriving-wrap').classList.remove('square')
+      banner.classList.remove('square')
     }
   }
   // display free_count in the right panel (optional)
   const metaEl = document.querySelector('.meta')
-  if(metaEl && typeof j.free_count !== 'undefined'){
-    metaEl.textContent = `Last update: ${new Date(j.ts).toLocaleTimeString()} — Free spots: ${j.free_count}`
+  if(metaEl && typeof state.freeCount === 'number'){
+    metaEl.textContent = `Last update: ${new Date(state.ts).toLocaleTimeString()} — Free spots: ${state.freeCount}`
   }
   const pill = document.getElementById('closest-pill')
-  pill.textContent = closest ? `(${closest})` : '-'
-      if(arrivingIdEl){
-        const gid = j.gate_waiting_car || '-'
-        // always set text (ensures UI shows current value even if we missed a transient)
-        const prev = arrivingIdEl.textContent
-        arrivingIdEl.textContent = gid
-        // animate when id changes
-        if(prev !== gid){
-          arrivingIdEl.classList.remove('pulse')
-          void arrivingIdEl.offsetWidth
-          arrivingIdEl.classList.add('pulse')
-        }
-      }
-    tsEl.textContent = new Date(j.ts).toLocaleTimeString()
+  pill.textContent = state.closest ? `(${state.closest})` : '-'
+  if(arrivingIdEl){
+    const gid = state.waitingCar || '-'
+    // always set text (ensures UI shows current value even if we missed a transient)
+    const prev = arrivingIdEl.textContent
+    arrivingIdEl.textContent = gid
+    // animate when id changes
+    if(prev !== gid){
+      arrivingIdEl.classList.remove('pulse')
+      void arrivingIdEl.offsetWidth
+      arrivingIdEl.classList.add('pulse')
+    }
+  }
+  if(state.ts) tsEl.textContent = new Date(state.ts).toLocaleTimeString()
+}
+
+// Copy summary fields present in a payload (deltas only carry what changed).
+// Returns true when something that affects every cell's rendering changed.
+function applySummary(j){
+  let global = false
+  if('closest_free' in j){
+    const prev = state.closest
+    state.closest = j.closest_free
+    if(cells){ patchSpot(prev); patchSpot(state.closest) }
+  }
+  if('free_count' in j){
+    // the OCCUPIED label is hidden lot-wide when the count hits 0
+    global = (state.freeCount === 0) !== (j.free_count === 0)
+    state.freeCount = j.free_count
+  }
+  if('is_full' in j) state.isFull = j.is_full
+  if('gate_waiting_car' in j) state.waitingCar = j.gate_waiting_car
+  if(j.ts) state.ts = j.ts
+  return global
+}
+
+function applySnapshot(j){
+  setGate(j.gate)
+  state.spots = j.spots || {}
+  applySummary(j)
+  render()
+  updatePanel()
+}
+
+function applyDelta(j){
+  const changed = j.spots || {}
+  for(const key of Object.keys(changed)){
+    if(changed[key] === null) delete state.spots[key]
+    else state.spots[key] = changed[key]
+  }
+  if(applySummary(j)) render()
+  else Object.keys(changed).forEach(patchSpot)
+  updatePanel()
+}
+
+async function poll(){
+  try{
+    const r = await fetch('/api/status' + location.search)
+    applySnapshot(await r.json())
   }catch(e){
     console.error(e)
   }
 }
-// poll faster so UI catches transient waiting states
-setInterval(poll, 400)
-poll()
+
+let pollTimer = null
+function startPolling(){
+  if(pollTimer) return
+  // poll faster so UI catches transient waiting states
+  pollTimer = setInterval(poll, 400)
+  poll()
+}
+
+function connect(){
+  if(!window.EventSource){
+    startPolling()
+    return
+  }
+  // one long-lived connection; the server pushes a snapshot then per-spot deltas
+  const es = new EventSource('/api/stream' + location.search)
+  es.addEventListener('snapshot', e => applySnapshot(JSON.parse(e.data)))
+  es.addEventListener('delta', e => applyDelta(JSON.parse(e.data)))
+  es.onerror = () => {
+    // CLOSED means the server refused the stream (e.g. 503 without a live
+    // mirror); transient drops stay CONNECTING and reconnect on their own
+    if(es.readyState === EventSource.CLOSED) startPolling()
+  }
+}
+connect()
@@ -0,0 +1,420 @@
+# Storage backends - the RTDB operations the server uses (get/set/update/
+# delete/listen) behind one interface, so the simulator, dashboard and the
+# benchmarks can run against an in-process tree instead of a Firebase project.
+#
+# Modules call storage.reference(path), which behaves like
+# firebase_admin.db.reference(path) on whichever backend is active:
+#   - FirebaseStorage (default)  the real RTDB via firebase_admin
+#   - RestStorage                STORAGE_BACKEND=rest, the RTDB REST API through
+#                                rtdb_client's pooled keep-alive session
+#   - MemoryStorage              STORAGE_BACKEND=memory, or storage.use(MemoryStorage())
+#
+# References are cached per path, so repeated storage.reference(...) calls
+# on a hot path cost a dict lookup.
+
+import abc
+import copy
+import os
+import threading
+import time
+import typing
+from collections import Counter, deque
+import rtdb_client
+
+
+def split_path(path) -> typing.List[str]:
+    """'/SondosPark/SPOTS/3,1/' -> ['SondosPark', 'SPOTS', '3,1']"""
+    return [p for p in str(path or '/').split('/') if p]
+
+
+def join_path(parts) -> str:
+    return '/' + '/'.join(parts)
+
+
+class Event:
+    """Listener event with the same attributes as firebase_admin.db.Event."""
+
+    def __init__(self, event_type: str, path: str, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+    def __repr__(self):
+        return f"Event({self.event_type!r}, {self.path!r}, {str(self.data)[:60]})"
+
+
+class Storage(abc.ABC):
+    """Backend interface. Paths are absolute ('/SondosPark/SPOTS/3,1').
+
+    update() takes multi-path keys relative to path ('SPOTS/3,1/status');
+    None values delete. listen() calls callback(Event) with an initial 'put'
+    at '/' and then every change below path; it returns an object with close().
+    """
+
+    @abc.abstractmethod
+    def get(self, path: str, shallow: bool = False):
+        ...
+
+    @abc.abstractmethod
+    def set(self, path: str, value):
+        ...
+
+    @abc.abstractmethod
+    def update(self, path: str, value: dict):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, path: str):
+        ...
+
+    @abc.abstractmethod
+    def listen(self, path: str, callback):
+        ...
+
+
+class FirebaseStorage(Storage):
+    """The Firebase RTDB through firebase_admin.
+
+    The app is initialized by firebase_init in the background as soon as the
+    backend is created; the first DB call waits for it to finish. Requests
+    share rtdb_client's concurrency limit and metrics, and firebase_admin's
+    session gets rtdb_client's keep-alive pool.
+    """
+
+    def __init__(self):
+        import firebase_init
+        self._firebase = firebase_init
+        firebase_init.start()
+        rtdb_client.report_at_exit()
+
+    def _ref(self, path):
+        self._firebase.init()
+        # looked up per call so tests can patch firebase_admin.db.reference
+        from firebase_admin import db
+        ref = db.reference(path)
+        rtdb_client.mount_pooled(getattr(getattr(ref, '_client', None), 'session', None))
+        return ref
+
+    def get(self, path, shallow=False):
+        ref = self._ref(path)
+        with rtdb_client.Request('get'):
+            return ref.get(shallow=True) if shallow else ref.get()
+
+    def set(self, path, value):
+        ref = self._ref(path)
+        with rtdb_client.Request('set'):
+            ref.set(value)
+
+    def update(self, path, value):
+        ref = self._ref(path)
+        with rtdb_client.Request('update'):
+            ref.update(value)
+
+    def delete(self, path):
+        ref = self._ref(path)
+        with rtdb_client.Request('delete'):
+            ref.delete()
+
+    def listen(self, path, callback):
+        return self._ref(path).listen(callback)
+
+
+class RestStorage(Storage):
+    """The RTDB REST API through rtdb_client.RtdbClient.
+
+    Without base_url the database URL and credentials come from firebase_init
+    on first use (RTDB_AUTH=none: unauthenticated, RTDB_URL). Listeners are
+    server-sent event streams, delivered on their own thread like firebase_admin's.
+    """
+
+    def __init__(self, base_url: typing.Optional[str] = None, auth=None, pool_size: typing.Optional[int] = None):
+        self._client = rtdb_client.RtdbClient(base_url, auth=auth, pool_size=pool_size) if base_url else None
+        self._client_lock = threading.Lock()
+        rtdb_client.report_at_exit()
+
+    @property
+    def client(self) -> 'rtdb_client.RtdbClient':
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = rtdb_client.from_env()
+        return self._client
+
+    def get(self, path, shallow=False):
+        return self.client.get(path, shallow=shallow)
+
+    def set(self, path, value):
+        if value is None:
+            self.client.delete(path)
+        else:
+            self.client.set(path, value)
+
+    def update(self, path, value):
+        if not isinstance(value, dict) or not value:
+            raise ValueError('update() needs a non-empty dict')
+        self.client.update(path, value)
+
+    def delete(self, path):
+        self.client.delete(path)
+
+    def listen(self, path, callback):
+        return self.client.stream(path, lambda kind, sub, data: callback(Event(kind, sub, data)))
+
+
+def _normalize(value):
+    """Copy value the way the RTDB stores it: no None children, no empty nodes."""
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            v = _normalize(v)
+            if v is not None:
+                out[str(k)] = v
+        return out or None
+    return copy.deepcopy(value)
+
+
+class _Listener:
+    def __init__(self, storage, parts, callback):
+        self.storage = storage
+        self.parts = parts
+        self.callback = callback
+
+    def close(self):
+        self.storage._remove_listener(self)
+
+
+class MemoryStorage(Storage):
+    """In-process RTDB tree with path semantics and listener callbacks.
+
+    Writes are atomic under one lock. Listener events are queued in write
+    order and delivered on the writing thread before the write returns, so
+    runs are deterministic. latency (seconds) is slept per request outside
+    the lock to emulate network round trips; `ops` counts requests by kind.
+    """
+
+    def __init__(self, data: typing.Optional[dict] = None, latency: float = 0.0):
+        self._root = _normalize(data) or {}
+        self.latency = latency
+        self.ops = Counter()
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._events = deque()
+        self._dispatch_lock = threading.RLock()
+        self._dispatching = threading.local()
+
+    @property
+    def requests(self) -> int:
+        return sum(self.ops.values())
+
+    def _request(self, kind):
+        with self._lock:
+            self.ops[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    # Tree access (callers hold self._lock)
+    def _node(self, parts):
+        node = self._root
+        for p in parts:
+            if not isinstance(node, dict) or p not in node:
+                return None
+            node = node[p]
+        return node
+
+    def _write(self, parts, value):
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        chain = [self._root]
+        node = self._root
+        for p in parts[:-1]:
+            child = node.get(p)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = {}
+                node[p] = child
+            node = child
+            chain.append(node)
+        if value is None:
+            node.pop(parts[-1], None)
+            # drop parents left empty
+            for depth in range(len(parts) - 1, 0, -1):
+                if chain[depth]:
+                    break
+                chain[depth - 1].pop(parts[depth - 1], None)
+        else:
+            node[parts[-1]] = value
+
+    # Storage interface
+    def get(self, path, shallow=False):
+        self._request('get')
+        with self._lock:
+            node = self._node(split_path(path))
+            if shallow and isinstance(node, dict):
+                return {k: (True if isinstance(v, dict) else v) for k, v in node.items()}
+            return copy.deepcopy(node)
+
+    def set(self, path, value):
+        self._request('set')
+        parts = split_path(path)
+        value = _normalize(value)
+        with self._lock:
+            self._write(parts, value)
+            self._queue_events([(parts, value)], base=None)
+        self._dispatch()
+
+    def update(self, path, value):
+        if not isinstance(value, dict) or not value:
+            raise ValueError('update() needs a non-empty dict')
+        self._request('update')
+        base = split_path(path)
+        writes = [(base + split_path(k), _normalize(v)) for k, v in value.items()]
+        with self._lock:
+            for parts, v in writes:
+                self._write(parts, v)
+            self._queue_events(writes, base=base)
+        self._dispatch()
+
+    def delete(self, path):
+        self._request('delete')
+        parts = split_path(path)
+        with self._lock:
+            self._write(parts, None)
+            self._queue_events([(parts, None)], base=None)
+        self._dispatch()
+
+    def listen(self, path, callback):
+        listener = _Listener(self, split_path(path), callback)
+        with self._lock:
+            self._listeners.append(listener)
+            self._events.append((listener, Event('put', '/', copy.deepcopy(self._node(listener.parts)))))
+        self._dispatch()
+        return listener
+
+    def _remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    # Events
+    def _queue_events(self, writes, base):
+        """Queue what every listener sees for writes [(parts, value)] (under self._lock).
+
+        An update() whose keys are all direct children of a path at or below
+        the listener arrives as one 'patch', like Firebase; everything else as
+        'put' events, with a 'put' at '/' for listeners below a written path.
+        """
+        for listener in self._listeners:
+            lp = listener.parts
+            n = len(lp)
+            if base is not None and base[:n] == lp and all(len(p) == len(base) + 1 for p, _ in writes):
+                data = {p[-1]: copy.deepcopy(v) for p, v in writes}
+                self._events.append((listener, Event('patch', join_path(base[n:]), data)))
+                continue
+            covered = False
+            for parts, value in writes:
+                if parts[:n] == lp:
+                    self._events.append((listener, Event('put', join_path(parts[n:]), copy.deepcopy(value))))
+                elif lp[:len(parts)] == parts:
+                    covered = True
+            if covered:
+                self._events.append((listener, Event('put', '/', copy.deepcopy(self._node(lp)))))
+
+    def _dispatch(self):
+        # a callback that writes again only queues; the outer loop delivers it
+        if getattr(self._dispatching, 'active', False):
+            return
+        with self._dispatch_lock:
+            self._dispatching.active = True
+            try:
+                while True:
+                    with self._lock:
+                        if not self._events:
+                            return
+                        listener, event = self._events.popleft()
+                        if listener not in self._listeners:
+                            continue
+                    try:
+                        listener.callback(event)
+                    except Exception as e:
+                        print(f"[STORAGE] Listener on {join_path(listener.parts)} failed: {e}")
+            finally:
+                self._dispatching.active = False
+
+
+class Reference:
+    """firebase_admin.db.Reference look-alike bound to a Storage backend."""
+
+    def __init__(self, backend: Storage, path: str = '/'):
+        self._backend = backend
+        self._parts = split_path(path)
+
+    @property
+    def path(self) -> str:
+        return join_path(self._parts)
+
+    @property
+    def key(self) -> typing.Optional[str]:
+        return self._parts[-1] if self._parts else None
+
+    def child(self, path: str) -> 'Reference':
+        path = join_path(self._parts + split_path(path))
+        return reference(path) if self._backend is _backend else Reference(self._backend, path)
+
+    def get(self, etag: bool = False, shallow: bool = False):
+        return self._backend.get(self.path, shallow=shallow)
+
+    def set(self, value):
+        self._backend.set(self.path, value)
+
+    def update(self, value: dict):
+        self._backend.update(self.path, value)
+
+    def delete(self):
+        self._backend.delete(self.path)
+
+    def listen(self, callback):
+        return self._backend.listen(self.path, callback)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+# path -> Reference on the active backend; cleared when the backend changes
+_references = {}
+REFERENCE_CACHE_SIZE = 4096
+
+
+def get_backend() -> Storage:
+    """The active backend; STORAGE_BACKEND=memory|rest selects MemoryStorage / RestStorage."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            kind = os.environ.get('STORAGE_BACKEND', 'firebase').lower()
+            if kind == 'memory':
+                _backend = MemoryStorage()
+            elif kind == 'rest':
+                _backend = RestStorage()
+            else:
+                _backend = FirebaseStorage()
+        return _backend
+
+
+def use(backend: typing.Optional[Storage]) -> typing.Optional[Storage]:
+    """Make backend the active one (None: pick again from STORAGE_BACKEND); returns the previous."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+        _references.clear()
+        return previous
+
+
+def reference(path: str = '/') -> Reference:
+    """Drop-in for firebase_admin.db.reference on the active backend (cached per path)."""
+    backend = _backend or get_backend()
+    ref = _references.get(path)
+    if ref is None or ref._backend is not backend:
+        if len(_references) >= REFERENCE_CACHE_SIZE:
+            _references.clear()
+        ref = _references[path] = Reference(backend, path)
+    return ref
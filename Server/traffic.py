@@ -0,0 +1,235 @@
+# Traffic models for the simulator - arrival processes and dwell-time
+# distributions, generated lazily so a run can replay a realistic day (or
+# week) of load against the allocator and the dashboard.
+#
+# Arrival streams yield arrival times in seconds from the start of the run;
+# dwell samplers are called with an RNG and return a stay in seconds.
+# A TrafficModel bundles one of each with a seed, so two runs of the same
+# model see exactly the same cars.
+
+import math
+import os
+import random
+import typing
+
+# Hourly arrival-rate multipliers (index = hour of day), piecewise constant
+PROFILES = {
+    'flat': [1.0] * 24,
+    # commuter lot: morning and evening peaks
+    'weekday': [0.10, 0.05, 0.05, 0.05, 0.10, 0.30, 0.80, 1.60, 2.00, 1.40, 1.00, 1.00,
+                1.20, 1.10, 1.00, 1.10, 1.50, 1.90, 1.40, 0.90, 0.60, 0.40, 0.30, 0.20],
+    # shopping lot: late start, midday and early-evening peaks
+    'weekend': [0.10, 0.05, 0.05, 0.05, 0.05, 0.10, 0.20, 0.40, 0.70, 1.10, 1.50, 1.80,
+                1.90, 1.80, 1.70, 1.70, 1.60, 1.50, 1.30, 1.00, 0.70, 0.40, 0.25, 0.15],
+}
+
+
+# Arrival processes
+def fixed_arrivals(rng: random.Random, interval: float) -> typing.Iterator[float]:
+    """A car every interval seconds (the simulator's ARRIVAL_INTERVAL_SECONDS)."""
+    t = 0.0
+    while True:
+        yield t
+        t += interval
+
+
+def poisson_arrivals(rng: random.Random, rate_per_hour: float) -> typing.Iterator[float]:
+    """Homogeneous Poisson process: exponential gaps, rate_per_hour cars on average."""
+    rate = rate_per_hour / 3600.0
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate)
+        yield t
+
+
+def profile_rate(profile: typing.Sequence[float], rate_per_hour: float,
+                 start_hour: float = 0.0) -> typing.Callable[[float], float]:
+    """rate(t) in cars/second for an hourly multiplier profile; t=0 is start_hour o'clock."""
+    hours = len(profile)
+
+    def rate(t: float) -> float:
+        return rate_per_hour * profile[int(start_hour + t / 3600.0) % hours] / 3600.0
+    return rate
+
+
+def inhomogeneous_arrivals(rng: random.Random, rate: typing.Callable[[float], float],
+                           max_rate: float) -> typing.Iterator[float]:
+    """Poisson process with time-varying rate(t) (cars/second), by thinning.
+
+    Candidates come at the constant max_rate (>= rate(t) everywhere) and each
+    is kept with probability rate(t) / max_rate (Lewis & Shedler).
+    """
+    t = 0.0
+    while True:
+        t += rng.expovariate(max_rate)
+        if rng.random() * max_rate <= rate(t):
+            yield t
+
+
+def rush_hour_arrivals(rng: random.Random, rate_per_hour: float, profile='weekday',
+                       start_hour: float = 0.0) -> typing.Iterator[float]:
+    """Poisson arrivals at rate_per_hour scaled by an hourly profile (a PROFILES name or 24 numbers)."""
+    if isinstance(profile, str):
+        profile = PROFILES[profile]
+    peak = rate_per_hour * max(profile) / 3600.0
+    if peak <= 0:
+        return iter(())
+    return inhomogeneous_arrivals(rng, profile_rate(profile, rate_per_hour, start_hour), peak)
+
+
+def replay_arrivals(times: typing.Iterable[float]) -> typing.Iterator[float]:
+    """A recorded arrival trace (seconds from start, ascending) as a stream."""
+    last = 0.0
+    for t in times:
+        t = float(t)
+        if t < last:
+            raise ValueError(f"arrival trace goes back in time at {t}")
+        last = t
+        yield t
+
+
+# Dwell-time distributions
+def fixed_dwell(seconds: float) -> typing.Callable[[random.Random], float]:
+    return lambda rng: seconds
+
+
+def exponential_dwell(mean: float) -> typing.Callable[[random.Random], float]:
+    return lambda rng: rng.expovariate(1.0 / mean)
+
+
+def lognormal_dwell(mean: float, sigma: float = 0.8) -> typing.Callable[[random.Random], float]:
+    """Lognormal stays with the given mean (seconds); sigma is the spread of log(stay).
+
+    Parking durations are right-skewed: most stays are short, a few last all day.
+    """
+    mu = math.log(mean) - sigma * sigma / 2.0
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def empirical_dwell(samples: typing.Iterable[float]) -> typing.Callable[[random.Random], float]:
+    """Stays drawn from observed durations (seconds), interpolating between order statistics."""
+    values = sorted(float(s) for s in samples)
+    if not values:
+        raise ValueError('empirical_dwell needs at least one sample')
+    if len(values) == 1:
+        return fixed_dwell(values[0])
+    steps = len(values) - 1
+
+    def sample(rng: random.Random) -> float:
+        pos = rng.random() * steps
+        i = int(pos)
+        return values[i] + (values[i + 1] - values[i]) * (pos - i) if i < steps else values[-1]
+    return sample
+
+
+def _load_samples(source: str) -> typing.List[float]:
+    """'600,1800,3600' or a file path with one duration (seconds) per line."""
+    if os.path.exists(source):
+        with open(source) as f:
+            return [float(line) for line in f if line.strip() and not line.lstrip().startswith('#')]
+    return [float(v) for v in source.split(',') if v.strip()]
+
+
+# Specs ('kind:param,param') for env vars and command lines
+def _split_spec(spec: str) -> typing.Tuple[str, typing.List[str]]:
+    kind, _, params = str(spec).strip().partition(':')
+    return kind.strip().lower(), [p.strip() for p in params.split(',') if p.strip()] if params else []
+
+
+def parse_profile(spec) -> typing.Optional[typing.List[float]]:
+    """A PROFILES name or 24 comma-separated multipliers; None/'' for no profile."""
+    if not spec:
+        return None
+    if isinstance(spec, str) and spec.strip().lower() in PROFILES:
+        return PROFILES[spec.strip().lower()]
+    values = [float(v) for v in (spec.split(',') if isinstance(spec, str) else spec)]
+    if len(values) != 24:
+        raise ValueError(f"a traffic profile needs 24 hourly multipliers, got {len(values)}")
+    return values
+
+
+def parse_arrivals(spec: str, profile=None, start_hour: float = 0.0
+                   ) -> typing.Callable[[random.Random], typing.Iterator[float]]:
+    """'fixed:<seconds>' | 'poisson:<cars/hour>' | 'trace:<file or t1,t2,...>' -> rng -> stream.
+
+    With a profile, poisson becomes the rush-hour (inhomogeneous) process.
+    """
+    kind, params = _split_spec(spec)
+    profile = parse_profile(profile)
+    if kind == 'fixed':
+        interval = float(params[0])
+        return lambda rng: fixed_arrivals(rng, interval)
+    if kind == 'poisson':
+        rate = float(params[0])
+        if profile is not None:
+            return lambda rng: rush_hour_arrivals(rng, rate, profile, start_hour)
+        return lambda rng: poisson_arrivals(rng, rate)
+    if kind == 'trace':
+        times = _load_samples(','.join(params))
+        return lambda rng: replay_arrivals(times)
+    raise ValueError(f"unknown arrival model '{spec}' (fixed, poisson, trace)")
+
+
+def parse_dwell(spec: str) -> typing.Callable[[random.Random], float]:
+    """'fixed:<s>' | 'exp:<mean s>' | 'lognormal:<mean s>[,sigma]' | 'empirical:<file or s1,s2,...>'."""
+    kind, params = _split_spec(spec)
+    if kind == 'fixed':
+        return fixed_dwell(float(params[0]))
+    if kind in ('exp', 'exponential'):
+        return exponential_dwell(float(params[0]))
+    if kind == 'lognormal':
+        return lognormal_dwell(*[float(p) for p in params[:2]])
+    if kind == 'empirical':
+        return empirical_dwell(_load_samples(','.join(params)))
+    raise ValueError(f"unknown dwell model '{spec}' (fixed, exp, lognormal, empirical)")
+
+
+class TrafficModel:
+    """An arrival process + a dwell distribution + a seed: one reproducible workload.
+
+    Arrivals and dwell times draw from separate RNGs derived from the seed,
+    so changing the dwell model leaves the arrival times of a run untouched
+    (and vice versa) - runs differ only in what was changed. Without a seed
+    every stream is freshly random. dwell=None keeps the simulator's periodic
+    random departures.
+    """
+
+    def __init__(self, arrivals: typing.Callable[[random.Random], typing.Iterator[float]],
+                 dwell: typing.Optional[typing.Callable[[random.Random], float]] = None,
+                 seed=None, name: str = ''):
+        self.arrivals = arrivals
+        self.dwell = dwell
+        self.seed = seed
+        self.name = name
+
+    def __repr__(self):
+        return f"TrafficModel({self.name or 'custom'}, seed={self.seed})"
+
+    def rng(self, stream: str) -> random.Random:
+        """A fresh RNG for one named stream ('arrivals', 'dwell', ...)."""
+        return random.Random(None if self.seed is None else f"{self.seed}/{stream}")
+
+    def arrival_times(self) -> typing.Iterator[float]:
+        """A fresh, lazily generated arrival stream (seconds from the start of the run)."""
+        return self.arrivals(self.rng('arrivals'))
+
+    @classmethod
+    def from_spec(cls, arrivals: str = 'fixed:5', dwell: typing.Optional[str] = None, profile=None,
+                  seed=None, start_hour: float = 0.0) -> 'TrafficModel':
+        name = ' '.join(p for p in (arrivals, f"profile={profile}" if profile else '',
+                                    f"dwell={dwell}" if dwell else '') if p)
+        return cls(parse_arrivals(arrivals, profile, start_hour), parse_dwell(dwell) if dwell else None,
+                   seed=seed, name=name)
+
+    @classmethod
+    def from_env(cls) -> typing.Optional['TrafficModel']:
+        """Model from SIM_ARRIVALS / SIM_DWELL / SIM_PROFILE / SIM_SEED / SIM_START_HOUR (None if unset)."""
+        arrivals = os.environ.get('SIM_ARRIVALS')
+        dwell = os.environ.get('SIM_DWELL')
+        if not arrivals and not dwell:
+            return None
+        if not arrivals:
+            arrivals = f"fixed:{os.environ.get('ARRIVAL_INTERVAL_SECONDS', '5')}"
+        seed = os.environ.get('SIM_SEED') or None
+        return cls.from_spec(arrivals, dwell, os.environ.get('SIM_PROFILE') or None, seed,
+                             float(os.environ.get('SIM_START_HOUR', '0')))
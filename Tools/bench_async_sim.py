@@ -0,0 +1,100 @@
+"""Benchmark: rush-hour arrival rate the one-car-at-a-time loop and the asyncio simulator sustain.
+
+Run from the repository root:
+    python Tools/bench_async_sim.py
+    python Tools/bench_async_sim.py --cars 2000 --rate 3600 --latency-ms 50 --speed 60
+
+Both sides push --cars cars through arrival -> park (--wait virtual seconds
+later) against a storage.MemoryStorage that sleeps --latency-ms per request,
+at --speed virtual seconds per real second. The sequential side is
+simulate_n_arrivals' loop: one car in flight, arriving only once the previous
+one has parked. The async side is async_sim.AsyncParkingSimulation offered
+--rate cars per virtual hour, with the writes micro-batched (--window-ms) as
+simulate_async does. "sustained" is the arrival rate actually achieved, in
+cars per virtual hour.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import eventlog  # noqa: E402
+import rtdb_batch  # noqa: E402
+import storage  # noqa: E402
+from async_sim import AsyncParkingSimulation  # noqa: E402
+from constants import ROOT_BRANCH  # noqa: E402
+from data_structures import ParkingLot, Spot  # noqa: E402
+from event_generator import simulate_car_arrival, simulate_car_parked  # noqa: E402
+from traffic import fixed_dwell  # noqa: E402
+
+
+def make_lot(latency, rows, cols):
+    spots = {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c} for r in range(rows) for c in range(cols)}
+    storage.use(storage.MemoryStorage({ROOT_BRANCH: {'SPOTS': spots}}, latency=latency))
+    pl = ParkingLot()
+    for r in range(rows):
+        for c in range(cols):
+            pl.add_spot(Spot(r, c, r + c))
+    return pl
+
+
+def sequential(args):
+    pl = make_lot(args.latency_ms / 1000, args.rows, args.cols)
+    rtdb_batch.set_batch_window(0)
+    started = time.perf_counter()
+    for _ in range(args.cars):
+        plate = simulate_car_arrival(pl)
+        time.sleep(args.wait / args.speed)
+        simulate_car_parked(pl, plate)
+    return time.perf_counter() - started, len(pl.occupied_spots_with_cars), 1, 0.0
+
+
+def concurrent(args):
+    pl = make_lot(args.latency_ms / 1000, args.rows, args.cols)
+    rtdb_batch.set_batch_window(args.window_ms / 1000)
+    sim = AsyncParkingSimulation(pl, arrival_interval=3600.0 / args.rate, wait_between=args.wait,
+                                 wrong_park_interval=0, dwell=fixed_dwell(10 * 86400), speed=args.speed)
+    started = time.perf_counter()
+
+    async def run():
+        task = asyncio.ensure_future(sim.run())
+        while sim.stats['parked'] < args.cars:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return elapsed
+    elapsed = asyncio.run(run())
+    rtdb_batch.flush()
+    return elapsed, sim.stats['parked'], sim.peak['cars'], sim.io_wait
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--cars', type=int, default=200)
+    ap.add_argument('--rate', type=float, default=1800.0, help='offered arrivals per virtual hour (async side)')
+    ap.add_argument('--wait', type=float, default=30.0, help='virtual seconds from arrival to parked')
+    ap.add_argument('--speed', type=float, default=60.0, help='virtual seconds per real second')
+    ap.add_argument('--latency-ms', type=float, default=20.0, help='per-request storage latency')
+    ap.add_argument('--window-ms', type=float, default=100.0, help='write micro-batch window (async side)')
+    ap.add_argument('--rows', type=int, default=40)
+    ap.add_argument('--cols', type=int, default=50)
+    args = ap.parse_args()
+    assert args.cars <= args.rows * args.cols, 'every car needs a spot'
+
+    print(f"{args.cars} cars, {args.wait:g}s to park, {args.latency_ms:g} ms per request, {args.speed:g}x real time")
+    print(f"{'simulator':<12}{'wall':>8}{'parked':>8}{'sustained':>14}{'in flight':>11}{'slot wait':>11}")
+    for name, run in (('sequential', sequential), ('asyncio', concurrent)):
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            elapsed, parked, peak, waited = run(args)
+            eventlog.flush()
+        rate = parked / (elapsed * args.speed) * 3600
+        print(f"{name:<12}{elapsed:>7.1f}s{parked:>8}{rate:>10.0f}/h{peak:>11}{waited:>10.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark: resetting the whole lot (clear CARS, every spot FREE).
+
+Run from the repository root:
+    python Tools/bench_bulk_reset.py                     # 50 / 5k / 50k spots, 5 ms round trips
+    python Tools/bench_bulk_reset.py --spots 10000 --rtt 20 --workers 8
+
+Compares the old per-spot loop (CARS delete, one set() per spot, verification
+read) with simulation_sondos.clear_cars_and_reset_spots (chunked multi-path
+updates with bounded parallelism and one verification read) against the
+storage.MemoryStorage backend. The per-spot loop is only run
+up to --legacy-max-spots and extrapolated beyond that.
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import rtdb_batch  # noqa: E402
+import storage  # noqa: E402
+import simulation_sondos  # noqa: E402
+from constants import ROOT_BRANCH  # noqa: E402
+
+
+def fill(store, n):
+    cols = 50
+    spots = {}
+    for i in range(n):
+        r, c = divmod(i, cols)
+        spots[f"{r},{c}"] = {'status': 'OCCUPIED' if i % 2 else 'FREE', 'carId': f"C{i}" if i % 2 else None,
+                             'distanceFromEntry': r + c, 'seenCarId': '-', 'waitingCarId': '-'}
+    store.set(f"/{ROOT_BRANCH}", {'SPOTS': spots, 'CARS': {f"C{i}": {'status': 'parked'} for i in range(1, n, 2)}})
+
+
+def legacy_reset():
+    """The pre-bulk clear_cars_and_reset_spots: CARS delete, one set() per spot, verification read."""
+    storage.reference(f"/{ROOT_BRANCH}/CARS").delete()
+    spots_ref = storage.reference(f"/{ROOT_BRANCH}/SPOTS")
+    data = spots_ref.get() or {}
+    ts = int(time.time() * 1000)
+    for sid, node in data.items():
+        spots_ref.child(sid).set({**node, 'status': 'FREE', 'carId': None, 'seenCarId': '-',
+                                  'waitingCarId': '-', 'lastUpdateMs': ts})
+    storage.reference(f"/{ROOT_BRANCH}/CARS").get()
+    storage.reference(f"/{ROOT_BRANCH}/SPOTS").get()
+
+
+def check(store):
+    lot = store.get(f"/{ROOT_BRANCH}")
+    assert 'CARS' not in lot
+    assert all(s['status'] == 'FREE' for s in lot['SPOTS'].values())
+
+
+def timed(store, fn):
+    store.ops.clear()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    return time.perf_counter() - started, store.requests
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--spots', type=int, nargs='+', default=[50, 5000, 50000])
+    ap.add_argument('--rtt', type=float, default=5.0, help='milliseconds per RTDB request')
+    ap.add_argument('--workers', type=int, default=rtdb_batch.BULK_WORKERS)
+    ap.add_argument('--chunk', type=int, default=rtdb_batch.BULK_CHUNK_SIZE)
+    ap.add_argument('--legacy-max-spots', type=int, default=5000)
+    args = ap.parse_args()
+
+    store = storage.MemoryStorage(latency=args.rtt / 1000.0)
+    storage.use(store)
+    rtdb_batch.BULK_WORKERS = args.workers
+    rtdb_batch.BULK_CHUNK_SIZE = args.chunk
+
+    print(f"{args.rtt} ms per request, chunks of {args.chunk} paths, {args.workers} in flight")
+    print(f"{'spots':>8} {'legacy req':>11} {'legacy s':>10} {'bulk req':>9} {'bulk s':>8} {'speedup':>8}")
+    for n in args.spots:
+        if n <= args.legacy_max_spots:
+            fill(store, n)
+            legacy_s, legacy_req = timed(store, legacy_reset)
+            check(store)
+            legacy_note = ''
+        else:
+            # the per-spot loop is linear in the number of spots
+            sample = args.legacy_max_spots
+            fill(store, sample)
+            sample_s, _ = timed(store, legacy_reset)
+            legacy_s, legacy_req = sample_s * n / sample, n + 4
+            legacy_note = '~'
+        fill(store, n)
+        bulk_s, bulk_req = timed(store, simulation_sondos.clear_cars_and_reset_spots)
+        check(store)
+        print(f"{n:>8} {legacy_note + str(legacy_req):>11} {legacy_note + format(legacy_s, '.2f'):>10} "
+              f"{bulk_req:>9} {bulk_s:>8.2f} {legacy_s / bulk_s:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark: cost of logging an RTDB listener event, print() vs the eventlog queue.
+
+Run from the repository root:
+    python Tools/bench_eventlog.py
+    python Tools/bench_eventlog.py --events 20000 --spots 50000
+
+Each side logs --events listener events the way RTDB_listener._on_spots
+does, half of them single-spot patches and half full-tree puts of --spots
+spots. "print" is the old f"... {str(event.data)[:120]}" line; the eventlog
+rows hand the payload to EventLog.info wrapped in Preview, at INFO, sampled
+1 in 100 (LOG_SAMPLE) and with INFO disabled (LOG_LEVEL=WARNING). "caller"
+is the time the listener thread spends per event; "total" includes the
+background writer draining the queue. Output goes to /dev/null.
+"""
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import eventlog  # noqa: E402
+from eventlog import EventLog, Preview  # noqa: E402
+
+
+def events(args):
+    tree = {f"{i // 100},{i % 100}": {'status': 'FREE', 'distanceFromEntry': i % 97} for i in range(args.spots)}
+    patch = {'status': 'OCCUPIED', 'carId': 'AB-123'}
+    return [('put', '/', tree) if i % 2 else ('patch', '/3,4', patch) for i in range(args.events)]
+
+
+def with_print(batch):
+    started = time.perf_counter()
+    for kind, path, data in batch:
+        print(f"[SPOTS EVENT] {kind} {path} -> {str(data)[:120]}")
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+def with_eventlog(batch, devnull, **config):
+    eventlog.configure(stream=devnull, **config)
+    log = EventLog('bench', 'LISTENER')
+    started = time.perf_counter()
+    for kind, path, data in batch:
+        log.info('spots_event', '%s %s -> %s', kind, path, Preview(data), event_type=kind, path=path)
+    caller = time.perf_counter() - started
+    eventlog.flush()
+    return caller, time.perf_counter() - started
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--events', type=int, default=2000)
+    ap.add_argument('--spots', type=int, default=10000, help='spots in each full-tree put payload')
+    args = ap.parse_args()
+    batch = events(args)
+
+    print(f"{args.events} listener events, half of them {args.spots}-spot puts")
+    print(f"{'logging':<22}{'caller':>12}{'total':>12}")
+    with open(os.devnull, 'w') as devnull:
+        runs = [
+            ('print', lambda: with_print(batch)),
+            ('eventlog', lambda: with_eventlog(batch, devnull, level='INFO')),
+            ('eventlog json', lambda: with_eventlog(batch, devnull, level='INFO', fmt='json')),
+            ('eventlog 1/100', lambda: with_eventlog(batch, devnull, level='INFO', sample='spots_event=100')),
+            ('eventlog WARNING', lambda: with_eventlog(batch, devnull, level='WARNING')),
+        ]
+        for name, run in runs:
+            with contextlib.redirect_stdout(devnull):
+                caller, total = run()
+            print(f"{name:<22}{caller / args.events * 1e6:>9.1f} us{total / args.events * 1e6:>9.1f} us")
+    eventlog.shutdown()
+
+
+if __name__ == '__main__':
+    main()
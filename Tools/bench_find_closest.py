@@ -0,0 +1,102 @@
+"""Benchmark: ParkingLot.find_closest, original string-parsing BFS vs coordinate index.
+
+Run from the repository root:
+    python Tools/bench_find_closest.py
+    python Tools/bench_find_closest.py --legacy-max-cells 100000   # also time legacy on 500x200 (slow)
+
+The gate is at (0, 2) like the dashboard default. The cells closest to the gate
+are occupied (FILL fraction of the lot) so every search walks past them.
+"""
+import os
+import sys
+import time
+import argparse
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+from data_structures import ParkingLot, Spot  # noqa: E402
+
+GRIDS = [(10, 5), (100, 50), (500, 200)]
+GATE = (0, 2)
+
+
+def legacy_find_closest(pl, gate_row, gate_col):
+    """The original find_closest body (parses every spot id for every neighbor)."""
+    free_positions = set()
+    for sid, spot in pl.spot_lookup.items():
+        if getattr(spot, 'status', None) == 'FREE':
+            free_positions.add(pl._parse_spot_coords(sid))
+    if not free_positions:
+        return None
+    q = deque([(gate_row, gate_col)])
+    seen = {(gate_row, gate_col)}
+    deltas = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    while q:
+        r, c = q.popleft()
+        if (r, c) in free_positions:
+            return (r, c)
+        neighbors = []
+        for dr, dc in deltas:
+            nr, nc = r + dr, c + dc
+            if (nr, nc) in seen:
+                continue
+            if (nr, nc) in free_positions or any((nr, nc) == pl._parse_spot_coords(sid) for sid in pl.spot_lookup):
+                neighbors.append((nr, nc))
+        neighbors.sort(key=lambda rc: (rc[1], rc[0]))
+        for n in neighbors:
+            seen.add(n)
+            q.append(n)
+    return None
+
+
+def build_lot(rows, cols, fill):
+    pl = ParkingLot()
+    cells = sorted(((r, c) for r in range(rows) for c in range(cols)),
+                   key=lambda rc: abs(rc[0] - GATE[0]) + abs(rc[1] - GATE[1]))
+    occupied = set(cells[:int(len(cells) * fill)])
+    for r, c in cells:
+        s = Spot(r, c, abs(r - GATE[0]) + abs(c - GATE[1]))
+        s.status = 'OCCUPIED' if (r, c) in occupied else 'FREE'
+        pl.spot_lookup[s.spot_id] = s
+        if s.status == 'FREE':
+            pl.free_spots.add(s)
+    return pl
+
+
+def time_calls(fn, budget=1.0, max_calls=1000):
+    calls, start = 0, time.perf_counter()
+    while calls < max_calls:
+        result = fn()
+        calls += 1
+        if time.perf_counter() - start > budget:
+            break
+    return (time.perf_counter() - start) / calls, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fill', type=float, default=0.05, help='fraction of cells nearest the gate that are occupied')
+    parser.add_argument('--legacy-max-cells', type=int, default=5000, help='skip the legacy BFS on bigger lots')
+    args = parser.parse_args()
+
+    print(f"find_closest from gate {GATE}, {args.fill:.0%} of the lot occupied around the gate")
+    for rows, cols in GRIDS:
+        pl = build_lot(rows, cols, args.fill)
+        start = time.perf_counter()
+        pl.find_closest(*GATE)  # first query builds the coordinate + gate indexes
+        build = time.perf_counter() - start
+        new, new_res = time_calls(lambda: pl.find_closest(*GATE))
+        line = (f"{rows:>4}x{cols:<4} ({rows * cols:>6} spots) | first query {build * 1e3:8.2f} ms"
+                f" | indexed {new * 1e3:9.4f} ms")
+        if rows * cols <= args.legacy_max_cells:
+            old, old_res = time_calls(lambda: legacy_find_closest(pl, *GATE), budget=3.0)
+            assert old_res == new_res, (old_res, new_res)
+            line += f" | legacy {old * 1e3:10.3f} ms | speedup x{old / new:9.1f}"
+        else:
+            line += " | legacy skipped (use --legacy-max-cells)"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark: cold import time of the server entry points (python -X importtime).
+
+Run from the repository root:
+    python Tools/bench_import_time.py
+    python Tools/bench_import_time.py --budget-ms 500 --runs 5 dashboard
+
+Each module is imported in a fresh interpreter (-X importtime); the best of
+--runs cumulative times is reported with the slowest top-level imports, and
+whether Firebase / requests / numpy were pulled in. Importing must not touch
+the network: firebase_init only initializes on first DB use. Exits with
+status 1 when a module is over --budget-ms.
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server')
+HEAVY = ('firebase_admin', 'requests', 'numpy', 'flask')
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_profile(module):
+    """({direct import: cumulative us}, module's cumulative us, heavy modules loaded)."""
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=SERVER)
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, cwd=SERVER,
+                         capture_output=True, text=True, check=True)
+    rows = [(len(m.group(3)), m.group(4), int(m.group(2)))
+            for m in map(LINE.match, out.stderr.splitlines()) if m]
+    # children are listed before their parent, one indent level deeper
+    at = max(i for i, row in enumerate(rows) if row[1] == module)
+    depth, _, total = rows[at]
+    top = {}
+    for indent, name, us in reversed(rows[:at]):
+        if indent <= depth:
+            break
+        if indent == depth + 2:
+            top[name] = us
+    loaded = [m for m in out.stdout.strip().split(',') if m]
+    return top, total, loaded
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('modules', nargs='*', default=['dashboard', 'simulation_sondos'])
+    ap.add_argument('--budget-ms', type=float, default=1000.0)
+    ap.add_argument('--runs', type=int, default=3)
+    args = ap.parse_args()
+
+    over = False
+    for module in args.modules:
+        best = min((import_profile(module) for _ in range(args.runs)), key=lambda p: p[1])
+        top, total, loaded = best
+        ms = total / 1000
+        over |= ms > args.budget_ms
+        print(f"{module:<20}{ms:>8.0f} ms  (budget {args.budget_ms:.0f} ms{', OVER' if ms > args.budget_ms else ''})")
+        print(f"  loaded: {', '.join(loaded) or 'none of ' + ', '.join(HEAVY)}")
+        slowest = sorted(((us, name) for name, us in top.items()), reverse=True)[:5]
+        for us, name in slowest:
+            print(f"  {name:<28}{us / 1000:>8.1f} ms")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == '__main__':
+    main()
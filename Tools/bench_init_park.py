@@ -0,0 +1,79 @@
+"""Benchmark: initializing a large lot with one SPOTS set() vs Init_Park's chunked parallel updates.
+
+Run from the repository root:
+    python Tools/bench_init_park.py
+    python Tools/bench_init_park.py --rows 100 --cols 250 --levels 4 --latency-ms 50 --workers 8
+
+Both sides write the same spots over HTTP to Server/rtdb_standin.py (with
+--latency-ms added to every request) through storage.RestStorage. "single"
+is the old initializer: one set() of the whole payload, then a full read of
+SPOTS to count the spots. "chunked" is Init_Park.initialize: the payload
+generated lazily as --chunk-size-spot update() calls, --workers in flight,
+then a shallow (keys only) read. The MB columns are the request and
+response bodies each side moved in total.
+"""
+import os
+import sys
+import time
+import argparse
+import contextlib
+import io
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import Init_Park  # noqa: E402
+import rtdb_client  # noqa: E402
+import rtdb_standin  # noqa: E402
+import storage  # noqa: E402
+from constants import ROOT_BRANCH  # noqa: E402
+
+
+def single(layout, args):
+    spots_ref = storage.reference(ROOT_BRANCH).child('SPOTS')
+    payload = dict(layout.spots(int(time.time() * 1000)))
+    spots_ref.set(payload)
+    return len(spots_ref.get() or {})
+
+
+def chunked(layout, args):
+    # initialize() already counts the spots with its shallow read
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = Init_Park.initialize(layout, args.chunk_size, args.workers, progress_path=None)
+    return layout.spot_count if ok else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rows', type=int, default=100)
+    ap.add_argument('--cols', type=int, default=100)
+    ap.add_argument('--levels', type=int, default=2)
+    ap.add_argument('--chunk-size', type=int, default=500)
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--latency-ms', type=float, default=20.0, help='server-side delay per request')
+    args = ap.parse_args()
+    layout = Init_Park.Layout(rows=args.rows, cols=args.cols, levels=args.levels)
+    rtdb_client.set_concurrency(max(args.workers, 1))
+
+    print(f"{layout.spot_count} spots, {args.latency_ms:g} ms per request")
+    print(f"{'initializer':<12}{'wall':>8}{'requests':>10}{'MB sent':>9}{'MB read':>9}{'spots':>8}")
+    for name, run in (('single', single), ('chunked', chunked)):
+        server = rtdb_standin.serve(storage.MemoryStorage(latency=args.latency_ms / 1000))
+        previous = storage.use(storage.RestStorage(server.url))
+        rtdb_client.stats.reset()
+        try:
+            started = time.perf_counter()
+            count = run(layout, args)
+            wall = time.perf_counter() - started
+        finally:
+            storage.use(previous)
+            server.stop()
+        # every calling module (Init_Park, rtdb_batch, this script) together
+        summary = rtdb_client.stats.summary().values()
+        requests = sum(s['requests'] for s in summary)
+        sent = sum(sum(s['bytes_sent'].values()) for s in summary) / 1e6
+        read = sum(sum(s['bytes_received'].values()) for s in summary) / 1e6
+        print(f"{name:<12}{wall:>7.2f}s{requests:>10}{sent:>9.1f}{read:>9.1f}{count:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: building a ParkingLot from a raw SPOTS snapshot.
+
+Run from the repository root:
+    python Tools/bench_load_snapshot.py
+    python Tools/bench_load_snapshot.py --spots 500000 --budget-ms 2500
+
+Compares the per-spot loop the loaders used to have (replace/split key
+parsing and one free_spots insert per spot) with ParkingLot.load_snapshot,
+cold (first time the keys are seen) and warm (parsed keys cached), and the
+live mirror's first snapshot. Exits with status 1 when a warm load_snapshot
+of the snapshot takes longer than --budget-ms.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import data_structures  # noqa: E402
+from data_structures import ParkingLot, Spot  # noqa: E402
+from lot_mirror import ParkingLotMirror  # noqa: E402
+
+
+def legacy_load(snapshot):
+    """The per-spot loop of the original dashboard/simulator loaders."""
+    pl = ParkingLot()
+    for sid, s in snapshot.items():
+        if not isinstance(s, dict):
+            continue
+        try:
+            row_str, col_str = sid.replace('(', '').replace(')', '').split(',')
+            row, col = int(row_str), int(col_str)
+        except Exception:
+            continue
+        spot = Spot.from_node(row, col, s)
+        pl.spot_lookup[spot.spot_id] = spot
+        if spot.status == 'FREE':
+            pl.free_spots.add(spot)
+    return pl
+
+
+def make_snapshot(n, malformed=10):
+    cols = 500
+    spots = {}
+    for i in range(n):
+        r, c = divmod(i, cols)
+        spots[f"{r},{c}"] = {'status': 'OCCUPIED' if i % 3 == 0 else 'FREE', 'distanceFromEntry': r + c,
+                             'waitingCarId': '-', 'seenCarId': '-', 'lastUpdateMs': 0}
+    for i in range(malformed):
+        spots[f"junk{i}"] = {'status': 'FREE'}
+    return json.loads(json.dumps(spots))
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--spots', type=int, default=100_000)
+    ap.add_argument('--budget-ms', type=float, default=500.0, help='max warm load_snapshot time')
+    args = ap.parse_args()
+    snapshot = make_snapshot(args.spots)
+
+    data_structures.parse_spot_key.cache_clear()
+    results = [
+        ('legacy loop', timed(legacy_load, snapshot)),
+        ('load_snapshot (cold keys)', timed(lambda: ParkingLot().load_snapshot(snapshot))),
+        ('load_snapshot (warm keys)', timed(lambda: ParkingLot().load_snapshot(snapshot))),
+        ('load_snapshot into a loaded lot', None),
+        ('mirror first snapshot', timed(lambda: ParkingLotMirror().apply_event('put', '/', snapshot))),
+    ]
+    pl = ParkingLot()
+    pl.load_snapshot(snapshot)
+    results[3] = (results[3][0], timed(pl.load_snapshot, snapshot))
+
+    print(f"{len(snapshot)} entries ({len(pl.load_snapshot(snapshot))} malformed)")
+    for name, ms in results:
+        print(f"{name:<34}{ms:>9.0f} ms")
+    warm = results[2][1]
+    verdict = 'ok' if warm <= args.budget_ms else 'OVER BUDGET'
+    print(f"budget {args.budget_ms:.0f} ms: {verdict}")
+    sys.exit(0 if warm <= args.budget_ms else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark: cost of the metrics layer on the allocation hot path, disabled vs enabled.
+
+Run from the repository root:
+    python Tools/bench_metrics_overhead.py
+    python Tools/bench_metrics_overhead.py --rows 100 --cols 100 --rounds 5
+
+Each round fills a --rows x --cols lot through reserve_closest and
+confirm_parked, then empties it with release_spot (in-memory only, no
+storage). "disabled" is the plain import (METRICS unset); "enabled" runs the
+same rounds after metrics.enable(), so every allocation, find_closest and
+SortedList operation is timed into a histogram.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import metrics  # noqa: E402
+from data_structures import ParkingLot, Spot  # noqa: E402
+
+
+def make_lot(rows, cols):
+    pl = ParkingLot()
+    for r in range(rows):
+        for c in range(cols):
+            pl.add_spot(Spot(r, c, r + c))
+    return pl
+
+
+def cycle(pl, cars):
+    for i in range(cars):
+        plate = f"CAR{i}"
+        pl.reserve_closest(plate, gate_row=0, gate_col=0)
+        pl.confirm_parked(plate)
+    for spot_id in list(pl.occupied_spots_with_cars):
+        pl.release_spot(spot_id)
+
+
+def run(args):
+    pl = make_lot(args.rows, args.cols)
+    cars = args.rows * args.cols
+    cycle(pl, cars)  # warm-up: builds the gate index
+    best = float('inf')
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        cycle(pl, cars)
+        best = min(best, time.perf_counter() - started)
+    return best / cars
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rows', type=int, default=40)
+    ap.add_argument('--cols', type=int, default=50)
+    ap.add_argument('--rounds', type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{args.rows * args.cols} cars per round, best of {args.rounds}")
+    print(f"{'metrics':<10}{'per car':>12}")
+    baseline = run(args)
+    print(f"{'disabled':<10}{baseline * 1e6:>9.1f} us")
+    metrics.enable()
+    try:
+        enabled = run(args)
+    finally:
+        metrics.disable()
+    print(f"{'enabled':<10}{enabled * 1e6:>9.1f} us  (+{(enabled / baseline - 1) * 100:.0f}%)")
+    [alloc] = metrics.ALLOCATION.snapshot()
+    print(f"allocation p50 {alloc['p50'] * 1e6:.1f} us, p99 {alloc['p99'] * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark: simultaneous arrivals at every gate of a large lot.
+
+Run from the repository root:
+    python Tools/bench_multi_gate.py                      # 10k spots, 8 gates
+    python Tools/bench_multi_gate.py --rows 200 --cols 100 --gates 16
+
+The lot starts --fill occupied from the gates outwards (the spots nearest the
+entrances are taken first, as during a rush hour). Each round one car arrives
+at every gate at the same moment (ParkingLot.allocate_for_gates) and
+--depart-ratio as many random cars leave, so the lot keeps filling up. The
+per-gate indexes are compared with running a fresh BFS from each gate for each
+arrival (the pre-index behaviour).
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+from data_structures import ParkingLot, Spot  # noqa: E402
+
+
+def perimeter_gates(rows, cols, n):
+    """n gates spread evenly around the lot boundary."""
+    ring = ([(0, c) for c in range(cols)] + [(r, cols - 1) for r in range(1, rows)]
+            + [(rows - 1, c) for c in range(cols - 2, -1, -1)] + [(r, 0) for r in range(rows - 2, 0, -1)])
+    step = len(ring) / n
+    return {f"G{i + 1}": ring[int(i * step)] for i in range(n)}
+
+
+def build_lot(rows, cols, gates, fill):
+    pl = ParkingLot()
+    cells = [(r, c) for r in range(rows) for c in range(cols)]
+    # occupy the cells closest to any gate first
+    cells.sort(key=lambda rc: min(abs(rc[0] - g[0]) + abs(rc[1] - g[1]) for g in gates.values()))
+    occupied = set(cells[:int(len(cells) * fill)])
+    for r, c in cells:
+        s = Spot(r, c, r + c)
+        if (r, c) in occupied:
+            s.status = 'OCCUPIED'
+        pl.spot_lookup[s.spot_id] = s
+    for gid, (r, c) in gates.items():
+        pl.register_gate(gid, r, c)
+    return pl, sorted(f"{r},{c}" for r, c in occupied)
+
+
+def bfs_closest(pl, gate):
+    """Fresh BFS that stops at the first FREE cell (one full search per query)."""
+    q = deque([gate])
+    seen = {gate}
+    while q:
+        cell = q.popleft()
+        spot = pl._grid.get(cell)
+        if spot is not None and spot.status == 'FREE':
+            return cell
+        for nxt in pl._neighbors.get(cell) or pl._cell_neighbors(cell):
+            if nxt not in seen:
+                seen.add(nxt)
+                q.append(nxt)
+    return None
+
+
+def run(pl, taken, rounds, depart_ratio, rng, use_index):
+    car = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        arrivals = []
+        for gid in pl.gates:
+            car += 1
+            arrivals.append((f"CAR{car}", gid))
+        if use_index:
+            allocated = pl.allocate_for_gates(arrivals)
+        else:
+            allocated = {}
+            for car_id, gid in arrivals:
+                cell = bfs_closest(pl, pl.gates[gid])
+                if cell is None:
+                    allocated[car_id] = None
+                    continue
+                pl._grid[cell].status = 'WAITING'
+                allocated[car_id] = f"{cell[0]},{cell[1]}"
+        spots = [sid for sid in allocated.values() if sid]
+        assert len(spots) == len(set(spots)), "spot handed out twice"
+        taken.extend(spots)
+        for _ in range(int(len(spots) * depart_ratio)):
+            sid = taken.pop(rng.randrange(len(taken)))
+            pl.get_spot(sid).status = 'FREE'
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--cols', type=int, default=100)
+    parser.add_argument('--gates', type=int, default=8)
+    parser.add_argument('--fill', type=float, default=0.5)
+    parser.add_argument('--depart-ratio', type=float, default=0.5)
+    parser.add_argument('--rounds', type=int, default=500)
+    args = parser.parse_args()
+
+    gates = perimeter_gates(args.rows, args.cols, args.gates)
+    print(f"{args.rows}x{args.cols} lot ({args.rows * args.cols} spots), {args.gates} gates, "
+          f"{args.fill:.0%} occupied at start, {args.rounds} rounds of simultaneous arrivals")
+    results = {}
+    for label, use_index in (("fresh BFS per gate", False), ("per-gate index", True)):
+        pl, taken = build_lot(args.rows, args.cols, gates, args.fill)
+        build = 0.0
+        if use_index:
+            start = time.perf_counter()
+            pl.find_closest_for_gates()  # build every gate's index up front
+            build = time.perf_counter() - start
+        else:
+            pl._sync_grid()
+        elapsed = run(pl, taken, args.rounds, args.depart_ratio, random.Random(2), use_index)
+        allocs = args.rounds * args.gates
+        results[label] = elapsed
+        extra = f" (index build {build * 1e3:.0f} ms)" if use_index else ""
+        print(f"  {label:<20} {allocs / elapsed:10.0f} allocations/s | "
+              f"{elapsed / args.rounds * 1e3:8.3f} ms per round{extra}")
+    print(f"  speedup x{results['fresh BFS per gate'] / results['per-gate index']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark: refreshing a loaded ParkingLot from a new SPOTS snapshot.
+
+Run from the repository root:
+    python Tools/bench_refresh.py
+    python Tools/bench_refresh.py --spots 500000 --changes 0 100 10000 --repeat 3
+
+The original refresh_parking_lot re-applied every spot of every snapshot
+(status setter, free_spots membership checks, occupied map); the legacy
+column reproduces that walk. ParkingLot.refresh_from_snapshot only applies
+the spots whose node differs from the one it last loaded. Snapshot reads are
+not included (both paths get the same already-decoded dict). Each time is
+the best of --repeat runs on freshly loaded lots.
+"""
+import os
+import sys
+import gc
+import copy
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+from data_structures import ParkingLot  # noqa: E402
+
+
+def legacy_refresh(parking_lot, data):
+    """The original refresh_parking_lot loop (with a working free_spots removal)."""
+    for sid, s in data.items():
+        if not isinstance(s, dict):
+            continue
+        spot = parking_lot.spot_lookup.get(sid)
+        if not spot:
+            continue
+        new_status = s.get('status', 'FREE')
+        spot.status = new_status
+        spot.waiting_car_id = s.get('waitingCarId', '-')
+        spot.seen_car_id = s.get('seenCarId', '-')
+        if new_status == 'FREE' and spot not in parking_lot.free_spots:
+            parking_lot.free_spots.add(spot)
+        elif new_status != 'FREE' and spot in parking_lot.free_spots:
+            parking_lot.free_spots.remove(spot)
+        car_id = s.get('carId')
+        if new_status == 'OCCUPIED' and car_id:
+            parking_lot.occupied_spots_with_cars[sid] = car_id
+        elif sid in parking_lot.occupied_spots_with_cars and new_status != 'OCCUPIED':
+            parking_lot.occupied_spots_with_cars.pop(sid, None)
+
+
+def make_snapshot(n):
+    cols = 500
+    return {f"{i // cols},{i % cols}": {'status': 'OCCUPIED' if i % 3 == 0 else 'FREE',
+                                        'carId': f"CAR{i}" if i % 3 == 0 else None,
+                                        'distanceFromEntry': i // cols + i % cols,
+                                        'waitingCarId': '-', 'seenCarId': '-', 'lastUpdateMs': 0}
+            for i in range(n)}
+
+
+def mutate(snapshot, count, rng):
+    data = copy.deepcopy(snapshot)
+    for sid in rng.sample(sorted(data), count):
+        node = data[sid]
+        node['status'] = 'FREE' if node['status'] != 'FREE' else 'WAITING'
+        node['lastUpdateMs'] = 1
+    return data
+
+
+def timed(fn, *args):
+    gc.collect()  # don't bill the deepcopy garbage to the refresh being timed
+    started = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--spots', type=int, default=100_000)
+    ap.add_argument('--changes', type=int, nargs='+', default=[0, 10, 1000, 10000])
+    ap.add_argument('--repeat', type=int, default=5, help='runs per row; the best is reported')
+    args = ap.parse_args()
+    rng = random.Random(1)
+    base = make_snapshot(args.spots)
+    print(f"{args.spots} spots; refresh time")
+    print(f"{'changed':>8}{'legacy':>12}{'diff':>12}")
+    for count in args.changes:
+        data = mutate(base, count, rng)
+        legacy_best = diff_best = float('inf')
+        for _ in range(args.repeat):
+            legacy_lot, lot = ParkingLot(), ParkingLot()
+            legacy_lot.load_snapshot(copy.deepcopy(base))
+            lot.load_snapshot(copy.deepcopy(base))
+            legacy_ms, _ = timed(legacy_refresh, legacy_lot, data)
+            diff_ms, changes = timed(lot.refresh_from_snapshot, data)
+            assert len(changes) == count
+            assert len(lot.free_spots) == len(legacy_lot.free_spots)
+            legacy_best, diff_best = min(legacy_best, legacy_ms), min(diff_best, diff_ms)
+        print(f"{count:>8}{legacy_best:>10.1f}ms{diff_best:>10.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
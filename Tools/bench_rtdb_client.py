@@ -0,0 +1,75 @@
+"""Benchmark: RTDB REST traffic with and without the pooled keep-alive client.
+
+Run from the repository root:
+    python Tools/bench_rtdb_client.py
+    python Tools/bench_rtdb_client.py --requests 2000 --threads 8 --latency-ms 5
+
+Both sides talk to Server/rtdb_standin.py on localhost. The "fresh" side
+opens a connection per request (what independent requests without a shared
+session cost); the "pooled" side is rtdb_client.RtdbClient. Each request is
+a small spot update followed by a read of the spot, spread over --threads
+workers. Over the internet the TLS handshake a fresh connection pays is
+tens of milliseconds, so the localhost gap is a lower bound.
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import requests  # noqa: E402
+import rtdb_client  # noqa: E402
+import rtdb_standin  # noqa: E402
+import storage  # noqa: E402
+
+
+class FreshConnections(rtdb_client.RtdbClient):
+    """RtdbClient that closes its connection after every request."""
+
+    @property
+    def session(self):
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json', 'Connection': 'close'})
+        rtdb_client.mount_pooled(session, 1)
+        return session
+
+
+def run(client, count, threads):
+    def work(i):
+        path = f"/SondosPark/SPOTS/{i % 200},0"
+        client.update(path, {'status': 'OCCUPIED' if i % 2 else 'FREE', 'lastUpdateMs': i})
+        client.get(path)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(work, range(count)))
+    return time.perf_counter() - started
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--requests', type=int, default=1000, help='update+get pairs per side')
+    ap.add_argument('--threads', type=int, default=4)
+    ap.add_argument('--latency-ms', type=float, default=1.0, help='server-side delay per request')
+    args = ap.parse_args()
+    rtdb_client.set_concurrency(max(args.threads, 1))
+
+    print(f"{args.requests * 2} requests over {args.threads} threads, {args.latency_ms:g} ms server latency")
+    print(f"{'client':<8}{'wall':>9}{'req/s':>9}{'p50':>9}{'p99':>9}{'reuse':>8}{'conns':>7}")
+    for name, cls in (('fresh', FreshConnections), ('pooled', rtdb_client.RtdbClient)):
+        server = rtdb_standin.serve(storage.MemoryStorage(latency=args.latency_ms / 1000))
+        client = cls(server.url)
+        rtdb_client.stats.reset()
+        try:
+            wall = run(client, args.requests, args.threads)
+        finally:
+            client.close()
+            server.stop()
+        s = rtdb_client.stats.summary()[__name__]
+        print(f"{name:<8}{wall:>8.2f}s{s['requests'] / wall:>9.0f}{s['p50_ms']:>7.2f}ms{s['p99_ms']:>7.2f}ms"
+              f"{s['reuse_ratio']:>8.0%}{server.connections:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark: RTDB round trips per car lifecycle, per-call writes vs. batched.
+
+Run from the repository root:
+    python Tools/bench_rtdb_writes.py                   # 1,000 cars, 5 ms round trips
+    python Tools/bench_rtdb_writes.py --cars 5000 --rtt 0 --window 20
+
+Each car arrives, parks and departs on a 10x5 lot. Firebase is replaced by
+storage.MemoryStorage charging --rtt milliseconds per request.
+
+- legacy:  the pre-batching write sequence (set, read, update, update / update,
+           update / update, update, delete, delete)
+- batched: event_generator as shipped, one multi-path update per transition
+- window:  the same with a --window ms micro-batch, cars in --threads threads
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import eventlog  # noqa: E402
+import rtdb_batch  # noqa: E402
+import storage  # noqa: E402
+from constants import ROOT_BRANCH  # noqa: E402
+from data_structures import ParkingLot, Spot  # noqa: E402
+from event_generator import simulate_car_arrival, simulate_car_parked, simulate_car_departure  # noqa: E402
+
+
+def legacy_lifecycle(pl, plate):
+    """The per-call write sequence event_generator used before batching."""
+    cars = storage.reference(f"/{ROOT_BRANCH}/CARS")
+    spots = storage.reference(f"/{ROOT_BRANCH}/SPOTS")
+    # arrival: car record, sensor-spot refresh read, allocation writes
+    cars.child(plate).set({'Id': plate, 'status': 'waiting', 'allocatedSpot': '-'})
+    spots.child('0,0').get()
+    spot = pl.reserve_closest(plate)
+    cars.child(plate).update({'allocatedSpot': spot, 'ClosestSpot': spot, 'status': 'waiting'})
+    spots.child(spot).update({'status': 'WAITING', 'waitingCarId': plate, 'seenCarId': '-'})
+    # parked
+    pl.confirm_parked(plate, spot)
+    cars.child(plate).update({'SpotIn': {'Arrievied': True}, 'status': 'parked'})
+    spots.child(spot).update({'status': 'OCCUPIED', 'carId': plate, 'seenCarId': plate})
+    # departure: spot, car marked departed, car delete, legacy delete
+    pl.release_spot(spot)
+    spots.child(spot).update({'status': 'FREE', 'carId': None, 'seenCarId': '-', 'waitingCarId': '-'})
+    cars.child(plate).update({'status': 'departed', 'allocatedSpot': '-'})
+    cars.child(plate).delete()
+    storage.reference('/CARS').child(plate).delete()
+
+
+def batched_lifecycle(pl):
+    plate = simulate_car_arrival(pl)
+    simulate_car_parked(pl, plate)
+    simulate_car_departure(pl)
+
+
+def make_lot():
+    pl = ParkingLot()
+    for r in range(10):
+        for c in range(5):
+            pl.add_spot(Spot(r, c, r + c))
+    return pl
+
+
+def run(name, store, cars, fn, threads=1):
+    store.ops.clear()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if threads == 1:
+            for i in range(cars):
+                fn(i)
+        else:
+            with ThreadPoolExecutor(threads) as pool:
+                list(pool.map(fn, range(cars)))
+        rtdb_batch.flush()
+        eventlog.flush()
+    elapsed = time.perf_counter() - started
+    print(f"{name:>22} {store.requests:>10} {store.requests / cars:>9.2f} {elapsed:>9.2f}s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--cars', type=int, default=1000)
+    ap.add_argument('--rtt', type=float, default=5.0, help='milliseconds per RTDB request')
+    ap.add_argument('--window', type=float, default=20.0, help='micro-batch window in ms')
+    ap.add_argument('--threads', type=int, default=16, help='concurrent cars in window mode')
+    args = ap.parse_args()
+
+    store = storage.MemoryStorage(latency=args.rtt / 1000.0)
+    storage.use(store)
+    rtdb_batch.set_batch_window(0)
+
+    print(f"{args.cars} cars (arrive, park, depart), {args.rtt} ms per request")
+    print(f"{'mode':>22} {'requests':>10} {'per car':>9} {'wall':>10}")
+    pl = make_lot()
+    run('legacy', store, args.cars, lambda i: legacy_lifecycle(pl, f"L{i}"))
+
+    pl = make_lot()
+    run('batched', store, args.cars, lambda i: batched_lifecycle(pl))
+
+    pl = make_lot()
+    pl.live = True  # stream-fed lot: no sensor-spot read on arrival
+    run('batched, live lot', store, args.cars, lambda i: batched_lifecycle(pl))
+
+    # concurrent cars sharing one micro-batch window
+    pl = make_lot()
+    pl.live = True
+    rtdb_batch.set_batch_window(args.window / 1000.0)
+    run(f'window {args.window:g}ms x{args.threads}', store, args.cars,
+        lambda i: batched_lifecycle(pl), threads=args.threads)
+    rtdb_batch.set_batch_window(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark: simulated lot time per CPU second on the discrete-event engine.
+
+Run from the repository root:
+    python Tools/bench_sim_engine.py                          # a week of a 2,000-spot lot
+    python Tools/bench_sim_engine.py --days 1 --rows 10 --cols 5 --arrivals fixed:5
+    python Tools/bench_sim_engine.py --arrivals poisson:900 --profile weekday --dwell lognormal:7200,0.9
+    python Tools/bench_sim_engine.py --max-seconds 60           # exit 1 if the week takes longer
+
+The lot lives in storage.MemoryStorage, so every arrival / park / departure /
+wrong-park writes exactly what the simulator writes to the RTDB. Traffic is a
+traffic.TrafficModel built from --arrivals / --profile / --dwell / --seed
+(same specs as SIM_ARRIVALS etc.); by default a car every 4 s with a 2 h mean
+stay. Cars park --wait seconds after arriving. The wall-clock simulator would
+need the simulated time itself to get through the same traffic; runs with the
+same seed see the same cars, so their numbers can be compared.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+import eventlog  # noqa: E402
+import rtdb_batch  # noqa: E402
+import storage  # noqa: E402
+from constants import ROOT_BRANCH  # noqa: E402
+from data_structures import ParkingLot, Spot  # noqa: E402
+from sim_engine import SimEngine, ParkingSimulation  # noqa: E402
+from traffic import TrafficModel  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--days', type=float, default=7.0)
+    ap.add_argument('--rows', type=int, default=40)
+    ap.add_argument('--cols', type=int, default=50)
+    ap.add_argument('--arrivals', default='fixed:4', help='fixed:<s> | poisson:<cars/h> | trace:<file>')
+    ap.add_argument('--profile', default=None, help='hourly rate profile for poisson: weekday, weekend, flat')
+    ap.add_argument('--dwell', default='exp:7200', help='fixed:<s> | exp:<mean> | lognormal:<mean>,<sigma> | empirical:<file>')
+    ap.add_argument('--wait', type=float, default=1.0, help='seconds from arrival to parked')
+    ap.add_argument('--wrong-park', type=float, default=45.0, help='seconds between wrong parks (0: off)')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--max-seconds', type=float, default=None, help='fail (exit 1) above this CPU time')
+    args = ap.parse_args()
+
+    random.seed(args.seed)
+    spots = {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c}
+             for r in range(args.rows) for c in range(args.cols)}
+    store = storage.MemoryStorage({ROOT_BRANCH: {'SPOTS': spots}})
+    storage.use(store)
+    rtdb_batch.set_batch_window(0)
+
+    pl = ParkingLot()
+    for r in range(args.rows):
+        for c in range(args.cols):
+            pl.add_spot(Spot(r, c, r + c))
+    pl.live = True  # the lot is the only writer: no sensor-spot read per arrival
+
+    traffic = TrafficModel.from_spec(args.arrivals, args.dwell, args.profile, seed=args.seed)
+    sim = ParkingSimulation(pl, SimEngine(), wait_between=args.wait, wrong_park_interval=args.wrong_park,
+                            traffic=traffic)
+    duration = args.days * 86400.0
+    print(f"{args.days:g} days of a {args.rows * args.cols}-spot lot, {traffic.name}")
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        stats = sim.run(duration)
+        eventlog.flush()
+    elapsed = time.perf_counter() - started
+
+    events = sum(sim.engine.processed.values())
+    print(f"events     {events:>10}  ({events / elapsed:,.0f}/s)")
+    for name in ('arrivals', 'parked', 'departures', 'wrong_parks', 'rejected'):
+        print(f"{name:<10} {stats[name]:>10}")
+    offered = stats['arrivals'] + stats['rejected']
+    print(f"rejection  {stats['rejected'] / max(offered, 1):>10.1%}")
+    print(f"writes     {store.ops['update']:>10}")
+    print(f"occupied   {len(pl.occupied_spots_with_cars):>10} / {args.rows * args.cols}")
+    print(f"cpu time   {elapsed:>9.1f}s  for {duration:,.0f}s simulated ({duration / elapsed:,.0f}x real time)")
+    if args.max_seconds is not None and elapsed > args.max_seconds:
+        sys.exit(f"over budget: {elapsed:.1f}s > --max-seconds {args.max_seconds:g}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Micro-benchmark: SortedList add/remove/membership, old linear version vs blocked index.
+
+Run from the repository root:
+    python Tools/bench_sorted_list.py            # 1k / 10k / 100k spots
+    python Tools/bench_sorted_list.py 5000 50000
+
+Each lot is pre-filled with N free spots, then OPS spots are removed and
+re-added (the `remove_spot_from_free` / `add_spot_to_free` pattern used when a
+car is allocated and later departs), each preceded by a membership check.
+"""
+import os
+import sys
+import random
+import time
+from bisect import bisect_left
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+from data_structures import SortedList, Spot  # noqa: E402
+
+OPS = 2000
+
+
+class LegacySortedList:
+    """The pre-index SortedList (key mode only), kept here as the baseline."""
+
+    def __init__(self, key):
+        self._key = key
+        self._list = []
+
+    def add(self, value):
+        k = self._key(value)
+        keys = [kv[0] for kv in self._list]
+        idx = bisect_left(keys, k)
+        self._list.insert(idx, (k, value))
+
+    def remove(self, value):
+        for i, (k, item) in enumerate(self._list):
+            if item == value:
+                self._list.pop(i)
+                return
+        raise ValueError(f"{value} not in SortedList")
+
+    def __contains__(self, value):
+        return any(item == value for (_, item) in self._list)
+
+
+def make_spots(n):
+    cols = max(1, int(n ** 0.5))
+    return [Spot(i // cols, i % cols, (i // cols) + (i % cols)) for i in range(n)]
+
+
+def fill_legacy(spots):
+    sl = LegacySortedList(key=lambda s: s.distance_from_entry)
+    # bulk-build the sorted list directly; building it via add() is itself O(n^2)
+    sl._list = sorted(((s.distance_from_entry, s) for s in spots), key=lambda kv: kv[0])
+    return sl
+
+
+def fill_new(spots):
+    sl = SortedList(key=lambda s: s.distance_from_entry)
+    for s in spots:
+        sl.add(s)
+    return sl
+
+
+def churn(sl, sample):
+    start = time.perf_counter()
+    for s in sample:
+        if s in sl:
+            sl.remove(s)
+    for s in sample:
+        if s not in sl:
+            sl.add(s)
+    return time.perf_counter() - start
+
+
+def run(n):
+    spots = make_spots(n)
+    rng = random.Random(n)
+    sample = rng.sample(spots, min(OPS, n))
+    # the legacy list is O(n) per op, so give it fewer cycles on big lots
+    legacy_sample = sample[:max(100, OPS * 1000 // n)]
+    legacy = churn(fill_legacy(spots), legacy_sample) / (4 * len(legacy_sample))
+    new = churn(fill_new(spots), sample) / (4 * len(sample))  # contains+remove, contains+add
+    print(f"{n:>8} spots | legacy {legacy * 1e6:10.2f} us/op | "
+          f"indexed {new * 1e6:8.2f} us/op | speedup x{legacy / new:8.1f}")
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    print(f"SortedList churn benchmark ({OPS} remove+add cycles per size)")
+    for n in sizes:
+        run(n)
@@ -0,0 +1,113 @@
+"""Benchmark: bytes per Spot, original dict-backed Spot vs slotted Spot.from_node.
+
+Run from the repository root:
+    python Tools/bench_spot_memory.py
+    python Tools/bench_spot_memory.py --spots 500000
+
+The snapshot is decoded from JSON like an RTDB read, so every node carries its
+own copy of the status text. Memory is measured with tracemalloc for the Spot
+objects alone and for a whole ParkingLot (spot_lookup + free_spots) loaded the
+way dashboard.build_parkinglot_from_db does it.
+"""
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+
+from data_structures import ParkingLot, Spot  # noqa: E402
+
+
+class LegacySpot:
+    """The original Spot layout: instance __dict__, formatted spot_id, status as read."""
+
+    def __init__(self, row, col, distance):
+        self._lot = None
+        self._status = "FREE"
+        self.waiting_car_id = "-"
+        self.seen_car_id = "-"
+        self.distance_from_entry = distance
+        self.spot_id = f"{row},{col}"
+        self.row = row
+        self.col = col
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        self._status = value
+
+
+def legacy_from_node(row, col, node):
+    spot = LegacySpot(row, col, node.get('distanceFromEntry', 0) or 0)
+    spot.status = node.get('status', 'FREE')
+    spot.waiting_car_id = node.get('waitingCarId', '-')
+    spot.seen_car_id = node.get('seenCarId', '-')
+    return spot
+
+
+def make_snapshot(n):
+    cols = 500
+    spots = {}
+    for i in range(n):
+        r, c = divmod(i, cols)
+        spots[f"{r},{c}"] = {'status': 'OCCUPIED' if i % 3 == 0 else 'FREE', 'distanceFromEntry': r + c,
+                             'waitingCarId': '-', 'seenCarId': '-'}
+    # round-trip through JSON so status strings are per-node copies, as after a DB read
+    return json.loads(json.dumps(spots))
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, kept
+
+
+def spots_only(snapshot, factory):
+    def build():
+        out = []
+        for sid, node in snapshot.items():
+            row, col = sid.split(',')
+            out.append(factory(int(row), int(col), node))
+        return out
+    return build
+
+
+def whole_lot(snapshot, factory):
+    def build():
+        pl = ParkingLot()
+        for sid, node in snapshot.items():
+            row, col = sid.split(',')
+            spot = factory(int(row), int(col), node)
+            pl.spot_lookup[spot.spot_id] = spot
+            if spot.status == 'FREE':
+                pl.free_spots.add(spot)
+        return pl
+    return build
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--spots', type=int, default=100_000)
+    args = ap.parse_args()
+    snapshot = make_snapshot(args.spots)
+    n = len(snapshot)
+    print(f"{n} spots; bytes per spot")
+    print(f"{'':<12}{'legacy':>10}{'slotted':>10}{'saved':>8}")
+    for name, make in (('spots only', spots_only), ('ParkingLot', whole_lot)):
+        legacy, kept = measure(make(snapshot, legacy_from_node))
+        del kept
+        slotted, kept = measure(make(snapshot, Spot.from_node))
+        del kept
+        print(f"{name:<12}{legacy / n:>10.0f}{slotted / n:>10.0f}{1 - slotted / legacy:>8.0%}")
+
+
+if __name__ == '__main__':
+    main()
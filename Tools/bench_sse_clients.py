@@ -0,0 +1,194 @@
+"""Load test: N dashboard clients on /api/stream vs. the old 400 ms polling.
+
+Run from the repository root:
+    python Tools/bench_sse_clients.py                       # 1/10/100/500 clients
+    python Tools/bench_sse_clients.py --clients 10 100 --duration 5 --no-poll
+
+A dashboard server is started in a subprocess on the in-memory storage
+backend (no Firebase needed). A feeder thread flips a random spot every
+--interval seconds, the way the simulator does. Every read the server makes
+from storage counts as an upstream RTDB read.
+
+- stream: each client holds one /api/stream connection and reads events.
+- poll:   each client fetches /api/status every 400 ms with LIVE_MIRROR=0,
+          i.e. a full SPOTS read per request (the pre-stream dashboard).
+
+For each run it reports the events delivered, bytes sent, server CPU time and
+upstream reads.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server')
+sys.path.insert(0, SERVER_DIR)
+
+POLL_INTERVAL = 0.4
+
+
+# --- server side (runs in the subprocess) -----------------------------------
+def serve(port, rows, cols, interval):
+    from werkzeug.serving import make_server
+    from flask import jsonify
+    import storage
+    import dashboard
+    import lot_mirror
+    from constants import ROOT_BRANCH
+
+    store = storage.MemoryStorage({ROOT_BRANCH: {
+        'SPOTS': {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c} for r in range(rows) for c in range(cols)},
+        '_meta': {'gates': {'main': {'row': 0, 'col': 2}}},
+    }})
+    storage.use(store)
+    if os.environ.get('LIVE_MIRROR', '1') != '0':
+        lot_mirror.get_shared_mirror()
+
+    @dashboard.app.route('/_bench/stats')
+    def bench_stats():
+        # every get() is a full read the real RTDB would have served
+        return jsonify({'upstream_reads': store.ops['get'], 'changes': store.ops['set']})
+
+    def feed():
+        spots = storage.reference(f"/{ROOT_BRANCH}/SPOTS")
+        keys = sorted(spots.get(shallow=True))
+        occupied = set()
+        rnd = random.Random(1)
+        while True:
+            time.sleep(interval)
+            key = rnd.choice(keys)
+            occupied ^= {key}
+            spots.child(f"{key}/status").set('OCCUPIED' if key in occupied else 'FREE')
+
+    threading.Thread(target=feed, daemon=True).start()
+    store.ops.clear()
+    server = make_server('127.0.0.1', port, dashboard.app, threaded=True)
+    print('ready', flush=True)
+    server.serve_forever()
+
+
+# --- client side ------------------------------------------------------------
+def start_server(port, rows, cols, interval, live):
+    env = dict(os.environ, LIVE_MIRROR='1' if live else '0')
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', str(port),
+                             '--rows', str(rows), '--cols', str(cols), '--interval', str(interval)],
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    while proc.stdout.readline().strip() != 'ready':
+        if proc.poll() is not None:
+            raise RuntimeError('bench server failed to start')
+    return proc
+
+
+def cpu_seconds(pid):
+    """utime + stime of a process (Linux /proc)."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def stats(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('GET', '/_bench/stats')
+    body = json.loads(conn.getresponse().read())
+    conn.close()
+    return body
+
+
+def stream_client(port, deadline, totals, lock):
+    events = received = 0
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request('GET', '/api/stream')
+        resp = conn.getresponse()
+        while time.time() < deadline:
+            line = resp.readline()
+            if not line:
+                break
+            received += len(line)
+            if line.startswith(b'event:'):
+                events += 1
+    except OSError:
+        pass
+    finally:
+        conn.close()
+    with lock:
+        totals['events'] += events
+        totals['bytes'] += received
+
+
+def poll_client(port, deadline, totals, lock):
+    events = received = 0
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    while time.time() < deadline:
+        started = time.time()
+        try:
+            conn.request('GET', '/api/status')
+            received += len(conn.getresponse().read())
+            events += 1
+        except OSError:
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        time.sleep(max(0.0, POLL_INTERVAL - (time.time() - started)))
+    conn.close()
+    with lock:
+        totals['events'] += events
+        totals['bytes'] += received
+
+
+def run(mode, port, proc, clients, duration):
+    totals = {'events': 0, 'bytes': 0}
+    lock = threading.Lock()
+    target = stream_client if mode == 'stream' else poll_client
+    before_stats = stats(port)
+    before_cpu = cpu_seconds(proc.pid)
+    deadline = time.time() + duration
+    threads = [threading.Thread(target=target, args=(port, deadline, totals, lock), daemon=True)
+               for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(duration + 10)
+    cpu = cpu_seconds(proc.pid) - before_cpu
+    after_stats = stats(port)
+    print(f"{mode:>6} {clients:>7} {totals['events']:>8} {totals['bytes'] / duration / 1024:>10.1f} "
+          f"{cpu:>8.2f} {after_stats['upstream_reads'] - before_stats['upstream_reads']:>9} "
+          f"{after_stats['changes'] - before_stats['changes']:>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    ap.add_argument('--clients', type=int, nargs='+', default=[1, 10, 100, 500])
+    ap.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    ap.add_argument('--interval', type=float, default=0.2, help='seconds between lot changes')
+    ap.add_argument('--rows', type=int, default=10)
+    ap.add_argument('--cols', type=int, default=5)
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--no-poll', action='store_true', help='skip the polling baseline')
+    args = ap.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.rows, args.cols, args.interval)
+        return
+
+    print(f"lot {args.rows}x{args.cols}, one change every {args.interval}s, {args.duration}s per run")
+    print(f"{'mode':>6} {'clients':>7} {'events':>8} {'KiB/s':>10} {'cpu_s':>8} {'upstream':>9} {'changes':>8}")
+    modes = ['stream'] if args.no_poll else ['stream', 'poll']
+    for i, mode in enumerate(modes):
+        port = args.port + i
+        proc = start_server(port, args.rows, args.cols, args.interval, live=(mode == 'stream'))
+        try:
+            for n in args.clients:
+                run(mode, port, proc, n, args.duration)
+        finally:
+            proc.kill()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Run the pytest-benchmark suite in UNIT TESTS/Server_Benchmarks, save baselines and check for regressions.
+
+Run from the repository root:
+    python Tools/bench_suite.py run                         # just print the tables
+    python Tools/bench_suite.py save                        # store a new baseline
+    python Tools/bench_suite.py compare                     # fail on >10% median regression vs the latest baseline
+    python Tools/bench_suite.py compare --max-regression 25 --stat min --baseline 0001
+    python Tools/bench_suite.py compare -k find_closest     # extra arguments go to pytest
+
+Baselines are the pytest-benchmark JSON files under
+UNIT TESTS/Server_Benchmarks/baselines/<machine>/ (one directory per
+platform/interpreter; numbered, newest last). compare runs the suite, lists
+every benchmark with its change in --stat against the baseline, and exits
+with status 1 when any is more than --max-regression percent slower.
+Timings only compare on the same machine: save a baseline before changing
+the code, then compare.
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+import subprocess
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SUITE = os.path.join(ROOT, 'UNIT TESTS', 'Server_Benchmarks')
+BASELINES = os.path.join(SUITE, 'baselines')
+
+
+def run_suite(args, extra) -> int:
+    cmd = [sys.executable, '-m', 'pytest', SUITE, '-q', '-p', 'no:cacheprovider', '--benchmark-only',
+           f"--benchmark-storage=file://{BASELINES}", f"--benchmark-max-time={args.max_time}",
+           '--benchmark-columns=min,median,mean,stddev,rounds', '--benchmark-sort=fullname']
+    return subprocess.call(cmd + extra + args.pytest_args, cwd=ROOT)
+
+
+def find_baseline(prefix=None) -> str:
+    """Path of the newest saved run, or of the one whose file name starts with prefix."""
+    runs = sorted(glob.glob(os.path.join(BASELINES, '*', '*.json')), key=os.path.basename)
+    if prefix:
+        runs = [path for path in runs if os.path.basename(path).startswith(prefix)]
+    if not runs:
+        sys.exit(f"No baseline{' ' + prefix if prefix else ''} in {BASELINES}; "
+                 f"run 'python Tools/bench_suite.py save' first")
+    return runs[-1]
+
+
+def load_stats(path, stat) -> dict:
+    with open(path) as f:
+        return {b['name']: b['stats'][stat] for b in json.load(f)['benchmarks']}
+
+
+def compare(baseline, current, stat, max_regression) -> list:
+    """Print each benchmark's change against the baseline; return the names that regressed."""
+    regressed = []
+    print(f"\n{stat} vs {os.path.relpath(baseline, ROOT)} (fail above +{max_regression:g}%)")
+    before = load_stats(baseline, stat)
+    width = max(map(len, current), default=0)
+    for name, now in sorted(current.items()):
+        if name not in before:
+            print(f"  {name:<{width}}  {now * 1e6:>12.1f} us   (new)")
+            continue
+        change = (now / before[name] - 1) * 100
+        mark = 'REGRESSED' if change > max_regression else ''
+        print(f"  {name:<{width}}  {now * 1e6:>12.1f} us  {change:>+7.1f}%  {mark}")
+        if mark:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('command', choices=('run', 'save', 'compare'))
+    ap.add_argument('--name', default='baseline', help='save: label of the stored run')
+    ap.add_argument('--baseline', help='compare: number or id of the saved run (default: latest)')
+    ap.add_argument('--max-regression', type=float, default=10.0, help='compare: percent slowdown that fails')
+    ap.add_argument('--stat', default='median', choices=('min', 'max', 'mean', 'median'),
+                    help='compare: statistic checked against --max-regression')
+    ap.add_argument('--max-time', type=float, default=1.0, help='seconds of rounds per benchmark')
+    args, args.pytest_args = ap.parse_known_args()
+
+    if args.command == 'run':
+        sys.exit(run_suite(args, []))
+    if args.command == 'save':
+        sys.exit(run_suite(args, [f"--benchmark-save={args.name}"]))
+
+    baseline = find_baseline(args.baseline)
+    with tempfile.TemporaryDirectory() as tmp:
+        result = os.path.join(tmp, 'current.json')
+        status = run_suite(args, [f"--benchmark-json={result}"])
+        if status != 0:
+            sys.exit(status)
+        regressed = compare(baseline, load_stats(result, args.stat), args.stat, args.max_regression)
+    if regressed:
+        print(f"{len(regressed)} benchmark(s) regressed by more than {args.max_regression:g}%")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,11 @@
 import threading
 import time
-from firebase_admin import db
-from firebase_init import db as _db_init
+import storage
 from constants import ROOT_BRANCH, STAT_WAIT, STAT_OCC
 import argparse
 import sys
 
-BASE = db.reference(ROOT_BRANCH)
+BASE = storage.reference(ROOT_BRANCH)
 SPOTS = BASE.child("SPOTS")
 CARS = BASE.child("CARS")
 
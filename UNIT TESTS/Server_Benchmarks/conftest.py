@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+# Server modules import each other by bare name (as when run from Server/)
+_SERVER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Server'))
+if _SERVER not in sys.path:
+    sys.path.insert(0, _SERVER)
+
+# dashboard imports firebase_init; give it a URL so it never probes the network
+os.environ.setdefault('RTDB_URL', 'http://localhost:9')
+# time the code, not the console: only warnings reach the event log
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+# lot sizes every benchmark runs at: (rows, cols)
+LOT_SIZES = [(10, 10), (50, 50), (100, 100)]
+
+
+def spots_snapshot(rows, cols, occupied_every=0):
+    """A SPOTS node for a rows x cols lot; every occupied_every-th spot OCCUPIED (0: all FREE)."""
+    spots = {}
+    for i in range(rows * cols):
+        r, c = divmod(i, cols)
+        taken = occupied_every and i % occupied_every == 0
+        spots[f"{r},{c}"] = {'status': 'OCCUPIED' if taken else 'FREE', 'distanceFromEntry': r + c}
+    return spots
+
+
+@pytest.fixture(params=LOT_SIZES, ids=lambda size: f"{size[0] * size[1]}spots")
+def lot_size(request):
+    return request.param
+
+
+@pytest.fixture
+def snapshot(lot_size):
+    """SPOTS node of a lot_size lot with every third spot OCCUPIED."""
+    return spots_snapshot(*lot_size, occupied_every=3)
+
+
+@pytest.fixture
+def lot(snapshot):
+    """ParkingLot loaded from snapshot (gate indexes not built yet)."""
+    from data_structures import ParkingLot
+    pl = ParkingLot()
+    pl.load_snapshot(snapshot)
+    return pl
+
+
+@pytest.fixture
+def memory_storage():
+    """Run the benchmark against a fresh in-memory storage backend (no latency)."""
+    import storage
+    backend = storage.MemoryStorage()
+    previous = storage.use(backend)
+    yield backend
+    storage.use(previous)
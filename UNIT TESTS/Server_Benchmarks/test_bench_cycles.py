@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+
+import rtdb_batch
+from constants import ROOT_BRANCH
+from event_generator import simulate_car_arrival, simulate_car_parked, simulate_car_departure
+
+
+@pytest.fixture
+def batch_window():
+    """rtdb_batch.set_batch_window; the shared writer's window is restored afterwards."""
+    previous = rtdb_batch.get_writer().window
+    yield rtdb_batch.set_batch_window
+    rtdb_batch.set_batch_window(previous)
+
+
+@pytest.mark.benchmark(group='car_cycle')
+def test_arrival_park_departure_cycle(benchmark, memory_storage, snapshot, lot, batch_window):
+    # one car through arrival -> parked -> departure against the in-memory DB, writes unbatched
+    memory_storage.set(f"/{ROOT_BRANCH}/SPOTS", snapshot)
+    batch_window(0)
+    lot.live = True  # no per-arrival sensor re-read; the lot is the source of truth
+    before = len(lot.free_spots)
+
+    def cycle():
+        plate = simulate_car_arrival(lot)
+        spot = simulate_car_parked(lot, plate)
+        return simulate_car_departure(lot, spot_id=spot)
+    departed = benchmark(cycle)
+    assert departed and len(lot.free_spots) == before
+    assert memory_storage.get(f"/{ROOT_BRANCH}/CARS") is None
+
+
+@pytest.mark.benchmark(group='car_cycle_batched')
+def test_cycles_with_batched_writes(benchmark, memory_storage, snapshot, lot, batch_window):
+    # 20 cars in flight, their writes coalesced by the batch writer
+    memory_storage.set(f"/{ROOT_BRANCH}/SPOTS", snapshot)
+    batch_window(0.005)
+    lot.live = True
+    batch = itertools.count()
+
+    def cycles():
+        plates = [simulate_car_arrival(lot) for _ in range(20)]
+        spots = [simulate_car_parked(lot, plate) for plate in plates]
+        for spot in spots:
+            simulate_car_departure(lot, spot_id=spot)
+        rtdb_batch.flush()
+        return next(batch)
+    benchmark(cycles)
+    assert memory_storage.get(f"/{ROOT_BRANCH}/CARS") is None
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from data_structures import SortedList
+
+
+@pytest.mark.benchmark(group='sortedlist_add_remove')
+def test_sortedlist_add_remove(benchmark, lot_size):
+    # steady state: one add and one remove against a list of the lot's size
+    n = lot_size[0] * lot_size[1]
+    sl = SortedList(range(0, 2 * n, 2))
+    probes = random.Random(1).sample(range(1, 2 * n, 2), min(n, 1000))
+
+    def add_remove():
+        for value in probes:
+            sl.add(value)
+            sl.remove(value)
+    benchmark(add_remove)
+    assert len(sl) == n
+
+
+@pytest.mark.benchmark(group='find_closest')
+def test_find_closest(benchmark, lot, lot_size):
+    rows, cols = lot_size
+    gates = [(0, 0), (0, cols // 2), (rows - 1, cols - 1), (rows // 2, 0)]
+    for gate in gates:
+        lot.find_closest(*gate)  # build each gate's index outside the timing
+
+    def find_all():
+        return [lot.find_closest(*gate) for gate in gates]
+    assert all(benchmark(find_all))
+
+
+@pytest.mark.benchmark(group='allocate_closest_spot')
+def test_allocate_closest_spot(benchmark, lot):
+    lot.find_closest(0, 2)
+    cars = iter(range(10 ** 9))
+    allocated = []
+
+    def release_previous():
+        if allocated:
+            lot.release_spot(allocated.pop())
+
+    def allocate():
+        allocated.append(lot.allocate_closest_spot(f"CAR{next(cars)}", 0, 2))
+    benchmark.pedantic(allocate, setup=release_previous, rounds=500, warmup_rounds=10)
+    assert allocated[-1] is not None
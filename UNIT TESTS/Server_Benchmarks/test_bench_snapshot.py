@@ -0,0 +1,49 @@
+import pytest
+
+import dashboard
+import simulation_sondos
+from constants import ROOT_BRANCH
+from lot_mirror import ParkingLotMirror
+
+
+@pytest.mark.benchmark(group='build_parkinglot_from_db')
+def test_build_parkinglot_from_db(benchmark, snapshot):
+    pl = benchmark(dashboard.build_parkinglot_from_db, snapshot)
+    assert len(pl.spot_lookup) == len(snapshot)
+
+
+@pytest.mark.benchmark(group='refresh_parking_lot')
+def test_refresh_parking_lot(benchmark, memory_storage, snapshot, lot):
+    # every round flips the same 1% of the spots, as a sensor sweep would
+    memory_storage.set(f"/{ROOT_BRANCH}/SPOTS", snapshot)
+    flipped = list(snapshot)[1::100]
+    state = {'status': 'FREE'}
+
+    def flip():
+        state['status'] = 'WAITING' if state['status'] == 'FREE' else 'FREE'
+        memory_storage.update(f"/{ROOT_BRANCH}/SPOTS", {f"{sid}/status": state['status'] for sid in flipped})
+    changes = benchmark.pedantic(simulation_sondos.refresh_parking_lot, args=(lot,), setup=flip,
+                                 rounds=30, warmup_rounds=1)
+    assert len(changes) == len(flipped)
+
+
+@pytest.fixture(params=['full_read', 'live_mirror'])
+def status_client(request, monkeypatch, memory_storage, snapshot):
+    monkeypatch.setattr(dashboard, 'load_gates', lambda: {})
+    if request.param == 'full_read':
+        monkeypatch.setenv('LIVE_MIRROR', '0')
+        memory_storage.set(dashboard.ROOT, snapshot)
+    else:
+        mirror = ParkingLotMirror()
+        mirror.apply_event('put', '/', snapshot)
+        monkeypatch.setattr(dashboard, 'get_shared_mirror', lambda: mirror)
+        dashboard._summary_cache.clear()
+        dashboard._body_cache.clear()
+    return dashboard.app.test_client()
+
+
+@pytest.mark.benchmark(group='api_status')
+def test_api_status(benchmark, status_client, snapshot):
+    resp = benchmark(status_client.get, '/api/status')
+    assert resp.status_code == 200
+    assert len(resp.get_json()['spots']) == len(snapshot)
@@ -8,6 +8,58 @@ _PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if _PROJECT_ROOT not in sys.path:
     sys.path.insert(0, _PROJECT_ROOT)
 
+# the Firebase backend initializes the app on first use; give it a URL so it never probes the network
+os.environ.setdefault('RTDB_URL', 'http://localhost:9')
+
+
+@pytest.fixture
+def memory_storage():
+    """Run the test against a fresh in-memory storage backend."""
+    import storage
+    backend = storage.MemoryStorage()
+    previous = storage.use(backend)
+    yield backend
+    storage.use(previous)
+
+
+@pytest.fixture
+def standin():
+    """RestStorage on a local RTDB REST stand-in, made the active backend."""
+    import rtdb_client
+    import rtdb_standin
+    import storage
+    server = rtdb_standin.serve(keepalive=1)
+    backend = storage.RestStorage(server.url)
+    previous = storage.use(backend)
+    rtdb_client.stats.reset()
+    yield server
+    storage.use(previous)
+    backend.client.close()
+    server.stop()
+
+
+@pytest.fixture
+def make_lot():
+    """Factory for a ParkingLot of rows x cols FREE spots with distanceFromEntry = row + col.
+
+    make_lot(rows, cols, first_row=0, storage=None); given a storage backend
+    the same spots are also written to SPOTS and the lot is marked live.
+    """
+    from constants import ROOT_BRANCH
+    from data_structures import ParkingLot, Spot
+
+    def make(rows=6, cols=6, first_row=0, storage=None):
+        cells = [(r, c) for r in range(first_row, first_row + rows) for c in range(cols)]
+        pl = ParkingLot()
+        for r, c in cells:
+            pl.add_spot(Spot(r, c, r + c))
+        if storage is not None:
+            storage.set(f"/{ROOT_BRANCH}/SPOTS", {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c}
+                                                  for r, c in cells})
+            pl.live = True
+        return pl
+    return make
+
 
 @pytest.fixture
 def firebase_db_mock(monkeypatch):
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from constants import ROOT_BRANCH
+from async_sim import AsyncParkingSimulation
+from traffic import fixed_dwell
+
+
+def test_cars_progress_concurrently_and_the_lot_drains(memory_storage, make_lot):
+    lot = make_lot(6, 10, storage=memory_storage)
+    sim = AsyncParkingSimulation(lot, arrival_interval=1, wait_between=5, wrong_park_interval=0,
+                                 dwell=fixed_dwell(20), speed=500)
+    stats = asyncio.run(sim.run(40, drain=True))
+    assert stats['arrivals'] == stats['parked'] == 41
+    # ~25 cars on the lot at once, a handful still driving to their spot
+    assert sim.peak['cars'] >= 20 and sim.peak['waiting'] >= 3
+    assert sum(sim.phases.values()) == 0
+    # everyone left except the car on the sensor spot 0,0, which departures skip
+    assert stats['departures'] == 40
+    spots = memory_storage.get(f"/{ROOT_BRANCH}/SPOTS")
+    assert sorted(k for k, v in spots.items() if v['status'] != 'FREE') == ['0,0']
+    assert len(lot.free_spots) == 59
+
+
+@pytest.mark.parametrize('patience, rejected', [(0, 5), (30, 0)])
+def test_full_lot_turns_cars_away_or_queues_them(memory_storage, make_lot, patience, rejected):
+    # no sensor spot 0,0 here: every car leaves after its stay
+    lot = make_lot(1, 5, first_row=1, storage=memory_storage)
+    sim = AsyncParkingSimulation(lot, arrival_interval=1, wait_between=0, wrong_park_interval=0,
+                                 dwell=fixed_dwell(10), speed=200, patience=patience)
+    stats = asyncio.run(sim.run(9, drain=True))
+    # ten cars for five spots: the second five either leave or take the spots freed at t=10..14
+    assert stats['rejected'] == rejected
+    assert stats['parked'] == 10 - rejected
+    assert stats['queued'] == 0
+
+
+def test_outstanding_transitions_are_bounded(memory_storage, make_lot):
+    memory_storage.latency = 0.005
+    lot = make_lot(5, 10, storage=memory_storage)
+    sim = AsyncParkingSimulation(lot, arrival_interval=0.1, wait_between=1, wrong_park_interval=0,
+                                 dwell=fixed_dwell(5), speed=100, io_workers=4, max_pending=3)
+    stats = asyncio.run(sim.run(3, drain=True))
+    assert stats['parked'] == 31
+    assert sim.peak['pending'] == 3
+    # the DB couldn't keep up with a car every millisecond: cars waited for slots
+    assert sim.io_wait > 0
@@ -0,0 +1,71 @@
+import pytest
+import storage
+import capacity_planner as cp
+
+
+def scenario(**overrides):
+    params = {'rows': 10, 'cols': 5, 'gates': [[3, 0]], 'arrivals': 'poisson:60', 'profile': None,
+              'dwell': 'exp:2400', 'hours': 24.0, 'warmup_hours': 2.0, 'wait': 1.0, 'seed': 1}
+    params.update(overrides)
+    return params
+
+
+def test_run_is_offline_and_reproducible(monkeypatch):
+    def no_storage(path='/'):
+        raise AssertionError('the planner must not touch storage')
+    monkeypatch.setattr(storage, 'reference', no_storage)
+    first = cp.run_scenario(scenario())
+    again = cp.run_scenario(scenario())
+    assert {k: v for k, v in first.items() if k != 'runtime_s'} == {k: v for k, v in again.items() if k != 'runtime_s'}
+    assert first['offered'] > 1000
+    assert cp.run_scenario(scenario(seed=2))['offered'] != first['offered']
+
+
+def test_metrics_follow_the_offered_load():
+    # 40 erlangs on 50 spots: ~80% busy with a few rejections; doubling the lot removes them
+    small = cp.run_scenario(scenario(hours=48.0))
+    assert small['mean_occupancy'] == pytest.approx(0.8, abs=0.05)
+    assert 0 < small['rejection_rate'] < 0.08
+    big = cp.run_scenario(scenario(rows=20, hours=48.0))
+    assert big['rejection_rate'] == 0
+    assert big['mean_occupancy'] == pytest.approx(0.4, abs=0.05)
+    assert big['peak_occupancy'] < 1
+    assert big['mean_walk'] > 0
+
+
+def test_more_gates_shorten_walks():
+    one = cp.run_scenario(scenario(rows=20, cols=10, arrivals='poisson:30'))
+    two = cp.run_scenario(scenario(rows=20, cols=10, arrivals='poisson:30', gates=[[3, 0], [19, 9]]))
+    assert two['mean_walk'] <= one['mean_walk']
+
+
+def test_grid_sweep_and_summary():
+    scenarios = cp.expand_grid(rows=(5, 10), rates=(30, 60), replicates=3, hours=4.0)
+    assert len(scenarios) == 12
+    assert len({s['seed'] for s in scenarios}) == 12
+    serial = list(cp.run_sweep(scenarios, workers=1))
+    parallel = list(cp.run_sweep(scenarios, workers=2, batch_size=2))
+    by_seed = lambda rs: {r['seed']: r['rejection_rate'] for r in rs}  # noqa: E731
+    assert by_seed(serial) == by_seed(parallel)
+    report = cp.summarize(parallel)
+    assert len(report) == 4
+    assert all(row['runs'] == 3 for row in report)
+    assert report[0]['rows'] == 5 and 'rejection_rate_ci95' in report[0]
+    assert '5x5' in cp.format_report(report)
+
+
+def test_closing_a_sweep_cancels_the_queued_batches(monkeypatch):
+    shutdowns = []
+
+    class Pool(cp.ProcessPoolExecutor):
+        def shutdown(self, wait=True, *, cancel_futures=False):
+            shutdowns.append(cancel_futures)
+            super().shutdown(wait=wait, cancel_futures=cancel_futures)
+    monkeypatch.setattr(cp, 'ProcessPoolExecutor', Pool)
+    scenarios = cp.expand_grid(rows=(5,), rates=(30,), replicates=40, hours=4.0)
+    sweep = cp.run_sweep(scenarios, workers=2, batch_size=1)
+    next(sweep)
+    sweep.close()
+    assert shutdowns[0] is True
+    assert len(list(cp.run_sweep(scenarios[:4], workers=2, batch_size=1))) == 4
+    assert shutdowns[-1] is False
@@ -0,0 +1,91 @@
+import random
+import sys
+import threading
+import time
+
+THREADS = 32
+
+
+def gated_lot(make_lot, rows, cols):
+    """make_lot(rows, cols) with gates A, B and C at three of its corners."""
+    pl = make_lot(rows, cols)
+    pl.register_gate('A', 0, 0)
+    pl.register_gate('B', rows - 1, cols - 1)
+    pl.register_gate('C', 0, cols - 1)
+    return pl
+
+
+def run_threads(target):
+    start_gate = threading.Barrier(THREADS)
+    threads = [threading.Thread(target=target, args=(i, start_gate)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_reserve_closest_never_double_allocates(make_lot):
+    # force very frequent thread switches so races would surface
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        pl = gated_lot(make_lot, 40, 25)
+        total = len(pl.spot_lookup)
+        results = [[] for _ in range(THREADS)]
+
+        def worker(i, start_gate):
+            start_gate.wait()
+            n = 0
+            while True:
+                n += 1
+                spot = pl.reserve_closest(f"T{i}-{n}", gate='ABC'[i % 3])
+                if spot is None:
+                    return
+                results[i].append(spot)
+
+        t0 = time.perf_counter()
+        run_threads(worker)
+        elapsed = time.perf_counter() - t0
+    finally:
+        sys.setswitchinterval(old_interval)
+
+    allocated = [s for r in results for s in r]
+    assert len(allocated) == total
+    assert len(set(allocated)) == total, "a spot was handed to two cars"
+    assert all(pl.get_spot(s).status == 'WAITING' for s in allocated)
+    assert len(pl.free_spots) == 0
+    assert len(pl.waiting_pairs) == total
+    print(f"\n{total / elapsed:,.0f} allocations/s from {THREADS} threads")
+
+
+def test_concurrent_arrive_park_depart_keeps_one_car_per_spot(make_lot):
+    pl = gated_lot(make_lot, 20, 10)
+    holders = {}  # spot_id -> car_id, as seen by the workers
+    holders_lock = threading.Lock()
+    errors = []
+
+    def worker(i, start_gate):
+        rng = random.Random(i)
+        start_gate.wait()
+        for n in range(200):
+            car = f"T{i}-{n}"
+            spot = pl.reserve_closest(car, gate='ABC'[rng.randrange(3)])
+            if spot is None:
+                continue
+            with holders_lock:
+                if spot in holders:
+                    errors.append((spot, holders[spot], car))
+                holders[spot] = car
+            pl.confirm_parked(car)
+            with holders_lock:
+                holders.pop(spot, None)
+            # departure must happen after the bookkeeping above so the spot is not
+            # legitimately re-reserved while this worker still holds it
+            pl.release_spot(spot)
+
+    run_threads(worker)
+    assert not errors
+    assert not pl.waiting_pairs
+    assert not pl.occupied_spots_with_cars
+    assert len(pl.free_spots) == len(pl.spot_lookup)
+    assert pl.find_closest(0, 0) == (0, 0)
@@ -0,0 +1,42 @@
+import pytest
+
+import dashboard
+
+
+@pytest.fixture
+def client(monkeypatch, memory_storage):
+    # read through the (in-memory) storage backend rather than the live stream mirror
+    monkeypatch.setenv('LIVE_MIRROR', '0')
+    spots = {}
+    for r in range(4):
+        for c in range(4):
+            spots[f"{r},{c}"] = {'status': 'FREE', 'distanceFromEntry': r + c}
+    spots['0,0']['status'] = 'OCCUPIED'
+    meta = {'gates': {'north': {'row': 0, 'col': 0}, 'south': {'row': 3, 'col': 3}}}
+    memory_storage.set(dashboard.ROOT, spots)
+    memory_storage.set(dashboard.META, meta)
+    monkeypatch.setitem(dashboard._gates_cache, 'loaded_at', None)
+    return dashboard.app.test_client()
+
+
+def test_status_for_named_gate(client):
+    north = client.get('/api/status?gate=north').get_json()
+    assert north['gate'] == {'id': 'north', 'row': 0, 'col': 0}
+    assert north['closest_free'] == '1,0'
+
+    south = client.get('/api/status?gate=south').get_json()
+    assert south['closest_free'] == '3,3'
+    assert south['closest_free_by_gate'] == {'north': '1,0', 'south': '3,3'}
+
+
+def test_status_unknown_gate_is_404(client):
+    resp = client.get('/api/status?gate=nope')
+    assert resp.status_code == 404
+    assert resp.get_json()['gates'] == ['north', 'south']
+
+
+def test_status_without_gate_uses_default(client):
+    body = client.get('/api/status').get_json()
+    assert body['gate']['id'] is None
+    assert (body['gate']['row'], body['gate']['col']) == (0, 2)
+    assert body['closest_free'] == '0,2'
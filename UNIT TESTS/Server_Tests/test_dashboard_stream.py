@@ -0,0 +1,116 @@
+import json
+import threading
+
+import pytest
+
+import dashboard
+from lot_mirror import ParkingLotMirror
+
+
+def read_events(resp, count):
+    """Parse the first `count` SSE events (skipping keepalive comments)."""
+    events, buf = [], ''
+    for chunk in resp.response:
+        buf += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buf:
+            block, buf = buf.split('\n\n', 1)
+            if block.startswith(':'):
+                continue
+            fields = dict(line.split(': ', 1) for line in block.split('\n'))
+            events.append((fields['event'], json.loads(fields['data'])))
+            if len(events) == count:
+                return events
+    return events
+
+
+@pytest.fixture
+def mirror(monkeypatch):
+    m = ParkingLotMirror()
+    m.apply_event('put', '/', {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c}
+                               for r in range(3) for c in range(3)})
+    monkeypatch.setattr(dashboard, 'get_shared_mirror', lambda: m)
+    monkeypatch.setattr(dashboard, 'load_gates', lambda: {'main': (0, 0)})
+    monkeypatch.setattr(dashboard, 'STREAM_KEEPALIVE_SECONDS', 0.05)
+    dashboard._summary_cache.clear()
+    dashboard._body_cache.clear()
+    return m
+
+
+def test_stream_sends_snapshot_then_deltas(mirror):
+    client = dashboard.app.test_client()
+    resp = client.get('/api/stream?gate=main', buffered=False)
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/event-stream'
+
+    # change the lot while the client is connected
+    timer = threading.Timer(0.1, lambda: mirror.apply_event('put', '/0,0/status', 'OCCUPIED'))
+    timer.start()
+    (kind, snap), (kind2, delta) = read_events(resp, 2)
+    timer.join()
+    resp.close()
+
+    assert kind == 'snapshot'
+    assert len(snap['spots']) == 9 and snap['closest_free'] == '0,0' and snap['free_count'] == 9
+    assert kind2 == 'delta'
+    assert delta['version'] == snap['version'] + 1
+    assert list(delta['spots']) == ['0,0'] and delta['spots']['0,0']['status'] == 'OCCUPIED'
+    # only summary fields that changed are resent
+    assert delta['closest_free'] == '1,0' and delta['free_count'] == 8
+    assert 'is_full' not in delta and 'gate_waiting_car' not in delta
+
+
+def test_stream_unknown_gate_and_no_mirror(mirror, monkeypatch):
+    client = dashboard.app.test_client()
+    assert client.get('/api/stream?gate=nope').status_code == 404
+    monkeypatch.setenv('LIVE_MIRROR', '0')
+    assert client.get('/api/stream').status_code == 503
+
+
+def test_status_etag_and_304(mirror):
+    client = dashboard.app.test_client()
+    first = client.get('/api/status?gate=main')
+    etag = first.headers['ETag']
+    assert first.get_json()['free_count'] == 9
+    assert client.get('/api/status?gate=main', headers={'If-None-Match': etag}).status_code == 304
+
+    # same version -> served from the cached body
+    assert client.get('/api/status?gate=main').data == first.data
+    assert len(dashboard._body_cache) == 1
+
+    mirror.apply_event('put', '/0,0/status', 'OCCUPIED')
+    fresh = client.get('/api/status?gate=main', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200 and fresh.headers['ETag'] != etag
+    assert fresh.get_json()['free_count'] == 8
+
+
+def test_gate_changes_in_meta_reach_the_cached_status(mirror, monkeypatch):
+    client = dashboard.app.test_client()
+    monkeypatch.setattr(dashboard, 'load_gates', lambda: {'main': (0, 0), 'side': (2, 2)})
+    first = client.get('/api/status?gate=main')
+    assert first.get_json()['closest_free_by_gate'] == {'main': '0,0', 'side': '2,2'}
+
+    # same lot version: 'side' moves, then goes away
+    monkeypatch.setattr(dashboard, 'load_gates', lambda: {'main': (0, 0), 'side': (0, 2)})
+    moved = client.get('/api/status?gate=main', headers={'If-None-Match': first.headers['ETag']})
+    assert moved.status_code == 200 and moved.get_json()['closest_free_by_gate']['side'] == '0,2'
+    monkeypatch.setattr(dashboard, 'load_gates', lambda: {'main': (0, 0)})
+    assert client.get('/api/status?gate=main').get_json()['closest_free_by_gate'] == {'main': '0,0'}
+    assert client.get('/api/status?gate=side').status_code == 404
+
+
+def test_status_since_returns_delta(mirror):
+    client = dashboard.app.test_client()
+    base = client.get('/api/status').get_json()
+    version, epoch = base['version'], base['epoch']
+    assert client.get(f'/api/status?since={version}').status_code == 304
+
+    mirror.apply_event('put', '/2,2/status', 'WAITING')
+    mirror.apply_event('put', '/2,1', None)
+    delta = client.get(f'/api/status?since={version}&epoch={epoch}').get_json()
+    assert delta['delta'] is True and delta['version'] == version + 2
+    assert delta['spots'] == {'2,2': {'status': 'WAITING', 'distanceFromEntry': 4}, '2,1': None}
+    assert delta['free_count'] == 7
+
+    # a version from another mirror (e.g. after a restart) gets the full payload
+    full = client.get(f'/api/status?since={version}&epoch=other').get_json()
+    assert full['delta'] is False and len(full['spots']) == 8
@@ -0,0 +1,110 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+
+import pytest
+
+import eventlog
+from eventlog import EventLog, Preview
+
+
+class Costly:
+    """Counts how often it is rendered."""
+
+    renders = 0
+
+    def __repr__(self):
+        Costly.renders += 1
+        return 'costly'
+
+    __str__ = __repr__
+
+
+@pytest.fixture
+def out():
+    stream = io.StringIO()
+    eventlog.stats.clear()
+    yield stream
+    eventlog.configure()
+
+
+def lines(stream):
+    eventlog.flush()
+    return stream.getvalue().splitlines()
+
+
+def test_json_lines_carry_the_event_and_its_fields(out):
+    eventlog.configure(level='INFO', fmt='json', stream=out)
+    EventLog('tests', 'T').info('car_parked', 'Car %s parked at spot %s', 'AB-123', '3,4', plate='AB-123', spot='3,4')
+    [line] = lines(out)
+    entry = json.loads(line)
+    assert entry['event'] == 'car_parked' and entry['level'] == 'INFO'
+    assert entry['msg'] == 'Car AB-123 parked at spot 3,4'
+    assert entry['plate'] == 'AB-123' and entry['spot'] == '3,4'
+    assert entry['logger'] == 'iot_parking.tests'
+
+
+def test_disabled_levels_never_format_their_arguments(out):
+    eventlog.configure(level='INFO', stream=out)
+    log = EventLog('tests', 'T')
+    Costly.renders = 0
+    for _ in range(1000):
+        log.debug('noise', 'value %s', Costly())
+    log.info('kept', 'value %s', Costly())
+    assert lines(out) == ['[T] value costly']
+    assert Costly.renders == 1
+
+
+def test_sampling_keeps_one_in_n_but_never_drops_warnings(out):
+    eventlog.configure(level='INFO', stream=out, sample='car_parked=10')
+    log = EventLog('tests', 'T')
+    for i in range(100):
+        log.info('car_parked', 'parked %d', i)
+        log.info('car_waiting', 'waiting %d', i)
+    for i in range(5):
+        log.warning('car_parked', 'failed %d', i)
+    text = lines(out)
+    assert [t for t in text if 'parked' in t] == ['[T] parked %d' % i for i in range(0, 100, 10)]
+    assert eventlog.stats['emitted:car_parked'] == 10 + 5
+    assert eventlog.stats['sampled_out:car_parked'] == 90
+    assert eventlog.stats['emitted:car_waiting'] == 100
+    assert sum(t.startswith('[T] failed') for t in text) == 5
+
+
+def test_records_after_shutdown_are_written_without_a_new_thread(out):
+    eventlog.configure(level='INFO', stream=out)
+    log = EventLog('tests', 'T')
+    log.info('car_parked', 'before')
+    eventlog.shutdown()
+    log.info('car_parked', 'after %s', 'shutdown')
+    assert eventlog._listener is None
+    assert out.getvalue().splitlines() == ['[T] before', '[T] after shutdown']
+
+
+def test_a_full_queue_drops_info_but_never_warnings(out, monkeypatch):
+    monkeypatch.setattr(eventlog, 'WARNING_WAIT', 0.01)
+    writer = logging.StreamHandler(out)
+    writer.setFormatter(logging.Formatter(eventlog.TEXT_FORMAT))
+    monkeypatch.setattr(eventlog, '_listener', logging.handlers.QueueListener(queue.Queue(), writer))
+    full = queue.Queue(1)
+    full.put('busy')
+    handler = eventlog._QueueHandler(full)
+    logger = logging.getLogger('iot_parking.tests')
+    for level, event in ((logging.INFO, 'car_parked'), (logging.WARNING, 'park_error')):
+        handler.handle(logger.makeRecord(logger.name, level, __file__, 0, event, (), None,
+                                         extra={'tag': 'T', 'event': event}))
+    assert eventlog.stats['dropped:car_parked'] == 1 and eventlog.stats['unqueued:park_error'] == 1
+    assert out.getvalue() == '[T] park_error\n'
+
+
+def test_preview_renders_only_what_it_shows():
+    Costly.renders = 0
+    tree = {f"{r},{c}": {'status': 'FREE', 'probe': Costly()} for r in range(300) for c in range(300)}
+    text = str(Preview(tree, 120))
+    assert len(text) == 123 and text.endswith('...')
+    assert text.startswith("{'0,0': {'status': 'FREE', 'probe': costly}")
+    assert Costly.renders < 5
+    assert str(Preview('short text')) == 'short text'
+    assert str(Preview({'a': [1, (2, 'x')]})) == str({'a': [1, (2, 'x')]})
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import firebase_init
+
+SERVER_DIR = os.path.dirname(os.path.abspath(firebase_init.__file__))
+
+
+def test_import_is_free_of_side_effects():
+    code = ("import sys, dashboard, simulation_sondos; "
+            "print(sorted(m for m in ('firebase_admin', 'requests', 'numpy') if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=SERVER_DIR, RTDB_URL='')
+    out = subprocess.run([sys.executable, '-c', code], env=env, cwd=SERVER_DIR,
+                         capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip().splitlines()[-1] == '[]'
+
+
+def test_candidates_are_probed_in_parallel(monkeypatch):
+    exists = {'https://b', 'https://c'}
+
+    def slow_probe(url, timeout=None):
+        time.sleep(0.2)
+        return url in exists
+    monkeypatch.setattr(firebase_init, '_probe_url', slow_probe)
+    started = time.perf_counter()
+    # the first existing candidate in list order wins, whichever answers first
+    assert firebase_init._probe_candidates(['https://a', 'https://b', 'https://c', 'https://d']) == 'https://b'
+    assert time.perf_counter() - started < 0.6
+
+
+def test_probed_url_is_cached_on_disk(monkeypatch, tmp_path):
+    secret = tmp_path / 'secret.json'
+    secret.write_text(json.dumps({'project_id': 'lot42'}))
+    monkeypatch.delenv('RTDB_URL', raising=False)
+    monkeypatch.delenv('FIREBASE_DATABASE_URL', raising=False)
+    monkeypatch.setattr(firebase_init, 'URL_CACHE_PATH', str(tmp_path / 'cache' / 'rtdb_url.json'))
+    probes = []
+
+    def probe(url, timeout=None):
+        probes.append(url)
+        return 'europe-west1' in url
+    monkeypatch.setattr(firebase_init, '_probe_url', probe)
+    url = firebase_init._derive_database_url(str(secret))
+    assert url == 'https://lot42-default-rtdb.europe-west1.firebasedatabase.app'
+    assert len(probes) == 4
+    # a second process start reads the cache instead of probing
+    assert firebase_init._derive_database_url(str(secret)) == url
+    assert len(probes) == 4
+
+
+def test_init_runs_once(monkeypatch):
+    import firebase_admin
+    calls = []
+
+    def no_app():
+        raise ValueError('no app')
+
+    def initialize_app(cred, options):
+        calls.append(options)
+        time.sleep(0.05)
+        return type('App', (), {'options': options})()
+    monkeypatch.setattr(firebase_admin, 'get_app', no_app)
+    monkeypatch.setattr(firebase_admin, 'initialize_app', initialize_app)
+    monkeypatch.setattr(firebase_init, '_load_credentials', lambda path: None)
+    monkeypatch.setattr(firebase_init, '_app', None)
+    monkeypatch.setattr(firebase_init, 'database_url', None)
+    monkeypatch.setenv('RTDB_URL', 'http://localhost:9')
+    threads = [threading.Thread(target=firebase_init.init) for _ in range(4)]
+    threads.append(firebase_init.start())
+    for t in threads[:-1]:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [{'databaseURL': 'http://localhost:9'}]
+    assert firebase_init.database_url == 'http://localhost:9'
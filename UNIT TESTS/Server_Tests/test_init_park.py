@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import Init_Park
+from constants import ROOT_BRANCH
+from Init_Park import Layout, initialize
+
+
+def test_default_lot_matches_the_single_write_initializer(memory_storage, tmp_path):
+    assert initialize(Layout(), progress_path=str(tmp_path / 'progress.json'))
+    # clear SPOTS, the _meta update, one update for the 50 spots, one shallow read
+    assert dict(memory_storage.ops) == {'delete': 1, 'update': 2, 'get': 1}
+    tree = memory_storage.get(f"/{ROOT_BRANCH}")
+    assert len(tree['SPOTS']) == Init_Park.ROWS * Init_Park.COLS
+    for sid, node in tree['SPOTS'].items():
+        assert sid == f"{node['row']},{node['col']}" and node['status'] == 'FREE'
+        assert node['distanceFromEntry'] == Init_Park.distance_from_entry(node['row'], node['col'])
+        assert 'level' not in node
+    assert tree['_meta']['gates'] == {'main': {'row': 3, 'col': 0}}
+    assert (tree['_meta']['rows'], tree['_meta']['cols']) == (10, 5)
+    assert not (tmp_path / 'progress.json').exists()
+
+
+def test_levels_gates_and_blocked_cells(memory_storage, tmp_path):
+    layout = Layout(rows=4, cols=5, levels=3, gates={'north': [0, 2], 'ramp': {'level': 1, 'row': 3, 'col': 4}},
+                    blocked=[[1, 1], '2:0,0'], level_distance=10)
+    assert layout.spot_count == 3 * 4 * 5 - 3 - 1
+    assert initialize(layout, chunk_size=7, workers=3, progress_path=str(tmp_path / 'p.json'))
+    spots = memory_storage.get(f"/{ROOT_BRANCH}/SPOTS")
+    assert len(spots) == layout.spot_count
+    assert {'1,1', '5,1', '9,1', '8,0'}.isdisjoint(spots)
+    # level 2 starts at grid row 8; distance from north (level 0, 0,2) plus two ramps
+    assert spots['8,2'] == {**spots['8,2'], 'level': 2, 'row': 8, 'col': 2, 'distanceFromEntry': 20}
+    meta = memory_storage.get(f"/{ROOT_BRANCH}/_meta")
+    assert meta['gates'] == {'north': {'row': 0, 'col': 2}, 'ramp': {'row': 7, 'col': 4}}
+    assert (meta['rows'], meta['rowsPerLevel'], meta['levels'], meta['spots']) == (12, 4, 3, layout.spot_count)
+
+
+def test_interrupted_run_resumes_with_the_missing_chunks(memory_storage, tmp_path, monkeypatch):
+    progress = str(tmp_path / 'progress.json')
+    memory_storage.set(f"/{ROOT_BRANCH}/SPOTS/99,99", {'status': 'OCCUPIED'})  # left over from a bigger lot
+    layout = Layout(rows=10, cols=10)
+    update = memory_storage.update
+
+    def flaky(path, value):
+        if path.endswith('SPOTS') and '3,0' in value:
+            raise ConnectionError('connection reset')
+        return update(path, value)
+    monkeypatch.setattr(memory_storage, 'update', flaky)
+    assert not initialize(layout, chunk_size=10, workers=1, progress_path=progress)
+    assert json.load(open(progress))['done'] == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert len(memory_storage.get(f"/{ROOT_BRANCH}/SPOTS")) == 90
+
+    monkeypatch.setattr(memory_storage, 'update', update)
+    memory_storage.ops.clear()
+    assert initialize(layout, chunk_size=10, workers=1, progress_path=progress)
+    # only row 3 went out again (plus _meta); the SPOTS node was not cleared
+    assert memory_storage.ops['update'] == 2 and memory_storage.ops['delete'] == 0
+    spots = memory_storage.get(f"/{ROOT_BRANCH}/SPOTS")
+    assert len(spots) == 100 and '99,99' not in spots
+    assert not (tmp_path / 'progress.json').exists()
+
+
+def test_layout_from_file_and_flags(tmp_path):
+    path = tmp_path / 'garage.json'
+    path.write_text(json.dumps({'rows': 20, 'cols': 30, 'levels': 2, 'gates': {'a': [0, 0]}, 'blocked': [[1, 1]]}))
+    args = Init_Park.parse_args(['--layout', str(path), '--cols', '40', '--gate', 'b=1:2,3', '--block', '0:5,5'])
+    layout = Init_Park.layout_from_args(args)
+    assert (layout.rows, layout.cols, layout.levels) == (20, 40, 2)
+    assert layout.gates == {'b': (1, 2, 3)} and layout.entry == (1, 2, 3)
+    assert layout.blocked == {(0, 1, 1), (1, 1, 1), (0, 5, 5)}
+    with pytest.raises(ValueError, match='outside'):
+        Layout(rows=5, cols=5, gates={'g': [5, 0]})
+    with pytest.raises(ValueError, match='outside'):
+        Layout(rows=10, cols=5, blocked=['99,99'])
+    with pytest.raises(ValueError, match='outside'):
+        Layout(rows=10, cols=5, levels=2, blocked=['2:0,0'])
+    with pytest.raises(ValueError, match='unknown layout keys'):
+        Layout.from_dict({'rows': 5, 'colums': 5})
@@ -1,8 +1,10 @@
 import time
 import os
 from firebase_admin import db
-import firebase_init  # initializes firebase_admin using secret.json or env
-from event_generator import simulate_car_arrival, simulate_car_departure
+import firebase_init
+
+firebase_init.init()  # initializes firebase_admin using secret.json or env
+from event_generator import simulate_car_arrival, simulate_car_departure  # noqa: E402
 
 
 class SimplePL:
@@ -0,0 +1,131 @@
+import random
+
+import numpy as np
+import pytest
+
+import dashboard
+import lot_grid
+from data_structures import ParkingLot, Spot
+from lot_grid import OccupancyGrid
+from lot_mirror import ParkingLotMirror
+
+
+def test_grid_follows_the_lot(make_lot):
+    pl = make_lot(4, 5)
+    grid = pl.attach_occupancy_grid()
+    assert grid.shape == (4, 5)
+    assert grid.counts()['FREE'] == 20
+    assert grid.distance[3, 4] == 7
+
+    pl.get_spot('1,2').status = 'OCCUPIED'
+    pl.get_spot('1,3').status = 'WAITING'
+    pl.remove_spot('3,4')
+    pl.add_spot(Spot(5, 1, 6))  # grows the grid
+    assert grid.shape == (6, 5)
+    assert grid.counts() == {'FREE': 18, 'WAITING': 1, 'OCCUPIED': 1, 'WRONG_PARK': 0, 'OTHER': 0}
+    assert grid.free_count() == 18 and grid.spot_count() == 20
+    assert grid.row_occupancy().tolist() == [0, 0.4, 0, 0, 0, 0]
+    assert grid.col_occupancy()[2] == pytest.approx(0.25)
+    assert grid.status[3, 4] == lot_grid.NO_SPOT
+
+    # incremental counters match a full recount
+    rows, cols = grid.row_occupancy(), grid.col_occupancy()
+    grid._recount()
+    assert np.array_equal(rows, grid.row_occupancy()) and np.array_equal(cols, grid.col_occupancy())
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(11)
+    grid = OccupancyGrid()
+    cells = {}
+    for r in range(60):
+        for c in range(45):
+            if rng.random() < 0.9:
+                cells[(r, c)] = rng.choice(['FREE', 'OCCUPIED', 'OCCUPIED', 'OCCUPIED', 'WAITING'])
+    grid.load((r, c, status, r + c) for (r, c), status in cells.items())
+    for gate in [(0, 0), (30, 20), (59, 44), (-5, 100), (200, -3)]:
+        for status in ('FREE', 'WAITING'):
+            matches = sorted(cell for cell, s in cells.items() if s == status)
+            expected = min(matches, key=lambda cell: abs(cell[0] - gate[0]) + abs(cell[1] - gate[1]))
+            assert grid.nearest(status, *gate) == expected
+    assert grid.nearest('WRONG_PARK', 0, 0) is None
+
+
+def test_heatmap_tiles():
+    grid = OccupancyGrid()
+    grid.load([(0, 0, 'OCCUPIED', 0), (0, 1, 'FREE', 1), (1, 0, 'FREE', 1), (1, 1, 'FREE', 2),
+               (2, 2, 'WAITING', 4)])
+    tiles = grid.heatmap(2)
+    assert tiles.shape == (2, 2)
+    assert tiles[0, 0] == 0.25 and tiles[1, 1] == 1.0
+    assert np.isnan(tiles[0, 1]) and np.isnan(tiles[1, 0])
+    payload = dashboard.heatmap_payload(grid, 2)
+    assert payload['tiles'] == [[250, -1], [-1, 1000]]
+
+
+def test_negative_cells_are_rejected():
+    grid = OccupancyGrid()
+    grid.set_spot(2, 2, 'FREE', 4)
+    for update in (lambda: grid.set_spot(-1, 0, 'FREE'), lambda: grid.set_status(0, -1, 'OCCUPIED'),
+                   lambda: grid.remove_spot(-2, -2), lambda: grid.load([(-1, 1, 'FREE', 0)])):
+        with pytest.raises(ValueError, match='negative'):
+            update()
+    assert grid.counts()['FREE'] == 1 and grid.status[2, 2] == lot_grid.FREE
+
+    pl = ParkingLot()
+    pl.attach_occupancy_grid(grid)
+    pl.load_snapshot({'-1,0': {'status': 'FREE'}, '0,0': {'status': 'FREE'}})
+    assert pl.get_spot('-1,0') is not None and grid.free_count() == 2
+
+
+@pytest.fixture
+def mirror(monkeypatch):
+    m = ParkingLotMirror()
+    m.apply_event('put', '/', {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c}
+                               for r in range(4) for c in range(4)})
+    monkeypatch.setattr(dashboard, 'get_shared_mirror', lambda: m)
+    monkeypatch.setattr(dashboard, 'load_gates', lambda: {'main': (0, 0)})
+    dashboard._analytics_cache.clear()
+    return m
+
+
+def test_analytics_endpoint(mirror):
+    client = dashboard.app.test_client()
+    mirror.apply_event('put', '/0,0/status', 'OCCUPIED')
+    mirror.apply_event('patch', '/2,3', {'status': 'WAITING', 'waitingCarId': 'CAR9'})
+    resp = client.get('/api/analytics?gate=main')
+    body = resp.get_json()
+    assert body['gate'] == {'id': 'main', 'row': 0, 'col': 0}
+    assert body['counts']['FREE'] == 14 and body['free_count'] == 14
+    assert body['nearest_free'] == '0,1' and body['nearest_waiting'] == '2,3'
+    assert body['row_occupancy'] == [0.25, 0, 0.25, 0]
+    assert body['occupancy'] == pytest.approx(2 / 16)
+
+    etag = resp.headers['ETag']
+    assert client.get('/api/analytics?gate=main', headers={'If-None-Match': etag}).status_code == 304
+    mirror.apply_event('put', '/0,1/status', 'OCCUPIED')
+    fresh = client.get('/api/analytics?gate=main', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200 and fresh.get_json()['nearest_free'] == '1,0'
+    assert client.get('/api/analytics?gate=nowhere').status_code == 404
+
+
+def test_heatmap_endpoint(mirror):
+    client = dashboard.app.test_client()
+    mirror.apply_event('put', '/0,0/status', 'OCCUPIED')
+    body = client.get('/api/heatmap?block=2').get_json()
+    assert body['block'] == 2 and body['scale'] == 1000
+    assert body['tiles'] == [[250, 0], [0, 0]]
+    assert client.get('/api/heatmap').get_json()['block'] == 1
+    assert client.get('/api/heatmap?block=0').status_code == 400
+
+
+def test_endpoints_without_mirror(monkeypatch, memory_storage):
+    monkeypatch.setenv('LIVE_MIRROR', '0')
+    memory_storage.set(dashboard.ROOT, {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c}
+                                        for r in range(3) for c in range(3)})
+    memory_storage.set(dashboard.META, {'gates': {'main': {'row': 2, 'col': 2}}})
+    monkeypatch.setitem(dashboard._gates_cache, 'loaded_at', None)
+    client = dashboard.app.test_client()
+    body = client.get('/api/analytics?gate=main').get_json()
+    assert body['nearest_free'] == '2,2' and body['spots'] == 9
+    assert client.get('/api/heatmap?block=3').get_json()['tiles'] == [[0]]
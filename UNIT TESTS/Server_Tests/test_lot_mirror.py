@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+import rtdb_client
+import storage
+from lot_mirror import ParkingLotMirror
+
+
+def grid_snapshot(rows=3, cols=3):
+    return {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c, 'seenCarId': '-', 'waitingCarId': '-'}
+            for r in range(rows) for c in range(cols)}
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.fixture
+def mirror():
+    m = ParkingLotMirror()
+    m.apply_event('put', '/', grid_snapshot())
+    return m
+
+
+def test_initial_put_builds_lot(mirror):
+    pl = mirror.parking_lot
+    assert mirror.ready and mirror.version == 1
+    assert len(pl.spot_lookup) == 9
+    assert len(pl.free_spots) == 9
+    assert pl.live
+    assert pl.find_closest(0, 0) == (0, 0)
+
+
+def test_single_spot_and_field_events(mirror):
+    pl = mirror.parking_lot
+    # whole spot replaced
+    mirror.apply_event('put', '/0,0', {'status': 'OCCUPIED', 'carId': 'CAR1', 'distanceFromEntry': 0})
+    assert pl.get_spot('0,0').status == 'OCCUPIED'
+    assert pl.occupied_spots_with_cars == {'0,0': 'CAR1'}
+    assert pl.find_closest(0, 0) == (1, 0)
+
+    # single field
+    mirror.apply_event('put', '/1,0/status', 'WAITING')
+    assert pl.get_spot('1,0').status == 'WAITING'
+    assert mirror.snapshot()['1,0']['status'] == 'WAITING'
+    assert mirror.snapshot()['1,0']['distanceFromEntry'] == 1
+    assert pl.find_closest(0, 0) == (0, 1)
+
+    # patch of one spot (None removes a field)
+    mirror.apply_event('patch', '/0,0', {'status': 'FREE', 'carId': None})
+    assert pl.get_spot('0,0').status == 'FREE'
+    assert '0,0' not in pl.occupied_spots_with_cars
+    assert 'carId' not in mirror.snapshot()['0,0']
+
+    # multi-spot patch at the root, parenthesised keys are normalized
+    mirror.apply_event('patch', '/', {'(2,2)': {'status': 'OCCUPIED', 'carId': 'CAR2'}})
+    assert pl.get_spot('2,2').status == 'OCCUPIED'
+    assert pl.get_spot('2,2') not in pl.free_spots
+    assert mirror.version == 5
+
+
+def test_nested_field_patch(mirror):
+    mirror.apply_event('patch', '/0,1/SpotIn', {'Arrievied': True})
+    mirror.apply_event('patch', '/0,1/SpotIn', {'Note': 'x'})
+    assert mirror.snapshot()['0,1']['SpotIn'] == {'Arrievied': True, 'Note': 'x'}
+
+
+def test_spot_removal_and_full_replace(mirror):
+    pl = mirror.parking_lot
+    mirror.apply_event('put', '/0,0', None)
+    assert pl.get_spot('0,0') is None
+    assert pl.find_closest(0, 0) == (1, 0)
+
+    mirror.apply_event('put', '/', {'5,5': {'status': 'FREE', 'distanceFromEntry': 10}})
+    assert set(pl.spot_lookup) == {'5,5'}
+    assert list(mirror.snapshot()) == ['5,5']
+    assert pl.find_closest(5, 5) == (5, 5)
+
+
+def test_start_waits_for_initial_snapshot(memory_storage):
+    memory_storage.set('/SondosPark/SPOTS', grid_snapshot(2, 2))
+    m = ParkingLotMirror().start(timeout=2)
+    assert len(m.parking_lot.spot_lookup) == 4
+
+    waiter = threading.Thread(target=lambda: memory_storage.set('/SondosPark/SPOTS/0,0/status', 'OCCUPIED'))
+    waiter.start()
+    assert m.wait_for_change(1, timeout=2) == 2
+    waiter.join()
+    m.stop()
+
+
+class Tokens:
+    """Access token source that counts what it hands out."""
+
+    def __init__(self):
+        self.issued = self.expired = 0
+
+    def __call__(self):
+        self.issued += 1
+        return f"token{self.issued}"
+
+    def expire(self):
+        self.expired += 1
+
+
+def test_rest_stream_reconnects_and_the_mirror_rebuilds(standin, monkeypatch):
+    monkeypatch.setattr(rtdb_client, 'STREAM_BACKOFF_MIN', 0.05)
+    tokens = storage.get_backend().client.auth = Tokens()
+    standin.storage.set('/SondosPark/SPOTS', grid_snapshot(2, 2))
+    m = ParkingLotMirror().start(timeout=2)
+    try:
+        assert standin.drop_streams('auth_revoked') == 1
+        assert wait_until(lambda: not standin.streams)
+        # written while nothing listens: only the reconnect's initial put carries it
+        standin.storage.set('/SondosPark/SPOTS/0,0/status', 'OCCUPIED')
+        standin.storage.set('/SondosPark/SPOTS/1,1', None)
+        assert wait_until(lambda: m.snapshot().get('0,0', {}).get('status') == 'OCCUPIED')
+        assert sorted(m.snapshot()) == ['0,0', '0,1', '1,0']
+        assert m.free_count() == 2 and len(m.parking_lot.free_spots) == 2
+        assert m._stream.reconnects == 1
+        assert tokens.expired == 1 and tokens.issued >= 2
+
+        standin.storage.set('/SondosPark/SPOTS/0,1/status', 'OCCUPIED')
+        assert wait_until(lambda: m.free_count() == 1)
+    finally:
+        m.stop()
+
+
+def test_mirror_listens_again_when_the_listener_dies(standin, monkeypatch):
+    monkeypatch.setattr(ParkingLotMirror, 'WATCH_SECONDS', 0.05)
+    standin.storage.set('/SondosPark/SPOTS', grid_snapshot(2, 2))
+    m = ParkingLotMirror().start(timeout=2)
+    try:
+        # a listener that gives up for good, like firebase_admin's on an error
+        m._stream.close()
+        assert wait_until(lambda: not m._stream.thread.is_alive())
+        standin.storage.set('/SondosPark/SPOTS/1,0/status', 'OCCUPIED')
+        assert wait_until(lambda: m.free_count() == 3)
+        assert m.relistens == 1
+    finally:
+        m.stop()
+
+
+def test_changes_since(mirror):
+    mirror.apply_event('put', '/0,0/status', 'OCCUPIED')
+    mirror.apply_event('put', '/1,1', None)
+    version, changes = mirror.changes_since(1)
+    assert version == 3
+    assert changes['0,0']['status'] == 'OCCUPIED'
+    assert changes['1,1'] is None and set(changes) == {'0,0', '1,1'}
+    assert mirror.changes_since(3) == (3, {})
+    # the initial put is still in the changelog, so every spot shows up
+    assert len(mirror.changes_since(0)[1]) == 9
+    # older than the changelog (or from the future) -> resync
+    assert mirror.changes_since(99)[1] is None
+
+    mirror._changelog.clear()
+    assert mirror.changes_since(1)[1] is None
+
+
+def test_status_counters_track_events(mirror):
+    assert mirror.free_count() == 9 and mirror.waiting_spots() == {}
+    mirror.apply_event('put', '/0,0/status', 'WAITING')
+    mirror.apply_event('patch', '/', {'0,1': {'status': 'OCCUPIED'}, '0,2': None})
+    assert mirror.free_count() == 6
+    assert list(mirror.waiting_spots()) == ['0,0']
+    mirror.apply_event('put', '/', grid_snapshot(2, 2))
+    assert mirror.free_count() == 4 and mirror.waiting_spots() == {}
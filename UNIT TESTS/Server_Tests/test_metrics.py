@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import dashboard
+import metrics
+import rtdb_client
+import rtdb_standin
+from data_structures import ParkingLot, SortedList
+
+
+@pytest.fixture
+def recording():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def test_disabled_runs_the_original_methods():
+    original = ParkingLot.__dict__['find_closest']
+    assert not metrics.enabled
+    metrics.enable()
+    try:
+        assert ParkingLot.__dict__['find_closest'].__wrapped__ is original
+        assert hasattr(SortedList.__dict__['add'], '__wrapped__')
+    finally:
+        metrics.disable()
+    assert ParkingLot.__dict__['find_closest'] is original
+    assert not hasattr(SortedList.__dict__['add'], '__wrapped__')
+
+
+def test_hot_paths_are_recorded(recording, make_lot):
+    pl = make_lot()
+    for i in range(10):
+        pl.reserve_closest(f"CAR{i}", gate_row=0, gate_col=2)
+    pl.refresh_from_snapshot({'5,5': {'status': 'OCCUPIED'}})
+    data = metrics.snapshot()['metrics']
+    [alloc] = data['parking_allocation_seconds']['series']
+    assert alloc['labels'] == {'method': 'reserve_closest'} and alloc['count'] == 10
+    assert 0 < alloc['p50'] <= alloc['p99'] <= alloc['max']
+    assert data['parking_bfs_runs_total']['series'][0]['value'] == 1
+    assert data['parking_bfs_nodes_visited_total']['series'][0]['value'] == 36
+    assert data['parking_refresh_changed_spots_total']['series'][0]['value'] == 1
+    ops = {s['labels']['op'] for s in data['sortedlist_op_seconds']['series']}
+    assert {'add', 'remove'} <= ops
+
+    text = metrics.prometheus()
+    assert '# TYPE parking_allocation_seconds histogram' in text
+    assert 'parking_allocation_seconds_bucket{method="reserve_closest",le="+Inf"} 10' in text
+    assert 'parking_allocation_seconds_count{method="reserve_closest"} 10' in text
+
+
+def test_rtdb_round_trips_and_payload_bytes_per_operation(recording):
+    server = rtdb_standin.serve()
+    client = rtdb_client.RtdbClient(server.url)
+    try:
+        value = {'status': 'FREE', 'distanceFromEntry': 3}
+        client.set('/P/SPOTS/1,2', value)
+        assert client.get('/P/SPOTS/1,2') == value
+    finally:
+        client.close()
+        server.stop()
+    stats = rtdb_client.stats.summary()[__name__]
+    body = len(json.dumps(value, separators=(',', ':')))
+    assert stats['ops'] == {'set': 1, 'get': 1}
+    assert stats['bytes_sent'] == {'set': body, 'get': 0}
+    assert stats['bytes_received'] == {'set': 0, 'get': body}
+
+    resp = dashboard.app.test_client().get('/metrics')
+    assert resp.status_code == 200 and resp.mimetype == 'text/plain'
+    text = resp.get_data(as_text=True)
+    assert f'rtdb_requests_total{{module="{__name__}",op="set"}} 1' in text
+    assert f'rtdb_payload_bytes_sent_total{{module="{__name__}",op="set"}} {body}' in text
+    assert f'rtdb_request_seconds_count{{module="{__name__}"}} 2' in text
@@ -51,3 +51,79 @@ def test_find_closest_and_allocate():
     allocated2 = pl.allocate_closest_spot(plate2, 0, 0)
     # depending on BFS traversal the next closest is 0,1
     assert allocated2 in ('0,1', '0,2', '1,1')
+
+
+def legacy_find_closest(pl, gate_row, gate_col):
+    """Reference BFS equivalent to the original string-parsing implementation."""
+    from collections import deque
+    cells = {pl._parse_spot_coords(sid) for sid in pl.spot_lookup}
+    free = {pl._parse_spot_coords(sid) for sid, s in pl.spot_lookup.items() if s.status == 'FREE'}
+    q = deque([(gate_row, gate_col)])
+    seen = {(gate_row, gate_col)}
+    while q:
+        r, c = q.popleft()
+        if (r, c) in free:
+            return (r, c)
+        nbrs = [(r + dr, c + dc) for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))]
+        nbrs = sorted((n for n in nbrs if n not in seen and n in cells), key=lambda rc: (rc[1], rc[0]))
+        for n in nbrs:
+            seen.add(n)
+            q.append(n)
+    return None
+
+
+def test_find_closest_matches_reference_bfs_on_random_lots():
+    import random
+    rng = random.Random(3)
+    for _ in range(30):
+        rows, cols = rng.randint(1, 12), rng.randint(1, 12)
+        pl = ParkingLot()
+        for r in range(rows):
+            for c in range(cols):
+                if rng.random() < 0.1:
+                    continue  # hole in the grid (pillar / ramp)
+                s = Spot(r, c, r + c)
+                s.status = 'FREE' if rng.random() < 0.3 else 'OCCUPIED'
+                # mix both registration styles used across the server
+                if rng.random() < 0.5:
+                    pl.add_spot(s)
+                else:
+                    pl.spot_lookup[s.spot_id] = s
+        for gate in ((0, 0), (0, cols // 2), (rows - 1, cols - 1), (-1, 0)):
+            assert pl.find_closest(*gate) == legacy_find_closest(pl, *gate)
+
+
+def test_find_closest_indexes_spots_added_after_first_search():
+    pl = ParkingLot()
+    first = Spot(0, 0, 0)
+    first.status = 'OCCUPIED'
+    pl.spot_lookup[first.spot_id] = first
+    assert pl.find_closest(0, 0) is None
+
+    late = Spot(0, 1, 1)
+    pl.spot_lookup[late.spot_id] = late
+    assert pl.find_closest(0, 0) == (0, 1)
+    assert pl.allocate_closest_spot('CAR', 0, 0) == '0,1'
+    assert late.status == 'WAITING'
+
+
+def test_gate_index_follows_status_flips():
+    import random
+    rng = random.Random(11)
+    pl = ParkingLot()
+    spots = []
+    for r in range(15):
+        for c in range(9):
+            s = Spot(r, c, r + c)
+            s.status = 'OCCUPIED'
+            pl.add_spot(s)
+            spots.append(s)
+    gates = [(0, 2), (14, 8), (7, 0)]
+    for gate in gates:
+        assert pl.find_closest(*gate) is None
+
+    for _ in range(400):
+        s = rng.choice(spots)
+        s.status = rng.choice(['FREE', 'WAITING', 'OCCUPIED'])
+        for gate in gates:
+            assert pl.find_closest(*gate) == legacy_find_closest(pl, *gate)
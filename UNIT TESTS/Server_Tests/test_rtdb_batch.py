@@ -0,0 +1,83 @@
+import time
+
+import pytest
+import rtdb_batch
+from data_structures import ParkingLot, Spot
+from event_generator import simulate_car_arrival, simulate_car_departure, simulate_car_parked
+from rtdb_batch import BatchWriter, WriteBatch
+from constants import ROOT_BRANCH
+
+
+class RecordingRef:
+    def __init__(self, calls, path):
+        self.calls, self.path = calls, path
+
+    def update(self, value):
+        self.calls.append((self.path, dict(value)))
+
+    def get(self):
+        return None
+
+    def child(self, name):
+        return RecordingRef(self.calls, f"{self.path}/{name}")
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(rtdb_batch.storage, 'reference', lambda path='/': RecordingRef(recorded, path))
+    monkeypatch.setattr(rtdb_batch, '_writer', BatchWriter())
+    return recorded
+
+
+def test_batch_folds_overlapping_paths():
+    b = WriteBatch()
+    b.update('A/CARS/1', {'status': 'waiting', 'SpotIn': {'Arrievied': False}})
+    b.set('A/CARS/1', {'Id': '1'})  # replaces the queued children
+    b.set('A/CARS/1/SpotIn/Arrievied', True)  # merges into the queued node
+    b.update('/A/SPOTS/0,1/', {'status': 'FREE', 'carId': None})
+    assert b.updates == {
+        'A/CARS/1': {'Id': '1', 'SpotIn': {'Arrievied': True}},
+        'A/SPOTS/0,1/status': 'FREE',
+        'A/SPOTS/0,1/carId': None,
+    }
+    b.delete('A/SPOTS')
+    assert b.updates == {'A/CARS/1': {'Id': '1', 'SpotIn': {'Arrievied': True}}, 'A/SPOTS': None}
+
+
+def test_lifecycle_is_one_update_per_transition(calls):
+    pl = ParkingLot()
+    for c in range(3):
+        pl.add_spot(Spot(0, c, c))
+    pl.live = True  # no sensor refresh read
+
+    plate = simulate_car_arrival(pl)
+    assert len(calls) == 1
+    root, updates = calls[0]
+    assert root == '/'
+    assert updates[f"{ROOT_BRANCH}/CARS/{plate}"]['allocatedSpot'] == '0,2'
+    assert updates[f"{ROOT_BRANCH}/SPOTS/0,2/status"] == 'WAITING'
+
+    assert simulate_car_parked(pl, plate) == '0,2'
+    assert len(calls) == 2
+    assert calls[1][1][f"{ROOT_BRANCH}/SPOTS/0,2/status"] == 'OCCUPIED'
+    assert calls[1][1][f"{ROOT_BRANCH}/CARS/{plate}/status"] == 'parked'
+
+    assert simulate_car_departure(pl) == plate
+    assert len(calls) == 3
+    updates = calls[2][1]
+    assert updates[f"{ROOT_BRANCH}/SPOTS/0,2/status"] == 'FREE'
+    assert updates[f"{ROOT_BRANCH}/CARS/{plate}"] is None and updates[f"CARS/{plate}"] is None
+
+
+def test_micro_batch_window_merges_cars(calls):
+    writer = rtdb_batch.set_batch_window(0.05)
+    for i in range(5):
+        rtdb_batch.commit(WriteBatch().set(f"A/CARS/{i}", {'Id': str(i)}))
+    assert calls == []
+    time.sleep(0.2)
+    assert len(calls) == 1 and len(calls[0][1]) == 5
+
+    rtdb_batch.commit(WriteBatch().set('A/CARS/9', {'Id': '9'}))
+    rtdb_batch.flush()
+    assert len(calls) == 2 and writer.round_trips == 2
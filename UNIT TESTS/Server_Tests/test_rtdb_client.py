@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+import rtdb_client
+import rtdb_standin
+import storage
+
+
+def test_rest_backend_round_trip(standin):
+    events = []
+    listener = storage.reference('/P/SPOTS').listen(events.append)
+    spots = storage.reference('/P/SPOTS')
+    spots.set({'0,0': {'status': 'FREE'}, '0,1': {'status': 'FREE'}})
+    storage.reference('/P').update({'SPOTS/0,0/status': 'OCCUPIED', 'CARS/A': {'spot': '0,0'}})
+    spots.update({'0,1': {'status': 'WAITING'}})
+    spots.child('0,1').delete()
+    assert storage.reference('/P').get() == {'SPOTS': {'0,0': {'status': 'OCCUPIED'}}, 'CARS': {'A': {'spot': '0,0'}}}
+    assert storage.reference('/P').get(shallow=True) == {'SPOTS': True, 'CARS': True}
+    with pytest.raises(rtdb_client.RtdbError) as err:
+        storage.get_backend().client.update('/P', [])
+    assert err.value.status == 400
+
+    deadline = time.time() + 5
+    while len(events) < 5 and time.time() < deadline:
+        time.sleep(0.02)
+    listener.close()
+    assert [(e.event_type, e.path) for e in events] == [
+        ('put', '/'), ('put', '/'), ('put', '/0,0/status'), ('patch', '/'), ('put', '/0,1')]
+    assert events[1].data == {'0,0': {'status': 'FREE'}, '0,1': {'status': 'FREE'}}
+
+
+def test_requests_reuse_one_connection_and_are_metered_per_module(standin):
+    ref = storage.reference('/P/SPOTS')
+    for i in range(50):
+        ref.child(str(i)).set({'status': 'FREE'})
+        ref.get(shallow=True)
+    assert standin.connections == 1
+    stats = rtdb_client.stats.summary()[__name__]
+    assert stats['requests'] == 100 and stats['errors'] == 0
+    assert stats['ops'] == {'set': 50, 'get': 50}
+    assert stats['new_connections'] == 1 and stats['reuse_ratio'] == pytest.approx(0.99)
+    assert 0 < stats['p50_ms'] <= stats['p90_ms'] <= stats['p99_ms'] <= stats['max_ms']
+
+
+def test_concurrency_limit(monkeypatch):
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    class Tracked(storage.MemoryStorage):
+        def get(self, path, shallow=False):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return super().get(path, shallow)
+
+    server = rtdb_standin.serve(Tracked())
+    monkeypatch.setattr(rtdb_client, '_limit', threading.BoundedSemaphore(2))
+    client = rtdb_client.RtdbClient(server.url)
+    try:
+        threads = [threading.Thread(target=client.get, args=('/P',)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        client.close()
+        server.stop()
+    assert peak[0] == 2
+    # two workers need at most two keep-alive connections
+    assert server.connections == 2
+
+
+def test_references_are_cached_per_path(memory_storage):
+    ref = storage.reference('/P/SPOTS')
+    assert storage.reference('/P/SPOTS') is ref
+    assert ref.child('1,2') is storage.reference('/P/SPOTS/1,2')
+    other = storage.MemoryStorage()
+    previous = storage.use(other)
+    try:
+        assert storage.reference('/P/SPOTS') is not ref
+        assert storage.reference('/P/SPOTS')._backend is other
+    finally:
+        storage.use(previous)
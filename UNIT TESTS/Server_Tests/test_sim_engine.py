@@ -0,0 +1,96 @@
+import io
+import random
+import pytest
+import eventlog
+from constants import ROOT_BRANCH
+from sim_engine import SimEngine, ParkingSimulation
+
+
+@pytest.fixture
+def lot(memory_storage, make_lot):
+    return make_lot(4, 5, storage=memory_storage)
+
+
+def test_engine_runs_events_in_time_order_on_virtual_clock():
+    engine = SimEngine()
+    seen = []
+    engine.schedule(5.0, 'b', lambda: seen.append(('b', engine.now)))
+    engine.schedule(1.0, 'a', lambda: seen.append(('a', engine.now)))
+    engine.schedule(5.0, 'c', lambda: seen.append(('c', engine.now)))
+    assert engine.run(until=3600.0) == 3
+    assert seen == [('a', 1.0), ('b', 5.0), ('c', 5.0)]
+    assert engine.now == 3600.0
+    assert engine.processed == {'a': 1, 'b': 1, 'c': 1}
+
+
+def test_engine_keeps_running_after_a_failing_handler():
+    engine = SimEngine()
+    engine.schedule(1.0, 'boom', lambda: 1 / 0)
+    engine.schedule(2.0, 'ok', lambda: None)
+    assert engine.run() == 2
+    assert engine.processed == {'boom_failed': 1, 'ok': 1}
+
+
+def test_dwell_departures_free_each_car_after_its_stay(lot, memory_storage):
+    sim = ParkingSimulation(lot, arrival_interval=10, wait_between=1, wrong_park_interval=0,
+                            dwell=lambda rng: 25.0, rng=random.Random(1))
+    sim.run(100)
+    # arrivals at 0..100 (11), parked 1s later, gone 25s after parking
+    assert sim.stats['arrivals'] == 11
+    assert sim.stats['parked'] == 10
+    assert sim.stats['departures'] == 8
+    occupied = dict(lot.get_occupied_spots())
+    assert len(occupied) == 2
+    spots = memory_storage.get(f"/{ROOT_BRANCH}/SPOTS")
+    assert sorted(k for k, v in spots.items() if v['status'] == 'OCCUPIED') == sorted(occupied)
+    # departed cars' records are deleted; the two parked and the waiting one remain
+    assert len(memory_storage.get(f"/{ROOT_BRANCH}/CARS")) == 3
+
+
+def test_car_on_the_sensor_spot_is_counted_not_departed(memory_storage, make_lot, monkeypatch):
+    monkeypatch.setenv('GATE_COL', '0')
+    lot = make_lot(1, 1, storage=memory_storage)
+    sim = ParkingSimulation(lot, arrival_interval=10, wait_between=1, wrong_park_interval=0,
+                            dwell=lambda rng: 5.0)
+    sim.run(30)
+    assert sim.stats['parked'] == 1 and sim.stats['sensor_spot_skipped'] == 1
+    assert sim.stats['departures'] == 0 and sim.stats['rejected'] == 3
+    assert sim.engine.processed['departure'] == 0
+
+
+def test_full_lot_rejects_arrivals_and_periodic_departures_continue(lot):
+    sim = ParkingSimulation(lot, arrival_interval=1, wait_between=0.5, depart_interval=30,
+                            depart_when_full=10, wrong_park_interval=0)
+    sim.run(60)
+    assert sim.stats['rejected'] > 0
+    assert sim.stats['departures'] >= 2
+    assert sim.stats['arrivals'] == 20 + sim.stats['departures']
+
+
+def test_wrong_park_steps_are_scheduled_without_sleeping(lot, memory_storage):
+    sim = ParkingSimulation(lot, arrival_interval=1000, wait_between=1, wrong_park_interval=10,
+                            dwell=lambda rng: 1000.0)
+    sim.run(11)
+    # wrong park began at t=10: a spot other than the closest is purple, the closest is WAITING
+    spots = memory_storage.get(f"/{ROOT_BRANCH}/SPOTS")
+    assert [v['status'] for v in spots.values()].count('WRONG_PARK') == 1
+    sim.run(1.5)
+    assert sim.stats['wrong_parks'] == 1
+    spots = memory_storage.get(f"/{ROOT_BRANCH}/SPOTS")
+    assert 'WRONG_PARK' not in [v['status'] for v in spots.values()]
+    assert len(lot.get_occupied_spots()) == 2
+
+
+def test_default_log_level_keeps_per_car_events_off_the_log(lot):
+    # Tools/bench_sim_engine.py's week stays under a minute only while the
+    # per-car transitions never become log records at the default level
+    eventlog.configure(level='INFO', stream=io.StringIO())
+    eventlog.stats.clear()
+    try:
+        sim = ParkingSimulation(lot, arrival_interval=5, wait_between=1, wrong_park_interval=45,
+                                dwell=lambda rng: 60.0)
+        sim.run(3600)
+        assert sim.stats['parked'] > 500 and sim.stats['wrong_parks'] > 50
+        assert [key for key in eventlog.stats if key.startswith('emitted:')] == []
+    finally:
+        eventlog.configure()
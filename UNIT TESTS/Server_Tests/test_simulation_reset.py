@@ -0,0 +1,33 @@
+import pytest
+import simulation_sondos
+from constants import ROOT_BRANCH
+
+
+@pytest.fixture
+def lot(memory_storage):
+    spots = {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c} for r in range(40) for c in range(30)}
+    spots['0,1'] = {'status': 'OCCUPIED', 'carId': 'CAR1', 'seenCarId': 'CAR1', 'distanceFromEntry': 1}
+    memory_storage.set(f"/{ROOT_BRANCH}", {'SPOTS': spots, 'CARS': {'CAR1': {'status': 'parked'}}})
+    memory_storage.ops.clear()
+    return memory_storage
+
+
+def test_clear_is_chunked_with_one_verification_read(lot):
+    simulation_sondos.clear_cars_and_reset_spots()
+    # 1,200 spots + the CARS delete -> 3 chunks of <= 500 paths, one read before and one after
+    assert dict(lot.ops) == {'get': 2, 'update': 3}
+    tree = lot.get(f"/{ROOT_BRANCH}")
+    assert 'CARS' not in tree
+    assert all(s['status'] == 'FREE' for s in tree['SPOTS'].values())
+    spot = tree['SPOTS']['0,1']
+    assert spot == {'status': 'FREE', 'seenCarId': '-', 'waitingCarId': '-',
+                    'distanceFromEntry': 1, 'lastUpdateMs': spot['lastUpdateMs']}
+
+
+def test_restore_writes_backup_and_drops_cars(lot):
+    backup = lot.get(f"/{ROOT_BRANCH}/SPOTS")
+    lot.set(f"/{ROOT_BRANCH}/SPOTS/5,5/status", 'OCCUPIED')
+    lot.set(f"/{ROOT_BRANCH}/CARS/NEW1", {'status': 'parked'})
+    assert simulation_sondos.restore_spots_and_cars(backup, ['NEW1'])
+    assert lot.get(f"/{ROOT_BRANCH}/SPOTS") == backup
+    assert lot.get(f"/{ROOT_BRANCH}/CARS") == {'CAR1': {'status': 'parked'}}
@@ -0,0 +1,118 @@
+import dashboard
+import simulation_sondos
+from data_structures import ParkingLot, parse_spot_key
+from lot_mirror import ParkingLotMirror
+
+
+def snapshot():
+    spots = {f"{r},{c}": {'status': 'FREE', 'distanceFromEntry': r + c} for r in range(3) for c in range(3)}
+    spots['1,1'] = {'status': 'OCCUPIED', 'carId': 'CAR1', 'distanceFromEntry': 2}
+    spots['(2,2)'] = spots.pop('2,2')
+    spots['lobby'] = {'status': 'FREE'}
+    spots['3,x'] = {'status': 'FREE'}
+    spots['3,0'] = 'FREE'
+    return spots
+
+
+def test_parse_spot_key():
+    assert parse_spot_key('4,7') == ('4,7', 4, 7)
+    assert parse_spot_key(' (04, 7) ') == ('4,7', 4, 7)
+    assert parse_spot_key('4') is None and parse_spot_key('a,b') is None
+    parse_spot_key('9,9')
+    hits = parse_spot_key.cache_info().hits
+    parse_spot_key('9,9')
+    assert parse_spot_key.cache_info().hits == hits + 1
+
+
+def test_load_snapshot_builds_the_lot_and_reports_malformed():
+    pl = ParkingLot()
+    malformed = pl.load_snapshot(snapshot())
+    assert set(malformed) == {'lobby', '3,x', '3,0'}
+    assert malformed['3,0'] == 'not a spot node'
+    assert len(pl.spot_lookup) == 9 and '2,2' in pl.spot_lookup
+    assert len(pl.free_spots) == 8
+    assert [s.distance_from_entry for s in pl.free_spots] == sorted(s.distance_from_entry for s in pl.free_spots)
+    assert pl.occupied_spots_with_cars == {'1,1': 'CAR1'}
+    # the coordinate index catches up on first use and follows later status flips
+    assert pl.find_closest(1, 1) == (1, 0)
+    pl.get_spot('1,0').status = 'OCCUPIED'
+    assert pl.find_closest(1, 1) == (0, 1)
+
+
+def test_load_snapshot_updates_a_loaded_lot():
+    pl = ParkingLot()
+    pl.load_snapshot(snapshot())
+    spot = pl.get_spot('0,0')
+    pl.load_snapshot({'0,0': {'status': 'WAITING', 'waitingCarId': 'CAR2'},
+                      '1,1': {'status': 'FREE'}, '5,5': {'status': 'FREE', 'distanceFromEntry': 10}})
+    assert pl.get_spot('0,0') is spot and spot.waiting_car_id == 'CAR2'
+    assert spot not in pl.free_spots and pl.get_spot('1,1') in pl.free_spots
+    assert pl.occupied_spots_with_cars == {}
+    assert len(pl.spot_lookup) == 10 and len(pl.free_spots) == 9
+    # a cell listed twice keeps the last node
+    pl.load_snapshot({'7,0': {'status': 'FREE'}, '(7,0)': {'status': 'OCCUPIED'}})
+    assert pl.get_spot('7,0') not in pl.free_spots
+
+
+def test_mirror_and_dashboard_share_the_loader(capsys):
+    mirror = ParkingLotMirror()
+    mirror.apply_event('put', '/', snapshot())
+    assert mirror.free_count() == 8 and len(mirror.snapshot()) == 9
+    assert mirror.grid.free_count() == 8
+    assert 'Skipped 3 malformed' in capsys.readouterr().out
+
+    dashboard._malformed_reported.clear()
+    dashboard.build_parkinglot_from_db(snapshot())
+    dashboard.build_parkinglot_from_db(snapshot())
+    assert capsys.readouterr().out.count('malformed') == 1
+
+
+def test_refresh_applies_only_changed_spots():
+    pl = ParkingLot()
+    pl.load_snapshot(snapshot())
+    data = snapshot()
+    assert pl.refresh_from_snapshot(data) == {}
+
+    data['0,0'] = {'status': 'OCCUPIED', 'carId': 'CAR3', 'distanceFromEntry': 0}
+    data['1,1'] = {'status': 'FREE', 'distanceFromEntry': 2}
+    data['0,2']['waitingCarId'] = 'CAR4'
+    data['4,4'] = {'status': 'WAITING', 'distanceFromEntry': 8}
+    del data['2,1']
+    free_before = len(pl.free_spots)
+    changes = pl.refresh_from_snapshot(data)
+    assert changes == {'0,0': ('FREE', 'OCCUPIED'), '1,1': ('OCCUPIED', 'FREE'), '0,2': ('FREE', 'FREE'),
+                       '4,4': (None, 'WAITING'), '2,1': ('FREE', None)}
+    assert len(pl.free_spots) == free_before - 1
+    assert pl.occupied_spots_with_cars == {'0,0': 'CAR3'}
+    assert pl.get_spot('2,1') is None and pl.get_spot('0,2').waiting_car_id == 'CAR4'
+    assert pl.refresh_from_snapshot(data) == {}
+
+
+def test_refresh_matches_spots_by_normalized_key():
+    pl = ParkingLot()
+    pl.load_snapshot({'(1,2)': {'status': 'FREE', 'distanceFromEntry': 3}})
+    changes = pl.refresh_from_snapshot({'1,2': {'status': 'OCCUPIED', 'carId': 'CAR1', 'distanceFromEntry': 3}})
+    assert changes == {'1,2': ('FREE', 'OCCUPIED')}
+    assert pl.get_spot('1,2').status == 'OCCUPIED' and not pl.free_spots
+    assert pl.refresh_from_snapshot({'(1,2)': {'status': 'OCCUPIED', 'carId': 'CAR1', 'distanceFromEntry': 3}}) == {}
+
+
+def test_refresh_sees_a_snapshot_edited_in_place():
+    pl = ParkingLot()
+    data = snapshot()
+    pl.load_snapshot(data)
+    data['0,0']['status'] = 'OCCUPIED'
+    data['0,0']['carId'] = 'CAR6'
+    assert pl.refresh_from_snapshot(data) == {'0,0': ('FREE', 'OCCUPIED')}
+    data['0,0']['status'] = 'FREE'
+    assert pl.refresh_from_snapshot(data) == {'0,0': ('OCCUPIED', 'FREE')}
+    assert pl.occupied_spots_with_cars == {'1,1': 'CAR1'} and pl.get_spot('0,0') in pl.free_spots
+
+
+def test_refresh_parking_lot_returns_the_change_set(memory_storage):
+    memory_storage.set(simulation_sondos.get_spots_ref().path, {'0,0': {'status': 'FREE'}, '0,1': {'status': 'FREE'}})
+    pl, _ = simulation_sondos.load_parking_lot_from_db()
+    assert simulation_sondos.refresh_parking_lot(pl) == {}
+    simulation_sondos.get_spots_ref().child('0,1').update({'status': 'OCCUPIED', 'carId': 'CAR5'})
+    assert simulation_sondos.refresh_parking_lot(pl) == {'0,1': ('FREE', 'OCCUPIED')}
+    assert [s.spot_id for s in pl.free_spots] == ['0,0']
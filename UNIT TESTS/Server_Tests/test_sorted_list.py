@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from data_structures import SortedList, Spot
+
+
+def test_plain_values_stay_sorted():
+    rng = random.Random(7)
+    values = [rng.randint(0, 500) for _ in range(5000)]
+    sl = SortedList(values)
+    assert list(sl) == sorted(values)
+    assert len(sl) == len(values)
+
+    for v in values[:2500]:
+        sl.remove(v)
+    expected = sorted(values[2500:])
+    assert list(sl) == expected
+    assert sl[0] == expected[0]
+    assert sl[-1] == expected[-1]
+    assert sl[1234] == expected[1234]
+
+
+def test_key_mode_matches_previous_tie_order():
+    # equal keys used to be inserted with bisect_left -> newest first
+    sl = SortedList(key=lambda spot: spot.distance_from_entry)
+    a, b, c = Spot(0, 0, 1), Spot(0, 1, 1), Spot(0, 2, 0)
+    for s in (a, b, c):
+        sl.add(s)
+    assert [s.spot_id for s in sl] == ['0,2', '0,1', '0,0']
+    assert sl.index(a) == 2
+
+
+def test_membership_remove_and_pop_with_spots():
+    spots = [Spot(r, c, r + c) for r in range(60) for c in range(40)]
+    sl = SortedList(key=lambda spot: spot.distance_from_entry)
+    for s in spots:
+        sl.add(s)
+
+    removed = spots[::3]
+    for s in removed:
+        sl.remove(s)
+    for s in removed:
+        assert s not in sl
+    assert spots[1] in sl
+    assert len(sl) == len(spots) - len(removed)
+
+    dists = [s.distance_from_entry for s in sl]
+    assert dists == sorted(dists)
+
+    farthest = sl.pop()
+    assert farthest.distance_from_entry == dists[-1]
+    assert farthest not in sl
+    closest = sl.pop(0)
+    assert closest.distance_from_entry == dists[0]
+
+    with pytest.raises(ValueError):
+        sl.remove(removed[0])
+    with pytest.raises(ValueError):
+        sl.index(removed[0])
+
+
+def test_index_positions_are_consistent():
+    sl = SortedList(range(3000))
+    for i in (0, 1, 1023, 1024, 2999):
+        assert sl.index(i) == i
+        assert sl[i] == i
+    assert 3000 not in sl
+    assert sl[10:13] == [10, 11, 12]
+
+
+def test_discard_and_update():
+    sl = SortedList(key=lambda spot: spot.distance_from_entry)
+    a, b = Spot(0, 0, 3), Spot(0, 1, 1)
+    sl.update([a, b])
+    assert list(sl) == [b, a]
+    sl.discard(a)
+    sl.discard(a)  # not there any more: no error
+    assert list(sl) == [b]
+    sl.update([a, Spot(0, 2, 0)])
+    assert [s.distance_from_entry for s in sl] == [0, 1, 3]
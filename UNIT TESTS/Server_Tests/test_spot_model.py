@@ -0,0 +1,39 @@
+import json
+
+import pytest
+from data_structures import Car, ParkingLot, Spot, intern_status
+
+
+def test_spot_and_car_are_slotted():
+    spot = Spot(3, 4, 7)
+    assert not hasattr(spot, '__dict__')
+    assert not hasattr(Car('12345678'), '__dict__')
+    with pytest.raises(AttributeError):
+        spot.colour = 'red'
+    assert spot.spot_id == '3,4'
+    assert (spot.row, spot.col, spot.distance_from_entry) == (3, 4, 7)
+
+
+def test_from_node_interns_statuses():
+    nodes = json.loads('{"0,1": {"status": "OCCUPIED", "distanceFromEntry": 1, "waitingCarId": "CAR1"},'
+                       ' "0,2": {"status": "OCCUPIED"}, "0,3": {}}')
+    spots = [Spot.from_node(0, int(sid[2:]), node) for sid, node in nodes.items()]
+    assert spots[0].status is spots[1].status is intern_status('OCCUPIED')
+    assert spots[0].waiting_car_id == 'CAR1' and spots[0].distance_from_entry == 1
+    assert spots[2].status == 'FREE' and spots[2].seen_car_id == '-'
+
+    spots[2].status = ''.join(['WAIT', 'ING'])
+    assert spots[2].status is intern_status('WAITING')
+    # unknown statuses are kept as given
+    spots[2].status = 'closed'
+    assert spots[2].status == 'closed'
+
+
+def test_apply_spot_node_uses_the_factory():
+    pl = ParkingLot()
+    spot = pl.apply_spot_node('(2,1)', {'status': 'OCCUPIED', 'carId': 'CAR7', 'distanceFromEntry': 3})
+    assert pl.get_spot('2,1') is spot
+    assert spot.distance_from_entry == 3
+    assert pl.occupied_spots_with_cars == {'2,1': 'CAR7'}
+    pl.apply_spot_node('2,1', {'status': 'FREE'})
+    assert spot.status == 'FREE' and spot in pl.free_spots
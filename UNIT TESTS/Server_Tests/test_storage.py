@@ -0,0 +1,52 @@
+import storage
+from lot_mirror import ParkingLotMirror
+from storage import MemoryStorage
+
+
+def test_path_semantics():
+    s = MemoryStorage({'A': {'SPOTS': {'0,0': {'status': 'FREE', 'carId': None}}}})
+    ref = storage.Reference(s, '/A')
+    assert ref.child('SPOTS/0,0').get() == {'status': 'FREE'}
+    assert ref.child('SPOTS').child('0,0').key == '0,0'
+
+    ref.update({'SPOTS/0,1/status': 'WAITING', 'CARS/7': {'Id': '7'}})
+    assert ref.get(shallow=True) == {'SPOTS': True, 'CARS': True}
+    # deleting the last child removes the now-empty parents too
+    ref.child('CARS/7/Id').delete()
+    assert ref.get(shallow=True) == {'SPOTS': True}
+    ref.child('SPOTS/0,0').set({'status': None})
+    assert ref.child('SPOTS').get() == {'0,1': {'status': 'WAITING'}}
+
+    # values handed out are copies
+    ref.child('SPOTS').get()['0,1']['status'] = 'X'
+    assert ref.child('SPOTS/0,1/status').get() == 'WAITING'
+    assert s.ops['update'] == 1 and s.ops['delete'] == 1
+
+
+def test_listen_events():
+    s = MemoryStorage({'A': {'SPOTS': {'0,0': {'status': 'FREE'}}}})
+    events = []
+    reg = s.listen('/A/SPOTS', lambda e: events.append((e.event_type, e.path, e.data)))
+    s.set('/A/SPOTS/0,0/status', 'WAITING')
+    s.update('/A/SPOTS', {'0,1': {'status': 'FREE'}, '0,0': None})
+    s.update('/A', {'SPOTS/0,1/status': 'OCCUPIED', 'CARS/1': {'Id': '1'}})
+    s.set('/A', {'SPOTS': {'9,9': {'status': 'FREE'}}})
+    reg.close()
+    s.set('/A/SPOTS/9,9/status', 'WAITING')
+    assert events == [
+        ('put', '/', {'0,0': {'status': 'FREE'}}),
+        ('put', '/0,0/status', 'WAITING'),
+        ('patch', '/', {'0,1': {'status': 'FREE'}, '0,0': None}),
+        ('put', '/0,1/status', 'OCCUPIED'),
+        ('put', '/', {'9,9': {'status': 'FREE'}}),
+    ]
+
+
+def test_mirror_follows_memory_storage(memory_storage):
+    memory_storage.set('/SondosPark/SPOTS', {f"0,{c}": {'status': 'FREE', 'distanceFromEntry': c} for c in range(3)})
+    mirror = ParkingLotMirror().start(timeout=1)
+    storage.reference('/SondosPark').update({'SPOTS/0,0/status': 'OCCUPIED', 'SPOTS/0,0/carId': 'C1'})
+    # delivered before update() returns
+    assert mirror.parking_lot.find_closest(0, 0) == (0, 1)
+    assert mirror.snapshot()['0,0'] == {'status': 'OCCUPIED', 'carId': 'C1', 'distanceFromEntry': 0}
+    mirror.stop()
@@ -0,0 +1,73 @@
+import itertools
+import random
+import pytest
+import traffic
+from traffic import TrafficModel
+from sim_engine import ParkingSimulation
+
+
+def take(stream, n):
+    return list(itertools.islice(stream, n))
+
+
+def test_poisson_arrivals_have_the_requested_rate():
+    times = take(traffic.poisson_arrivals(random.Random(7), 360.0), 5000)
+    assert times == sorted(times)
+    # 360 cars/hour -> a 10 s mean gap
+    assert times[-1] / len(times) == pytest.approx(10.0, rel=0.05)
+
+
+def test_rush_hour_profile_shapes_arrivals():
+    profile = [0.0] * 24
+    profile[8] = 2.0
+    profile[17] = 1.0
+    times = list(itertools.takewhile(lambda t: t < 86400, traffic.rush_hour_arrivals(random.Random(3), 600.0, profile)))
+    hours = [int(t // 3600) for t in times]
+    assert set(hours) == {8, 17}
+    # the 8 o'clock peak has twice the rate of 17 o'clock
+    assert hours.count(8) / hours.count(17) == pytest.approx(2.0, rel=0.2)
+
+
+def test_dwell_distributions():
+    rng = random.Random(5)
+    lognormal = traffic.lognormal_dwell(3600.0, 0.8)
+    stays = [lognormal(rng) for _ in range(20000)]
+    assert sum(stays) / len(stays) == pytest.approx(3600.0, rel=0.05)
+    # right-skewed: the median is well below the mean
+    assert sorted(stays)[len(stays) // 2] < 3000
+    empirical = traffic.empirical_dwell([600, 1200, 1800])
+    assert all(600 <= empirical(rng) <= 1800 for _ in range(1000))
+
+
+def test_specs_and_seeded_models_replay_exactly():
+    model = TrafficModel.from_spec('poisson:720', 'lognormal:5400,0.9', profile='weekday', seed=42)
+    again = TrafficModel.from_spec('poisson:720', 'exp:600', profile='weekday', seed=42)
+    # same seed -> same arrival stream, whatever the dwell model
+    assert take(model.arrival_times(), 200) == take(again.arrival_times(), 200)
+    assert take(model.arrival_times(), 5) != take(TrafficModel.from_spec('poisson:720', seed=43).arrival_times(), 5)
+    assert take(TrafficModel.from_spec('fixed:5').arrival_times(), 3) == [0.0, 5.0, 10.0]
+    with pytest.raises(ValueError):
+        traffic.parse_dwell('weibull:3')
+    with pytest.raises(ValueError):
+        traffic.parse_profile('1,2,3')
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.delenv('SIM_ARRIVALS', raising=False)
+    monkeypatch.delenv('SIM_DWELL', raising=False)
+    assert TrafficModel.from_env() is None
+    monkeypatch.setenv('SIM_DWELL', 'fixed:60')
+    monkeypatch.setenv('ARRIVAL_INTERVAL_SECONDS', '7')
+    model = TrafficModel.from_env()
+    assert take(model.arrival_times(), 2) == [0.0, 7.0]
+    assert model.dwell(random.Random()) == 60
+
+
+def test_simulation_consumes_the_arrival_stream(memory_storage, make_lot):
+    pl = make_lot(1, 10, storage=memory_storage)
+    model = TrafficModel(lambda rng: traffic.replay_arrivals([5, 6, 30, 31, 32]), traffic.fixed_dwell(10))
+    sim = ParkingSimulation(pl, wait_between=1, wrong_park_interval=0, traffic=model)
+    sim.run(3600)
+    assert sim.stats['arrivals'] == 5
+    assert sim.stats['departures'] == 5
+    assert sim.engine.processed['arrival'] == 5